@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Adaptive Controller
+ปรับขนาดภาพ (imgsz) และการข้ามเฟรมระหว่างรัน ให้ได้ FPS ตามเป้าหมายบน CPU แต่ละเครื่อง
+- วัด latency ของ inference ย้อนหลัง (median ของ window) และ backlog ของ frame queue
+  (backlog ค้างตลอด window = inference ตามกล้องไม่ทัน -> ลดขั้น และห้ามเพิ่มขั้น)
+- ช้ากว่าเป้า: ลด imgsz ทีละขั้นก่อน ถึงขั้นต่ำสุดแล้วจึงเพิ่มการข้ามเฟรม
+- เร็วกว่าเป้า: ลดการข้ามเฟรมก่อน แล้วจึงเพิ่ม imgsz (เมื่อคาดว่าขั้นถัดไปยังทันเป้า)
+- ทุกการเปลี่ยนแปลงถูกบันทึกเป็น metric (history / callback / ไฟล์ JSONL)
+
+FPS ที่ควบคุม = จำนวนเฟรมกล้องที่ระบบรองรับได้ต่อวินาที = (skip + 1) / latency
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import json
+import time
+from collections import deque
+
+DEFAULT_IMG_SIZES = (320, 384, 416, 480, 544, 640)
+
+
+class AdaptiveController:
+    """ควบคุม imgsz / frame-skip จาก latency ที่วัดได้จริง"""
+
+    def __init__(self, target_fps=15.0, img_sizes=DEFAULT_IMG_SIZES, initial_img_size=None,
+                 initial_skip=0, max_skip=3, window=20, hysteresis=0.15, cooldown_seconds=3.0,
+                 backlog_threshold=None, on_change=None, metrics_file=None, clock=time.monotonic):
+        if target_fps <= 0:
+            raise ValueError("target_fps must be > 0")
+
+        self.target_fps = float(target_fps)
+        self.img_sizes = sorted(set(int(size) for size in img_sizes))
+        self.max_skip = max(0, int(max_skip))
+        self.window = window
+        self.hysteresis = hysteresis
+        self.cooldown_seconds = cooldown_seconds
+        self.backlog_threshold = backlog_threshold
+        self.on_change = on_change
+        self.metrics_file = metrics_file
+        self.clock = clock
+
+        initial = initial_img_size if initial_img_size is not None else self.img_sizes[-1]
+        # เริ่มที่ขั้นที่ใกล้ค่าเริ่มต้นที่สุด (เช่น IMG_SIZE ใน config)
+        self.level = min(range(len(self.img_sizes)), key=lambda i: abs(self.img_sizes[i] - initial))
+        self.skip_frames = min(self.max_skip, max(0, int(initial_skip)))
+
+        self._latencies = deque(maxlen=window)
+        self._backlogs = deque(maxlen=window)
+        self._last_change = clock()
+        self.history = []
+
+    @property
+    def img_size(self):
+        return self.img_sizes[self.level]
+
+    def latency_ms(self):
+        """median ของ latency ใน window (ms)"""
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[len(ordered) // 2] * 1000
+
+    def achievable_fps(self, latency_ms=None, skip_frames=None):
+        """จำนวนเฟรมกล้องต่อวินาทีที่รองรับได้ที่ latency / skip นี้"""
+        latency_ms = self.latency_ms() if latency_ms is None else latency_ms
+        skip_frames = self.skip_frames if skip_frames is None else skip_frames
+        return (skip_frames + 1) * 1000.0 / latency_ms if latency_ms > 0 else float("inf")
+
+    def record(self, latency_seconds, backlog=0):
+        """
+        บันทึกเวลา inference หนึ่งครั้ง (และความยาวคิวที่รออยู่)
+        คืน dict ของการเปลี่ยนแปลงถ้ามีการปรับ ไม่งั้นคืน None
+        """
+        self._latencies.append(latency_seconds)
+        self._backlogs.append(backlog)
+        if len(self._latencies) < self.window:
+            return None
+        if self.clock() - self._last_change < self.cooldown_seconds:
+            return None
+        return self._evaluate()
+
+    def _evaluate(self):
+        latency_ms = self.latency_ms()
+        fps = self.achievable_fps(latency_ms)
+        backlogged = bool(self.backlog_threshold) and min(self._backlogs) >= self.backlog_threshold
+
+        if fps < self.target_fps * (1.0 - self.hysteresis) or backlogged:
+            reason = "too_slow" if fps < self.target_fps * (1.0 - self.hysteresis) else "backlog"
+            if self.level > 0:
+                return self._apply(self.level - 1, self.skip_frames, reason, latency_ms, fps)
+            if self.skip_frames < self.max_skip:
+                return self._apply(self.level, self.skip_frames + 1, reason, latency_ms, fps)
+            return None
+
+        if fps > self.target_fps * (1.0 + self.hysteresis):
+            if self.skip_frames > 0:
+                if self.achievable_fps(latency_ms, self.skip_frames - 1) >= self.target_fps:
+                    return self._apply(self.level, self.skip_frames - 1, "headroom", latency_ms, fps)
+                return None
+            if self.level < len(self.img_sizes) - 1:
+                # latency โดยประมาณแปรผันตามจำนวน pixel (imgsz^2)
+                scale = (self.img_sizes[self.level + 1] / self.img_size) ** 2
+                if self.achievable_fps(latency_ms * scale) >= self.target_fps:
+                    return self._apply(self.level + 1, self.skip_frames, "headroom", latency_ms, fps)
+        return None
+
+    def _apply(self, level, skip_frames, reason, latency_ms, fps):
+        change = {
+            "timestamp": time.time(),
+            "reason": reason,
+            "img_size_from": self.img_size,
+            "img_size": self.img_sizes[level],
+            "skip_from": self.skip_frames,
+            "skip": skip_frames,
+            "latency_ms": round(latency_ms, 2),
+            "fps": round(fps, 2),
+            "target_fps": self.target_fps,
+            "backlog": max(self._backlogs) if self._backlogs else 0,
+        }
+        self.level = level
+        self.skip_frames = skip_frames
+        self._latencies.clear()  # วัดใหม่ที่การตั้งค่าใหม่
+        self._backlogs.clear()
+        self._last_change = self.clock()
+        self.history.append(change)
+
+        if self.metrics_file:
+            try:
+                with open(self.metrics_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(change) + "\n")
+            except OSError as e:
+                print(f"⚠️ Cannot write adaptive metrics: {e}")
+        if self.on_change is not None:
+            self.on_change(change)
+        return change
+
+    def apply_to_gate(self, gate):
+        """ส่งค่าการข้ามเฟรมให้ MotionGate (ฉากยุ่งจะข้ามอย่างน้อยเท่านี้)"""
+        if gate is not None:
+            gate.set_skip_floor(self.skip_frames)
+
+    def get_stats(self):
+        latency_ms = self.latency_ms()
+        return {
+            "img_size": self.img_size,
+            "skip_frames": self.skip_frames,
+            "latency_ms": latency_ms,
+            "achievable_fps": self.achievable_fps(latency_ms) if latency_ms else 0.0,
+            "target_fps": self.target_fps,
+            "changes": len(self.history),
+        }
+
+
+def create_adaptive_controller_from_config(config, on_change=None):
+    """
+    สร้าง AdaptiveController จาก config class (None ถ้า ADAPTIVE_ENABLED ปิดอยู่)
+
+    อ่านค่า ADAPTIVE_TARGET_FPS (หรือ FPS_TARGET), ADAPTIVE_IMG_SIZES (ไม่เกิน IMG_SIZE),
+    ADAPTIVE_MAX_SKIP, ADAPTIVE_WINDOW, ADAPTIVE_COOLDOWN, ADAPTIVE_BACKLOG_LIMIT และ ADAPTIVE_METRICS_FILE
+    """
+    if not getattr(config, "ADAPTIVE_ENABLED", False):
+        return None
+    img_size = getattr(config, "IMG_SIZE", 640)
+    sizes = [size for size in getattr(config, "ADAPTIVE_IMG_SIZES", DEFAULT_IMG_SIZES) if size <= img_size]
+    return AdaptiveController(
+        target_fps=getattr(config, "ADAPTIVE_TARGET_FPS", getattr(config, "FPS_TARGET", 15)),
+        img_sizes=sizes or [img_size],
+        initial_img_size=img_size,
+        initial_skip=getattr(config, "SKIP_FRAMES", 0),
+        max_skip=getattr(config, "ADAPTIVE_MAX_SKIP", 3),
+        window=getattr(config, "ADAPTIVE_WINDOW", 20),
+        cooldown_seconds=getattr(config, "ADAPTIVE_COOLDOWN", 3.0),
+        backlog_threshold=getattr(config, "ADAPTIVE_BACKLOG_LIMIT", 0),
+        on_change=on_change,
+        metrics_file=getattr(config, "ADAPTIVE_METRICS_FILE", None)
+    )
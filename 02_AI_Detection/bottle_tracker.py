@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Bottle Tracker
+Tracker แบบ SORT อย่างง่าย (IoU + centroid, คำนวณแบบ vectorized ด้วย NumPy)
+ให้ track ID กับขวดแต่ละใบ และนับขวดแต่ละ track เพียงครั้งเดียว
+เมื่อข้ามเส้นนับ (line) หรือเข้าพื้นที่นับ (roi) - ใช้แทนการนับด้วย cooldown
+
+พิกัดของเส้น/พื้นที่นับเป็นสัดส่วนของเฟรม (0.0-1.0) จึงใช้ได้กับทุกความละเอียด
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import itertools
+
+import cv2
+import numpy as np
+
+COUNT_MODES = ("line", "roi", "track")
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU ของทุกคู่ระหว่าง boxes_a (N, 4) และ boxes_b (M, 4) แบบ xyxy - คืน (N, M)"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0).astype(np.float32)
+
+
+def centroids(boxes):
+    """จุดกึ่งกลางของ boxes แบบ xyxy - คืน (N, 2)"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def xywh_to_xyxy(boxes):
+    """แปลง boxes [x, y, w, h] (จาก cv2.dnn) เป็น [x1, y1, x2, y2]"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+    boxes[:, 2:] += boxes[:, :2]
+    return boxes
+
+
+def greedy_match(score, threshold):
+    """จับคู่แบบ greedy ตามคะแนนมากไปน้อย - คืน list ของ (row, col) ที่คะแนน >= threshold"""
+    if score.size == 0:
+        return []
+    rows, cols = np.nonzero(score >= threshold)
+    order = np.argsort(-score[rows, cols], kind="stable")
+
+    matches = []
+    used_rows, used_cols = set(), set()
+    for k in order:
+        r, c = int(rows[k]), int(cols[k])
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+
+class Track:
+    """ขวดหนึ่งใบที่กำลังถูกติดตาม"""
+
+    __slots__ = ("track_id", "box", "score", "velocity", "hits", "misses", "counted", "side", "pending_count")
+
+    def __init__(self, track_id, box, score):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.score = float(score)
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.hits = 1
+        self.misses = 0
+        self.counted = False
+        self.side = 0  # ฝั่งของเส้นนับที่เห็นล่าสุด (0 = ยังไม่รู้)
+        self.pending_count = False  # ข้ามเส้น / เข้า ROI ก่อนครบ min_hits - นับเมื่อ track ยืนยันแล้ว
+
+    @property
+    def centroid(self):
+        return np.array([(self.box[0] + self.box[2]) / 2, (self.box[1] + self.box[3]) / 2], dtype=np.float32)
+
+    def predicted_box(self):
+        """ตำแหน่งที่คาดว่าจะอยู่ในเฟรมถัดไป (ความเร็วคงที่)"""
+        return self.box + np.tile(self.velocity, 2)
+
+    def update(self, box, score, smoothing=0.5):
+        box = np.asarray(box, dtype=np.float32)
+        shift = centroids(box)[0] - self.centroid
+        self.velocity = smoothing * shift + (1 - smoothing) * self.velocity
+        self.box = box
+        self.score = float(score)
+        self.hits += 1
+        self.misses = 0
+
+    def mark_missed(self):
+        self.box = self.predicted_box()
+        self.misses += 1
+
+
+class BottleTracker:
+    """
+    ติดตามขวดข้ามเฟรมและนับขวดแต่ละใบครั้งเดียว
+
+    count_mode:
+      "line"  - นับเมื่อจุดกึ่งกลางข้ามเส้น count_line ((x1, y1), (x2, y2))
+      "roi"   - นับเมื่อจุดกึ่งกลางเข้าพื้นที่ count_roi (x1, y1, x2, y2)
+      "track" - นับทันทีเมื่อ track ยืนยันแล้ว (ครบ min_hits เฟรม)
+    direction: ทิศการเคลื่อนที่ที่นับในโหมด line เช่น (1, 0) = ซ้ายไปขวา, (0, 1) = บนลงล่าง
+               (None = นับทั้งสองทิศ)
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, min_hits=2, max_centroid_distance=0.15,
+                 count_mode="line", count_line=((0.5, 0.0), (0.5, 1.0)),
+                 count_roi=(0.25, 0.25, 0.75, 0.75), direction=None):
+        if count_mode not in COUNT_MODES:
+            raise ValueError(f"count_mode must be one of {COUNT_MODES}, got '{count_mode}'")
+
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+        self.max_centroid_distance = max_centroid_distance
+        self.count_mode = count_mode
+        self.count_line = count_line
+        self.count_roi = count_roi
+        self.direction = direction
+
+        self.tracks = []
+        self.total_counted = 0
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        """ล้าง track ทั้งหมดและตัวนับ"""
+        self.tracks = []
+        self.total_counted = 0
+
+    def update(self, boxes, scores, frame_shape):
+        """
+        อัปเดต tracker ด้วย detection ของเฟรมใหม่
+
+        Args:
+            boxes: (N, 4) xyxy พิกัดเฟรม
+            scores: (N,) confidence
+            frame_shape: shape ของเฟรม (ใช้แปลงเส้น/พื้นที่นับเป็น pixel)
+
+        Returns:
+            list ของ Track ที่ถูกนับในเฟรมนี้
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        height, width = frame_shape[:2]
+
+        unmatched_tracks = list(range(len(self.tracks)))
+        unmatched_dets = list(range(len(boxes)))
+
+        if self.tracks and len(boxes):
+            predicted = np.stack([track.predicted_box() for track in self.tracks])
+
+            # รอบแรก: จับคู่ด้วย IoU กับตำแหน่งที่คาดไว้
+            matches = greedy_match(iou_matrix(predicted, boxes), self.iou_threshold)
+            for t, d in matches:
+                self.tracks[t].update(boxes[d], scores[d])
+            matched_t = {t for t, _ in matches}
+            matched_d = {d for _, d in matches}
+            unmatched_tracks = [t for t in unmatched_tracks if t not in matched_t]
+            unmatched_dets = [d for d in unmatched_dets if d not in matched_d]
+
+            # รอบสอง: สายพานเร็วจน box ไม่ซ้อนกัน -> ใช้ระยะ centroid (สัดส่วนของเส้นทแยงเฟรม)
+            if unmatched_tracks and unmatched_dets:
+                diagonal = float(np.hypot(width, height))
+                distance = np.linalg.norm(
+                    centroids(predicted[unmatched_tracks])[:, None, :] - centroids(boxes[unmatched_dets])[None, :, :],
+                    axis=2
+                ) / diagonal
+                closeness = 1.0 - distance
+                for i, j in greedy_match(closeness, 1.0 - self.max_centroid_distance):
+                    t, d = unmatched_tracks[i], unmatched_dets[j]
+                    self.tracks[t].update(boxes[d], scores[d])
+                    matched_t.add(t)
+                    matched_d.add(d)
+                unmatched_tracks = [t for t in unmatched_tracks if t not in matched_t]
+                unmatched_dets = [d for d in unmatched_dets if d not in matched_d]
+
+        for t in unmatched_tracks:
+            self.tracks[t].mark_missed()
+
+        for d in unmatched_dets:
+            self.tracks.append(Track(next(self._ids), boxes[d], scores[d]))
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_missed]
+
+        counted = []
+        for track in self.tracks:
+            if track.misses:
+                continue  # ใช้เฉพาะตำแหน่งที่วัดได้จริง ไม่ใช่ตำแหน่งที่คาดไว้
+            if track.counted:
+                continue
+            # เรียกทุกเฟรมเพื่อให้ track.side ตามทัน - การข้ามเส้นก่อนยืนยัน track จะถูกจำไว้ไม่ใช่ทิ้ง
+            if self._should_count(track, width, height):
+                track.pending_count = True
+            if track.pending_count and track.hits >= self.min_hits:
+                track.counted = True
+                counted.append(track)
+
+        self.total_counted += len(counted)
+        return counted
+
+    def confirmed_tracks(self):
+        """track ที่ยืนยันแล้วและเห็นในเฟรมล่าสุด"""
+        return [track for track in self.tracks if track.hits >= self.min_hits and track.misses == 0]
+
+    def snapshot(self):
+        """สำเนาของ track ที่ยืนยันแล้ว (ปลอดภัยสำหรับส่งข้าม thread ไปแสดงผล)"""
+        return [
+            {"id": track.track_id, "centroid": tuple(track.centroid.tolist()), "counted": track.counted}
+            for track in self.confirmed_tracks()
+        ]
+
+    def _should_count(self, track, width, height):
+        if self.count_mode == "track":
+            return True
+
+        scale = np.array([width, height], dtype=np.float32)
+        current = track.centroid
+
+        if self.count_mode == "roi":
+            x1, y1, x2, y2 = self.count_roi
+            cx, cy = current / scale
+            return x1 <= cx <= x2 and y1 <= cy <= y2
+
+        # line: นับเมื่อจุดกึ่งกลางเปลี่ยนฝั่งของเส้น (เทียบกับฝั่งที่วัดได้ครั้งก่อน)
+        p1 = np.asarray(self.count_line[0], dtype=np.float32) * scale
+        p2 = np.asarray(self.count_line[1], dtype=np.float32) * scale
+        before = track.side
+        after = _side_of_line(p1, p2, current)
+        if after != 0:
+            track.side = after
+        if before == 0 or after == 0 or before == after:
+            return False
+        return self.direction is None or float(np.dot(track.velocity, self.direction)) > 0
+
+
+def _side_of_line(p1, p2, point):
+    """ฝั่งของจุดเทียบกับเส้น p1->p2 (1, -1 หรือ 0 ถ้าอยู่บนเส้น)"""
+    cross = (p2[0] - p1[0]) * (point[1] - p1[1]) - (p2[1] - p1[1]) * (point[0] - p1[0])
+    return int(np.sign(cross))
+
+
+def create_tracker_from_config(config):
+    """สร้าง BottleTracker จากค่าใน config class (ใช้ค่า default ถ้าไม่มี)"""
+    return BottleTracker(
+        iou_threshold=getattr(config, "TRACK_IOU_THRESHOLD", 0.3),
+        max_missed=getattr(config, "TRACK_MAX_MISSED", 10),
+        min_hits=getattr(config, "TRACK_MIN_HITS", 2),
+        count_mode=getattr(config, "COUNT_MODE", "line"),
+        count_line=getattr(config, "COUNT_LINE", ((0.5, 0.0), (0.5, 1.0))),
+        count_roi=getattr(config, "COUNT_ROI", (0.25, 0.25, 0.75, 0.75)),
+        direction=getattr(config, "COUNT_DIRECTION", None)
+    )
+
+
+def draw_tracks(frame, tracker, tracks=None, color=(0, 255, 255)):
+    """วาด track ID และเส้น/พื้นที่นับลงบนเฟรม (tracks = ผลจาก tracker.snapshot())"""
+    height, width = frame.shape[:2]
+
+    if tracker.count_mode == "line":
+        (x1, y1), (x2, y2) = tracker.count_line
+        cv2.line(frame, (int(x1 * width), int(y1 * height)), (int(x2 * width), int(y2 * height)), color, 2)
+    elif tracker.count_mode == "roi":
+        x1, y1, x2, y2 = tracker.count_roi
+        cv2.rectangle(frame, (int(x1 * width), int(y1 * height)), (int(x2 * width), int(y2 * height)), color, 2)
+
+    for track in tracker.snapshot() if tracks is None else tracks:
+        cx, cy = track["centroid"]
+        mark = (0, 255, 0) if track["counted"] else color
+        cv2.circle(frame, (int(cx), int(cy)), 4, mark, -1)
+        cv2.putText(frame, f"#{track['id']}", (int(cx) + 6, int(cy) - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, mark, 1)
+    return frame
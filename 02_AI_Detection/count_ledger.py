@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Count Ledger
+บันทึกการนับขวดเป็น event log แบบ append-only ใน SQLite (WAL) แทนตัวนับในหน่วยความจำ
+- ทุก event มี station ID + sequence number (ต่อ station) และเก็บเป็น delta
+  (bottle_count / total_points / servo_actions) - การรีเซ็ตก็คือ event ที่ลบยอดเดิมออก
+- ยอดรวมคำนวณแบบ incremental ในหน่วยความจำ และเขียน snapshot ทุก N event
+- เปิดโปรแกรมใหม่ = snapshot ล่าสุด + event ที่ตามมา (log tail) -> process ตายก็ไม่เสียยอด
+- sync ไป Firebase ทีละช่วงของ event ที่ยังไม่ได้ส่ง โดย key ตาม station/seq
+  และยอดรวมของแต่ละ station เป็นค่า absolute -> ส่งซ้ำได้ผลเหมือนเดิม (idempotent)
+  และหลาย station ไม่เขียนทับกัน (ยอดรวมทั้งร้าน = ผลรวมของทุก station)
+
+โครงสร้างใน Firebase:
+    count_events/{user_id}/{station}/e0000000042 = {"kind", "ts", "bottle_count", ...}  (delta)
+    count_totals/{user_id}/{station} = {"bottle_count", "total_points", "servo_actions", "seq", ...}
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import re
+import socket
+import sqlite3
+import threading
+import time
+
+COUNTERS = ("bottle_count", "total_points", "servo_actions")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    station TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    bottle_count INTEGER NOT NULL DEFAULT 0,
+    total_points INTEGER NOT NULL DEFAULT 0,
+    servo_actions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (station, seq)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    station TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    bottle_count INTEGER NOT NULL,
+    total_points INTEGER NOT NULL,
+    servo_actions INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    station TEXT PRIMARY KEY,
+    synced_seq INTEGER NOT NULL
+);
+"""
+
+
+def default_station_id():
+    """ชื่อเครื่องที่ใช้เป็น key ใน Firebase ได้ (ห้ามมี . $ # [ ] /)"""
+    return re.sub(r"[.$#\[\]/\s]", "_", socket.gethostname()) or "station"
+
+
+def event_key(seq):
+    """key ของ event ใน Firebase - มีตัวอักษรนำหน้าเพื่อไม่ให้ถูกแปลงเป็น array และเรียงตามลำดับได้"""
+    return f"e{seq:010d}"
+
+
+class CountLedger:
+    """event log ของการนับขวด (SQLite WAL) พร้อมยอดรวมแบบ incremental"""
+
+    def __init__(self, path="count_ledger.db", station_id=None, snapshot_every=100, synchronous="NORMAL"):
+        self.path = path
+        self.station_id = station_id or default_station_id()
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")  # NORMAL: ทน process crash, FULL: ทนไฟดับ
+        self._conn.executescript(_SCHEMA)
+
+        self.stats = {"appended": 0, "snapshots": 0, "recovered_events": 0, "recovery_ms": 0.0}
+        self._recover()
+
+    # ----------------------------------------
+    # Recovery
+    # ----------------------------------------
+
+    def _recover(self):
+        """ยอดรวม = snapshot ล่าสุด + ผลรวมของ event หลัง snapshot"""
+        start = time.perf_counter()
+        row = self._conn.execute(
+            "SELECT seq, bottle_count, total_points, servo_actions FROM snapshots WHERE station = ?",
+            (self.station_id,)
+        ).fetchone()
+        snapshot_seq = row[0] if row else 0
+        totals = dict(zip(COUNTERS, row[1:])) if row else dict.fromkeys(COUNTERS, 0)
+
+        tail = self._conn.execute(
+            "SELECT COUNT(*), MAX(seq), SUM(bottle_count), SUM(total_points), SUM(servo_actions) "
+            "FROM events WHERE station = ? AND seq > ?",
+            (self.station_id, snapshot_seq)
+        ).fetchone()
+        for name, delta in zip(COUNTERS, tail[2:]):
+            totals[name] += delta or 0
+
+        self._totals = totals
+        self._seq = max(snapshot_seq, tail[1] or 0)
+        self._snapshot_seq = snapshot_seq
+        self.stats["recovered_events"] = tail[0]
+        self.stats["recovery_ms"] = (time.perf_counter() - start) * 1000
+
+    # ----------------------------------------
+    # Writing
+    # ----------------------------------------
+
+    def append(self, bottle_count=0, total_points=0, servo_actions=0, kind="count"):
+        """
+        บันทึก event (ค่าเป็น delta) ลง log แล้วคืนยอดรวมใหม่
+        commit ก่อนคืนค่า - ยอดที่คืนไปจึงไม่หายแม้ process ตายทันทีหลังจากนี้
+        """
+        with self._lock:
+            return self._append_locked((int(bottle_count), int(total_points), int(servo_actions)), kind)
+
+    def reset(self):
+        """รีเซ็ตยอดเป็น 0 ด้วย event ที่ลบยอดปัจจุบันออก (ประวัติเดิมยังอยู่ใน log)"""
+        with self._lock:
+            return self._append_locked(tuple(-self._totals[name] for name in COUNTERS), "reset")
+
+    def _append_locked(self, deltas, kind):
+        seq = self._seq + 1
+        totals = {name: self._totals[name] + delta for name, delta in zip(COUNTERS, deltas)}
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute(
+                "INSERT INTO events (station, seq, ts, kind, bottle_count, total_points, servo_actions) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.station_id, seq, time.time(), kind) + deltas
+            )
+            if self.snapshot_every and seq - self._snapshot_seq >= self.snapshot_every:
+                self._write_snapshot(seq, totals)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._seq = seq
+        self._totals = totals
+        self.stats["appended"] += 1
+        return self._totals_locked()
+
+    def _write_snapshot(self, seq, totals):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO snapshots (station, seq, bottle_count, total_points, servo_actions, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.station_id, seq) + tuple(totals[name] for name in COUNTERS) + (time.time(),)
+        )
+        self._snapshot_seq = seq
+        self.stats["snapshots"] += 1
+
+    def snapshot(self):
+        """เขียน snapshot ของยอดปัจจุบัน (เปิดครั้งถัดไปไม่ต้องรวม event ย้อนหลัง)"""
+        with self._lock:
+            if self._seq > self._snapshot_seq:
+                self._write_snapshot(self._seq, self._totals)
+
+    def compact(self):
+        """ลบ event ที่อยู่ใน snapshot และ sync แล้ว - คืนจำนวนที่ลบ"""
+        self.snapshot()
+        with self._lock:
+            upto = min(self._snapshot_seq, self._synced_seq_locked())
+            cursor = self._conn.execute("DELETE FROM events WHERE station = ? AND seq <= ?",
+                                        (self.station_id, upto))
+            return cursor.rowcount
+
+    # ----------------------------------------
+    # Reading
+    # ----------------------------------------
+
+    def _totals_locked(self):
+        return {**self._totals, "seq": self._seq}
+
+    def totals(self):
+        """ยอดรวมปัจจุบันของ station นี้ พร้อม seq ล่าสุด"""
+        with self._lock:
+            return self._totals_locked()
+
+    def totals_at(self, seq):
+        """ยอดรวม ณ event ที่ seq (= ยอดปัจจุบัน - event ที่ตามมาหลังจากนั้น)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT SUM(bottle_count), SUM(total_points), SUM(servo_actions) FROM events "
+                "WHERE station = ? AND seq > ?",
+                (self.station_id, seq)
+            ).fetchone()
+            totals = {name: self._totals[name] - (later or 0) for name, later in zip(COUNTERS, row)}
+        return {**totals, "seq": seq}
+
+    def events_after(self, seq, limit=None):
+        """event ของ station นี้ที่ seq มากกว่าค่าที่ให้ (เรียงตาม seq)"""
+        query = ("SELECT seq, ts, kind, bottle_count, total_points, servo_actions FROM events "
+                 "WHERE station = ? AND seq > ? ORDER BY seq")
+        params = (self.station_id, seq)
+        if limit:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(("seq", "ts", "kind") + COUNTERS, row)) for row in rows]
+
+    # ----------------------------------------
+    # Sync
+    # ----------------------------------------
+
+    def _synced_seq_locked(self):
+        row = self._conn.execute("SELECT synced_seq FROM sync_state WHERE station = ?",
+                                 (self.station_id,)).fetchone()
+        return row[0] if row else 0
+
+    @property
+    def synced_seq(self):
+        """seq ล่าสุดที่ backend ยืนยันแล้ว"""
+        with self._lock:
+            return self._synced_seq_locked()
+
+    def pending_count(self):
+        with self._lock:
+            return self._seq - self._synced_seq_locked()
+
+    def mark_synced(self, seq):
+        """บันทึกว่า event ถึง seq นี้ส่งสำเร็จแล้ว (ไม่ถอยหลัง)"""
+        with self._lock:
+            if seq > self._synced_seq_locked():
+                self._conn.execute("INSERT OR REPLACE INTO sync_state (station, synced_seq) VALUES (?, ?)",
+                                   (self.station_id, seq))
+
+    def sync_updates(self, user_id, limit=200):
+        """
+        multi-path update ของ event ที่ยังไม่ได้ส่ง (สูงสุด limit event) + ยอดรวม ณ event สุดท้าย
+        คืน (updates, last_seq) - updates ว่างถ้าไม่มีอะไรค้าง
+        """
+        events = self.events_after(self.synced_seq, limit)
+        if not events:
+            return {}, self.synced_seq
+
+        prefix = f"count_events/{user_id}/{self.station_id}"
+        updates = {
+            f"{prefix}/{event_key(event['seq'])}": {key: value for key, value in event.items() if key != "seq"}
+            for event in events
+        }
+        last_seq = events[-1]["seq"]
+        updates[f"count_totals/{user_id}/{self.station_id}"] = {
+            **self.totals_at(last_seq),
+            "updated": events[-1]["ts"],
+        }
+        return updates, last_seq
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update(self._totals_locked())
+            stats["synced_seq"] = self._synced_seq_locked()
+            stats["snapshot_seq"] = self._snapshot_seq
+        stats["station"] = self.station_id
+        return stats
+
+    def close(self):
+        """เขียน snapshot แล้วปิดฐานข้อมูล"""
+        self.snapshot()
+        with self._lock:
+            self._conn.close()
+
+
+class LedgerSyncer:
+    """ส่ง event ที่ค้างจาก CountLedger ไป Firebase ใน background (offline ก็แค่รอรอบถัดไป)"""
+
+    def __init__(self, ledger, writer, user_id, interval=2.0, batch_size=200):
+        self.ledger = ledger
+        self.writer = writer
+        self.user_id = user_id
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stats = {"batches": 0, "events": 0, "failures": 0}
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._sync_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ledger-sync", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """ปลุกให้ sync เร็วขึ้น (เช่น หลังนับขวด)"""
+        self._wake.set()
+
+    def sync_once(self):
+        """ส่ง event ที่ค้างทั้งหมดเป็นชุดๆ - คืนจำนวน event ที่ส่งสำเร็จ"""
+        sent = 0
+        with self._sync_lock:
+            while True:
+                updates, last_seq = self.ledger.sync_updates(self.user_id, self.batch_size)
+                if not updates:
+                    return sent
+                if not self.writer.send_updates(updates):
+                    self.stats["failures"] += 1
+                    return sent
+                count = len(updates) - 1  # ไม่รวม path ของยอดรวม
+                self.ledger.mark_synced(last_seq)
+                self.stats["batches"] += 1
+                self.stats["events"] += count
+                sent += count
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._stop.wait(0.2)  # รวม event ที่ตามมาติดๆ เป็น batch เดียว
+            self.sync_once()
+
+    def close(self, timeout=5.0):
+        """หยุด thread แล้ว sync รอบสุดท้าย"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        self.sync_once()
+
+
+def create_ledger_from_config(config):
+    """
+    สร้าง CountLedger จาก config class (None ถ้า LEDGER_ENABLED ปิดอยู่)
+
+    อ่านค่า LEDGER_PATH, LEDGER_STATION_ID ("" = ชื่อเครื่อง) และ LEDGER_SNAPSHOT_EVERY
+    """
+    if not getattr(config, "LEDGER_ENABLED", False):
+        return None
+    return CountLedger(
+        path=getattr(config, "LEDGER_PATH", "count_ledger.db"),
+        station_id=getattr(config, "LEDGER_STATION_ID", "") or None,
+        snapshot_every=getattr(config, "LEDGER_SNAPSHOT_EVERY", 100)
+    )
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Detection Service
+ให้บริการ model สำหรับ API: รวม request ที่เข้ามาพร้อมกันเป็น micro-batch
+(รอไม่เกิน max_wait_ms) แล้วรัน inference ใน worker thread แยกจาก event loop
+หรือส่งต่อให้ batcher ภายนอก (DynamicBatcher ที่ใช้ร่วมกันทั้ง process ของ 15_Performance)
+ที่จัด batch ตาม latency SLO และ priority lane
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from frame_pipeline import StageStats
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceOverloadedError(RuntimeError):
+    """queue ของ service เต็ม - ผู้เรียกควรตอบ 503 ให้ client ลองใหม่"""
+
+
+class _PendingRequest:
+    __slots__ = ("frame", "future", "enqueued_at")
+
+    def __init__(self, frame, future):
+        self.frame = frame
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class YOLODetectionService:
+    """
+    Micro-batching detection service บน DetectionBackend ตัวเดียว
+
+    - detect(frame) เป็น coroutine: ใส่ request ลง queue แล้วรอผลของตัวเอง
+    - batcher task เก็บ request จนครบ max_batch_size หรือหมดเวลา max_wait_ms
+      นับจาก request แรกของ batch แล้วส่งให้ backend.predict() ใน thread เดียว
+    - batcher: ใช้ batcher ภายนอกแทน batcher task เช่น get_shared_batcher() ที่งาน offline ใช้ด้วย
+      (ต้องมี submit(frame, lane, handler) -> concurrent Future, get_stats(), queue_depth())
+      service ไม่ได้เป็นเจ้าของ batcher จึงไม่ปิดมันตอน stop()
+    """
+
+    def __init__(self, backend, max_batch_size=8, max_wait_ms=10.0, max_queue_size=64, batcher=None):
+        self.backend = backend
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.batcher = batcher
+        self._batcher_pending = set()   # Future ของ request ที่ส่งเข้า batcher แล้วยังไม่เสร็จ
+        self._batcher_lock = threading.Lock()
+
+        self._queue = None
+        self._task = None
+        self._inflight = []   # request ที่ batcher task ดึงออกจาก queue แล้ว (กำลังรวม batch / รอ inference)
+        self._executor = None
+        self._running = False
+
+        self.batch_sizes = Counter()
+        self.queue_depths = Counter()
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.queue_wait = StageStats("queue_wait")
+        self.inference = StageStats("inference")
+
+    @property
+    def running(self):
+        return self._running
+
+    async def start(self, warmup=True):
+        """โหลด model (+warmup) ใน worker thread แล้วเริ่ม batcher task"""
+        if self._running:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detection-worker")
+        loop = asyncio.get_running_loop()
+        if warmup:
+            warmup_ms = await loop.run_in_executor(self._executor, self.backend.warmup)
+            logger.info(f"🔥 {self.backend.name} warmed up ({warmup_ms:.1f} ms/batch)")
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._running = True
+        if self.batcher is not None:
+            logger.info(f"✅ Detection service started (backend={self.backend.name}, "
+                        f"batcher={type(self.batcher).__name__})")
+            return
+        self._task = asyncio.create_task(self._batch_loop())
+        logger.info(f"✅ Detection service started (backend={self.backend.name}, "
+                    f"max_batch={self.max_batch_size}, max_wait={self.max_wait * 1000:.0f}ms)")
+
+    async def stop(self):
+        """หยุดรับ request, ยกเลิกที่ค้างใน queue / batch ที่ยังไม่เสร็จ และปิด backend"""
+        if not self._running:
+            return
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        pending = list(self._inflight)
+        self._inflight = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(ServiceOverloadedError("Detection service stopped"))
+
+        if self.batcher is not None:
+            # batcher ใช้ร่วมกับงานอื่น: ยกเลิก request ของเราที่ยังไม่เริ่ม แล้วรอตัวที่กำลังรันก่อนปิด backend
+            with self._batcher_lock:
+                pending = list(self._batcher_pending)
+            for future in pending:
+                future.cancel()
+            running = [future for future in pending if not future.done()]
+            if running:
+                await asyncio.get_running_loop().run_in_executor(None, wait_futures, running, 10.0)
+
+        self._executor.shutdown(wait=True)
+        self.backend.close()
+
+    async def detect(self, frame, lane=None):
+        """ตรวจจับวัตถุในภาพ BGR หนึ่งภาพ - คืน Detections (lane ใช้เมื่อมี batcher ภายนอกเท่านั้น)"""
+        if not self._running:
+            raise ServiceOverloadedError("Detection service is not running")
+
+        if self.batcher is not None:
+            try:
+                future = self.batcher.submit(frame, lane, handler=self._predict_batch)
+            except RuntimeError as e:
+                # queue เต็ม / batcher ปิดแล้ว
+                self.rejected += 1
+                raise ServiceOverloadedError(str(e)) from e
+            with self._batcher_lock:
+                self._batcher_pending.add(future)
+            future.add_done_callback(self._discard_pending)
+            self.requests += 1
+            depth = self.batcher.queue_depth()
+            self.queue_depths[depth] += 1
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                if future.cancelled() and not self._running:
+                    raise ServiceOverloadedError("Detection service stopped")
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingRequest(frame, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ServiceOverloadedError("Detection queue is full")
+
+        self.requests += 1
+        depth = self._queue.qsize()
+        self.queue_depths[depth] += 1
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        return await future
+
+    async def _collect_batch(self):
+        """รอ request แรก แล้วเก็บเพิ่มจนเต็ม batch หรือหมดเวลา"""
+        batch = self._inflight = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # หมดเวลาแล้ว แต่ยังเก็บตัวที่รออยู่ใน queue ได้โดยไม่ต้องรอเพิ่ม
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            batch = await self._collect_batch()
+            # ข้ามตัวที่ client ยกเลิกไปแล้ว (เช่น connection หลุด)
+            batch = [request for request in batch if not request.future.cancelled()]
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            for request in batch:
+                self.queue_wait.record(now - request.enqueued_at)
+            self.batch_sizes[len(batch)] += 1
+
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.backend.predict, [request.frame for request in batch]
+                )
+            except Exception as e:
+                self.failed_batches += 1
+                self.inference.record_error()
+                logger.error(f"❌ Batch inference failed ({len(batch)} requests): {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            self.inference.record(time.perf_counter() - start)
+
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+
+    def _discard_pending(self, future):
+        with self._batcher_lock:
+            self._batcher_pending.discard(future)
+
+    def _predict_batch(self, frames):
+        """handler ของ batcher ภายนอก (เรียกจาก thread ของ batcher)"""
+        self.batch_sizes[len(frames)] += 1
+        start = time.perf_counter()
+        try:
+            results = self.backend.predict(frames)
+        except Exception:
+            self.failed_batches += 1
+            self.inference.record_error()
+            raise
+        self.inference.record(time.perf_counter() - start)
+        return results
+
+    def get_stats(self):
+        """สถิติของ service: queue depth, histogram ขนาด batch และ latency"""
+        batches = sum(self.batch_sizes.values())
+        batched_requests = sum(size * count for size, count in self.batch_sizes.items())
+        if self.batcher is not None:
+            queue_depth = self.batcher.queue_depth()
+        else:
+            queue_depth = self._queue.qsize() if self._queue else 0
+        stats = {
+            "backend": self.backend.info(),
+            "running": self._running,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "batches": batches,
+            "avg_batch_size": (batched_requests / batches) if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "queue_depth_histogram": {str(depth): count for depth, count in sorted(self.queue_depths.items())},
+            "queue_wait": self.queue_wait.snapshot(),
+            "inference": self.inference.snapshot(),
+        }
+        if self.batcher is not None:
+            stats["dynamic_batcher"] = self.batcher.get_stats()
+        return stats
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Firebase Batch Writer
+ตัวเขียน Firebase Realtime Database แบบ background ที่ใช้ร่วมกันทุกสคริปต์
+- รวม (coalesce) การอัปเดต path เดียวกันที่มาติดๆ กัน (last-write-wins)
+- ใช้ HTTP session แบบ keep-alive ตัวเดียว
+- รวมหลาย path เป็น multi-path PATCH ครั้งเดียว
+- เมื่อ network ล่ม จะ spool ลงไฟล์ append-only แล้ว replay เมื่อกลับมาออนไลน์
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+import requests
+
+
+class FirebaseBatchWriter:
+    """เขียนข้อมูลไป Firebase แบบ batch ใน background thread"""
+
+    def __init__(self, base_url, spool_path="firebase_spool.jsonl", flush_interval=0.5,
+                 timeout=10, retry_interval=5.0, max_paths_per_patch=500, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.spool_path = spool_path
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.max_paths_per_patch = max_paths_per_patch
+        self.session = session or requests.Session()
+
+        self.online = True
+        self.stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "patches_sent": 0,
+            "paths_sent": 0,
+            "failures": 0,
+            "spooled_batches": 0,
+            "replayed_batches": 0,
+            "dropped_paths": 0,
+        }
+
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._io_lock = threading.Lock()  # ส่งทีละ batch เพื่อรักษาลำดับ
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_failure = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="firebase-writer", daemon=True)
+        self._thread.start()
+
+    # ----------------------------------------
+    # Public API
+    # ----------------------------------------
+
+    def submit(self, path, data):
+        """เพิ่มการอัปเดตเข้า queue (ไม่ block) - path เดิมจะถูกแทนที่ด้วยค่าล่าสุด"""
+        path = path.strip("/")
+        with self._pending_lock:
+            if path in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[path] = data
+            self.stats["submitted"] += 1
+        self._wake.set()
+        return True
+
+    def send_now(self, path, data):
+        """ส่งทันทีแบบ blocking (ใช้ทดสอบการเชื่อมต่อ) - คืน True ถ้าสำเร็จ"""
+        with self._io_lock:
+            return self._patch({path.strip("/"): data}) == "ok"
+
+    def send_updates(self, updates):
+        """ส่งหลาย path เป็น PATCH เดียวทันที (blocking, ไม่ผ่าน spool) - คืน True ถ้าสำเร็จ"""
+        with self._io_lock:
+            return self._patch({path.strip("/"): data for path, data in updates.items()}) == "ok"
+
+    def flush(self):
+        """ส่งทุกอย่างที่ค้างอยู่ทันที (blocking) - คืน True ถ้าไม่มีอะไรค้าง"""
+        with self._io_lock:
+            return self._flush_locked()
+
+    def close(self, timeout=5.0):
+        """หยุด background thread แล้ว flush ครั้งสุดท้าย"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        self.flush()
+        self.session.close()
+
+    def pending_count(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def get_stats(self):
+        """สถิติการทำงานของ writer"""
+        with self._pending_lock:
+            stats = dict(self.stats)
+            stats["pending_paths"] = len(self._pending)
+        stats["online"] = self.online
+        stats["spool_bytes"] = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+        return stats
+
+    # ----------------------------------------
+    # Background worker
+    # ----------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.retry_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            # รอสักครู่เพื่อรวมการอัปเดตที่ตามมาติดๆ
+            self._stop.wait(self.flush_interval)
+
+            # ตอน offline รอ retry_interval ก่อนลองใหม่
+            if not self.online and time.time() - self._last_failure < self.retry_interval:
+                continue
+
+            with self._io_lock:
+                self._flush_locked()
+
+    def _take_pending(self):
+        with self._pending_lock:
+            batch = self._pending
+            self._pending = {}
+        return batch
+
+    def _flush_locked(self):
+        """ส่ง spool ที่ค้าง + pending รวมเป็น PATCH เดียว (ต้องถือ _io_lock)"""
+        spooled, spooled_batches = self._read_spool()
+        batch = self._take_pending()
+        if not spooled and not batch:
+            return True
+
+        # spool เก่ากว่า pending เสมอ - ค่าใน pending จึงทับค่าใน spool
+        updates = dict(spooled)
+        updates.update(batch)
+
+        paths = list(updates.keys())
+        for start in range(0, len(paths), self.max_paths_per_patch):
+            chunk = {path: updates[path] for path in paths[start:start + self.max_paths_per_patch]}
+            status = self._patch(chunk)
+
+            if status == "retry":
+                # spool เดิมยังอยู่ครบ ต่อท้ายเฉพาะ pending ชุดใหม่
+                # (การส่งซ้ำ path ที่ส่งไปแล้วให้ผลเหมือนเดิม จึง replay ได้ปลอดภัย)
+                if batch:
+                    self._append_spool(batch)
+                return False
+
+            if status == "rejected":
+                self.stats["dropped_paths"] += len(chunk)
+
+        if spooled:
+            self._clear_spool()
+            self.stats["replayed_batches"] += spooled_batches
+            print(f"✅ Firebase: replayed {spooled_batches} spooled batch(es)")
+        return True
+
+    def _patch(self, updates):
+        """Multi-path PATCH ที่ root - คืน 'ok', 'retry' หรือ 'rejected'"""
+        url = f"{self.base_url}/.json"
+        try:
+            response = self.session.patch(url, json=updates, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self._mark_offline(f"{type(e).__name__}")
+            return "retry"
+        except Exception as e:
+            self._mark_offline(f"unexpected error: {e}")
+            return "retry"
+
+        if response.status_code == 200:
+            if not self.online:
+                print("✅ Firebase: connection restored")
+            self.online = True
+            self.stats["patches_sent"] += 1
+            self.stats["paths_sent"] += len(updates)
+            return "ok"
+
+        self.stats["failures"] += 1
+        if response.status_code >= 500 or response.status_code == 429:
+            self._mark_offline(f"HTTP {response.status_code}")
+            return "retry"
+
+        # 4xx (เช่น permission denied) ส่งซ้ำก็ไม่สำเร็จ
+        print(f"❌ Firebase rejected update ({response.status_code}): {response.text[:200]}")
+        return "rejected"
+
+    def _mark_offline(self, reason):
+        if self.online:
+            print(f"⚠️ Firebase offline ({reason}) - spooling to {self.spool_path}")
+        self.online = False
+        self._last_failure = time.time()
+        self.stats["failures"] += 1
+
+    # ----------------------------------------
+    # Offline spool (append-only JSON lines)
+    # ----------------------------------------
+
+    def _append_spool(self, updates):
+        try:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), "updates": updates}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.stats["spooled_batches"] += 1
+        except OSError as e:
+            print(f"❌ Cannot write Firebase spool: {e}")
+            self.stats["dropped_paths"] += len(updates)
+
+    def _read_spool(self):
+        """อ่าน spool ทั้งหมดแล้วรวมเป็น dict เดียว (บรรทัดหลังทับบรรทัดก่อน)"""
+        if not os.path.exists(self.spool_path):
+            return {}, 0
+
+        merged = {}
+        batches = 0
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # บรรทัดสุดท้ายอาจเขียนไม่ครบตอนเครื่องดับ
+                        continue
+                    merged.update(record.get("updates", {}))
+                    batches += 1
+        except OSError as e:
+            print(f"❌ Cannot read Firebase spool: {e}")
+        return merged, batches
+
+    def _clear_spool(self):
+        try:
+            os.remove(self.spool_path)
+        except OSError:
+            pass
+
+
+# ========================================
+# Shared writer (หนึ่งตัวต่อ Firebase URL ต่อ process)
+# ========================================
+
+_shared_writers = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_writer(base_url, **kwargs):
+    """คืน writer ที่ใช้ร่วมกันสำหรับ base_url นี้ (สร้างใหม่ถ้ายังไม่มี)"""
+    key = base_url.rstrip("/")
+    with _shared_lock:
+        writer = _shared_writers.get(key)
+        if writer is None:
+            writer = FirebaseBatchWriter(key, **kwargs)
+            _shared_writers[key] = writer
+        return writer
+
+
+def close_shared_writers():
+    """flush และปิด writer ทั้งหมด (เรียกอัตโนมัติตอนจบโปรแกรม)"""
+    with _shared_lock:
+        writers = list(_shared_writers.values())
+        _shared_writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_shared_writers)
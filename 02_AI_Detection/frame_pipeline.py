@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Frame Pipeline
+แยกการทำงาน capture / inference / output ออกเป็น stage คนละ thread
+เชื่อมกันด้วย bounded queue ที่ทิ้งเฟรมเก่าสุดเมื่อเต็ม
+เพื่อให้ Firebase/Serial ที่ช้าไม่ทำให้กล้องค้าง
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class DropOldestQueue:
+    """Bounded queue ที่ไม่ block ผู้ส่ง - ถ้าเต็มจะทิ้ง item ที่เก่าที่สุด"""
+
+    def __init__(self, maxsize=2):
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._put_lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item):
+        """ใส่ item ลง queue (ทิ้งตัวเก่าสุดถ้าเต็ม)"""
+        with self._put_lock:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        """ดึง item ออกจาก queue (raise queue.Empty เมื่อหมดเวลา, timeout=0 คือไม่รอ)"""
+        if timeout == 0:
+            return self._queue.get_nowait()
+        return self._queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    @property
+    def maxsize(self):
+        return self._queue.maxsize
+
+
+class StageStats:
+    """ตัวนับ latency ของ stage หนึ่งใน pipeline"""
+
+    def __init__(self, name, window=300):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """บันทึกเวลาที่ใช้ (วินาที)"""
+        with self._lock:
+            self.count += 1
+            self.total_time += seconds
+            self.last_time = seconds
+            self.max_time = max(self.max_time, seconds)
+            self._recent.append(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """สรุปค่าสถิติเป็น dict (หน่วย ms)"""
+        with self._lock:
+            recent = sorted(self._recent)
+            count = self.count
+            total = self.total_time
+            snapshot = {
+                "count": count,
+                "errors": self.errors,
+                "last_ms": self.last_time * 1000,
+                "avg_ms": (total / count * 1000) if count else 0.0,
+                "max_ms": self.max_time * 1000,
+            }
+
+        for label, pct in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+            snapshot[label] = _percentile(recent, pct) * 1000
+        return snapshot
+
+
+def _percentile(sorted_values, pct):
+    """percentile แบบ nearest-rank จาก list ที่เรียงแล้ว"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class FramePacket:
+    """ข้อมูลของเฟรมหนึ่งเฟรมที่ไหลผ่าน pipeline"""
+
+    __slots__ = ("frame_id", "frame", "captured_at", "result")
+
+    def __init__(self, frame_id, frame, captured_at):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.captured_at = captured_at
+        self.result = None
+
+
+class LatestFrameReader:
+    """
+    อ่านเฟรมจากกล้องหนึ่งตัวใน thread แยก เก็บไว้เฉพาะเฟรมล่าสุด
+    ใช้เมื่อหลายกล้องป้อนเฟรมเข้า model ตัวเดียวกัน (multi-camera station)
+    """
+
+    def __init__(self, source, name=None, frame_width=None, frame_height=None, max_read_failures=30):
+        self.source = source
+        self.name = name or str(source)
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.max_read_failures = max_read_failures
+
+        self.latest = DropOldestQueue(1)
+        self.stats = StageStats(f"capture[{self.name}]")
+        self.cap = None
+        self.frames_read = 0
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def dropped(self):
+        return self.latest.dropped
+
+    def start(self):
+        """เปิดกล้องและเริ่ม thread อ่านเฟรม"""
+        self.cap = cv2.VideoCapture(self.source)
+        if self.frame_width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
+        if self.frame_height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open camera source: {self.source}")
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._read_loop, name=f"reader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """หยุด thread และปล่อยกล้อง"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _read_loop(self):
+        failures = 0
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            elapsed = time.perf_counter() - start
+
+            if not ret or frame is None:
+                failures += 1
+                self.stats.record_error()
+                if failures >= self.max_read_failures:
+                    print(f"❌ Camera {self.name}: failed to grab frames, reader stopped")
+                    break
+                time.sleep(0.01)
+                continue
+
+            failures = 0
+            self.frames_read += 1
+            self.stats.record(elapsed)
+            self.latest.put(FramePacket(self.frames_read, frame, time.time()))
+
+    def read_latest(self, timeout=0.0):
+        """คืนเฟรมล่าสุดที่ยังไม่ถูกอ่าน (None ถ้ายังไม่มีเฟรมใหม่)"""
+        try:
+            return self.latest.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class FramePipeline:
+    """
+    Pipeline 3 stage:
+      capture thread  -> frame queue  -> inference thread -> output queue -> output thread
+                                                          -> display queue (อ่านจาก main thread)
+
+    - infer_fn(frame) คืนค่าผลลัพธ์ที่จะแนบไปกับ packet
+    - output_fn(packet) ทำงาน I/O (Serial, Firebase) โดยไม่ถ่วง inference
+    """
+
+    STAGES = ("capture", "inference", "output", "display", "end_to_end")
+
+    def __init__(self, source, infer_fn, output_fn=None, frame_queue_size=2,
+                 output_queue_size=4, display_queue_size=1, frame_width=None,
+                 frame_height=None, max_read_failures=30):
+        self.source = source
+        self.infer_fn = infer_fn
+        self.output_fn = output_fn
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.max_read_failures = max_read_failures
+
+        self.frame_queue = DropOldestQueue(frame_queue_size)
+        self.output_queue = DropOldestQueue(output_queue_size)
+        self.display_queue = DropOldestQueue(display_queue_size)
+
+        self.stats = {name: StageStats(name) for name in self.STAGES}
+        self.cap = None
+        self._threads = []
+        self._stop_event = threading.Event()
+        self._frame_counter = 0
+        self._started_at = None
+
+    @property
+    def running(self):
+        return self._started_at is not None and not self._stop_event.is_set()
+
+    def start(self):
+        """เปิดกล้องและเริ่มทุก stage"""
+        self.cap = cv2.VideoCapture(self.source)
+        if self.frame_width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
+        if self.frame_height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open camera source: {self.source}")
+
+        self._stop_event.clear()
+        self._started_at = time.time()
+
+        workers = [
+            ("capture", self._capture_loop),
+            ("inference", self._inference_loop),
+        ]
+        if self.output_fn is not None:
+            workers.append(("output", self._output_loop))
+
+        for name, target in workers:
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        print(f"🎞️ Frame pipeline started (source={self.source}, "
+              f"queues={self.frame_queue.maxsize}/{self.output_queue.maxsize})")
+
+    def stop(self, timeout=2.0):
+        """หยุดทุก stage และปล่อยกล้อง"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _capture_loop(self):
+        """Stage 1: อ่านเฟรมจากกล้องให้เร็วที่สุด"""
+        failures = 0
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            elapsed = time.perf_counter() - start
+
+            if not ret or frame is None:
+                failures += 1
+                self.stats["capture"].record_error()
+                if failures >= self.max_read_failures:
+                    print("❌ Failed to grab frames from camera, stopping pipeline")
+                    self._stop_event.set()
+                    break
+                time.sleep(0.01)
+                continue
+
+            failures = 0
+            self._frame_counter += 1
+            self.stats["capture"].record(elapsed)
+            self.frame_queue.put(FramePacket(self._frame_counter, frame, time.time()))
+
+    def _inference_loop(self):
+        """Stage 2: ประมวลผล model กับเฟรมล่าสุด"""
+        while not self._stop_event.is_set():
+            try:
+                packet = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            start = time.perf_counter()
+            try:
+                packet.result = self.infer_fn(packet.frame)
+            except Exception as e:
+                self.stats["inference"].record_error()
+                print(f"❌ Inference error: {e}")
+                continue
+            self.stats["inference"].record(time.perf_counter() - start)
+
+            if self.output_fn is not None:
+                self.output_queue.put(packet)
+            self.display_queue.put(packet)
+
+    def _output_loop(self):
+        """Stage 3: ส่งผลไป Arduino / Firebase"""
+        while not self._stop_event.is_set():
+            try:
+                packet = self.output_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            start = time.perf_counter()
+            try:
+                self.output_fn(packet)
+            except Exception as e:
+                self.stats["output"].record_error()
+                print(f"❌ Output stage error: {e}")
+                continue
+            self.stats["output"].record(time.perf_counter() - start)
+            self.stats["end_to_end"].record(time.time() - packet.captured_at)
+
+    def get_display_packet(self, timeout=0.05):
+        """ดึง packet ล่าสุดสำหรับแสดงผล (None ถ้ายังไม่มี)"""
+        try:
+            return self.display_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def record_stage(self, name, seconds):
+        """บันทึกเวลาของ stage ที่ทำงานนอก pipeline (เช่น display บน main thread)"""
+        self.stats[name].record(seconds)
+
+    def get_stats(self):
+        """สถิติของทุก stage และ queue"""
+        elapsed = (time.time() - self._started_at) if self._started_at else 0.0
+        inferred = self.stats["inference"].count
+        return {
+            "uptime_s": elapsed,
+            "frames_captured": self._frame_counter,
+            "inference_fps": (inferred / elapsed) if elapsed > 0 else 0.0,
+            "stages": {name: stats.snapshot() for name, stats in self.stats.items()},
+            "queues": {
+                "frame": {"depth": self.frame_queue.qsize(), "dropped": self.frame_queue.dropped},
+                "output": {"depth": self.output_queue.qsize(), "dropped": self.output_queue.dropped},
+                "display": {"depth": self.display_queue.qsize(), "dropped": self.display_queue.dropped},
+            },
+        }
+
+    def print_stats(self):
+        """แสดงสถิติ latency ของแต่ละ stage"""
+        stats = self.get_stats()
+        print(f"🎞️ Pipeline: {stats['frames_captured']} frames captured, "
+              f"{stats['inference_fps']:.1f} inference FPS")
+        for name, stage in stats["stages"].items():
+            print(f"   - {name:<10} n={stage['count']:<6} avg={stage['avg_ms']:.1f}ms "
+                  f"p95={stage['p95_ms']:.1f}ms max={stage['max_ms']:.1f}ms errors={stage['errors']}")
+        for name, q in stats["queues"].items():
+            print(f"   - {name} queue: depth={q['depth']} dropped={q['dropped']}")
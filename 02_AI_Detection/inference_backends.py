@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Inference Backends
+รวม detector ทุกแบบไว้หลัง interface เดียว (DetectionBackend)
+- opencv_dnn  : YOLOv3 ผ่าน cv2.dnn (.weights/.cfg)
+- ultralytics : YOLOv8/YOLOv11 (.pt)
+- onnxruntime : ONNX ที่ export จาก Ultralytics บน CPU (ตั้งจำนวน thread ได้)
+- tflite      : TFLite ที่ export จาก Ultralytics
+
+ทุก backend คืนผลเป็น Detections (boxes xyxy ในพิกัดเฟรมจริง, scores, class_ids)
+และเลือกได้จาก config ผ่าน create_backend_from_config()
+
+การใช้งาน benchmark:
+    python inference_backends.py ultralytics=best.pt onnxruntime=best.onnx --runs 30 --batch 4
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from yolo_postprocess import decode_yolo_outputs, decode_yolo_outputs_all
+
+
+class Detections:
+    """ผลการตรวจจับของเฟรมหนึ่งเฟรมในรูปแบบ array มาตรฐาน"""
+
+    __slots__ = ("boxes", "scores", "class_ids")
+
+    def __init__(self, boxes=None, scores=None, class_ids=None):
+        self.boxes = np.zeros((0, 4), dtype=np.float32) if boxes is None else np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.zeros((0,), dtype=np.float32) if scores is None else np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.class_ids = np.zeros((0,), dtype=np.int32) if class_ids is None else np.asarray(class_ids, dtype=np.int32).reshape(-1)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def filter_class(self, class_id):
+        """คืนเฉพาะ detection ของ class ที่กำหนด"""
+        keep = self.class_ids == class_id
+        return Detections(self.boxes[keep], self.scores[keep], self.class_ids[keep])
+
+    def to_list(self, class_names=None):
+        """แปลงเป็น list ของ dict (ใช้กับ JSON API)"""
+        detections = []
+        for (x1, y1, x2, y2), score, class_id in zip(self.boxes.tolist(), self.scores.tolist(), self.class_ids.tolist()):
+            name = class_names[class_id] if class_names and 0 <= class_id < len(class_names) else str(class_id)
+            detections.append({
+                "class": name,
+                "class_id": class_id,
+                "confidence": round(score, 4),
+                "bbox": [int(x1), int(y1), int(x2), int(y2)],
+            })
+        return detections
+
+
+# ========================================
+# Shared helpers
+# ========================================
+
+def letterbox(frame, size, color=(114, 114, 114)):
+    """ย่อภาพแบบคงสัดส่วนแล้วเติมขอบให้เป็น size x size - คืน (ภาพ, scale, (pad_x, pad_y))"""
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (width, height) else frame
+
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, scale, (pad_x, pad_y)
+
+
+def nms_per_class(boxes_xyxy, scores, class_ids, conf_threshold, iou_threshold, max_detections=300):
+    """NMS แยกตาม class - คืน index ที่เหลือ"""
+    if len(scores) == 0:
+        return np.empty((0,), dtype=np.int64)
+
+    xywh = boxes_xyxy.copy()
+    xywh[:, 2:] -= xywh[:, :2]
+    indexes = cv2.dnn.NMSBoxesBatched(
+        xywh.tolist(), scores.tolist(), class_ids.tolist(), conf_threshold, iou_threshold
+    )
+    return np.asarray(indexes, dtype=np.int64).reshape(-1)[:max_detections]
+
+
+def decode_ultralytics_output(output, scale, pad, frame_shape, conf_threshold, iou_threshold,
+                              classes=None, max_detections=300, input_size=None):
+    """
+    แปลง output ของ YOLOv8/YOLOv11 ที่ export แล้ว (4 + nc, anchors) เป็น Detections
+
+    Args:
+        output: array (4 + nc, A) ของภาพเดียว (layout มาตรฐานของ Ultralytics export)
+        scale, pad: ค่าจาก letterbox() สำหรับแปลงกลับเป็นพิกัดเฟรมจริง
+        input_size: ถ้ากำหนดและพิกัดเป็นแบบ normalized (TFLite) จะคูณกลับเป็น pixel
+    """
+    output = np.asarray(output, dtype=np.float32).T  # -> (A, 4 + nc)
+
+    scores_all = output[:, 4:]
+    class_ids = np.argmax(scores_all, axis=1)
+    scores = scores_all[np.arange(len(output)), class_ids]
+
+    keep = scores > conf_threshold
+    if classes is not None:
+        keep &= np.isin(class_ids, classes)
+    if not keep.any():
+        return Detections()
+
+    cxcywh = output[keep, :4]
+    scores = scores[keep]
+    class_ids = class_ids[keep]
+
+    if input_size and cxcywh.max() <= 1.5:
+        cxcywh = cxcywh * input_size
+
+    boxes = np.empty_like(cxcywh)
+    boxes[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+    boxes[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+
+    # ย้อน letterbox กลับเป็นพิกัดเฟรมจริง
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_shape[0])
+
+    keep = nms_per_class(boxes, scores, class_ids, conf_threshold, iou_threshold, max_detections)
+    return Detections(boxes[keep], scores[keep], class_ids[keep])
+
+
+# ========================================
+# Backend interface + registry
+# ========================================
+
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Decorator สำหรับลงทะเบียน backend ใหม่"""
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def available_backends():
+    """รายชื่อ backend ที่ลงทะเบียนไว้"""
+    return sorted(BACKENDS)
+
+
+class DetectionBackend:
+    """
+    Interface กลางของ detector ทุกแบบ
+
+    subclass ต้อง implement load() และ _predict_batch(frames)
+    """
+
+    name = "base"
+
+    def __init__(self, model_path, conf_threshold=0.5, iou_threshold=0.45, img_size=640,
+                 classes=None, max_detections=300, device="cpu", class_names=None):
+        self.model_path = model_path
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.img_size = img_size
+        self.classes = list(classes) if classes is not None else None
+        self.max_detections = max_detections
+        self.device = device
+        self.class_names = list(class_names) if class_names else []
+        self.loaded = False
+
+    def load(self):
+        """โหลด model (เรียกครั้งเดียว)"""
+        raise NotImplementedError
+
+    def _predict_batch(self, frames):
+        """ประมวลผล list ของเฟรม BGR - คืน list ของ Detections"""
+        raise NotImplementedError
+
+    def predict(self, frames):
+        """ตรวจจับวัตถุใน list ของเฟรม (BGR, ขนาดไม่จำเป็นต้องเท่ากัน)"""
+        if not self.loaded:
+            self.load()
+            self.loaded = True
+        if not frames:
+            return []
+        return self._predict_batch(list(frames))
+
+    def predict_one(self, frame):
+        """ตรวจจับวัตถุในเฟรมเดียว"""
+        return self.predict([frame])[0]
+
+    def warmup(self, runs=2, batch_size=1):
+        """รัน inference กับภาพว่างเพื่อให้ allocate memory/kernel ก่อนใช้งานจริง - คืนเวลาเฉลี่ย (ms)"""
+        dummy = [np.zeros((self.img_size, self.img_size, 3), dtype=np.uint8)] * batch_size
+        self.predict(dummy)
+        start = time.perf_counter()
+        for _ in range(runs):
+            self.predict(dummy)
+        return (time.perf_counter() - start) / max(1, runs) * 1000
+
+    def close(self):
+        """คืนทรัพยากรของ model"""
+        self.loaded = False
+
+    def info(self):
+        return {
+            "backend": self.name,
+            "model_path": str(self.model_path),
+            "img_size": self.img_size,
+            "conf_threshold": self.conf_threshold,
+            "iou_threshold": self.iou_threshold,
+            "classes": self.classes,
+            "loaded": self.loaded,
+        }
+
+
+@register_backend("opencv_dnn")
+class OpenCVDNNBackend(DetectionBackend):
+    """YOLOv3 (Darknet) ผ่าน cv2.dnn - แบบเดียวกับ YOLODetector/BottleDetector"""
+
+    def __init__(self, model_path="yolov3.weights", config_path="yolov3.cfg",
+                 names_path="coco.names", img_size=416, **kwargs):
+        super().__init__(model_path, img_size=img_size, **kwargs)
+        self.config_path = config_path
+        self.names_path = names_path
+        self.net = None
+        self.output_layers = None
+
+    def load(self):
+        self.net = cv2.dnn.readNet(self.model_path, self.config_path)
+        self.output_layers = self.net.getUnconnectedOutLayersNames()
+        if not self.class_names and self.names_path and os.path.exists(self.names_path):
+            with open(self.names_path, "r") as f:
+                self.class_names = [line.strip() for line in f.readlines()]
+        print(f"✅ OpenCV DNN model loaded: {self.model_path}")
+
+    def _predict_batch(self, frames):
+        results = []
+        # region layer ของ Darknet รวม batch เป็นแถวเดียวกัน จึงรันทีละเฟรม
+        for frame in frames:
+            height, width = frame.shape[:2]
+            blob = cv2.dnn.blobFromImage(
+                frame, 1 / 255.0, (self.img_size, self.img_size), (0, 0, 0), True, crop=False
+            )
+            self.net.setInput(blob)
+            outputs = self.net.forward(self.output_layers)
+
+            if self.classes is not None and len(self.classes) == 1:
+                boxes, scores = decode_yolo_outputs(outputs, width, height, self.classes[0], self.conf_threshold)
+                class_ids = np.full(len(scores), self.classes[0], dtype=np.int32)
+            else:
+                boxes, scores, class_ids = decode_yolo_outputs_all(outputs, width, height, self.conf_threshold)
+                if self.classes is not None:
+                    keep = np.isin(class_ids, self.classes)
+                    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+            xyxy = boxes.astype(np.float32)
+            xyxy[:, 2:] += xyxy[:, :2]
+            keep = nms_per_class(xyxy, scores, class_ids, self.conf_threshold,
+                                 self.iou_threshold, self.max_detections)
+            results.append(Detections(xyxy[keep], scores[keep], class_ids[keep]))
+        return results
+
+    def close(self):
+        self.net = None
+        super().close()
+
+
+@register_backend("ultralytics")
+class UltralyticsBackend(DetectionBackend):
+    """YOLOv8/YOLOv11 ผ่าน ultralytics.YOLO - predict ทั้ง batch ในครั้งเดียว"""
+
+    def __init__(self, model_path="best.pt", half=False, **kwargs):
+        super().__init__(model_path, **kwargs)
+        self.half = half
+        self.model = None
+
+    def load(self):
+        from ultralytics import YOLO
+
+        self.model = YOLO(self.model_path)
+        if not self.class_names:
+            names = self.model.names
+            self.class_names = [names[i] for i in sorted(names)] if isinstance(names, dict) else list(names)
+        print(f"✅ Ultralytics model loaded: {self.model_path}")
+
+    def _predict_batch(self, frames):
+        results = self.model.predict(
+            source=frames,
+            imgsz=self.img_size,
+            conf=self.conf_threshold,
+            iou=self.iou_threshold,
+            classes=self.classes,
+            max_det=self.max_detections,
+            device=self.device,
+            half=self.half,
+            verbose=False
+        )
+        detections = []
+        for r in results:
+            boxes = r.boxes
+            detections.append(Detections(
+                boxes.xyxy.cpu().numpy(),
+                boxes.conf.cpu().numpy(),
+                boxes.cls.cpu().numpy().astype(np.int32)
+            ))
+        return detections
+
+    def close(self):
+        self.model = None
+        super().close()
+
+
+@register_backend("onnxruntime")
+class ONNXRuntimeBackend(DetectionBackend):
+    """
+    ONNX ที่ export ด้วย `yolo export format=onnx` รันบน CPU ด้วย ONNX Runtime
+
+    num_threads: จำนวน intra-op thread (0 = ให้ ONNX Runtime เลือกเอง)
+    ถ้า export แบบ dynamic=True จะส่งทั้ง batch ในครั้งเดียว ไม่เช่นนั้นรันทีละเฟรม
+    """
+
+    def __init__(self, model_path="best.onnx", num_threads=0, **kwargs):
+        super().__init__(model_path, **kwargs)
+        self.num_threads = num_threads
+        self.session = None
+        self.input_name = None
+        self.dynamic_batch = False
+
+    def load(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = int(self.num_threads or 0)
+        options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, _ = model_input.shape
+        self.dynamic_batch = not isinstance(batch_dim, int)
+        if isinstance(height, int):
+            self.img_size = height  # ใช้ขนาดที่ model ถูก export มา
+
+        if not self.class_names:
+            names = self.session.get_modelmeta().custom_metadata_map.get("names")
+            if names:
+                self.class_names = _parse_names_metadata(names)
+        print(f"✅ ONNX Runtime model loaded: {self.model_path} "
+              f"(threads={self.num_threads or 'auto'}, dynamic_batch={self.dynamic_batch})")
+
+    def _predict_batch(self, frames):
+        prepared = [letterbox(frame, self.img_size) for frame in frames]
+        blob = cv2.dnn.blobFromImages([p[0] for p in prepared], 1 / 255.0, swapRB=True)
+
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate(
+                [self.session.run(None, {self.input_name: blob[i:i + 1]})[0] for i in range(len(frames))]
+            )
+
+        return [
+            decode_ultralytics_output(
+                output, scale, pad, frame.shape, self.conf_threshold, self.iou_threshold,
+                classes=self.classes, max_detections=self.max_detections
+            )
+            for output, frame, (_, scale, pad) in zip(outputs, frames, prepared)
+        ]
+
+    def info(self):
+        info = super().info()
+        info["num_threads"] = self.num_threads
+        info["dynamic_batch"] = self.dynamic_batch
+        return info
+
+    def close(self):
+        self.session = None
+        super().close()
+
+
+@register_backend("tflite")
+class TFLiteBackend(DetectionBackend):
+    """TFLite ที่ export ด้วย `yolo export format=tflite` (float32/float16)"""
+
+    def __init__(self, model_path="best_float32.tflite", num_threads=0, **kwargs):
+        super().__init__(model_path, **kwargs)
+        self.num_threads = num_threads
+        self.interpreter = None
+        self.input_details = None
+        self.output_details = None
+
+    def load(self):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.interpreter = Interpreter(model_path=str(self.model_path), num_threads=self.num_threads or None)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.img_size = int(self.input_details["shape"][1])
+        print(f"✅ TFLite model loaded: {self.model_path}")
+
+    def _predict_batch(self, frames):
+        results = []
+        for frame in frames:
+            image, scale, pad = letterbox(frame, self.img_size)
+            input_data = (cv2.cvtColor(image, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0)[np.newaxis]
+
+            self.interpreter.set_tensor(self.input_details["index"], input_data)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_details["index"])[0]
+
+            results.append(decode_ultralytics_output(
+                output, scale, pad, frame.shape, self.conf_threshold, self.iou_threshold,
+                classes=self.classes, max_detections=self.max_detections, input_size=self.img_size
+            ))
+        return results
+
+    def close(self):
+        self.interpreter = None
+        super().close()
+
+
+def _parse_names_metadata(names):
+    """แปลง metadata 'names' ของ Ultralytics ("{0: 'bottle', ...}") เป็น list"""
+    import ast
+
+    try:
+        parsed = ast.literal_eval(names)
+    except (ValueError, SyntaxError):
+        return []
+    if isinstance(parsed, dict):
+        return [parsed[i] for i in sorted(parsed)]
+    return list(parsed)
+
+
+# ========================================
+# Factory
+# ========================================
+
+def create_backend(name, **kwargs):
+    """สร้าง backend จากชื่อที่ลงทะเบียนไว้"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Available: {', '.join(available_backends())}")
+    return BACKENDS[name](**kwargs)
+
+
+def create_backend_from_config(config, name=None, **overrides):
+    """
+    สร้าง backend จาก config class (YOLOv11Config, ServoConfig, ...)
+
+    อ่านค่า INFERENCE_BACKEND, MODEL_PATH, CONF_THRESHOLD, IOU_THRESHOLD, IMG_SIZE,
+    DEVICE, TARGET_CLASS_ID, MAX_DETECTIONS และ ONNX_NUM_THREADS (ถ้ามี)
+    """
+    name = name or getattr(config, "INFERENCE_BACKEND", "ultralytics")
+    kwargs = {
+        "model_path": getattr(config, "MODEL_PATH", "best.pt"),
+        "conf_threshold": getattr(config, "CONF_THRESHOLD", 0.5),
+        "iou_threshold": getattr(config, "IOU_THRESHOLD", 0.45),
+        "img_size": getattr(config, "IMG_SIZE", 640),
+        "device": getattr(config, "DEVICE", "cpu"),
+        "max_detections": getattr(config, "MAX_DETECTIONS", 300),
+    }
+    target = getattr(config, "TARGET_CLASS_ID", None)
+    if target is not None:
+        kwargs["classes"] = [target]
+    if name in ("onnxruntime", "tflite"):
+        kwargs["num_threads"] = getattr(config, "ONNX_NUM_THREADS", 0)
+    kwargs.update(overrides)
+    return create_backend(name, **kwargs)
+
+
+# ========================================
+# Benchmark
+# ========================================
+
+def benchmark_backends(backends, frames, runs=20, batch_size=1):
+    """
+    วัดเวลา predict ของแต่ละ backend ด้วยเฟรมชุดเดียวกัน
+
+    Returns:
+        dict {backend_name: {"mean_ms", "p95_ms", "fps", "detections"}}
+    """
+    results = {}
+    for backend in backends:
+        backend.warmup(runs=1, batch_size=batch_size)
+        timings = []
+        detections = 0
+        for i in range(runs):
+            batch = [frames[(i * batch_size + j) % len(frames)] for j in range(batch_size)]
+            start = time.perf_counter()
+            output = backend.predict(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+            detections += sum(len(d) for d in output)
+
+        timings.sort()
+        mean_ms = sum(timings) / len(timings)
+        results[backend.name] = {
+            "mean_ms": mean_ms,
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "fps": batch_size * 1000.0 / mean_ms if mean_ms > 0 else 0.0,
+            "detections": detections,
+        }
+    return results
+
+
+def _load_frames(path, count=8, size=(640, 480)):
+    """โหลดภาพจากโฟลเดอร์/ไฟล์วิดีโอ หรือสร้างภาพสุ่มถ้าไม่กำหนด"""
+    frames = []
+    if path and os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            image = cv2.imread(os.path.join(path, name))
+            if image is not None:
+                frames.append(image)
+            if len(frames) >= count:
+                break
+    elif path:
+        cap = cv2.VideoCapture(path)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark inference backends")
+    parser.add_argument("models", nargs="+", help="backend=model_path เช่น onnxruntime=best.onnx")
+    parser.add_argument("--images", default=None, help="โฟลเดอร์ภาพหรือไฟล์วิดีโอสำหรับทดสอบ")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads ของ onnxruntime/tflite")
+    args = parser.parse_args()
+
+    backends = []
+    for spec in args.models:
+        name, _, model_path = spec.partition("=")
+        kwargs = {"model_path": model_path, "img_size": args.imgsz} if model_path else {"img_size": args.imgsz}
+        if name in ("onnxruntime", "tflite"):
+            kwargs["num_threads"] = args.threads
+        backends.append(create_backend(name, **kwargs))
+
+    frames = _load_frames(args.images)
+    print(f"⏱️ Benchmarking {len(backends)} backend(s) on {len(frames)} frame(s), "
+          f"batch={args.batch}, runs={args.runs}")
+    for name, result in benchmark_backends(backends, frames, runs=args.runs, batch_size=args.batch).items():
+        print(f"📊 {name:<12} mean={result['mean_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+              f"fps={result['fps']:.1f} detections={result['detections']}")
+
+    for backend in backends:
+        backend.close()
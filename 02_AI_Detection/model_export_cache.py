@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Model Export Cache
+export YOLOv11 (.pt) เป็นรูปแบบที่เร็วบน CPU (ONNX / OpenVINO, INT8 ได้) ครั้งเดียวแล้วเก็บไว้
+- key ของ cache = hash ของไฟล์ weights + IMG_SIZE + DEVICE + format/INT8/dynamic
+  (เปลี่ยน best.pt หรือขนาดภาพ -> export ใหม่อัตโนมัติ)
+- เปิดโปรแกรมครั้งถัดไปใช้ไฟล์ที่ export ไว้ทันที
+- warmup ด้วยเฟรมว่างก่อนเปิดกล้อง เพื่อไม่ให้เฟรมแรกๆ ช้า
+
+การใช้งาน (export + เทียบ latency กับ .pt):
+    python model_export_cache.py best.pt --format openvino --int8 --imgsz 640
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+EXPORT_FORMATS = ("onnx", "openvino")
+META_FILE = "export.json"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """hash ของไฟล์ weights"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _ultralytics_export(weights_path, fmt, img_size, device, int8=False, half=False,
+                        dynamic=False, data=None):
+    """export ด้วย Ultralytics - คืน path ของไฟล์/โฟลเดอร์ที่ได้ (ข้างไฟล์ weights)"""
+    from ultralytics import YOLO
+
+    kwargs = {"format": fmt, "imgsz": img_size, "device": device, "half": half, "dynamic": dynamic}
+    if int8 and fmt == "openvino":
+        kwargs["int8"] = True
+        if data:
+            kwargs["data"] = data  # ภาพสำหรับ calibrate INT8
+    exported = str(YOLO(weights_path).export(**kwargs))
+
+    if int8 and fmt == "onnx":
+        # Ultralytics ไม่ quantize ONNX ให้ - ใช้ dynamic quantization ของ onnxruntime แทน
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized = exported.replace(".onnx", "_int8.onnx")
+        quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+        os.remove(exported)
+        exported = quantized
+    return exported
+
+
+class ModelExportCache:
+    """เก็บ model ที่ export แล้ว แยกตาม hash ของ weights / ขนาดภาพ / device / format"""
+
+    def __init__(self, cache_dir="model_cache", exporter=None):
+        self.cache_dir = cache_dir
+        self.exporter = exporter or _ultralytics_export
+
+    def cache_key(self, weights_path, fmt, img_size, device, int8=False, half=False, dynamic=False):
+        """ชื่อ entry ใน cache เช่น best_openvino_int8_640_cpu_3fa2c1d9e0b4"""
+        digest = file_sha256(weights_path)[:12]
+        stem = os.path.splitext(os.path.basename(weights_path))[0]
+        size = "x".join(str(s) for s in img_size) if isinstance(img_size, (list, tuple)) else str(img_size)
+        flags = "".join(("_int8" if int8 else "", "_fp16" if half else "", "_dynamic" if dynamic else ""))
+        return f"{stem}_{fmt}{flags}_{size}_{device}_{digest}"
+
+    def lookup(self, key):
+        """path ของ model ที่ export ไว้แล้ว หรือ None"""
+        meta_path = os.path.join(self.cache_dir, key, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        artifact = os.path.join(self.cache_dir, key, meta["artifact"])
+        return artifact if os.path.exists(artifact) else None
+
+    def get_or_export(self, weights_path, fmt="onnx", img_size=640, device="cpu",
+                      int8=False, half=False, dynamic=False, data=None):
+        """
+        คืน (path ของ model ที่ export แล้ว, cache_hit)
+        export ครั้งแรกจะช้า (หลายสิบวินาที) ครั้งถัดไปใช้ไฟล์ใน cache
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'. Available: {', '.join(EXPORT_FORMATS)}")
+
+        key = self.cache_key(weights_path, fmt, img_size, device, int8, half, dynamic)
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached, True
+
+        start = time.perf_counter()
+        exported = str(self.exporter(weights_path, fmt, img_size, device, int8=int8, half=half,
+                                     dynamic=dynamic, data=data))
+        export_seconds = time.perf_counter() - start
+
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.makedirs(entry_dir)
+        artifact = os.path.basename(os.path.normpath(exported))
+        shutil.move(exported, os.path.join(entry_dir, artifact))
+
+        meta = {
+            "artifact": artifact,
+            "weights": os.path.abspath(weights_path),
+            "format": fmt,
+            "img_size": img_size,
+            "device": device,
+            "int8": int8,
+            "half": half,
+            "dynamic": dynamic,
+            "export_seconds": round(export_seconds, 2),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with open(os.path.join(entry_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return os.path.join(entry_dir, artifact), False
+
+    def entries(self):
+        """รายการ entry ที่อยู่ใน cache"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(name for name in os.listdir(self.cache_dir)
+                      if os.path.exists(os.path.join(self.cache_dir, name, META_FILE)))
+
+    def clear(self):
+        """ลบ model ที่ export ไว้ทั้งหมด"""
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+
+def warmup_model(model, img_size=640, device="cpu", runs=3, **predict_kwargs):
+    """
+    รัน predict กับเฟรมว่างก่อนเปิดกล้อง (allocate memory / compile kernel)
+    คืนเวลาแต่ละรอบเป็น ms - รอบแรกมักช้าสุด
+    """
+    height, width = (img_size, img_size) if isinstance(img_size, int) else img_size
+    dummy = np.zeros((height, width, 3), dtype=np.uint8)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(source=dummy, imgsz=img_size, device=device, verbose=False, **predict_kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def needs_dynamic_shape(config):
+    """
+    model ที่ export ต้องรับ input หลายขนาดหรือไม่:
+    ROI_ENABLED (input ไม่เป็นสี่เหลี่ยมจัตุรัส) หรือ ADAPTIVE_ENABLED (controller เปลี่ยน imgsz ระหว่างรัน)
+    """
+    return bool(getattr(config, "ROI_ENABLED", False) or getattr(config, "ADAPTIVE_ENABLED", False))
+
+
+def export_model_from_config(config, cache=None):
+    """
+    export/ใช้ cache ตาม MODEL_EXPORT_FORMAT ของ config - คืน (path, format, cache_hit)
+
+    ถ้า export ไม่สำเร็จจะคืน MODEL_PATH (.pt) แทน
+    """
+    weights = getattr(config, "MODEL_PATH", "best.pt")
+    fmt = getattr(config, "MODEL_EXPORT_FORMAT", "") or ""
+    if not fmt or fmt == "pt":
+        return weights, "pt", False
+
+    cache = cache or ModelExportCache(getattr(config, "MODEL_CACHE_DIR", "model_cache"))
+    try:
+        path, cache_hit = cache.get_or_export(
+            weights, fmt, getattr(config, "IMG_SIZE", 640), getattr(config, "DEVICE", "cpu"),
+            int8=getattr(config, "MODEL_EXPORT_INT8", False),
+            dynamic=needs_dynamic_shape(config),
+            data=getattr(config, "MODEL_EXPORT_DATA", None)
+        )
+    except Exception as e:
+        print(f"⚠️ Model export ({fmt}) failed, using {weights}: {e}")
+        return weights, "pt", False
+    return path, fmt, cache_hit
+
+
+def load_optimized_model_from_config(config, cache=None):
+    """
+    โหลด YOLO model ตาม config: export/ใช้ cache ตาม MODEL_EXPORT_FORMAT แล้ว warmup
+
+    อ่านค่า MODEL_PATH, IMG_SIZE, DEVICE, MODEL_EXPORT_FORMAT ("" = ใช้ .pt ตรงๆ),
+    MODEL_EXPORT_INT8, MODEL_EXPORT_DATA, MODEL_CACHE_DIR, MODEL_WARMUP_RUNS, ROI_ENABLED และ ADAPTIVE_ENABLED
+    (ROI / adaptive imgsz ใช้ input หลายขนาด จึง export แบบ dynamic shape - ดู needs_dynamic_shape)
+
+    Returns:
+        (model, info) โดย info มี path, format, cache_hit, load_seconds, warmup_ms
+    """
+    from ultralytics import YOLO
+
+    img_size = getattr(config, "IMG_SIZE", 640)
+    device = getattr(config, "DEVICE", "cpu")
+    start = time.perf_counter()
+
+    path, fmt, cache_hit = export_model_from_config(config, cache)
+
+    model = YOLO(path, task="detect")
+    load_seconds = time.perf_counter() - start
+
+    runs = getattr(config, "MODEL_WARMUP_RUNS", 3)
+    warmup_ms = warmup_model(model, img_size, device, runs=runs) if runs else []
+
+    info = {
+        "path": path,
+        "format": fmt,
+        "cache_hit": cache_hit,
+        "load_seconds": load_seconds,
+        "warmup_ms": warmup_ms,
+    }
+    return model, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLOv11 model to a cached CPU format and compare latency")
+    parser.add_argument("weights", help="path ของไฟล์ .pt")
+    parser.add_argument("--format", default="onnx", choices=EXPORT_FORMATS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--int8", action="store_true", help="quantize เป็น INT8")
+    parser.add_argument("--data", default=None, help="dataset yaml สำหรับ calibrate INT8 (OpenVINO)")
+    parser.add_argument("--cache-dir", default="model_cache")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    cache = ModelExportCache(args.cache_dir)
+    start = time.perf_counter()
+    path, hit = cache.get_or_export(args.weights, args.format, args.imgsz, args.device,
+                                    int8=args.int8, data=args.data)
+    print(f"{'♻️ Cache hit' if hit else '📦 Exported'}: {path} ({time.perf_counter() - start:.1f}s)")
+
+    for label, model_path in (("pt", args.weights), (args.format, path)):
+        start = time.perf_counter()
+        model = YOLO(model_path, task="detect")
+        load_ms = (time.perf_counter() - start) * 1000
+        timings = warmup_model(model, args.imgsz, args.device, runs=args.runs)
+        steady = sorted(timings[1:] or timings)
+        print(f"🤖 {label:9s} load {load_ms:7.0f} ms | first frame {timings[0]:7.1f} ms | "
+              f"p50 {steady[len(steady) // 2]:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
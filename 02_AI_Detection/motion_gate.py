@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Motion Gate
+ตรวจการเปลี่ยนแปลงของภาพแบบประหยัด (frame differencing บนภาพ grayscale ขนาดเล็ก)
+เพื่อปลุก YOLO เฉพาะเมื่อมีการเคลื่อนไหว และปรับอัตราการข้ามเฟรมตามความยุ่งของฉาก
+
+- ฉากนิ่ง (ถังว่าง)     : ไม่รัน inference ยกเว้นรอบตรวจซ้ำทุก idle_refresh วินาที
+- มีการเคลื่อนไหวเล็กน้อย : รัน inference แบบข้ามเฟรม (สูงสุด max_skip)
+- ฉากยุ่ง / เจอขวดอยู่    : รันทุก (skip_frames + 1) เฟรม ตาม SKIP_FRAMES ใน config
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """ตัดสินใจว่าเฟรมไหนควรส่งเข้า YOLO"""
+
+    def __init__(self, skip_frames=0, max_skip=5, downscale_width=160, pixel_threshold=15,
+                 min_changed_fraction=0.004, busy_fraction=0.05, hold_seconds=1.5,
+                 idle_refresh=5.0, ema_alpha=0.3):
+        self.skip_frames = max(0, int(skip_frames))
+        self.max_skip = max(self.skip_frames, int(max_skip))
+        # ค่าที่ตั้งไว้ตอนสร้าง - set_skip_floor() ปรับได้แค่เพิ่มจากค่านี้
+        self.base_skip_frames = self.skip_frames
+        self.base_max_skip = self.max_skip
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.busy_fraction = busy_fraction
+        self.hold_seconds = hold_seconds
+        self.idle_refresh = idle_refresh
+        self.ema_alpha = ema_alpha
+
+        self.reference = None
+        self.activity = 0.0          # EMA ของสัดส่วน pixel ที่เปลี่ยน
+        self.last_fraction = 0.0
+        self.awake_until = 0.0
+        self.last_inference = 0.0
+        self.frames_since_inference = self.max_skip  # ให้เฟรมแรกผ่านเสมอ
+
+        self.frames = 0
+        self.inferred = 0
+        self.motion_frames = 0
+
+    @property
+    def awake(self):
+        return time.monotonic() < self.awake_until
+
+    @property
+    def current_skip(self):
+        """จำนวนเฟรมที่ข้ามระหว่าง inference ตามความยุ่งของฉากตอนนี้"""
+        busy = min(1.0, self.activity / self.busy_fraction) if self.busy_fraction > 0 else 1.0
+        return int(round(self.max_skip - busy * (self.max_skip - self.skip_frames)))
+
+    def set_skip_floor(self, skip):
+        """ข้ามเฟรมอย่างน้อย skip เฟรมแม้ฉากยุ่ง (ใช้โดย AdaptiveController) - 0 = กลับไปใช้ค่าที่ตั้งไว้"""
+        skip = max(0, int(skip))
+        self.skip_frames = max(self.base_skip_frames, skip)
+        self.max_skip = max(self.base_max_skip, self.skip_frames)
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.downscale_width:
+            scale = self.downscale_width / width
+            frame = cv2.resize(frame, (self.downscale_width, max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def measure(self, frame):
+        """สัดส่วน pixel ที่เปลี่ยนเทียบกับเฟรมก่อนหน้า (0.0-1.0)"""
+        small = self._prepare(frame)
+        if self.reference is None or self.reference.shape != small.shape:
+            self.reference = small
+            return 1.0  # เฟรมแรกถือว่าเปลี่ยนเพื่อให้ได้ผล inference ตั้งต้น
+
+        diff = cv2.absdiff(small, self.reference)
+        self.reference = small
+        changed = np.count_nonzero(diff > self.pixel_threshold)
+        return changed / diff.size
+
+    def should_infer(self, frame):
+        """คืน True ถ้าควรรัน YOLO กับเฟรมนี้"""
+        now = time.monotonic()
+        self.frames += 1
+        self.frames_since_inference += 1
+
+        fraction = self.measure(frame)
+        self.last_fraction = fraction
+        self.activity = self.ema_alpha * fraction + (1 - self.ema_alpha) * self.activity
+
+        if fraction >= self.min_changed_fraction:
+            self.motion_frames += 1
+            self.awake_until = now + self.hold_seconds
+
+        if now < self.awake_until:
+            run = self.frames_since_inference > self.current_skip
+        else:
+            # ฉากนิ่ง: ตรวจซ้ำเป็นระยะเผื่อมีขวดวางนิ่งอยู่
+            run = now - self.last_inference >= self.idle_refresh
+
+        if run:
+            self.frames_since_inference = 0
+            self.last_inference = now
+            self.inferred += 1
+        return run
+
+    def notify_detections(self, count):
+        """แจ้งจำนวนวัตถุที่เจอ - ถ้ายังเจออยู่ให้ตื่นต่อแม้ภาพจะนิ่ง"""
+        if count:
+            self.awake_until = max(self.awake_until, time.monotonic() + self.hold_seconds)
+
+    def get_stats(self):
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.frames - self.inferred,
+            "inference_ratio": (self.inferred / self.frames) if self.frames else 0.0,
+            "motion_frames": self.motion_frames,
+            "activity": self.activity,
+            "last_changed_fraction": self.last_fraction,
+            "current_skip": self.current_skip,
+            "awake": self.awake,
+        }
+
+
+def create_motion_gate_from_config(config):
+    """
+    สร้าง MotionGate จาก config class
+
+    MOTION_GATE ปิดอยู่แต่ตั้ง SKIP_FRAMES ไว้ (หรือเปิด ADAPTIVE_ENABLED) -> ข้ามเฟรมแบบคงที่
+    ปิดทั้งหมด -> คืน None (รันทุกเฟรม)
+    """
+    skip_frames = getattr(config, "SKIP_FRAMES", 0)
+    if not getattr(config, "MOTION_GATE", False):
+        if not skip_frames and not getattr(config, "ADAPTIVE_ENABLED", False):
+            return None
+        return MotionGate(skip_frames=skip_frames, max_skip=skip_frames, min_changed_fraction=0.0)
+
+    return MotionGate(
+        skip_frames=skip_frames,
+        max_skip=getattr(config, "MOTION_MAX_SKIP", 5),
+        pixel_threshold=getattr(config, "MOTION_PIXEL_THRESHOLD", 15),
+        min_changed_fraction=getattr(config, "MOTION_MIN_CHANGED", 0.004),
+        hold_seconds=getattr(config, "MOTION_HOLD_SECONDS", 1.5),
+        idle_refresh=getattr(config, "MOTION_IDLE_REFRESH", 5.0)
+    )
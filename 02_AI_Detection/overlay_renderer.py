@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Overlay Renderer
+กล่องข้อมูลบนเฟรม (จำนวนขวด/คะแนน/สถานะ) แบบ cache:
+- วาดข้อความลง bitmap ขนาดเท่ากล่องเฉพาะตอนข้อความเปลี่ยน
+- ทุกเฟรมแค่ทำให้พื้นหลังในกล่องมืดลงแล้ววาง bitmap ทับ (ไม่ copy ทั้งเฟรม)
+
+การใช้งาน benchmark (เทียบกับ draw_info แบบเดิม):
+    python overlay_renderer.py
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+COLOR_GREEN = (0, 255, 0)
+COLOR_WHITE = (255, 255, 255)
+
+
+class InfoOverlay:
+    """กล่องข้อความโปร่งแสงที่มุมซ้ายบนของเฟรม"""
+
+    def __init__(self, rect=(10, 10, 450, 140), alpha=0.7, line_height=22, font_scale=0.5,
+                 text_origin=(15, 25), font=cv2.FONT_HERSHEY_SIMPLEX, thickness=1):
+        self.rect = rect                    # (x1, y1, x2, y2) ของพื้นหลัง
+        self.alpha = alpha                  # ความทึบของพื้นหลังดำ
+        self.line_height = line_height
+        self.font_scale = font_scale
+        self.text_origin = text_origin      # ตำแหน่งบรรทัดแรก (พิกัดเฟรม)
+        self.font = font
+        self.thickness = thickness
+
+        self._key = None
+        self._layer = None
+        self._mask = None
+        self.redraws = 0
+        self.renders = 0
+
+    def _region(self, frame_shape):
+        x1, y1, x2, y2 = self.rect
+        height, width = frame_shape[:2]
+        return max(0, x1), max(0, y1), min(width, x2 + 1), min(height, y2 + 1)
+
+    def _rebuild(self, texts, colors, size):
+        """วาดข้อความลง bitmap ขนาดเท่ากล่อง (ทำเมื่อข้อความเปลี่ยนเท่านั้น)"""
+        width, height = size
+        x1, y1 = self.rect[0], self.rect[1]
+        layer = np.zeros((height, width, 3), dtype=np.uint8)
+        for i, (text, color) in enumerate(zip(texts, colors)):
+            origin = (self.text_origin[0] - x1, self.text_origin[1] - y1 + i * self.line_height)
+            cv2.putText(layer, text, origin, self.font, self.font_scale, color, self.thickness)
+        self._layer = layer
+        self._mask = layer.any(axis=2).astype(np.uint8) * 255
+        self.redraws += 1
+
+    def render(self, frame, texts, colors=None):
+        """วาดกล่องข้อมูลลงเฟรม (in-place) แล้วคืนเฟรม"""
+        if colors is None:
+            colors = [COLOR_GREEN] + [COLOR_WHITE] * (len(texts) - 1)
+
+        x1, y1, x2, y2 = self._region(frame.shape)
+        if x2 <= x1 or y2 <= y1:
+            return frame
+
+        key = (tuple(texts), tuple(colors), (x2 - x1, y2 - y1))
+        if key != self._key:
+            self._rebuild(texts, colors, (x2 - x1, y2 - y1))
+            self._key = key
+
+        # พื้นหลังดำโปร่งแสงเฉพาะในกล่อง (= addWeighted กับสีดำ) แล้ววางข้อความทับ
+        region = frame[y1:y2, x1:x2]
+        cv2.convertScaleAbs(region, dst=region, alpha=1.0 - self.alpha)
+        cv2.copyTo(self._layer, self._mask, region)
+        self.renders += 1
+        return frame
+
+
+def draw_info_legacy(frame, texts, rect=(10, 10, 450, 140), line_height=22, font_scale=0.5):
+    """วิธีเดิม: copy ทั้งเฟรม + addWeighted ทั้งเฟรม + putText ทุกเฟรม (ใช้เป็น reference)"""
+    overlay = frame.copy()
+    cv2.rectangle(overlay, rect[:2], rect[2:], (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+    for i, text in enumerate(texts):
+        color = COLOR_GREEN if i == 0 else COLOR_WHITE
+        cv2.putText(frame, text, (15, 25 + i * line_height), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, 1)
+    return frame
+
+
+def benchmark_overlay(frames=300, frame_size=(640, 480), count_every=30):
+    """
+    FPS ของงานแสดงผลต่อเฟรม: ไม่มี overlay / draw_info เดิม / InfoOverlay แบบ cache
+    (ตัวนับเปลี่ยนทุก count_every เฟรม เหมือนมีขวดผ่านเป็นระยะ)
+    """
+    width, height = frame_size
+    rng = np.random.default_rng(0)
+    source = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    def texts_for(i):
+        count = i // count_every
+        return [
+            "YOLOv11 P2P Detection System",
+            f"Total Bottles: {count}",
+            f"Total Points: {count * 10}",
+            f"Detection: {'YES' if i % count_every < 5 else 'NO'}",
+            "Arduino: Connected",
+        ]
+
+    def timed(draw):
+        frame = source.copy()
+        start = time.perf_counter()
+        for i in range(frames):
+            np.copyto(frame, source)  # เฟรมใหม่จากกล้อง
+            draw(frame, i)
+        elapsed = time.perf_counter() - start
+        return frames / elapsed if elapsed > 0 else float("inf")
+
+    overlay = InfoOverlay()
+    results = {
+        "no_overlay_fps": timed(lambda frame, i: frame),
+        "legacy_fps": timed(lambda frame, i: draw_info_legacy(frame, texts_for(i))),
+        "cached_fps": timed(lambda frame, i: overlay.render(frame, texts_for(i))),
+    }
+    results["redraws"] = overlay.redraws
+    results["frames"] = frames
+    return results
+
+
+if __name__ == "__main__":
+    print("⏱️ Benchmarking info overlay (640x480)...")
+    result = benchmark_overlay()
+    print(f"🖼️ No overlay     : {result['no_overlay_fps']:8.0f} FPS")
+    print(f"🐢 draw_info เดิม  : {result['legacy_fps']:8.0f} FPS")
+    print(f"🚀 Cached overlay : {result['cached_fps']:8.0f} FPS "
+          f"({result['redraws']} redraws / {result['frames']} frames)")
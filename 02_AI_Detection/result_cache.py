@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Detection Result Cache
+cache ผลตรวจจับของภาพนิ่งที่ถูกอัปโหลดซ้ำ (เช่น kiosk กด retry) ที่ /v1/detect/image
+
+- key = perceptual hash (dHash) ของภาพที่ decode แล้ว + ขนาดภาพ + model + threshold
+- ภาพที่ต่างกันเล็กน้อย (JPEG encode ใหม่, noise) ยังถือว่าเป็นภาพเดียวกัน
+  ถ้า Hamming distance ของ hash ไม่เกิน max_distance
+- LRU จำกัดจำนวน entry และหมดอายุตาม ttl วินาที
+- นับ hit / miss / eviction เพื่อดู hit rate ที่ /v1/detect/stats
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(image, hash_size=16):
+    """
+    difference hash ของภาพ (int ขนาด hash_size * hash_size bit)
+
+    ย่อภาพ grayscale เป็น (hash_size + 1) x hash_size แล้วเทียบความสว่างของ pixel ที่อยู่ติดกันในแนวนอน
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    """จำนวน bit ที่ต่างกันของ hash สองค่า"""
+    return bin(a ^ b).count("1")
+
+
+class DetectionResultCache:
+    """LRU + TTL ของผลตรวจจับ ค้นหาแบบยอมให้ hash ต่างกันได้ไม่เกิน max_distance bit"""
+
+    def __init__(self, max_entries=256, ttl=30.0, max_distance=6, hash_size=16):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.max_distance = max(0, int(max_distance))
+        self.hash_size = hash_size
+
+        self._entries = OrderedDict()  # (shape, model, threshold, hash) -> (expires_at, detections)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def image_hash(self, image):
+        return dhash(image, self.hash_size)
+
+    def get(self, image_hash, shape, model_name, threshold):
+        """คืนสำเนาของ detections ที่ cache ไว้ หรือ None ถ้าไม่มี/หมดอายุ"""
+        group = (tuple(shape[:2]), model_name, round(float(threshold), 4))
+        now = time.monotonic()
+
+        with self._lock:
+            key = group + (image_hash,)
+            entry = self._entries.get(key)
+            near = False
+
+            if entry is None and self.max_distance:
+                # entry มีไม่เกิน max_entries จึงไล่เทียบทั้งหมดได้ในเวลาไม่กี่ไมโครวินาที
+                best = self.max_distance + 1
+                for candidate, value in self._entries.items():
+                    if candidate[:3] != group:
+                        continue
+                    distance = hamming(candidate[3], image_hash)
+                    if distance < best:
+                        key, entry, best = candidate, value, distance
+                near = entry is not None
+
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if near:
+                self.near_hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, image_hash, shape, model_name, threshold, detections):
+        """เก็บผลตรวจจับ (เก็บสำเนา ผู้เรียกแก้ list เดิมได้โดยไม่กระทบ cache)"""
+        key = (tuple(shape[:2]), model_name, round(float(threshold), 4), image_hash)
+        entry = (time.monotonic() + self.ttl, copy.deepcopy(detections))
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """สถิติของ cache: hit rate, จำนวน entry และการ evict"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "max_distance": self.max_distance,
+                "hash_bits": self.hash_size * self.hash_size,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+def create_result_cache_from_config(config):
+    """สร้าง DetectionResultCache จาก config class (คืน None ถ้า API_RESULT_CACHE ปิดอยู่)"""
+    if not getattr(config, "API_RESULT_CACHE", False):
+        return None
+
+    return DetectionResultCache(
+        max_entries=getattr(config, "API_RESULT_CACHE_SIZE", 256),
+        ttl=getattr(config, "API_RESULT_CACHE_TTL", 30.0),
+        max_distance=getattr(config, "API_RESULT_CACHE_MAX_DISTANCE", 6),
+        hash_size=getattr(config, "API_RESULT_CACHE_HASH_SIZE", 16)
+    )
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Region of Interest
+ครอปเฉพาะช่องใส่ขวด (chute) ก่อนส่งเข้า model แล้วแปลง boxes กลับเป็นพิกัดเฟรมเต็ม
+
+- ROI เก็บเป็นสัดส่วนของเฟรม (x1, y1, x2, y2) เหมือน COUNT_ROI
+- ขยายขอบ ROI ให้กว้าง/สูงเป็นพหุคูณของ stride (32) เพื่อให้ส่งเข้า model
+  ได้ตรงขนาดโดยไม่ต้อง letterbox / pad
+- RoiCalibrator เก็บ boxes ที่ตรวจเจอในอดีตแล้วแนะนำ ROI ที่ครอบคลุม
+
+การใช้งาน calibration (รัน model กับเฟรมเต็มแล้วแนะนำ ROI):
+    python roi.py --model best.pt --camera 1 --frames 300
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+
+def _align_span(start, end, limit, align):
+    """ขยายช่วง [start, end) ให้ยาวเป็นพหุคูณของ align โดยไม่เกินขอบ [0, limit)"""
+    length = end - start
+    target = min(int(np.ceil(length / align)) * align, (limit // align) * align)
+    if target <= 0:
+        return 0, limit
+    if target < length:
+        # ROI กว้างกว่าพหุคูณที่ใหญ่ที่สุดที่ใส่ในเฟรมได้ -> หดเข้าตรงกลาง
+        start += (length - target) // 2
+        return start, start + target
+
+    grow = target - length
+    start = max(0, start - grow // 2)
+    end = start + target
+    if end > limit:
+        start, end = limit - target, limit
+    return start, end
+
+
+class RegionOfInterest:
+    """ROI คงที่ของกล้อง - ครอปเฟรมและแปลงพิกัดกลับ"""
+
+    def __init__(self, roi, align=32):
+        x1, y1, x2, y2 = roi
+        if not (0.0 <= x1 < x2 <= 1.0 and 0.0 <= y1 < y2 <= 1.0):
+            raise ValueError(f"ROI must be normalized (x1, y1, x2, y2) with x1 < x2, y1 < y2: {roi}")
+        self.roi = (float(x1), float(y1), float(x2), float(y2))
+        self.align = max(1, int(align))
+        self._cache = {}
+
+    def resolve(self, frame_shape):
+        """พิกัด pixel (x1, y1, x2, y2) ของ ROI สำหรับเฟรมขนาดนี้ (cache ตามขนาดเฟรม)"""
+        height, width = frame_shape[:2]
+        rect = self._cache.get((height, width))
+        if rect is None:
+            x1, y1, x2, y2 = self.roi
+            left, right = _align_span(int(x1 * width), int(np.ceil(x2 * width)), width, self.align)
+            top, bottom = _align_span(int(y1 * height), int(np.ceil(y2 * height)), height, self.align)
+            rect = (left, top, right, bottom)
+            self._cache[(height, width)] = rect
+        return rect
+
+    def crop(self, frame):
+        """ครอปเฟรม (คืน view ไม่ copy)"""
+        x1, y1, x2, y2 = self.resolve(frame.shape)
+        return frame[y1:y2, x1:x2]
+
+    def input_size(self, frame_shape, max_side):
+        """
+        ขนาด input (width, height) ที่ส่งเข้า model: ใช้ขนาด ROI ตรงๆ ถ้าไม่เกิน max_side
+        ไม่เช่นนั้นย่อตามสัดส่วนแล้วปัดเป็นพหุคูณของ align
+        """
+        x1, y1, x2, y2 = self.resolve(frame_shape)
+        width, height = x2 - x1, y2 - y1
+        scale = min(1.0, max_side / max(width, height))
+        if scale == 1.0:
+            return width, height
+        return (max(self.align, int(round(width * scale / self.align)) * self.align),
+                max(self.align, int(round(height * scale / self.align)) * self.align))
+
+    def to_frame(self, boxes, frame_shape):
+        """แปลง boxes [x1, y1, x2, y2] ในภาพที่ครอปเป็นพิกัดเฟรมเต็ม"""
+        x1, y1, _, _ = self.resolve(frame_shape)
+        boxes = np.asarray(boxes)
+        if not len(boxes):
+            return boxes.reshape(0, 4)
+        return boxes + np.array([x1, y1, x1, y1], dtype=boxes.dtype)
+
+    def to_frame_xywh(self, boxes, frame_shape):
+        """แปลง boxes [x, y, w, h] ในภาพที่ครอปเป็นพิกัดเฟรมเต็ม"""
+        x1, y1, _, _ = self.resolve(frame_shape)
+        boxes = np.asarray(boxes)
+        if not len(boxes):
+            return boxes.reshape(0, 4)
+        return boxes + np.array([x1, y1, 0, 0], dtype=boxes.dtype)
+
+    def draw(self, frame, color=(255, 255, 0)):
+        """วาดกรอบ ROI ลงเฟรม"""
+        x1, y1, x2, y2 = self.resolve(frame.shape)
+        cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), color, 1)
+        return frame
+
+
+def suggest_roi(boxes, frame_shape, margin=0.15, coverage=0.99):
+    """
+    แนะนำ ROI (สัดส่วนของเฟรม) จาก boxes [x1, y1, x2, y2] ที่เคยตรวจเจอ
+
+    ใช้ percentile ตาม coverage เพื่อตัด detection หลุดๆ ทิ้ง แล้วเผื่อขอบ
+    ตาม margin (สัดส่วนของขนาด ROI) - คืน None ถ้ายังไม่มีข้อมูล
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(boxes):
+        return None
+
+    height, width = frame_shape[:2]
+    tail = (1.0 - coverage) * 100
+    x1 = np.percentile(boxes[:, 0], tail)
+    y1 = np.percentile(boxes[:, 1], tail)
+    x2 = np.percentile(boxes[:, 2], 100 - tail)
+    y2 = np.percentile(boxes[:, 3], 100 - tail)
+
+    pad_x = (x2 - x1) * margin
+    pad_y = (y2 - y1) * margin
+    return (
+        round(max(0.0, (x1 - pad_x) / width), 3),
+        round(max(0.0, (y1 - pad_y) / height), 3),
+        round(min(1.0, (x2 + pad_x) / width), 3),
+        round(min(1.0, (y2 + pad_y) / height), 3),
+    )
+
+
+class RoiCalibrator:
+    """สะสม boxes ที่ตรวจเจอ (สัดส่วนของเฟรม) ข้ามหลาย session เพื่อแนะนำ ROI"""
+
+    def __init__(self, path=None, max_boxes=50000):
+        self.path = path
+        self.max_boxes = max_boxes
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        if path and os.path.exists(path):
+            self.boxes = np.load(path).astype(np.float32).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def add(self, boxes, frame_shape):
+        """เพิ่ม boxes [x1, y1, x2, y2] (พิกัดเฟรมเต็ม)"""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if not len(boxes):
+            return
+        height, width = frame_shape[:2]
+        normalized = boxes / np.array([width, height, width, height], dtype=np.float32)
+        self.boxes = np.concatenate([self.boxes, normalized])[-self.max_boxes:]
+
+    def suggest(self, margin=0.15, coverage=0.99):
+        """ROI ที่แนะนำ (สัดส่วนของเฟรม) หรือ None ถ้ายังไม่มีข้อมูล"""
+        return suggest_roi(self.boxes, (1, 1), margin=margin, coverage=coverage)
+
+    def save(self):
+        if self.path:
+            np.save(self.path, self.boxes)
+
+
+def create_roi_from_config(config):
+    """สร้าง RegionOfInterest จาก config class - คืน None ถ้าปิด ROI_ENABLED"""
+    if not getattr(config, "ROI_ENABLED", False):
+        return None
+    return RegionOfInterest(getattr(config, "ROI"), align=getattr(config, "ROI_ALIGN", 32))
+
+
+def create_calibrator_from_config(config):
+    """สร้าง RoiCalibrator จาก config class - คืน None ถ้าปิด ROI_CALIBRATE"""
+    if not getattr(config, "ROI_CALIBRATE", False):
+        return None
+    return RoiCalibrator(getattr(config, "ROI_CALIBRATION_FILE", "roi_calibration.npy"))
+
+
+def main():
+    """รัน model กับเฟรมเต็มแล้วแนะนำ ROI สำหรับใส่ใน config"""
+    import argparse
+
+    from ultralytics import YOLO
+
+    parser = argparse.ArgumentParser(description="Suggest an ROI from historic detections")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--class-id", type=int, default=0)
+    parser.add_argument("--history", default="roi_calibration.npy")
+    parser.add_argument("--margin", type=float, default=0.15)
+    args = parser.parse_args()
+
+    model = YOLO(args.model)
+    calibrator = RoiCalibrator(args.history)
+    print(f"📂 Loaded {len(calibrator)} historic boxes from {args.history}")
+
+    cap = cv2.VideoCapture(args.camera)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open camera {args.camera}")
+
+    try:
+        for _ in range(args.frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            r = model.predict(source=frame, conf=args.conf, verbose=False)[0]
+            if r.boxes is not None and len(r.boxes):
+                mask = r.boxes.cls.cpu().numpy() == args.class_id
+                calibrator.add(r.boxes.xyxy.cpu().numpy()[mask], frame.shape)
+    finally:
+        cap.release()
+
+    calibrator.save()
+    roi = calibrator.suggest(margin=args.margin)
+    if roi is None:
+        print("⚠️ No detections collected - put bottles through the chute and try again")
+        return
+    print(f"📊 Boxes collected: {len(calibrator)}")
+    print(f"🎯 Suggested ROI: ROI = {roi}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Serial Protocol
+Protocol แบบ binary มี framing + checksum สำหรับคุยกับ Arduino แทนคำสั่ง ASCII
+(เก็บโหมด text เดิมไว้เป็น fallback สำหรับ sketch รุ่นเก่า)
+
+รูปแบบ frame:
+    SOF(0xA5) | SEQ(1) | OPCODE(1) | LEN(1) | PAYLOAD(LEN) | CRC16(2, big-endian)
+
+- CRC-16/CCITT-FALSE คำนวณจาก SEQ ถึง PAYLOAD
+- sketch ตอบด้วย ACK (opcode | 0x80) ที่มี SEQ เดียวกัน หรือ NACK (0xFF)
+- ตัว decoder หา SOF ใหม่เองเมื่อเจอ byte เสียหรือข้อความ debug ที่ปนมา
+
+การใช้งาน loopback benchmark (pty จำลอง Arduino):
+    python serial_protocol.py --baud 9600 --runs 200
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+SOF = 0xA5
+HEADER_SIZE = 4          # SOF, SEQ, OPCODE, LEN
+CRC_SIZE = 2
+MAX_PAYLOAD = 32
+
+# คำสั่ง (Python -> Arduino)
+OP_SIGNAL = 0x01         # payload: u8 detected (0/1) - แทน "90" / "0"
+OP_SERVO = 0x02          # payload: u8 angle - แทน "SERVO:angle"
+OP_SWEEP = 0x03          # แทน "SWEEP"
+OP_COUNT = 0x04          # payload: u16 count - แทน "COUNT:n"
+OP_RESET = 0x05          # แทน "reset" / "RESET"
+OP_STATUS = 0x06         # แทน "status"
+OP_BOTTLE = 0x07         # แทน "BOTTLE_DETECTED"
+OP_TEST = 0x08           # แทน "TEST"
+OP_PING = 0x09           # payload: ส่งกลับมาเหมือนเดิม (วัด round-trip)
+
+# คำตอบ (Arduino -> Python)
+ACK_FLAG = 0x80
+OP_NACK = 0xFF           # payload: u8 error code
+
+NACK_BAD_CRC = 1
+NACK_UNKNOWN_OPCODE = 2
+NACK_BAD_PAYLOAD = 3
+
+COMMAND_FORMATS = {
+    OP_SIGNAL: "<B",
+    OP_SERVO: "<B",
+    OP_COUNT: "<H",
+}
+
+# payload ของ ACK แต่ละคำสั่ง (สถานะของ sketch หลังทำคำสั่ง)
+REPLY_FORMATS = {
+    OP_SIGNAL: "<H",     # bottle_count
+    OP_BOTTLE: "<H",
+    OP_COUNT: "<H",
+    OP_RESET: "<H",
+    OP_SERVO: "<B",      # มุม servo ปัจจุบัน
+    OP_SWEEP: "<B",
+    OP_STATUS: "<HH",    # bottle_count, total_points
+}
+
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) - ตรงกับ crc16() ใน sketch"""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+class Frame(namedtuple("Frame", ["seq", "opcode", "payload"])):
+    """frame ที่ decode แล้ว"""
+
+    @property
+    def is_ack(self):
+        return self.opcode != OP_NACK and bool(self.opcode & ACK_FLAG)
+
+    @property
+    def is_nack(self):
+        return self.opcode == OP_NACK
+
+    @property
+    def command(self):
+        """opcode ของคำสั่งที่ frame นี้ตอบ (หรือตัวคำสั่งเองถ้าไม่ใช่ ACK)"""
+        return self.opcode & ~ACK_FLAG if self.is_ack else self.opcode
+
+    @property
+    def values(self):
+        """payload ที่ unpack ตาม format ของคำสั่ง - คืน () ถ้าไม่มี format"""
+        if self.is_nack:
+            return struct.unpack("<B", self.payload[:1]) if self.payload else ()
+        formats = REPLY_FORMATS if self.is_ack else COMMAND_FORMATS
+        fmt = formats.get(self.command)
+        if fmt is None or len(self.payload) != struct.calcsize(fmt):
+            return ()
+        return struct.unpack(fmt, self.payload)
+
+
+def encode_frame(seq, opcode, payload=b""):
+    """สร้าง frame พร้อม CRC"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload too long: {len(payload)} > {MAX_PAYLOAD}")
+    body = bytes((seq & 0xFF, opcode & 0xFF, len(payload))) + bytes(payload)
+    return bytes((SOF,)) + body + struct.pack(">H", crc16_ccitt(body))
+
+
+def pack_payload(opcode, value, formats=COMMAND_FORMATS):
+    """แปลงค่าเป็น payload ตาม format ของ opcode"""
+    if value is None:
+        return b""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    fmt = formats.get(opcode)
+    if fmt is None:
+        raise ValueError(f"Opcode 0x{opcode:02X} takes no value")
+    values = value if isinstance(value, tuple) else (value,)
+    return struct.pack(fmt, *values)
+
+
+class FrameDecoder:
+    """decode frame จาก byte stream ที่มาเป็นชิ้นๆ (ทนต่อ byte เสีย/ข้อความปน)"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.stats = {"frames": 0, "crc_errors": 0, "skipped_bytes": 0}
+
+    def feed(self, data):
+        """เพิ่ม bytes แล้วคืน list ของ Frame ที่สมบูรณ์"""
+        self.buffer.extend(data)
+        frames = []
+        buffer = self.buffer
+
+        while True:
+            start = buffer.find(SOF)
+            if start < 0:
+                self.stats["skipped_bytes"] += len(buffer)
+                buffer.clear()
+                break
+            if start:
+                self.stats["skipped_bytes"] += start
+                del buffer[:start]
+            if len(buffer) < HEADER_SIZE:
+                break
+
+            length = buffer[3]
+            if length > MAX_PAYLOAD:
+                # ไม่ใช่ header จริง - ข้าม SOF นี้แล้วหาใหม่
+                self.stats["skipped_bytes"] += 1
+                del buffer[:1]
+                continue
+
+            total = HEADER_SIZE + length + CRC_SIZE
+            if len(buffer) < total:
+                break
+
+            body = bytes(buffer[1:HEADER_SIZE + length])
+            (crc,) = struct.unpack(">H", buffer[HEADER_SIZE + length:total])
+            if crc != crc16_ccitt(body):
+                self.stats["crc_errors"] += 1
+                del buffer[:1]
+                continue
+
+            frames.append(Frame(body[0], body[1], body[3:]))
+            self.stats["frames"] += 1
+            del buffer[:total]
+
+        return frames
+
+
+# ========================================
+# Codecs (text เดิม / binary ใหม่) ที่ใช้แทนกันได้
+# ========================================
+
+def parse_text_command(text):
+    """แปลงคำสั่ง text เดิมเป็น (opcode, value)"""
+    command = text.strip()
+    upper = command.upper()
+    if command == "90":
+        return OP_SIGNAL, 1
+    if command == "0":
+        return OP_SIGNAL, 0
+    if upper.startswith("SERVO:"):
+        return OP_SERVO, int(command[6:])
+    if upper.startswith("COUNT:"):
+        return OP_COUNT, min(int(command[6:]), 0xFFFF)
+    simple = {
+        "SWEEP": OP_SWEEP,
+        "RESET": OP_RESET,
+        "STATUS": OP_STATUS,
+        "BOTTLE_DETECTED": OP_BOTTLE,
+        "TEST": OP_TEST,
+    }
+    if upper in simple:
+        return simple[upper], None
+    raise ValueError(f"Unknown command: {text!r}")
+
+
+class TextCodec:
+    """โหมดเดิม: คำสั่ง ASCII ทีละบรรทัด"""
+
+    name = "text"
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def encode_command(self, text):
+        return f"{text}\n".encode()
+
+    def feed(self, data):
+        """คืน list ของบรรทัดที่ได้รับครบแล้ว"""
+        self._buffer.extend(data)
+        lines = []
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                break
+            line = self._buffer[:end].decode("utf-8", errors="replace").strip()
+            del self._buffer[:end + 1]
+            if line:
+                lines.append(line)
+        return lines
+
+
+class BinaryCodec:
+    """โหมด binary: frame + sequence number + CRC"""
+
+    name = "binary"
+
+    def __init__(self):
+        self.decoder = FrameDecoder()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def next_seq(self):
+        with self._lock:
+            self._seq = (self._seq + 1) & 0xFF
+            return self._seq
+
+    def encode(self, opcode, value=None):
+        return encode_frame(self.next_seq(), opcode, pack_payload(opcode, value))
+
+    def encode_command(self, text):
+        opcode, value = parse_text_command(text)
+        return self.encode(opcode, value)
+
+    def feed(self, data):
+        """คืน list ของ Frame"""
+        return self.decoder.feed(data)
+
+
+def create_codec(name="text"):
+    """เลือก codec ตาม SERIAL_PROTOCOL ใน config ("text" หรือ "binary")"""
+    if name == "binary":
+        return BinaryCodec()
+    if name == "text":
+        return TextCodec()
+    raise ValueError(f"Unknown serial protocol: {name!r} (use 'text' or 'binary')")
+
+
+# ========================================
+# Loopback harness (pty จำลอง Arduino)
+# ========================================
+
+def wire_time(num_bytes, baud):
+    """เวลาส่งบนสาย (8N1 = 10 bit ต่อ byte)"""
+    return num_bytes * 10.0 / baud
+
+
+class LoopbackDevice:
+    """
+    Arduino จำลองที่ปลายอีกด้านของ pty: ตอบ ACK ทุกคำสั่ง (binary)
+    หรือตอบบรรทัดแบบ sketch เดิม (text) และหน่วงเวลาตาม baud ที่กำหนด
+    """
+
+    def __init__(self, fd, protocol="binary", baud=None):
+        self.fd = fd
+        self.protocol = protocol
+        self.baud = baud
+        self.codec = create_codec(protocol)
+        self.servo_angle = 90
+        self.bottle_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loopback-device", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+    def _reply_binary(self, frame):
+        if frame.opcode == OP_SERVO:
+            self.servo_angle = frame.values[0] if frame.values else self.servo_angle
+        if frame.opcode == OP_PING:
+            payload = frame.payload
+        elif frame.opcode in REPLY_FORMATS:
+            values = {
+                "<B": (self.servo_angle,),
+                "<H": (self.bottle_count,),
+                "<HH": (self.bottle_count, self.bottle_count * 10),
+            }[REPLY_FORMATS[frame.opcode]]
+            payload = struct.pack(REPLY_FORMATS[frame.opcode], *values)
+        else:
+            payload = b""
+        return encode_frame(frame.seq, frame.opcode | ACK_FLAG, payload)
+
+    def _reply_text(self, line):
+        if line.upper().startswith("SERVO:"):
+            return f"🔧 Servo moved to: {line[6:]}°\n".encode()
+        return f"✅ {line}\n".encode()
+
+    def _run(self):
+        import select
+
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 256)
+            except OSError:
+                break
+            for message in self.codec.feed(data):
+                if self.protocol == "binary":
+                    request = len(encode_frame(message.seq, message.opcode, message.payload))
+                    reply = self._reply_binary(message)
+                else:
+                    request = len(message) + 1
+                    reply = self._reply_text(message)
+                if self.baud:
+                    time.sleep(wire_time(request + len(reply), self.baud))
+                os.write(self.fd, reply)
+
+
+def open_loopback(protocol="binary", baud=None):
+    """เปิด pty คู่ - คืน (serial.Serial ฝั่ง host, LoopbackDevice)"""
+    import serial
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(master)
+    port = serial.Serial(os.ttyname(slave), timeout=1.0)
+    os.close(slave)
+    device = LoopbackDevice(master, protocol=protocol, baud=baud).start()
+    return port, device
+
+
+def measure_round_trip(protocol="binary", commands=("90", "SERVO:45", "COUNT:1234"),
+                       runs=100, baud=None):
+    """วัด round-trip (ms) ของแต่ละคำสั่งผ่าน pty loopback"""
+    port, device = open_loopback(protocol, baud)
+    codec = create_codec(protocol)
+    results = {}
+    try:
+        for text in commands:
+            request = codec.encode_command(text)
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                port.write(request)
+                replies = []
+                while not replies:
+                    chunk = port.read(max(1, port.in_waiting))
+                    if not chunk:
+                        raise TimeoutError(f"No reply to {text!r} over {protocol} loopback")
+                    replies = codec.feed(chunk)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            results[text] = {
+                "bytes": len(request),
+                "p50_ms": samples[len(samples) // 2],
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                "wire_ms": wire_time(len(request), baud) * 1000 if baud else None,
+            }
+    finally:
+        port.close()
+        device.stop()
+        os.close(device.fd)
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serial protocol loopback benchmark")
+    parser.add_argument("--baud", type=int, default=9600, help="baud ที่จำลอง (0 = ไม่หน่วง)")
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    baud = args.baud or None
+    print(f"⏱️ Loopback round-trip over pty (baud={baud or 'unlimited'}, runs={args.runs})")
+    for protocol in ("text", "binary"):
+        for text, result in measure_round_trip(protocol, runs=args.runs, baud=baud).items():
+            print(f"   {protocol:<6} {text:<12} {result['bytes']:>3} B  "
+                  f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
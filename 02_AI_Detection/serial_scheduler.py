@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Serial Command Scheduler
+คิวคำสั่ง Serial แบบ non-blocking สำหรับ Arduino
+- writer thread เขียนคำสั่งตามลำดับความสำคัญ (priority) ทีละคำสั่ง
+- คำสั่งที่เลย deadline แล้วจะถูกทิ้ง (เช่น heartbeat เก่า)
+- คำสั่งที่มี coalesce_key เดียวกันที่ยังไม่ได้ส่ง จะถูกแทนที่ด้วยค่าล่าสุด
+  (เช่น SERVO: หลายมุมติดกัน หรือ "0" ซ้ำๆ)
+- dwell: เวลาที่ต้องรอหลังเขียนคำสั่ง (เช่น servo กำลังหมุน) รอใน writer thread
+  ผู้เรียกไม่ต้อง sleep
+- reader thread อ่านข้อความตอบกลับของ sketch ใน background
+  (ทีละบรรทัด หรือผ่าน codec ของ serial_protocol.py เช่น frame แบบ binary)
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+PRIORITY_HIGH = 0      # servo / sweep / reset
+PRIORITY_NORMAL = 1    # สัญญาณตรวจจับ
+PRIORITY_LOW = 2       # heartbeat / status
+
+
+class SerialCommand:
+    __slots__ = ("payload", "priority", "deadline", "coalesce_key", "dwell",
+                 "seq", "enqueued_at", "cancelled")
+
+    def __init__(self, payload, priority, deadline, coalesce_key, dwell, seq):
+        self.payload = payload
+        self.priority = priority
+        self.deadline = deadline
+        self.coalesce_key = coalesce_key
+        self.dwell = dwell
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class SerialCommandScheduler:
+    """เขียน/อ่าน Serial ใน background threads แทน thread ที่ตรวจจับ"""
+
+    def __init__(self, port, name="serial", max_queue_size=32, on_line=None,
+                 response_history=50, codec=None):
+        self.port = port
+        self.name = name
+        self.max_queue_size = max_queue_size
+        self.on_line = on_line
+        self.codec = codec
+        self.responses = deque(maxlen=response_history)
+
+        self._heap = []
+        self._by_key = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._busy = False
+
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "coalesced": 0,
+            "expired": 0,
+            "dropped": 0,
+            "write_errors": 0,
+            "lines_read": 0,
+            "bytes_written": 0,
+        }
+
+        self._writer = threading.Thread(target=self._write_loop, name=f"{name}-writer", daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, name=f"{name}-reader", daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    # ----------------------------------------
+    # Public API
+    # ----------------------------------------
+
+    def submit(self, payload, priority=PRIORITY_NORMAL, deadline=None, coalesce_key=None, dwell=0.0):
+        """
+        เพิ่มคำสั่งเข้าคิว (ไม่ block)
+
+        Args:
+            payload: bytes ที่จะเขียนลง Serial
+            priority: PRIORITY_HIGH / PRIORITY_NORMAL / PRIORITY_LOW (น้อย = สำคัญกว่า)
+            deadline: วินาทีนับจากตอนนี้ ถ้ายังไม่ได้ส่งภายในเวลานี้จะทิ้ง (None = ไม่หมดอายุ)
+            coalesce_key: คำสั่งค้างที่มี key เดียวกันจะถูกแทนที่ด้วยคำสั่งนี้
+            dwell: วินาทีที่ writer รอหลังเขียนคำสั่งนี้ก่อนส่งคำสั่งถัดไป
+
+        Returns:
+            False ถ้าคิวเต็มหรือ scheduler ปิดแล้ว
+        """
+        if self._stop.is_set():
+            return False
+        expires = time.monotonic() + deadline if deadline is not None else None
+
+        with self._cond:
+            self.stats["submitted"] += 1
+            previous = self._by_key.get(coalesce_key) if coalesce_key is not None else None
+            if previous is not None:
+                # แทนที่คำสั่งเดิมโดยคงลำดับในคิวไว้ (ไม่ถูกแซงเพราะส่งค่าใหม่บ่อย)
+                previous.payload = payload
+                previous.deadline = expires
+                previous.dwell = dwell
+                if priority < previous.priority:
+                    previous.cancelled = True
+                    self._push(payload, priority, expires, coalesce_key, dwell)
+                self.stats["coalesced"] += 1
+                return True
+
+            if len(self._by_key) + self._pending_unkeyed() >= self.max_queue_size:
+                self.stats["dropped"] += 1
+                return False
+
+            self._push(payload, priority, expires, coalesce_key, dwell)
+            self._cond.notify()
+        return True
+
+    def pending(self):
+        """จำนวนคำสั่งที่ยังไม่ได้ส่ง"""
+        with self._cond:
+            return sum(1 for command in self._heap if not command.cancelled)
+
+    def flush(self, timeout=None):
+        """รอจนคิวว่างและคำสั่งสุดท้าย (รวม dwell) เสร็จ - คืน True ถ้าทันเวลา"""
+        end = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while self._busy or any(not command.cancelled for command in self._heap):
+                remaining = end - time.monotonic() if end is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+        return True
+
+    def close(self, timeout=3.0):
+        """ส่งคำสั่งที่ค้างให้หมด (ไม่เกิน timeout) แล้วหยุด threads"""
+        if self._stop.is_set():
+            return
+        flushed = self.flush(timeout=timeout)
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._writer.join(timeout=1.0)
+        self._reader.join(timeout=1.0)
+        if not flushed:
+            print(f"⚠️ {self.name}: {self.pending()} command(s) not sent before close")
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+        stats["pending"] = self.pending()
+        return stats
+
+    # ----------------------------------------
+    # Background workers
+    # ----------------------------------------
+
+    def _push(self, payload, priority, expires, coalesce_key, dwell):
+        command = SerialCommand(payload, priority, expires, coalesce_key, dwell, next(self._seq))
+        heapq.heappush(self._heap, command)
+        if coalesce_key is not None:
+            self._by_key[coalesce_key] = command
+
+    def _pending_unkeyed(self):
+        return sum(1 for command in self._heap if command.coalesce_key is None and not command.cancelled)
+
+    def _next_command(self):
+        """ดึงคำสั่งที่สำคัญที่สุดที่ยังไม่หมดอายุ (ต้องถือ _cond)"""
+        while self._heap:
+            command = heapq.heappop(self._heap)
+            if command.cancelled:
+                continue
+            if self._by_key.get(command.coalesce_key) is command:
+                del self._by_key[command.coalesce_key]
+            if command.deadline is not None and time.monotonic() > command.deadline:
+                self.stats["expired"] += 1
+                continue
+            return command
+        return None
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                command = self._next_command()
+                if command is None:
+                    self._busy = False
+                    self._cond.notify_all()
+                    self._cond.wait(timeout=0.5)
+                    continue
+                self._busy = True
+
+            try:
+                self.port.write(command.payload)
+                with self._cond:
+                    self.stats["written"] += 1
+                    self.stats["bytes_written"] += len(command.payload)
+            except Exception as e:
+                with self._cond:
+                    self.stats["write_errors"] += 1
+                print(f"❌ {self.name}: write failed ({command.payload!r}): {e}")
+
+            if command.dwell > 0:
+                # รอ servo หมุนเสร็จโดยไม่ block ผู้เรียก (หยุดได้ทันทีเมื่อ close)
+                self._stop.wait(command.dwell)
+
+        with self._cond:
+            self._busy = False
+            self._cond.notify_all()
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                messages = self._read_messages()
+            except Exception as e:
+                print(f"⚠️ {self.name}: read failed: {e}")
+                self._stop.wait(1.0)
+                continue
+
+            for message in messages:
+                self.responses.append(message)
+                with self._cond:
+                    self.stats["lines_read"] += 1
+                if self.on_line is not None:
+                    try:
+                        self.on_line(message)
+                    except Exception as e:
+                        print(f"⚠️ {self.name}: reply handler failed: {e}")
+
+    def _read_messages(self):
+        """อ่านข้อความตอบกลับ: บรรทัด text หรือสิ่งที่ codec decode ได้"""
+        if self.codec is not None:
+            data = self.port.read(max(1, self.port.in_waiting))
+            if not data:
+                # port ที่เปิดด้วย timeout=0 คืน b"" ทันที - พักสั้นๆ ไม่ให้ thread วนเปล่า
+                self._stop.wait(0.005)
+                return []
+            return self.codec.feed(data)
+
+        raw = self.port.readline()
+        line = raw.decode("utf-8", errors="replace").strip() if raw else ""
+        return [line] if line else []
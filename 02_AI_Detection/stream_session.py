@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Stream Session
+สถานะของการเชื่อมต่อ WebSocket หนึ่งตัวที่ /v1/detect/stream (kiosk ส่ง JPEG ต่อเนื่อง)
+
+- รับเฟรมตลอดเวลาแต่เก็บไว้แค่เฟรมล่าสุดเฟรมเดียว: ถ้า inference ยังไม่เสร็จ
+  เฟรมเก่าที่รออยู่จะถูกทิ้ง (backpressure แบบ drop stale frames) latency จึงไม่สะสม
+- มี BottleTracker ของตัวเองตลอดการเชื่อมต่อ จึงนับขวดที่ฝั่ง server ได้
+- ส่งผลกลับเป็น JSON ต่อเฟรมที่ประมวลผลเสร็จ
+
+Protocol:
+    client -> server : binary = JPEG หนึ่งเฟรม, text "reset" = ล้างตัวนับ
+    server -> client : {"frame", "detections", "counted", "total_counted", "tracks", "dropped", "processing_time"}
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import asyncio
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from bottle_tracker import COUNT_MODES, create_tracker_from_config
+from detection_service import ServiceOverloadedError
+from frame_pipeline import StageStats
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSession:
+    """ประมวลผลเฟรมของ client หนึ่งตัวทีละเฟรม โดยใช้เฉพาะเฟรมล่าสุดเสมอ"""
+
+    def __init__(self, detect, tracker, class_names=None, confidence_threshold=0.5,
+                 count_class_id=None, max_frame_bytes=2_000_000):
+        self.detect = detect                  # coroutine function: frame -> Detections
+        self.tracker = tracker
+        self.class_names = class_names
+        self.confidence_threshold = confidence_threshold
+        self.count_class_id = count_class_id  # None = นับทุก class
+        self.max_frame_bytes = max_frame_bytes
+
+        self._pending = None                  # (seq, jpeg bytes) ที่รอประมวลผล
+        self._ready = asyncio.Event()
+        self._closed = False
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.invalid = 0
+        self.latency = StageStats("stream")
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def offer(self, data):
+        """รับเฟรมใหม่ - ถ้ามีเฟรมที่ยังไม่ได้ประมวลผลอยู่ เฟรมนั้นจะถูกทิ้ง (คืน False ถ้าเฟรมนี้ใช้ไม่ได้)"""
+        self.received += 1
+        if not data or len(data) > self.max_frame_bytes:
+            self.invalid += 1
+            return False
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = (self.received, data)
+        self._ready.set()
+        return True
+
+    def handle_text(self, text):
+        """คำสั่งจาก client (text message)"""
+        if text.strip().lower() == "reset":
+            self.tracker.reset()
+
+    async def next_frame(self):
+        """รอเฟรมล่าสุด - คืน None เมื่อ session ปิดแล้ว"""
+        while self._pending is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        if self._closed:
+            return None
+        item, self._pending = self._pending, None
+        return item
+
+    def close(self):
+        self._closed = True
+        self._pending = None
+        self._ready.set()
+
+    async def process(self, seq, data):
+        """decode + detect + track หนึ่งเฟรม - คืนข้อความที่จะส่งกลับ (None = ไม่ต้องส่ง)"""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        frame = await loop.run_in_executor(None, cv2.imdecode, np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            self.invalid += 1
+            return {"frame": seq, "error": "Invalid image format"}
+
+        try:
+            result = await self.detect(frame)
+        except ServiceOverloadedError:
+            # service ไม่ว่าง: ทิ้งเฟรมนี้ เดี๋ยวเฟรมถัดไปก็มา
+            self.dropped += 1
+            return None
+
+        keep = result.scores >= self.confidence_threshold
+        track_mask = keep if self.count_class_id is None else keep & (result.class_ids == self.count_class_id)
+        counted = self.tracker.update(result.boxes[track_mask], result.scores[track_mask], frame.shape)
+
+        detections = []
+        for det, kept in zip(result.to_list(self.class_names), keep.tolist()):
+            if kept:
+                x1, y1, x2, y2 = det["bbox"]
+                det["center"] = [(x1 + x2) // 2, (y1 + y2) // 2]
+                detections.append(det)
+
+        elapsed = time.perf_counter() - start
+        self.latency.record(elapsed)
+        self.processed += 1
+        return {
+            "frame": seq,
+            "detections": detections,
+            "counted": [track.track_id for track in counted],
+            "total_counted": self.tracker.total_counted,
+            "tracks": self.tracker.snapshot(),
+            "dropped": self.dropped,
+            "processing_time": elapsed,
+        }
+
+    async def run(self, receive, send):
+        """
+        วนรับ/ประมวลผลจนกว่า client จะตัดการเชื่อมต่อ
+
+        receive(): coroutine คืน bytes / str หรือ None เมื่อ client ตัดการเชื่อมต่อ
+        send(message): coroutine ส่ง dict กลับเป็น JSON
+        """
+        worker = asyncio.create_task(self._process_loop(send))
+        try:
+            while not worker.done():
+                message = await receive()
+                if message is None:
+                    break
+                if isinstance(message, str):
+                    self.handle_text(message)
+                else:
+                    self.offer(message)
+        finally:
+            self.close()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    async def _process_loop(self, send):
+        while True:
+            item = await self.next_frame()
+            if item is None:
+                return
+            try:
+                message = await self.process(*item)
+            except Exception as e:
+                logger.error(f"❌ Stream frame {item[0]} failed: {e}")
+                message = {"frame": item[0], "error": f"Detection failed: {e}"}
+            if message is not None:
+                try:
+                    await send(message)
+                except Exception:
+                    # client ปิดไปแล้ว
+                    self.close()
+                    return
+
+    def get_stats(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "invalid": self.invalid,
+            "drop_rate": (self.dropped / self.received) if self.received else 0.0,
+            "total_counted": self.tracker.total_counted,
+            "latency": self.latency.snapshot(),
+        }
+
+
+def create_stream_session(config, detect, class_names=None, confidence_threshold=0.5, count_mode=None):
+    """สร้าง StreamSession จาก config class (count_mode ของ client ทับ API_STREAM_COUNT_MODE ได้)"""
+    tracker = create_tracker_from_config(config)
+    count_mode = count_mode or getattr(config, "API_STREAM_COUNT_MODE", None)
+    if count_mode:
+        if count_mode not in COUNT_MODES:
+            raise ValueError(f"count_mode must be one of {COUNT_MODES}, got '{count_mode}'")
+        tracker.count_mode = count_mode
+
+    return StreamSession(
+        detect,
+        tracker,
+        class_names=class_names,
+        confidence_threshold=confidence_threshold,
+        count_class_id=getattr(config, "TARGET_CLASS_ID", None),
+        max_frame_bytes=getattr(config, "API_STREAM_MAX_FRAME_BYTES", 2_000_000)
+    )
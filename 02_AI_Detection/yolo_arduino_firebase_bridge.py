@@ -9,10 +9,8 @@ Version: 2.0
 """
 
 import cv2
-import numpy as np
 import serial
 import time
-import requests
 import json
 from datetime import datetime
 import threading
@@ -20,21 +18,33 @@ import os
 import sys
 from pathlib import Path
 
+from firebase_writer import get_shared_writer
+from yolo_postprocess import detect_class_boxes
+from bottle_tracker import create_tracker_from_config, draw_tracks, xywh_to_xyxy
+from roi import create_roi_from_config
+from overlay_renderer import InfoOverlay
+from serial_protocol import Frame, OP_STATUS, create_codec
+
 # Configuration
 class Config:
     # Arduino Settings
-    ARDUINO_PORT = 'COM3'  # เปลี่ยนตาม port ของ Arduino R4
+    ARDUINO_PORT = os.environ.get("P2P_ARDUINO_PORT", 'COM3')  # เปลี่ยนตาม port ของ Arduino R4
     ARDUINO_BAUD_RATE = 115200
     ARDUINO_TIMEOUT = 2
+    SERIAL_PROTOCOL = "text"  # "text" (คำสั่ง ASCII เดิม) หรือ "binary" (serial_protocol.py)
     
     # Camera Settings
     CAMERA_INDEX = 0
     FRAME_WIDTH = 640
     FRAME_HEIGHT = 480
+    HEADLESS = os.environ.get("P2P_HEADLESS", "0") == "1"  # ไม่วาด/ไม่เปิดหน้าต่าง (Ctrl+C เพื่อออก)
     
     # Firebase Settings
-    FIREBASE_URL = "https://takultoujink-default-rtdb.asia-southeast1.firebasedatabase.app"
+    FIREBASE_URL = os.environ.get("P2P_FIREBASE_URL", "https://takultoujink-default-rtdb.asia-southeast1.firebasedatabase.app")
     USER_ID = "yolo_user"  # จะได้จาก web login หรือกำหนดเอง
+    FIREBASE_TIMEOUT = 10
+    FIREBASE_FLUSH_INTERVAL = 0.5  # รวมการอัปเดตภายในช่วงเวลานี้เป็น PATCH เดียว
+    FIREBASE_SPOOL_FILE = "firebase_spool.jsonl"  # เก็บข้อมูลตอน offline
     
     # YOLO Settings
     YOLO_DIR = "yolo"
@@ -45,8 +55,22 @@ class Config:
     # Detection Settings
     CONFIDENCE_THRESHOLD = 0.5
     NMS_THRESHOLD = 0.4
-    DETECTION_COOLDOWN = 2.0  # seconds
+    DETECTION_COOLDOWN = 2.0  # seconds - ใช้เมื่อปิด tracking เท่านั้น
     BOTTLE_CLASS_ID = 39  # 'bottle' in COCO dataset
+    INPUT_SIZE = 416      # ขนาด input ของ YOLOv3 (ด้านยาวสุดเมื่อใช้ ROI)
+    
+    # ROI Settings (ครอปเฉพาะช่องใส่ขวดก่อน blobFromImage - ดู roi.py)
+    ROI_ENABLED = False
+    ROI = (0.25, 0.0, 0.75, 1.0)  # (x1, y1, x2, y2) สัดส่วนของเฟรม
+    
+    # Tracking Settings (นับขวดแต่ละใบครั้งเดียวเมื่อข้ามเส้นนับ แทน cooldown)
+    USE_TRACKING = True
+    COUNT_MODE = "line"                      # "line", "roi" หรือ "track"
+    COUNT_LINE = ((0.5, 0.0), (0.5, 1.0))    # เส้นนับ (สัดส่วนของเฟรม)
+    COUNT_ROI = (0.25, 0.25, 0.75, 0.75)     # พื้นที่นับสำหรับ COUNT_MODE = "roi"
+    COUNT_DIRECTION = None                   # ทิศที่นับ เช่น (1, 0) = ซ้ายไปขวา, None = ทั้งสองทิศ
+    TRACK_MAX_MISSED = 10
+    TRACK_MIN_HITS = 2
 
 class ArduinoManager:
     """จัดการการเชื่อมต่อกับ Arduino R4"""
@@ -56,6 +80,8 @@ class ArduinoManager:
         self.baud_rate = baud_rate
         self.arduino = None
         self.connected = False
+        self.codec = create_codec(Config.SERIAL_PROTOCOL)
+        self.responses = []  # ข้อความที่ decode แล้วแต่ยังไม่ได้อ่าน
         self.connect()
     
     def connect(self):
@@ -87,8 +113,7 @@ class ArduinoManager:
             return False
         
         try:
-            message = f"{command}\n"
-            self.arduino.write(message.encode())
+            self.arduino.write(self.codec.encode_command(command))
             print(f"📡 → Arduino: {command}")
             return True
         except Exception as e:
@@ -96,15 +121,16 @@ class ArduinoManager:
             return False
     
     def read_response(self):
-        """อ่านข้อมูลจาก Arduino"""
+        """อ่านข้อมูลจาก Arduino - คืนบรรทัด text หรือ Frame (โหมด binary) ทีละข้อความ"""
         if not self.connected:
             return None
         
         try:
-            if self.arduino.in_waiting > 0:
-                response = self.arduino.readline().decode().strip()
-                if response:
-                    print(f"📡 ← Arduino: {response}")
+            if not self.responses and self.arduino.in_waiting > 0:
+                self.responses = self.codec.feed(self.arduino.read(self.arduino.in_waiting))
+            if self.responses:
+                response = self.responses.pop(0)
+                print(f"📡 ← Arduino: {response}")
                 return response
         except Exception as e:
             print(f"❌ Error reading from Arduino: {e}")
@@ -122,37 +148,39 @@ class FirebaseManager:
     def __init__(self, base_url=Config.FIREBASE_URL, user_id=Config.USER_ID):
         self.base_url = base_url
         self.user_id = user_id
+        self.writer = get_shared_writer(
+            base_url,
+            spool_path=Config.FIREBASE_SPOOL_FILE,
+            flush_interval=Config.FIREBASE_FLUSH_INTERVAL,
+            timeout=Config.FIREBASE_TIMEOUT
+        )
     
-    def send_data(self, data, path="bottle_data"):
-        """ส่งข้อมูลไป Firebase"""
-        try:
-            url = f"{self.base_url}/{path}/{self.user_id}.json"
-            
-            # เพิ่ม timestamp
-            data_with_timestamp = {
-                **data,
-                "timestamp": datetime.now().isoformat(),
-                "unix_timestamp": int(time.time())
-            }
-            
-            response = requests.put(url, json=data_with_timestamp, timeout=10)
-            
-            if response.status_code == 200:
-                print(f"✅ Firebase: Data sent successfully")
-                return True
-            else:
-                print(f"❌ Firebase error: {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Firebase connection error: {e}")
-            return False
+    def send_data(self, data, path="bottle_data", blocking=False):
+        """ส่งข้อมูลไป Firebase (เข้าคิวแล้วส่งใน background)"""
+        target = f"{path}/{self.user_id}"
+        
+        # เพิ่ม timestamp
+        data_with_timestamp = {
+            **data,
+            "timestamp": datetime.now().isoformat(),
+            "unix_timestamp": int(time.time())
+        }
+        
+        if not blocking:
+            return self.writer.submit(target, data_with_timestamp)
+        
+        if self.writer.send_now(target, data_with_timestamp):
+            print(f"✅ Firebase: Data sent successfully")
+            return True
+        
+        print(f"❌ Firebase connection error: could not write to {path}")
+        return False
     
     def get_data(self, path="bottle_data"):
         """ดึงข้อมูลจาก Firebase"""
         try:
             url = f"{self.base_url}/{path}/{self.user_id}.json"
-            response = requests.get(url, timeout=10)
+            response = self.writer.session.get(url, timeout=Config.FIREBASE_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -163,6 +191,11 @@ class FirebaseManager:
         except Exception as e:
             print(f"❌ Firebase get error: {e}")
             return None
+    
+    def close(self):
+        """ส่งข้อมูลที่ค้างอยู่ก่อนปิดระบบ"""
+        if not self.writer.flush():
+            print(f"⚠️ Firebase offline - pending data kept in {Config.FIREBASE_SPOOL_FILE}")
 
 class YOLODetector:
     """YOLO Object Detection สำหรับขวด"""
@@ -171,6 +204,7 @@ class YOLODetector:
         self.net = None
         self.classes = []
         self.output_layers = []
+        self.roi = create_roi_from_config(Config)
         self.load_model()
     
     def load_model(self):
@@ -224,69 +258,56 @@ class YOLODetector:
             print(f"   Save to: {Config.YOLO_WEIGHTS}")
             input("Press Enter after downloading...")
     
-    def detect_bottles(self, frame):
-        """ตรวจจับขวดในเฟรม"""
-        height, width, channels = frame.shape
+    def detect(self, frame):
+        """รัน YOLO กับเฟรม - คืน boxes [x, y, w, h] และ confidences ของขวดหลัง NMS"""
+        source = frame
+        input_size = (Config.INPUT_SIZE, Config.INPUT_SIZE)
+        if self.roi is not None:
+            source = self.roi.crop(frame)
+            input_size = self.roi.input_size(frame.shape, Config.INPUT_SIZE)
+        height, width = source.shape[:2]
         
         # เตรียมเฟรมสำหรับ YOLO
         blob = cv2.dnn.blobFromImage(
-            frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False
+            source, 0.00392, input_size, (0, 0, 0), True, crop=False
         )
         self.net.setInput(blob)
         outputs = self.net.forward(self.output_layers)
         
-        # ข้อมูลสำหรับแสดงผล
-        class_ids = []
-        confidences = []
-        boxes = []
-        
-        # ประมวลผลการตรวจจับ
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                # กรองเฉพาะขวดที่มีความมั่นใจสูง
-                if class_id == Config.BOTTLE_CLASS_ID and confidence > Config.CONFIDENCE_THRESHOLD:
-                    # คำนวณตำแหน่ง bounding box
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    # Rectangle coordinates
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-        
-        # Non-maximum suppression
-        indexes = cv2.dnn.NMSBoxes(boxes, confidences, Config.CONFIDENCE_THRESHOLD, Config.NMS_THRESHOLD)
-        
-        # วาด bounding boxes
-        bottle_count = 0
-        if len(indexes) > 0:
-            bottle_count = len(indexes.flatten())
-            for i in indexes.flatten():
-                x, y, w, h = boxes[i]
-                confidence = confidences[i]
-                
-                # วาดกรอบและข้อความ
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(
-                    frame, 
-                    f"Bottle {confidence:.2f}", 
-                    (x, y - 10), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 
-                    0.5, 
-                    (0, 255, 0), 
-                    2
-                )
+        # decode แบบ vectorized แล้วทำ NMS เฉพาะ box ที่ผ่านการกรอง
+        boxes, confidences = detect_class_boxes(
+            outputs, width, height,
+            Config.BOTTLE_CLASS_ID,
+            Config.CONFIDENCE_THRESHOLD,
+            Config.NMS_THRESHOLD
+        )
+        if self.roi is not None:
+            boxes = self.roi.to_frame_xywh(boxes, frame.shape)
+        return boxes, confidences
+    
+    def detect_bottles(self, frame):
+        """ตรวจจับขวดในเฟรม"""
+        boxes, confidences = self.detect(frame)
+        self.draw_detections(frame, boxes, confidences)
         
+        bottle_count = len(boxes)
         return frame, bottle_count > 0, bottle_count
+    
+    def draw_detections(self, frame, boxes, confidences):
+        """วาด bounding boxes"""
+        for (x, y, w, h), confidence in zip(boxes.tolist(), confidences.tolist()):
+            # วาดกรอบและข้อความ
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.putText(
+                frame, 
+                f"Bottle {confidence:.2f}", 
+                (x, y - 10), 
+                cv2.FONT_HERSHEY_SIMPLEX, 
+                0.5, 
+                (0, 255, 0), 
+                2
+            )
+        return frame
 
 class BottleDetectionSystem:
     """ระบบตรวจจับขวดแบบครบวงจร"""
@@ -300,6 +321,9 @@ class BottleDetectionSystem:
         self.arduino = ArduinoManager()
         self.firebase = FirebaseManager()
         self.yolo = YOLODetector()
+        self.tracker = create_tracker_from_config(Config) if Config.USE_TRACKING else None
+        self.overlay = InfoOverlay(rect=(10, 10, 400, 120), line_height=25, font_scale=0.6,
+                                   text_origin=(15, 30), thickness=2)
         
         # เริ่มต้นกล้อง
         self.init_camera()
@@ -322,8 +346,8 @@ class BottleDetectionSystem:
         """จัดการเมื่อตรวจพบขวด"""
         current_time = time.time()
         
-        # ป้องกันการตรวจจับซ้ำเร็วเกินไป
-        if current_time - self.last_detection_time < Config.DETECTION_COOLDOWN:
+        # ป้องกันการตรวจจับซ้ำเร็วเกินไป (tracker นับแต่ละขวดครั้งเดียวอยู่แล้ว)
+        if self.tracker is None and current_time - self.last_detection_time < Config.DETECTION_COOLDOWN:
             return
         
         self.last_detection_time = current_time
@@ -370,10 +394,13 @@ class BottleDetectionSystem:
     def run(self):
         """เริ่มการทำงานหลัก"""
         print("🚀 Starting bottle detection system...")
-        print("Controls:")
-        print("  'q' - Quit")
-        print("  'r' - Reset counter")
-        print("  's' - Show status")
+        if Config.HEADLESS:
+            print("🖥️ Headless mode: no display (Ctrl+C to quit)")
+        else:
+            print("Controls:")
+            print("  'q' - Quit")
+            print("  'r' - Reset counter")
+            print("  's' - Show status")
         print("="*50)
         
         try:
@@ -384,17 +411,27 @@ class BottleDetectionSystem:
                     break
                 
                 # ตรวจจับขวด
-                frame, bottle_detected, bottles_count = self.yolo.detect_bottles(frame)
+                boxes, confidences = self.yolo.detect(frame)
+                if not Config.HEADLESS:
+                    self.yolo.draw_detections(frame, boxes, confidences)
+                bottles_count = len(boxes)
                 
                 # จัดการการตรวจจับ
-                if bottle_detected:
+                if self.tracker is not None:
+                    counted = self.tracker.update(xywh_to_xyxy(boxes), confidences, frame.shape)
+                    if not Config.HEADLESS:
+                        draw_tracks(frame, self.tracker)
+                    if counted:
+                        self.on_bottle_detected(len(counted))
+                elif bottles_count:
                     self.on_bottle_detected(bottles_count)
                 
-                # แสดงข้อมูลบนเฟรม
-                self.draw_info(frame, bottles_count)
-                
-                # แสดงเฟรม
-                cv2.imshow('YOLO Bottle Detection - P2P System', frame)
+                if not Config.HEADLESS:
+                    # แสดงข้อมูลบนเฟรม
+                    self.draw_info(frame, bottles_count)
+                    
+                    # แสดงเฟรม
+                    cv2.imshow('YOLO Bottle Detection - P2P System', frame)
                 
                 # อ่านข้อมูลจาก Arduino
                 if self.arduino.connected:
@@ -402,6 +439,9 @@ class BottleDetectionSystem:
                     if response:
                         self.handle_arduino_response(response)
                 
+                if Config.HEADLESS:
+                    continue
+                
                 # จัดการคีย์บอร์ด
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
@@ -419,11 +459,6 @@ class BottleDetectionSystem:
     
     def draw_info(self, frame, current_bottles):
         """วาดข้อมูลบนเฟรม"""
-        # พื้นหลังสำหรับข้อความ
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (400, 120), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-        
         # ข้อความสถานะ
         texts = [
             f"Total Bottles: {self.bottle_count}",
@@ -432,13 +467,18 @@ class BottleDetectionSystem:
             f"Arduino: {'Connected' if self.arduino.connected else 'Disconnected'}"
         ]
         
-        for i, text in enumerate(texts):
-            y = 30 + (i * 25)
-            cv2.putText(frame, text, (15, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        # พื้นหลังโปร่งแสง + ข้อความ เฉพาะในกล่อง (ไม่ copy ทั้งเฟรม)
+        self.overlay.render(frame, texts, [(0, 255, 0)] * len(texts))
     
     def handle_arduino_response(self, response):
         """จัดการข้อมูลจาก Arduino"""
-        if response.startswith("STATUS:"):
+        if isinstance(response, Frame):
+            if response.is_ack and response.command == OP_STATUS and response.values:
+                arduino_count, arduino_points = response.values
+                print(f"📊 Arduino Status - Count: {arduino_count}, Points: {arduino_points}")
+            elif response.is_nack:
+                print(f"⚠️ Arduino rejected command #{response.seq} (error {response.values})")
+        elif response.startswith("STATUS:"):
             # Arduino ส่งสถานะมา
             status_data = response[7:].split(",")
             if len(status_data) >= 2:
@@ -466,11 +506,15 @@ class BottleDetectionSystem:
         if hasattr(self, 'cap'):
             self.cap.release()
         
-        cv2.destroyAllWindows()
+        if not Config.HEADLESS:
+            cv2.destroyAllWindows()
         
         if hasattr(self, 'arduino'):
             self.arduino.close()
         
+        if hasattr(self, 'firebase'):
+            self.firebase.close()
+        
         print("✅ Cleanup completed")
 
 def main():
@@ -4,14 +4,15 @@ YOLO Bottle Detection with Arduino Integration
 """
 
 import cv2
-import numpy as np
 import serial
 import time
-import requests
 import json
 from datetime import datetime
 import threading
 
+from firebase_writer import get_shared_writer
+from yolo_postprocess import detect_class_boxes
+
 # Configuration
 ARDUINO_PORT = 'COM3'  # เปลี่ยนตาม port ของ Arduino
 ARDUINO_BAUD_RATE = 115200
@@ -20,6 +21,7 @@ CAMERA_INDEX = 0  # Camera index (usually 0 for default camera)
 # Firebase Configuration
 FIREBASE_URL = "https://takultoujink-default-rtdb.asia-southeast1.firebasedatabase.app"
 USER_ID = "YOUR_USER_ID_HERE"  # จะได้จาก web login
+FIREBASE_SPOOL_FILE = "firebase_spool.jsonl"  # เก็บข้อมูลตอน offline แล้วส่งซ้ำเมื่อต่อได้
 
 # YOLO Configuration
 YOLO_CONFIG_PATH = "yolo/yolov3.cfg"  # Path to YOLO config file
@@ -33,6 +35,9 @@ class BottleDetector:
         self.detection_cooldown = 2.0  # seconds
         self.arduino_connected = False
         
+        # Shared background Firebase writer (keep-alive session, offline spool)
+        self.firebase_writer = get_shared_writer(FIREBASE_URL, spool_path=FIREBASE_SPOOL_FILE, timeout=5)
+        
         # Initialize Arduino connection
         self.init_arduino()
         
@@ -65,6 +70,7 @@ class BottleDetector:
             # Load class names
             with open(YOLO_CLASSES_PATH, "r") as f:
                 self.classes = [line.strip() for line in f.readlines()]
+            self.bottle_class_id = self.classes.index("bottle")
             
             # Get output layer names
             layer_names = self.net.getLayerNames()
@@ -78,56 +84,25 @@ class BottleDetector:
     
     def detect_bottles(self, frame):
         """Detect bottles in frame using YOLO"""
-        height, width, channels = frame.shape
+        height, width = frame.shape[:2]
         
         # Prepare frame for YOLO
         blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
         self.net.setInput(blob)
         outputs = self.net.forward(self.output_layers)
         
-        # Information to show on screen
-        class_ids = []
-        confidences = []
-        boxes = []
-        
-        # Process detections
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                # Filter for bottles (class_id might be 39 for 'bottle' in COCO dataset)
-                if confidence > 0.5 and self.classes[class_id] == "bottle":
-                    # Object detected
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    # Rectangle coordinates
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-        
-        # Non-maximum suppression
-        indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-        
-        bottle_detected = False
-        if len(indexes) > 0:
-            bottle_detected = True
-            
-            # Draw bounding boxes
-            for i in indexes.flatten():
-                x, y, w, h = boxes[i]
-                label = f"{self.classes[class_ids[i]]}: {confidences[i]:.2f}"
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        return frame, bottle_detected, len(indexes) if len(indexes) > 0 else 0
+        # Vectorized decode of the bottle class + NMS on the survivors
+        boxes, confidences = detect_class_boxes(
+            outputs, width, height, self.bottle_class_id, 0.5, 0.4
+        )
+        
+        # Draw bounding boxes
+        for (x, y, w, h), confidence in zip(boxes.tolist(), confidences.tolist()):
+            label = f"{self.classes[self.bottle_class_id]}: {confidence:.2f}"
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        
+        return frame, len(boxes) > 0, len(boxes)
     
     def send_to_arduino(self, signal):
         """Send signal to Arduino"""
@@ -139,16 +114,8 @@ class BottleDetector:
                 print(f"❌ Error sending to Arduino: {e}")
     
     def send_to_firebase_direct(self, count):
-        """Send data directly to Firebase (backup method)"""
-        try:
-            url = f"{FIREBASE_URL}/live_count/{USER_ID}.json"
-            response = requests.put(url, json=count, timeout=5)
-            if response.status_code == 200:
-                print(f"✅ Sent to Firebase: {count}")
-            else:
-                print(f"❌ Firebase error: {response.status_code}")
-        except Exception as e:
-            print(f"❌ Firebase connection error: {e}")
+        """Queue the live count for Firebase (sent by the background writer)"""
+        self.firebase_writer.submit(f"live_count/{USER_ID}", count)
     
     def on_bottle_detected(self, bottles_count):
         """Handle bottle detection event"""
@@ -211,6 +178,8 @@ class BottleDetector:
         cv2.destroyAllWindows()
         if self.arduino_connected:
             self.arduino.close()
+        if not self.firebase_writer.flush():
+            print(f"⚠️ Firebase offline - pending count kept in {FIREBASE_SPOOL_FILE}")
 
 def download_yolo_files():
     """Download YOLO files if not present"""
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+YOLO Post-processing
+ถอดรหัส output ของ YOLOv3 (cv2.dnn) แบบ vectorized ด้วย NumPy
+แทนการวน loop ทีละแถว (~10k แถวต่อเฟรมที่ 416x416)
+
+การใช้งาน benchmark:
+    python yolo_postprocess.py
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+BOX_COLUMNS = 4        # cx, cy, w, h (normalized)
+SCORE_OFFSET = 5       # คอลัมน์แรกของ class scores (ถัดจาก objectness)
+
+
+def decode_yolo_outputs(outputs, frame_width, frame_height, class_id, conf_threshold):
+    """
+    แปลง output ของ net.forward() เป็น boxes ของ class ที่ต้องการ
+
+    เงื่อนไขเหมือน loop เดิมทุกประการ: แถวจะถูกเก็บเมื่อ class_id เป็น argmax
+    ของ scores และ score ของ class นั้น > conf_threshold
+
+    Returns:
+        boxes: np.ndarray (N, 4) int32 ในรูปแบบ [x, y, w, h] (พิกัดเฟรม)
+        confidences: np.ndarray (N,) float32
+    """
+    column = SCORE_OFFSET + class_id
+    survivors = []
+
+    for output in outputs:
+        rows = output.reshape(-1, output.shape[-1])
+        # กรองด้วยคอลัมน์ของ class เป้าหมายก่อน (ถูกที่สุด) แล้วค่อย argmax เฉพาะแถวที่ผ่าน
+        candidates = rows[rows[:, column] > conf_threshold]
+        if candidates.shape[0]:
+            best = np.argmax(candidates[:, SCORE_OFFSET:], axis=1) == class_id
+            survivors.append(candidates[best])
+
+    if not survivors:
+        return np.empty((0, 4), dtype=np.int32), np.empty((0,), dtype=np.float32)
+
+    rows = np.concatenate(survivors, axis=0)
+
+    # แปลงพิกัดแบบ bulk (astype ตัดทศนิยมเข้าหา 0 เหมือน int() ใน loop เดิม)
+    center_x = (rows[:, 0] * frame_width).astype(np.int32)
+    center_y = (rows[:, 1] * frame_height).astype(np.int32)
+    widths = (rows[:, 2] * frame_width).astype(np.int32)
+    heights = (rows[:, 3] * frame_height).astype(np.int32)
+    xs = (center_x - widths / 2).astype(np.int32)
+    ys = (center_y - heights / 2).astype(np.int32)
+
+    boxes = np.stack([xs, ys, widths, heights], axis=1)
+    confidences = rows[:, column].astype(np.float32)
+    return boxes, confidences
+
+
+def decode_yolo_outputs_all(outputs, frame_width, frame_height, conf_threshold):
+    """
+    แบบเดียวกับ decode_yolo_outputs แต่เก็บทุก class
+
+    Returns:
+        boxes: np.ndarray (N, 4) int32 [x, y, w, h]
+        confidences: np.ndarray (N,) float32
+        class_ids: np.ndarray (N,) int32
+    """
+    rows = np.concatenate([output.reshape(-1, output.shape[-1]) for output in outputs], axis=0)
+    scores = rows[:, SCORE_OFFSET:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(rows)), class_ids]
+    keep = confidences > conf_threshold
+    rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+
+    widths = (rows[:, 2] * frame_width).astype(np.int32)
+    heights = (rows[:, 3] * frame_height).astype(np.int32)
+    xs = ((rows[:, 0] * frame_width).astype(np.int32) - widths / 2).astype(np.int32)
+    ys = ((rows[:, 1] * frame_height).astype(np.int32) - heights / 2).astype(np.int32)
+
+    boxes = np.stack([xs, ys, widths, heights], axis=1)
+    return boxes, confidences.astype(np.float32), class_ids.astype(np.int32)
+
+
+def apply_nms(boxes, confidences, conf_threshold, nms_threshold):
+    """Non-maximum suppression เฉพาะ boxes ที่ผ่านการกรองแล้ว - คืน index แบบ 1 มิติ"""
+    if len(boxes) == 0:
+        return np.empty((0,), dtype=np.int64)
+
+    indexes = cv2.dnn.NMSBoxes(
+        np.asarray(boxes).tolist(),
+        np.asarray(confidences).tolist(),
+        conf_threshold,
+        nms_threshold
+    )
+    return np.asarray(indexes, dtype=np.int64).reshape(-1)
+
+
+def detect_class_boxes(outputs, frame_width, frame_height, class_id,
+                       conf_threshold, nms_threshold):
+    """decode + NMS ในขั้นตอนเดียว - คืน boxes/confidences หลัง NMS"""
+    boxes, confidences = decode_yolo_outputs(
+        outputs, frame_width, frame_height, class_id, conf_threshold
+    )
+    keep = apply_nms(boxes, confidences, conf_threshold, nms_threshold)
+    return boxes[keep], confidences[keep]
+
+
+def decode_yolo_outputs_loop(outputs, frame_width, frame_height, class_id, conf_threshold):
+    """วิธีเดิมแบบวน loop ทีละแถว (เก็บไว้เป็น reference สำหรับ benchmark และ tests)"""
+    boxes = []
+    confidences = []
+
+    for output in outputs:
+        for detection in output:
+            scores = detection[5:]
+            detected_class = np.argmax(scores)
+            confidence = scores[detected_class]
+
+            if detected_class == class_id and confidence > conf_threshold:
+                center_x = int(detection[0] * frame_width)
+                center_y = int(detection[1] * frame_height)
+                w = int(detection[2] * frame_width)
+                h = int(detection[3] * frame_height)
+
+                x = int(center_x - w / 2)
+                y = int(center_y - h / 2)
+
+                boxes.append([x, y, w, h])
+                confidences.append(float(confidence))
+
+    return boxes, confidences
+
+
+# ========================================
+# Microbenchmark
+# ========================================
+
+def make_synthetic_outputs(input_size=416, num_classes=80, class_id=39,
+                           positives=12, seed=0):
+    """สร้าง output ปลอมขนาดเท่า YOLOv3 จริง (3 scales, 3 anchors ต่อ cell)"""
+    rng = np.random.default_rng(seed)
+    outputs = []
+    for stride in (32, 16, 8):
+        grid = input_size // stride
+        rows = grid * grid * 3
+        output = np.zeros((rows, SCORE_OFFSET + num_classes), dtype=np.float32)
+        output[:, :BOX_COLUMNS] = rng.random((rows, BOX_COLUMNS), dtype=np.float32) * 0.5 + 0.1
+        output[:, 4] = rng.random(rows, dtype=np.float32)
+        # class scores ส่วนใหญ่ต่ำ (เหมือน output จริงที่ผ่าน sigmoid)
+        output[:, SCORE_OFFSET:] = rng.random((rows, num_classes), dtype=np.float32) * 0.2
+        hits = rng.choice(rows, size=positives, replace=False)
+        output[hits, SCORE_OFFSET + class_id] = rng.uniform(0.55, 0.99, size=positives)
+        outputs.append(output)
+    return outputs
+
+
+def benchmark_decode(runs=50, input_size=416, class_id=39, conf_threshold=0.5):
+    """เปรียบเทียบเวลา decode แบบ loop เดิมกับแบบ vectorized (หน่วย ms ต่อเฟรม)"""
+    outputs = make_synthetic_outputs(input_size=input_size, class_id=class_id)
+    rows = sum(output.shape[0] for output in outputs)
+
+    def timed(fn):
+        fn(outputs, 640, 480, class_id, conf_threshold)  # warmup
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn(outputs, 640, 480, class_id, conf_threshold)
+        return (time.perf_counter() - start) / runs * 1000
+
+    loop_ms = timed(decode_yolo_outputs_loop)
+    vectorized_ms = timed(decode_yolo_outputs)
+
+    return {
+        "rows": rows,
+        "runs": runs,
+        "loop_ms": loop_ms,
+        "vectorized_ms": vectorized_ms,
+        "speedup": loop_ms / vectorized_ms if vectorized_ms > 0 else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    print("⏱️ Benchmarking YOLOv3 output decoding...")
+    result = benchmark_decode()
+    print(f"📊 Candidate rows per frame: {result['rows']}")
+    print(f"🐢 Python loop : {result['loop_ms']:.2f} ms/frame")
+    print(f"🚀 Vectorized  : {result['vectorized_ms']:.2f} ms/frame")
+    print(f"⚡ Speedup     : {result['speedup']:.1f}x")
@@ -12,22 +12,28 @@ import serial
 import time
 from ultralytics import YOLO
 import cv2
-import requests
 import json
 from datetime import datetime
 import os
 import sys
 import threading
 
+from firebase_writer import get_shared_writer
+from frame_pipeline import LatestFrameReader
+from motion_gate import create_motion_gate_from_config
+from overlay_renderer import InfoOverlay
+from serial_protocol import create_codec
+
 # ========================================
 # Configuration Class
 # ========================================
 class Config:
     # Arduino Settings
-    ARDUINO_PORT = "COM5"  # แก้ตามพอร์ต Arduino ของคุณ
+    ARDUINO_PORT = os.environ.get("P2P_ARDUINO_PORT", "COM5")  # แก้ตามพอร์ต Arduino ของคุณ
     ARDUINO_BAUD_RATE = 9600
     ARDUINO_TIMEOUT = 1
     SEND_DELAY = 1.0  # เวลาระหว่างส่งค่าไป Arduino (วินาที)
+    SERIAL_PROTOCOL = "text"  # "text" (คำสั่ง ASCII เดิม) หรือ "binary" (serial_protocol.py)
     
     # YOLOv11 Settings
     MODEL_PATH = "best.pt"  # path ไปยัง YOLOv11 model ของคุณ
@@ -39,16 +45,36 @@ class Config:
     DEVICE = "cpu"  # หรือ "cuda" ถ้ามี GPU
     IMG_SIZE = 640
     
+    # Multi-camera station mode: หลายกล้องใช้ model ตัวเดียวกัน (ว่าง = กล้องเดียวตาม CAM_ID)
+    # แต่ละกล้องมีตัวนับ, cooldown, Arduino และ Firebase path ของตัวเอง
+    CAMERA_SOURCES = [
+        # {"name": "cam1", "source": 0, "arduino_port": "COM5"},
+        # {"name": "cam2", "source": 1, "arduino_port": "COM6"},
+    ]
+    
     # Firebase Settings
-    FIREBASE_URL = "https://takultoujink-default-rtdb.asia-southeast1.firebasedatabase.app"
+    FIREBASE_URL = os.environ.get("P2P_FIREBASE_URL", "https://takultoujink-default-rtdb.asia-southeast1.firebasedatabase.app")
     USER_ID = "yolo_v11_user"
+    FIREBASE_TIMEOUT = 10
+    FIREBASE_FLUSH_INTERVAL = 0.5  # รวมการอัปเดตภายในช่วงเวลานี้เป็น PATCH เดียว
+    FIREBASE_SPOOL_FILE = "firebase_spool.jsonl"  # เก็บข้อมูลตอน offline
     
     # Display Settings
     WINDOW_NAME = "YOLOv11 P2P Detection (ESC to quit)"
+    HEADLESS = os.environ.get("P2P_HEADLESS", "0") == "1"  # ไม่วาด/ไม่เปิดหน้าต่าง (Ctrl+C เพื่อออก)
+    HEADLESS_STATUS_INTERVAL = 30.0  # โหมด headless: พิมพ์สถานะทุกกี่วินาที (0 = ไม่พิมพ์)
     
     # Detection Settings
     DETECTION_COOLDOWN = 2.0  # เวลารอระหว่างการนับขวด (วินาที)
     POINTS_PER_BOTTLE = 10    # คะแนนต่อขวด
+    
+    # Motion Gate (รัน YOLO เฉพาะเมื่อภาพเปลี่ยน - ดู motion_gate.py)
+    MOTION_GATE = True
+    SKIP_FRAMES = 0             # ข้ามเฟรมระหว่าง inference ตอนฉากยุ่ง (0 = ไม่ข้าม)
+    MOTION_MAX_SKIP = 5         # ข้ามเฟรมสูงสุดตอนมีการเคลื่อนไหวเล็กน้อย
+    MOTION_MIN_CHANGED = 0.004  # สัดส่วน pixel ที่เปลี่ยนจึงถือว่ามีการเคลื่อนไหว
+    MOTION_HOLD_SECONDS = 1.5   # ตื่นต่ออีกกี่วินาทีหลังการเคลื่อนไหวครั้งสุดท้าย
+    MOTION_IDLE_REFRESH = 5.0   # ตอนฉากนิ่ง ตรวจซ้ำทุกกี่วินาที
 
 class ArduinoManager:
     """จัดการการเชื่อมต่อกับ Arduino"""
@@ -59,10 +85,16 @@ class ArduinoManager:
         self.arduino = None
         self.connected = False
         self.last_send_time = 0
+        self.codec = create_codec(Config.SERIAL_PROTOCOL)
         self.connect()
     
     def connect(self):
         """เชื่อมต่อกับ Arduino"""
+        if not self.port:
+            print("⚠️ No Arduino port configured - running without Arduino")
+            self.connected = False
+            return
+        
         try:
             self.arduino = serial.Serial(
                 self.port, 
@@ -91,10 +123,10 @@ class ArduinoManager:
             
             try:
                 if detected:
-                    self.arduino.write(b"90\n")
+                    self.arduino.write(self.codec.encode_command("90"))
                     print("📡 → Arduino: 90 (Plastic bottle detected)")
                 else:
-                    self.arduino.write(b"0\n")
+                    self.arduino.write(self.codec.encode_command("0"))
                     print("📡 → Arduino: 0 (No plastic bottle detected)")
                 
                 self.last_send_time = current_time
@@ -118,68 +150,56 @@ class FirebaseManager:
     def __init__(self, base_url=Config.FIREBASE_URL, user_id=Config.USER_ID):
         self.base_url = base_url
         self.user_id = user_id
+        self.writer = get_shared_writer(
+            base_url,
+            spool_path=Config.FIREBASE_SPOOL_FILE,
+            flush_interval=Config.FIREBASE_FLUSH_INTERVAL,
+            timeout=Config.FIREBASE_TIMEOUT
+        )
     
-    def send_data(self, data, path="bottle_data"):
-        """ส่งข้อมูลไป Firebase"""
-        try:
-            url = f"{self.base_url}/{path}/{self.user_id}.json"
-            
-            # เพิ่ม timestamp
-            data_with_timestamp = {
-                **data,
-                "timestamp": datetime.now().isoformat(),
-                "unix_timestamp": int(time.time()),
-                "model_version": "YOLOv11"
-            }
-            
-            response = requests.put(url, json=data_with_timestamp, timeout=10)
-            
-            if response.status_code == 200:
-                print(f"✅ Firebase: Data sent successfully")
-                return True
-            else:
-                print(f"❌ Firebase error: {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Firebase connection error: {e}")
-            return False
+    def send_data(self, data, path="bottle_data", blocking=False):
+        """ส่งข้อมูลไป Firebase (เข้าคิวแล้วส่งใน background)"""
+        target = f"{path}/{self.user_id}"
+        
+        # เพิ่ม timestamp
+        data_with_timestamp = {
+            **data,
+            "timestamp": datetime.now().isoformat(),
+            "unix_timestamp": int(time.time()),
+            "model_version": "YOLOv11"
+        }
+        
+        if not blocking:
+            return self.writer.submit(target, data_with_timestamp)
+        
+        if self.writer.send_now(target, data_with_timestamp):
+            print(f"✅ Firebase: Data sent successfully")
+            return True
+        
+        print(f"❌ Firebase connection error: could not write to {path}")
+        return False
+    
+    def close(self):
+        """ส่งข้อมูลที่ค้างอยู่ก่อนปิดระบบ"""
+        if not self.writer.flush():
+            print(f"⚠️ Firebase offline - pending data kept in {Config.FIREBASE_SPOOL_FILE}")
 
-class YOLOv11DetectionSystem:
-    """ระบบตรวจจับขวดด้วย YOLOv11"""
+class CameraChannel:
+    """สถานะของกล้องหนึ่งตัว: ตัวนับ, cooldown, Arduino และ Firebase แยกกัน"""
     
-    def __init__(self):
+    def __init__(self, name, source, arduino_port=Config.ARDUINO_PORT, user_id=Config.USER_ID):
+        self.name = name
+        self.source = source
+        
         # สถิติการตรวจจับ
         self.bottle_count = 0
         self.total_points = 0
         self.last_detection_time = 0
         
-        # เริ่มต้นระบบย่อย
-        self.arduino = ArduinoManager()
-        self.firebase = FirebaseManager()
-        
-        # โหลด YOLOv11 model
-        self.load_model()
-        
-        print("🎯 YOLOv11 Detection System initialized!")
-    
-    def load_model(self):
-        """โหลด YOLOv11 model"""
-        try:
-            if not os.path.exists(Config.MODEL_PATH):
-                print(f"❌ Model file not found: {Config.MODEL_PATH}")
-                print("💡 กรุณาวาง YOLOv11 model (.pt file) ในโฟลเดอร์นี้")
-                print("📥 หรือเปลี่ยน MODEL_PATH ใน Config")
-                sys.exit(1)
-            
-            self.model = YOLO(Config.MODEL_PATH)
-            print(f"✅ YOLOv11 model loaded: {Config.MODEL_PATH}")
-            print(f"🎯 Target class ID: {Config.TARGET_CLASS_ID}")
-            print(f"📊 Confidence threshold: {Config.CONF_THRESHOLD}")
-            
-        except Exception as e:
-            print(f"❌ Failed to load YOLOv11 model: {e}")
-            sys.exit(1)
+        self.arduino = ArduinoManager(port=arduino_port)
+        self.firebase = FirebaseManager(user_id=user_id)
+        self.gate = create_motion_gate_from_config(Config)  # None = รันทุกเฟรม
+        self.overlay = InfoOverlay()  # กล่องข้อมูลบนเฟรม (วาดข้อความใหม่เมื่อค่าเปลี่ยนเท่านั้น)
     
     def on_bottle_detected(self, count=1):
         """จัดการเมื่อตรวจพบขวด"""
@@ -194,7 +214,7 @@ class YOLOv11DetectionSystem:
         self.total_points = self.bottle_count * Config.POINTS_PER_BOTTLE
         
         timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"🍼 [{timestamp}] Bottles detected: {count}, Total: {self.bottle_count}, Points: {self.total_points}")
+        print(f"🍼 [{timestamp}] [{self.name}] Bottles detected: {count}, Total: {self.bottle_count}, Points: {self.total_points}")
         
         # ส่งไป Firebase
         data = {
@@ -202,6 +222,7 @@ class YOLOv11DetectionSystem:
             "total_points": self.total_points,
             "last_detection": count,
             "device": "yolo_v11_python",
+            "camera": self.name,
             "confidence_threshold": Config.CONF_THRESHOLD,
             "model_path": Config.MODEL_PATH
         }
@@ -211,7 +232,7 @@ class YOLOv11DetectionSystem:
         """รีเซ็ตตัวนับ"""
         self.bottle_count = 0
         self.total_points = 0
-        print("🔄 Counter reset!")
+        print(f"🔄 [{self.name}] Counter reset!")
         
         # อัปเดต Firebase
         data = {
@@ -219,90 +240,163 @@ class YOLOv11DetectionSystem:
             "total_points": 0,
             "last_detection": 0,
             "device": "yolo_v11_python",
+            "camera": self.name,
             "action": "reset"
         }
         self.firebase.send_data(data)
     
-    def draw_info(self, frame, detected, confidence=0.0):
-        """วาดข้อมูลบนเฟรม"""
-        # พื้นหลังสำหรับข้อความ
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (450, 140), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+    def close(self):
+        self.arduino.close()
+
+class YOLOv11DetectionSystem:
+    """ระบบตรวจจับขวดด้วย YOLOv11 (กล้องเดียว หรือหลายกล้องใช้ model ร่วมกัน)"""
+    
+    def __init__(self, camera_sources=None):
+        camera_sources = Config.CAMERA_SOURCES if camera_sources is None else camera_sources
+        
+        # เริ่มต้นระบบย่อยของแต่ละกล้อง
+        if camera_sources:
+            self.channels = [
+                CameraChannel(
+                    name=cam.get("name", f"cam{i}"),
+                    source=cam.get("source", i),
+                    arduino_port=cam.get("arduino_port"),
+                    user_id=f"{Config.USER_ID}_{cam.get('name', f'cam{i}')}"
+                )
+                for i, cam in enumerate(camera_sources)
+            ]
+        else:
+            self.channels = [CameraChannel("main", Config.CAM_ID)]
+        
+        self.firebase = self.channels[0].firebase  # writer ใช้ร่วมกันทุกกล้อง
         
+        self.last_status_time = time.time()
+        
+        # โหลด YOLOv11 model ครั้งเดียวสำหรับทุกกล้อง
+        self.load_model()
+        
+        print(f"🎯 YOLOv11 Detection System initialized! ({len(self.channels)} camera(s))")
+    
+    @property
+    def multi_camera(self):
+        return len(self.channels) > 1
+    
+    def load_model(self):
+        """โหลด YOLOv11 model"""
+        try:
+            if not os.path.exists(Config.MODEL_PATH):
+                print(f"❌ Model file not found: {Config.MODEL_PATH}")
+                print("💡 กรุณาวาง YOLOv11 model (.pt file) ในโฟลเดอร์นี้")
+                print("📥 หรือเปลี่ยน MODEL_PATH ใน Config")
+                sys.exit(1)
+            
+            self.model = YOLO(Config.MODEL_PATH)
+            print(f"✅ YOLOv11 model loaded: {Config.MODEL_PATH}")
+            print(f"🎯 Target class ID: {Config.TARGET_CLASS_ID}")
+            print(f"📊 Confidence threshold: {Config.CONF_THRESHOLD}")
+            
+        except Exception as e:
+            print(f"❌ Failed to load YOLOv11 model: {e}")
+            sys.exit(1)
+    
+    def analyze_result(self, r):
+        """นับขวดจากผลของ YOLO หนึ่งเฟรม - คืน (detected, count, max_confidence)"""
+        bottle_count_in_frame = 0
+        max_confidence = 0.0
+        
+        if r.boxes is not None and len(r.boxes):
+            classes = r.boxes.cls.cpu().numpy()
+            confidences = r.boxes.conf.cpu().numpy()
+            mask = (classes == Config.TARGET_CLASS_ID) & (confidences >= Config.CONF_THRESHOLD)
+            bottle_count_in_frame = int(mask.sum())
+            if bottle_count_in_frame:
+                max_confidence = float(confidences[mask].max())
+        
+        return bottle_count_in_frame > 0, bottle_count_in_frame, max_confidence
+    
+    def handle_result(self, channel, r):
+        """ส่งสัญญาณ/นับขวดของกล้องหนึ่งตัว แล้วคืนเฟรมที่วาดข้อมูลแล้ว (headless คืน None)"""
+        detected, bottle_count_in_frame, max_confidence = self.analyze_result(r)
+        
+        # ส่งสัญญาณไป Arduino ของกล้องนี้
+        channel.arduino.send_signal(detected)
+        
+        # จัดการการตรวจจับ
+        if detected:
+            channel.on_bottle_detected(bottle_count_in_frame)
+        
+        if channel.gate is not None:
+            channel.gate.notify_detections(bottle_count_in_frame)
+        
+        if Config.HEADLESS:
+            return None
+        
+        frame = r.plot()  # วาดกล่องลงเฟรม
+        return self.draw_info(frame, channel, detected, max_confidence)
+    
+    def reset_counter(self):
+        """รีเซ็ตตัวนับทุกกล้อง"""
+        for channel in self.channels:
+            channel.reset_counter()
+    
+    def draw_info(self, frame, channel, detected, confidence=0.0):
+        """วาดข้อมูลบนเฟรม"""
         # ข้อความสถานะ
+        title = "YOLOv11 P2P Detection System"
+        if self.multi_camera:
+            title += f" [{channel.name}]"
         texts = [
-            f"YOLOv11 P2P Detection System",
-            f"Total Bottles: {self.bottle_count}",
-            f"Total Points: {self.total_points}",
+            title,
+            f"Total Bottles: {channel.bottle_count}",
+            f"Total Points: {channel.total_points}",
             f"Detection: {'YES' if detected else 'NO'} ({confidence:.2f})",
-            f"Arduino: {'Connected' if self.arduino.connected else 'Disconnected'}"
+            f"Arduino: {'Connected' if channel.arduino.connected else 'Disconnected'}"
         ]
         
-        for i, text in enumerate(texts):
-            y = 25 + (i * 22)
-            color = (0, 255, 0) if i == 0 else (255, 255, 255)
-            cv2.putText(frame, text, (15, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        # พื้นหลังโปร่งแสง + ข้อความ เฉพาะในกล่อง (ไม่ copy ทั้งเฟรม)
+        return channel.overlay.render(frame, texts)
+    
+    def show_frame(self, window_name, frame):
+        """แสดงเฟรม (โหมด headless ไม่เปิดหน้าต่าง)"""
+        if not Config.HEADLESS:
+            cv2.imshow(window_name, frame)
+    
+    def handle_key(self):
+        """จัดการคีย์บอร์ด - คืน False เมื่อต้องการออก"""
+        if Config.HEADLESS:
+            # ไม่มีหน้าต่างให้กดคีย์: พิมพ์สถานะเป็นระยะแทน (ออกด้วย Ctrl+C)
+            interval = Config.HEADLESS_STATUS_INTERVAL
+            if interval and time.time() - self.last_status_time >= interval:
+                self.last_status_time = time.time()
+                self.show_status()
+            return True
         
-        return frame
+        key = cv2.waitKey(1) & 0xFF
+        if key == 27:  # ESC เพื่อออก
+            return False
+        elif key == ord('r'):
+            self.reset_counter()
+        elif key == ord('s'):
+            self.show_status()
+        return True
     
     def run(self):
         """เริ่มการทำงานหลัก"""
         print("🚀 Starting YOLOv11 bottle detection system...")
-        print("Controls:")
-        print("  'ESC' - Quit")
-        print("  'r' - Reset counter")
-        print("  's' - Show status")
+        if Config.HEADLESS:
+            print("🖥️ Headless mode: no display (Ctrl+C to quit)")
+        else:
+            print("Controls:")
+            print("  'ESC' - Quit")
+            print("  'r' - Reset counter")
+            print("  's' - Show status")
         print("="*60)
         
         try:
-            # ใช้โหมด stream ของ YOLOv11
-            for r in self.model.predict(
-                source=Config.CAM_ID, 
-                stream=True, 
-                device=Config.DEVICE,
-                conf=Config.CONF_THRESHOLD, 
-                imgsz=Config.IMG_SIZE, 
-                verbose=False
-            ):
-                frame = r.plot()  # วาดกล่องลงเฟรมแล้ว
-                
-                # ตรวจสอบว่ามี plastic bottle ปรากฏ
-                detected = False
-                max_confidence = 0.0
-                bottle_count_in_frame = 0
-                
-                if r.boxes is not None:
-                    for box in r.boxes:
-                        cls_id = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        
-                        if cls_id == Config.TARGET_CLASS_ID and conf >= Config.CONF_THRESHOLD:
-                            detected = True
-                            bottle_count_in_frame += 1
-                            max_confidence = max(max_confidence, conf)
-                
-                # ส่งสัญญาณไป Arduino
-                self.arduino.send_signal(detected)
-                
-                # จัดการการตรวจจับ
-                if detected:
-                    self.on_bottle_detected(bottle_count_in_frame)
-                
-                # วาดข้อมูลบนเฟรม
-                frame = self.draw_info(frame, detected, max_confidence)
-                
-                # แสดงผลภาพ
-                cv2.imshow(Config.WINDOW_NAME, frame)
-                
-                # จัดการคีย์บอร์ด
-                key = cv2.waitKey(1) & 0xFF
-                if key == 27:  # ESC เพื่อออก
-                    break
-                elif key == ord('r'):
-                    self.reset_counter()
-                elif key == ord('s'):
-                    self.show_status()
+            if self.multi_camera:
+                self.run_multi_camera()
+            else:
+                self.run_single_camera()
         
         except KeyboardInterrupt:
             print("\n🛑 System interrupted by user")
@@ -315,6 +409,117 @@ class YOLOv11DetectionSystem:
         finally:
             self.cleanup()
     
+    def run_single_camera(self):
+        """กล้องเดียว - ใช้โหมด stream ของ YOLOv11 (หรืออ่านกล้องเองเมื่อเปิด motion gate)"""
+        channel = self.channels[0]
+        if channel.gate is not None:
+            self.run_gated_camera(channel)
+            return
+        
+        for r in self.model.predict(
+            source=channel.source, 
+            stream=True, 
+            device=Config.DEVICE,
+            conf=Config.CONF_THRESHOLD, 
+            imgsz=Config.IMG_SIZE, 
+            verbose=False
+        ):
+            frame = self.handle_result(channel, r)
+            
+            # แสดงผลภาพ
+            self.show_frame(Config.WINDOW_NAME, frame)
+            
+            if not self.handle_key():
+                break
+    
+    def run_gated_camera(self, channel):
+        """กล้องเดียวแบบมี motion gate - รัน YOLO เฉพาะเฟรมที่ gate อนุญาต"""
+        cap = cv2.VideoCapture(channel.source)
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open camera source: {channel.source}")
+        
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    print("❌ Failed to grab frame")
+                    break
+                
+                if channel.gate.should_infer(frame):
+                    r = self.model.predict(
+                        source=frame,
+                        device=Config.DEVICE,
+                        conf=Config.CONF_THRESHOLD,
+                        imgsz=Config.IMG_SIZE,
+                        verbose=False
+                    )[0]
+                    frame = self.handle_result(channel, r)
+                elif not Config.HEADLESS:
+                    frame = self.draw_info(frame, channel, False)
+                
+                self.show_frame(Config.WINDOW_NAME, frame)
+                
+                if not self.handle_key():
+                    break
+        finally:
+            cap.release()
+    
+    def run_multi_camera(self):
+        """
+        หลายกล้อง - แต่ละกล้องมี thread อ่านเฟรมของตัวเอง
+        ทุกรอบจะรวมเฟรมใหม่ล่าสุดของทุกกล้องเป็น batch เดียวแล้ว predict ครั้งเดียว
+        """
+        readers = []
+        for channel in self.channels:
+            reader = LatestFrameReader(channel.source, name=channel.name)
+            try:
+                reader.start()
+            except RuntimeError as e:
+                print(f"❌ [{channel.name}] {e}")
+                continue
+            readers.append((channel, reader))
+        
+        if not readers:
+            raise RuntimeError("No camera could be opened")
+        
+        print(f"📹 Multi-camera mode: {len(readers)} camera(s) sharing one model")
+        self.readers = readers
+        
+        try:
+            while any(reader.alive for _, reader in readers):
+                # เฟรมใหม่ของแต่ละกล้อง (กล้องที่ยังไม่มีเฟรมใหม่ หรือฉากนิ่ง จะข้ามรอบนี้)
+                batch = []
+                for channel, reader in readers:
+                    packet = reader.read_latest()
+                    if packet is None:
+                        continue
+                    if channel.gate is None or channel.gate.should_infer(packet.frame):
+                        batch.append((channel, packet))
+                
+                if not batch:
+                    time.sleep(0.002)
+                    if not self.handle_key():
+                        break
+                    continue
+                
+                results = self.model.predict(
+                    source=[packet.frame for _, packet in batch],
+                    device=Config.DEVICE,
+                    conf=Config.CONF_THRESHOLD,
+                    imgsz=Config.IMG_SIZE,
+                    verbose=False
+                )
+                
+                for (channel, _), r in zip(batch, results):
+                    frame = self.handle_result(channel, r)
+                    self.show_frame(f"{Config.WINDOW_NAME} [{channel.name}]", frame)
+                
+                if not self.handle_key():
+                    break
+        finally:
+            for _, reader in readers:
+                reader.stop()
+    
     def show_status(self):
         """แสดงสถานะระบบ"""
         print("\n" + "="*60)
@@ -323,11 +528,21 @@ class YOLOv11DetectionSystem:
         print(f"🤖 Model: {Config.MODEL_PATH}")
         print(f"🎯 Target Class ID: {Config.TARGET_CLASS_ID}")
         print(f"📊 Confidence Threshold: {Config.CONF_THRESHOLD}")
-        print(f"🍼 Total Bottles: {self.bottle_count}")
-        print(f"⭐ Total Points: {self.total_points}")
-        print(f"🔌 Arduino: {'Connected' if self.arduino.connected else 'Disconnected'}")
+        for channel in self.channels:
+            print(f"📹 [{channel.name}] Camera: {channel.source}")
+            print(f"   🍼 Total Bottles: {channel.bottle_count}")
+            print(f"   ⭐ Total Points: {channel.total_points}")
+            print(f"   🔌 Arduino: {'Connected' if channel.arduino.connected else 'Disconnected'}")
+            if channel.gate is not None:
+                gate = channel.gate.get_stats()
+                print(f"   💤 Motion gate: {gate['inferred']}/{gate['frames']} frames inferred "
+                      f"({gate['inference_ratio'] * 100:.0f}%), skip={gate['current_skip']}")
+            reader = dict(getattr(self, "readers", [])).get(channel)
+            if reader is not None:
+                capture = reader.stats.snapshot()
+                print(f"   🎞️ Frames: {reader.frames_read} read, {reader.dropped} skipped, "
+                      f"read p95={capture['p95_ms']:.1f}ms")
         print(f"🔥 Firebase: Ready")
-        print(f"📹 Camera ID: {Config.CAM_ID}")
         print(f"💻 Device: {Config.DEVICE}")
         print("="*60 + "\n")
     
@@ -335,10 +550,14 @@ class YOLOv11DetectionSystem:
         """ทำความสะอาดเมื่อปิดระบบ"""
         print("🧹 Cleaning up...")
         
-        cv2.destroyAllWindows()
+        if not Config.HEADLESS:
+            cv2.destroyAllWindows()
         
-        if hasattr(self, 'arduino'):
-            self.arduino.close()
+        for channel in getattr(self, 'channels', []):
+            channel.close()
+        
+        if hasattr(self, 'firebase'):
+            self.firebase.close()
         
         print("✅ Cleanup completed")
 
@@ -10,9 +10,7 @@ Version: 3.1 (YOLOv11 + Servo Edition)
 
 import serial
 import time
-from ultralytics import YOLO
 import cv2
-import requests
 import json
 from datetime import datetime
 import os
@@ -20,6 +18,18 @@ import sys
 import threading
 import numpy as np
 
+from adaptive_controller import create_adaptive_controller_from_config
+from firebase_writer import get_shared_writer
+from frame_pipeline import FramePipeline
+from bottle_tracker import create_tracker_from_config, draw_tracks
+from count_ledger import COUNTERS, LedgerSyncer, create_ledger_from_config, default_station_id
+from model_export_cache import load_optimized_model_from_config
+from motion_gate import create_motion_gate_from_config
+from overlay_renderer import InfoOverlay
+from roi import create_roi_from_config, create_calibrator_from_config
+from serial_scheduler import SerialCommandScheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from serial_protocol import Frame, OP_SERVO, OP_SWEEP, create_codec
+
 # ========================================
 # Configuration Class
 # ========================================
@@ -40,23 +50,81 @@ class ServoConfig:
     DEVICE = "cpu"  # หรือ "cuda" ถ้ามี GPU
     IMG_SIZE = 640
     
+    # Model Export Cache (export ครั้งเดียวแล้วใช้ซ้ำ - ดู model_export_cache.py)
+    MODEL_EXPORT_FORMAT = ""        # "" = ใช้ .pt ตรงๆ, "onnx" หรือ "openvino" (เร็วกว่าบน CPU)
+    MODEL_EXPORT_INT8 = False       # quantize เป็น INT8 ตอน export
+    MODEL_EXPORT_DATA = None        # dataset yaml สำหรับ calibrate INT8 ของ OpenVINO
+    MODEL_CACHE_DIR = "model_cache"
+    MODEL_WARMUP_RUNS = 3           # รัน predict กับเฟรมว่างก่อนเปิดกล้อง (0 = ไม่ warmup)
+    
     # Firebase Settings
     FIREBASE_URL = "https://takultoujink-default-rtdb.asia-southeast1.firebasedatabase.app"
     USER_ID = "yolo_v11_servo_user"
+    FIREBASE_TIMEOUT = 10                        # Timeout ต่อ request (วินาที)
+    FIREBASE_FLUSH_INTERVAL = 0.5                # รวมการอัปเดตภายในช่วงเวลานี้เป็น PATCH เดียว
+    FIREBASE_SPOOL_FILE = "firebase_spool.jsonl" # เก็บข้อมูลตอน offline แล้วส่งซ้ำเมื่อต่อได้
+    
+    # Count Ledger (event log ของการนับใน SQLite - ยอดไม่หายเมื่อปิด/crash - ดู count_ledger.py)
+    LEDGER_ENABLED = True
+    LEDGER_PATH = "count_ledger.db"
+    LEDGER_STATION_ID = ""          # "" = ชื่อเครื่อง (แต่ละ station ต้องไม่ซ้ำกัน)
+    LEDGER_SNAPSHOT_EVERY = 100     # เขียน snapshot ยอดรวมทุกกี่ event
+    LEDGER_SYNC_INTERVAL = 2.0      # ส่ง event ที่ค้างไป Firebase ทุกกี่วินาที (ส่งซ้ำได้ไม่นับซ้ำ)
     
     # Display Settings
     WINDOW_NAME = "YOLOv11 P2P Detection with Servo Control (ESC to quit)"
+    HEADLESS = os.environ.get("P2P_HEADLESS", "0") == "1"  # ไม่วาด/ไม่เปิดหน้าต่าง (Ctrl+C เพื่อออก)
+    HEADLESS_STATUS_INTERVAL = 30.0  # โหมด headless: พิมพ์สถานะทุกกี่วินาที (0 = ไม่พิมพ์)
     
     # Detection Settings
-    DETECTION_COOLDOWN = 2.0  # เวลารอระหว่างการนับขวด (วินาที)
+    DETECTION_COOLDOWN = 2.0  # เวลารอระหว่างการนับขวด (วินาที) - ใช้เมื่อปิด tracking เท่านั้น
     POINTS_PER_BOTTLE = 10    # คะแนนต่อขวด
     
+    # Tracking Settings (นับขวดแต่ละใบครั้งเดียวเมื่อข้ามเส้น/เข้าพื้นที่นับ แทน cooldown)
+    USE_TRACKING = True
+    COUNT_MODE = "line"                      # "line", "roi" หรือ "track"
+    COUNT_LINE = ((0.5, 0.0), (0.5, 1.0))    # เส้นนับ (สัดส่วนของเฟรม) - เส้นแนวตั้งกลางภาพ
+    COUNT_ROI = (0.25, 0.25, 0.75, 0.75)     # พื้นที่นับ (x1, y1, x2, y2) สำหรับ COUNT_MODE = "roi"
+    COUNT_DIRECTION = None                   # ทิศที่นับ เช่น (1, 0) = ซ้ายไปขวา, None = ทั้งสองทิศ
+    TRACK_IOU_THRESHOLD = 0.3
+    TRACK_MAX_MISSED = 10                    # จำนวนเฟรมที่หายไปได้ก่อนลบ track
+    TRACK_MIN_HITS = 2                       # จำนวนเฟรมที่ต้องเห็นก่อนนับ
+    
+    # Motion Gate (รัน YOLO เฉพาะเมื่อภาพเปลี่ยน - ดู motion_gate.py)
+    MOTION_GATE = True
+    SKIP_FRAMES = 0             # ข้ามเฟรมระหว่าง inference ตอนฉากยุ่ง (0 = ไม่ข้าม)
+    MOTION_MAX_SKIP = 5         # ข้ามเฟรมสูงสุดตอนมีการเคลื่อนไหวเล็กน้อย
+    MOTION_MIN_CHANGED = 0.004  # สัดส่วน pixel ที่เปลี่ยนจึงถือว่ามีการเคลื่อนไหว
+    MOTION_HOLD_SECONDS = 1.5   # ตื่นต่ออีกกี่วินาทีหลังการเคลื่อนไหวครั้งสุดท้าย
+    MOTION_IDLE_REFRESH = 5.0   # ตอนฉากนิ่ง ตรวจซ้ำทุกกี่วินาที
+    
+    # Adaptive Controller (ปรับ imgsz / การข้ามเฟรมตาม FPS ที่วัดได้ - ดู adaptive_controller.py)
+    ADAPTIVE_ENABLED = False
+    ADAPTIVE_TARGET_FPS = 15                          # FPS เป้าหมาย (เฟรมกล้องที่รองรับได้ต่อวินาที)
+    ADAPTIVE_IMG_SIZES = (320, 384, 416, 480, 544, 640)  # ขั้นของ imgsz (ไม่เกิน IMG_SIZE)
+    ADAPTIVE_MAX_SKIP = 3                             # ข้ามเฟรมได้สูงสุดเมื่อ imgsz ต่ำสุดแล้วยังไม่ทัน
+    ADAPTIVE_BACKLOG_LIMIT = 0                        # frame queue ค้างถึงค่านี้ตลอด window = ลดขั้น (0 = ไม่ใช้)
+    ADAPTIVE_METRICS_FILE = "adaptive_metrics.jsonl"  # บันทึกทุกการเปลี่ยนแปลง
+    
+    # ROI (ครอปเฉพาะช่องใส่ขวดก่อน inference - ดู roi.py)
+    ROI_ENABLED = False
+    ROI = (0.25, 0.0, 0.75, 1.0)   # (x1, y1, x2, y2) สัดส่วนของเฟรม
+    ROI_ALIGN = 32                  # ขยาย ROI ให้เป็นพหุคูณของ stride -> ไม่ต้อง letterbox
+    ROI_CALIBRATE = False           # เก็บ boxes จากเฟรมเต็มไว้แนะนำ ROI (python roi.py)
+    ROI_CALIBRATION_FILE = "roi_calibration.npy"
+    
     # Servo Settings
     SERVO_REST_POSITION = 90    # ตำแหน่งพัก
     SERVO_SWEEP_POSITION = 45   # ตำแหน่งปัดขวด
     SERVO_RETURN_POSITION = 135 # ตำแหน่งกลับ
     AUTO_SERVO_SWEEP = True     # เปิดใช้การปัดขวดอัตโนมัติ
     SERVO_DELAY = 0.5          # เวลาหน่วงระหว่างการเคลื่อนไหว Servo
+    SERIAL_QUEUE_SIZE = 32     # คำสั่ง Serial ที่รอส่งได้สูงสุด (serial_scheduler.py)
+    SERIAL_PROTOCOL = "text"   # "text" (คำสั่ง ASCII เดิม) หรือ "binary" (serial_protocol.py)
+    
+    # Pipeline Settings (capture / inference / output แยก thread)
+    FRAME_QUEUE_SIZE = 2        # เฟรมที่รอ inference (เกินนี้ทิ้งเฟรมเก่าสุด)
+    OUTPUT_QUEUE_SIZE = 4       # ผลลัพธ์ที่รอส่ง Arduino/Firebase
 
 class ArduinoServoManager:
     """จัดการการเชื่อมต่อกับ Arduino และควบคุม Servo"""
@@ -65,9 +133,12 @@ class ArduinoServoManager:
         self.port = port
         self.baud_rate = baud_rate
         self.arduino = None
+        self.scheduler = None
         self.connected = False
         self.last_send_time = 0
-        self.servo_position = ServoConfig.SERVO_REST_POSITION
+        self.servo_position = ServoConfig.SERVO_REST_POSITION     # มุมล่าสุดที่สั่ง
+        self.confirmed_position = None                            # มุมล่าสุดที่ sketch ตอบกลับ
+        self.codec = create_codec(ServoConfig.SERIAL_PROTOCOL)
         self.connect()
     
     def connect(self):
@@ -79,6 +150,15 @@ class ArduinoServoManager:
                 timeout=ServoConfig.ARDUINO_TIMEOUT
             )
             time.sleep(2)  # รอให้ Arduino reset
+            
+            # คำสั่งทั้งหมดผ่านคิวของ serial thread - detection thread ไม่ต้องรอ servo
+            self.scheduler = SerialCommandScheduler(
+                self.arduino,
+                name="arduino-servo",
+                max_queue_size=ServoConfig.SERIAL_QUEUE_SIZE,
+                on_line=self._on_reply,
+                codec=self.codec
+            )
             self.connected = True
             print(f"✅ Arduino with Servo connected on {self.port}")
             
@@ -94,37 +174,51 @@ class ArduinoServoManager:
             print("   - ตรวจสอบว่า Servo เชื่อมต่อที่ pin 9")
             self.connected = False
     
+    def _on_reply(self, line):
+        """รับข้อความตอบกลับจาก sketch (ทำงานใน serial reader thread)"""
+        if isinstance(line, Frame):
+            if line.is_nack:
+                print(f"⚠️ Arduino rejected command #{line.seq} (error {line.values})")
+            elif line.command in (OP_SERVO, OP_SWEEP) and line.values:
+                self.confirmed_position = line.values[0]
+            return
+        
+        if "Servo moved to:" in line:
+            digits = "".join(ch for ch in line.split(":", 1)[1] if ch.isdigit())
+            if digits:
+                self.confirmed_position = int(digits)
+        elif line.startswith("❌") or line.startswith("❓"):
+            print(f"⚠️ Arduino: {line}")
+    
     def send_signal(self, detected):
-        """ส่งสัญญาณไป Arduino ตามเวลาที่กำหนด"""
+        """ส่งสัญญาณไป Arduino ตามเวลาที่กำหนด (เข้าคิว ไม่ block)"""
         current_time = time.time()
         
         if current_time - self.last_send_time >= ServoConfig.SEND_DELAY:
             if not self.connected:
                 return False
             
-            try:
-                if detected:
-                    self.arduino.write(b"90\n")
-                    print("📡 → Arduino: 90 (Plastic bottle detected)")
-                    
-                    # Auto servo sweep if enabled
-                    if ServoConfig.AUTO_SERVO_SWEEP:
-                        self.perform_bottle_sweep()
-                else:
-                    self.arduino.write(b"0\n")
-                    print("📡 → Arduino: 0 (No plastic bottle detected)")
+            # สัญญาณที่ยังไม่ได้ส่งถูกแทนที่ด้วยค่าล่าสุด และหมดอายุภายใน SEND_DELAY
+            if detected:
+                self.scheduler.submit(self.codec.encode_command("90"), PRIORITY_NORMAL,
+                                      deadline=ServoConfig.SEND_DELAY, coalesce_key="signal")
+                print("📡 → Arduino: 90 (Plastic bottle detected)")
                 
-                self.last_send_time = current_time
-                return True
-                
-            except Exception as e:
-                print(f"❌ Error sending to Arduino: {e}")
-                return False
+                # Auto servo sweep if enabled
+                if ServoConfig.AUTO_SERVO_SWEEP:
+                    self.perform_bottle_sweep()
+            else:
+                self.scheduler.submit(self.codec.encode_command("0"), PRIORITY_LOW,
+                                      deadline=ServoConfig.SEND_DELAY, coalesce_key="signal")
+                print("📡 → Arduino: 0 (No plastic bottle detected)")
+            
+            self.last_send_time = current_time
+            return True
         
         return True  # ยังไม่ถึงเวลาส่ง
     
-    def move_servo_to_angle(self, angle):
-        """เคลื่อนไหว Servo ไปยังมุมที่กำหนด"""
+    def move_servo_to_angle(self, angle, dwell=ServoConfig.SERVO_DELAY, coalesce=True):
+        """สั่ง Servo ไปยังมุมที่กำหนด - serial thread รอ dwell แทนผู้เรียก"""
         if not self.connected:
             return False
         
@@ -132,39 +226,40 @@ class ArduinoServoManager:
             print(f"❌ Invalid servo angle: {angle}. Must be 0-180.")
             return False
         
-        try:
-            command = f"SERVO:{angle}\n"
-            self.arduino.write(command.encode())
-            self.servo_position = angle
-            print(f"🔧 Servo moved to: {angle}°")
-            time.sleep(ServoConfig.SERVO_DELAY)
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error moving servo: {e}")
+        # มุมที่ยังไม่ได้ส่งถูกแทนที่ด้วยมุมล่าสุด (coalesce=False สำหรับลำดับการทดสอบ)
+        queued = self.scheduler.submit(
+            self.codec.encode_command(f"SERVO:{angle}"),
+            PRIORITY_HIGH,
+            coalesce_key="servo" if coalesce else None,
+            dwell=dwell
+        )
+        if not queued:
+            print(f"❌ Serial queue full - servo command {angle}° dropped")
             return False
+        
+        self.servo_position = angle
+        print(f"🔧 Servo → {angle}°")
+        return True
     
     def perform_bottle_sweep(self):
         """ทำการปัดขวดแบบอัตโนมัติ"""
         if not self.connected:
             return False
         
-        try:
-            print("🧹 Performing automatic bottle sweep...")
-            self.arduino.write(b"SWEEP\n")
-            print("✅ Bottle sweep command sent")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Error performing sweep: {e}")
+        print("🧹 Performing automatic bottle sweep...")
+        if not self.scheduler.submit(self.codec.encode_command("SWEEP"), PRIORITY_HIGH,
+                                     dwell=ServoConfig.SERVO_DELAY):
+            print("❌ Serial queue full - sweep command dropped")
             return False
+        print("✅ Bottle sweep command queued")
+        return True
     
     def move_servo_to_rest(self):
         """เคลื่อนไหว Servo ไปยังตำแหน่งพัก"""
         return self.move_servo_to_angle(ServoConfig.SERVO_REST_POSITION)
     
     def test_servo(self):
-        """ทดสอบการทำงานของ Servo"""
+        """ทดสอบการทำงานของ Servo (เข้าคิวทั้งลำดับแล้วคืนทันที)"""
         if not self.connected:
             print("❌ Arduino not connected")
             return False
@@ -173,12 +268,10 @@ class ArduinoServoManager:
         test_angles = [0, 45, 90, 135, 180, 90]  # กลับไปตำแหน่งพัก
         
         for angle in test_angles:
-            if self.move_servo_to_angle(angle):
-                time.sleep(1)
-            else:
+            if not self.move_servo_to_angle(angle, dwell=ServoConfig.SERVO_DELAY + 1.0, coalesce=False):
                 return False
         
-        print("✅ Servo test completed")
+        print("✅ Servo test queued")
         return True
     
     def reset_servo(self):
@@ -191,7 +284,8 @@ class ArduinoServoManager:
         if self.arduino and self.connected:
             # Return servo to rest position before closing
             self.move_servo_to_rest()
-            time.sleep(1)
+            self.scheduler.close(timeout=ServoConfig.SERVO_DELAY + 2.0)
+            self.connected = False
             self.arduino.close()
             print("🔌 Arduino connection closed")
 
@@ -201,48 +295,51 @@ class FirebaseServoManager:
     def __init__(self, base_url=ServoConfig.FIREBASE_URL, user_id=ServoConfig.USER_ID):
         self.base_url = base_url
         self.user_id = user_id
+        # writer ตัวเดียวใช้ร่วมกันทั้ง process - ไม่ block detection path
+        self.writer = get_shared_writer(
+            base_url,
+            spool_path=ServoConfig.FIREBASE_SPOOL_FILE,
+            flush_interval=ServoConfig.FIREBASE_FLUSH_INTERVAL,
+            timeout=ServoConfig.FIREBASE_TIMEOUT
+        )
     
-    def send_data(self, data, path="bottle_servo_data"):
-        """ส่งข้อมูลไป Firebase"""
-        try:
-            url = f"{self.base_url}/{path}/{self.user_id}.json"
-            
-            # เพิ่ม timestamp และข้อมูล servo
-            data_with_timestamp = {
-                **data,
-                "timestamp": datetime.now().isoformat(),
-                "unix_timestamp": int(time.time()),
-                "model_version": "YOLOv11",
-                "has_servo": True
-            }
-            
-            print(f"📡 Sending to Firebase: {url}")
-            print(f"📄 Data: {json.dumps(data_with_timestamp, indent=2)}")
-            
-            response = requests.put(url, json=data_with_timestamp, timeout=10)
-            
-            print(f"📊 Firebase Response Status: {response.status_code}")
-            print(f"📊 Firebase Response: {response.text}")
-            
-            if response.status_code == 200:
-                print(f"✅ Firebase: Data sent successfully to {path}")
-                return True
-            else:
-                print(f"❌ Firebase error: {response.status_code}")
-                print(f"❌ Response text: {response.text}")
-                return False
-                
-        except requests.exceptions.Timeout:
-            print(f"❌ Firebase timeout: Request took longer than 10 seconds")
-            return False
-        except requests.exceptions.ConnectionError:
-            print(f"❌ Firebase connection error: Cannot connect to Firebase")
-            print(f"💡 Check internet connection and Firebase URL")
-            return False
-        except Exception as e:
-            print(f"❌ Firebase unexpected error: {e}")
-            print(f"💡 Error type: {type(e).__name__}")
-            return False
+    def send_data(self, data, path="bottle_servo_data", blocking=False, station_id=None):
+        """
+        ส่งข้อมูลไป Firebase (ค่าเริ่มต้นคือเข้าคิวแล้วส่งใน background)
+        
+        station_id: เขียนลง {path}/{user_id}/{station_id} เพื่อไม่ให้หลาย station ของ user เดียวกันทับกัน
+        """
+        target = f"{path}/{self.user_id}/{station_id}" if station_id else f"{path}/{self.user_id}"
+        
+        # เพิ่ม timestamp และข้อมูล servo
+        data_with_timestamp = {
+            **data,
+            "timestamp": datetime.now().isoformat(),
+            "unix_timestamp": int(time.time()),
+            "model_version": "YOLOv11",
+            "has_servo": True
+        }
+        
+        if not blocking:
+            self.writer.submit(target, data_with_timestamp)
+            print(f"📡 Queued for Firebase: {target}")
+            return True
+        
+        print(f"📡 Sending to Firebase: {self.base_url}/{target}.json")
+        print(f"📄 Data: {json.dumps(data_with_timestamp, indent=2)}")
+        
+        if self.writer.send_now(target, data_with_timestamp):
+            print(f"✅ Firebase: Data sent successfully to {path}")
+            return True
+        
+        print(f"❌ Firebase error: could not write to {path}")
+        print(f"💡 Check internet connection and Firebase URL")
+        return False
+    
+    def close(self):
+        """ส่งข้อมูลที่ค้างอยู่ทั้งหมดก่อนปิดระบบ"""
+        if not self.writer.flush():
+            print(f"⚠️ Firebase offline - pending data kept in {ServoConfig.FIREBASE_SPOOL_FILE}")
     
     def send_servo_data(self, servo_angle, action="servo_move"):
         """ส่งข้อมูล Servo เฉพาะไป Firebase"""
@@ -262,11 +359,45 @@ class YOLOv11ServoDetectionSystem:
         self.total_points = 0
         self.last_detection_time = 0
         self.servo_actions = 0
+        self.state_lock = threading.Lock()  # ตัวนับถูกแก้จาก output thread และ main thread
+        self.pipeline = None
+        
+        # tracker ทำงานใน inference thread (ต้องเห็นทุกเฟรมตามลำดับ)
+        # ขวดที่นับได้จะสะสมใน pending_bottles จน output thread มารับไป จึงไม่หายแม้ output queue ทิ้ง packet
+        self.tracker = create_tracker_from_config(ServoConfig) if ServoConfig.USE_TRACKING else None
+        self.pending_bottles = 0
+        
+        # ข้าม inference ตอนฉากนิ่ง (ทำงานใน inference thread เช่นกัน)
+        self.gate = create_motion_gate_from_config(ServoConfig)
+        
+        # ปรับ imgsz / การข้ามเฟรมของ gate ระหว่างรันให้ได้ FPS เป้าหมาย
+        self.controller = create_adaptive_controller_from_config(ServoConfig, on_change=self._on_adaptive_change)
+        
+        # ครอปเฉพาะช่องใส่ขวด / เก็บ boxes ไว้แนะนำ ROI
+        self.roi = create_roi_from_config(ServoConfig)
+        self.calibrator = create_calibrator_from_config(ServoConfig)
+        
+        # กล่องข้อมูลบนเฟรม (วาดข้อความใหม่เมื่อค่าเปลี่ยนเท่านั้น)
+        self.overlay = InfoOverlay(rect=(10, 10, 500, 180), line_height=20, font_scale=0.45)
         
         # เริ่มต้นระบบย่อย
         self.arduino = ArduinoServoManager()
         self.firebase = FirebaseServoManager()
         
+        # event log ของการนับ: กู้ยอดจาก snapshot + log tail แล้ว sync delta ไป Firebase ใน background
+        self.ledger = create_ledger_from_config(ServoConfig)
+        self.ledger_syncer = None
+        # สถานะของ station นี้เขียนลง bottle_servo_data/{user_id}/{station_id} (ยอดรวมของ user อยู่ที่ count_totals)
+        self.station_id = self.ledger.station_id if self.ledger is not None else \
+            (ServoConfig.LEDGER_STATION_ID or default_station_id())
+        if self.ledger is not None:
+            totals = self.ledger.totals()
+            self.bottle_count, self.total_points, self.servo_actions = (totals[name] for name in COUNTERS)
+            self.ledger_syncer = LedgerSyncer(self.ledger, self.firebase.writer, self.firebase.user_id,
+                                              interval=ServoConfig.LEDGER_SYNC_INTERVAL)
+            print(f"📒 Count ledger: station '{self.station_id}', {self.bottle_count} bottles "
+                  f"recovered (seq {totals['seq']}, {self.ledger.stats['recovery_ms']:.1f} ms)")
+        
         # โหลด YOLOv11 model
         self.load_model()
         
@@ -282,8 +413,12 @@ class YOLOv11ServoDetectionSystem:
                 print("📥 หรือเปลี่ยน MODEL_PATH ใน ServoConfig")
                 sys.exit(1)
             
-            self.model = YOLO(ServoConfig.MODEL_PATH)
-            print(f"✅ YOLOv11 model loaded: {ServoConfig.MODEL_PATH}")
+            self.model, model_info = load_optimized_model_from_config(ServoConfig)
+            self.model_info = model_info
+            print(f"✅ YOLOv11 model loaded: {model_info['path']} ({model_info['format']}"
+                  f"{', cached' if model_info['cache_hit'] else ''}, {model_info['load_seconds']:.1f}s)")
+            if model_info["warmup_ms"]:
+                print(f"🔥 Warmup: {' / '.join(f'{ms:.0f}' for ms in model_info['warmup_ms'])} ms")
             print(f"🎯 Target class ID: {ServoConfig.TARGET_CLASS_ID}")
             print(f"📊 Confidence threshold: {ServoConfig.CONF_THRESHOLD}")
             
@@ -295,36 +430,54 @@ class YOLOv11ServoDetectionSystem:
         """จัดการเมื่อตรวจพบขวด"""
         current_time = time.time()
         
-        # ป้องกันการตรวจจับซ้ำเร็วเกินไป
-        if current_time - self.last_detection_time < ServoConfig.DETECTION_COOLDOWN:
-            return
+        with self.state_lock:
+            # ป้องกันการตรวจจับซ้ำเร็วเกินไป (tracker นับแต่ละขวดครั้งเดียวอยู่แล้ว)
+            if self.tracker is None and current_time - self.last_detection_time < ServoConfig.DETECTION_COOLDOWN:
+                return
+            
+            self.last_detection_time = current_time
+            if self.ledger is not None:
+                # บันทึก event ลง log ก่อน แล้วใช้ยอดรวมจาก ledger
+                totals = self.ledger.append(
+                    bottle_count=count,
+                    total_points=count * ServoConfig.POINTS_PER_BOTTLE,
+                    servo_actions=1 if ServoConfig.AUTO_SERVO_SWEEP else 0
+                )
+                self.bottle_count, self.total_points, self.servo_actions = (totals[name] for name in COUNTERS)
+            else:
+                self.bottle_count += count
+                self.total_points = self.bottle_count * ServoConfig.POINTS_PER_BOTTLE
+                
+                # นับการทำงานของ Servo
+                if ServoConfig.AUTO_SERVO_SWEEP:
+                    self.servo_actions += 1
+            
+            bottle_count = self.bottle_count
+            total_points = self.total_points
+            servo_actions = self.servo_actions
+        
+        if self.ledger_syncer is not None:
+            self.ledger_syncer.notify()
         
         print(f"\n🔍 Bottle Detection Event:")
         print(f"   - Bottles detected: {count}")
-        
-        self.last_detection_time = current_time
-        self.bottle_count += count
-        self.total_points = self.bottle_count * ServoConfig.POINTS_PER_BOTTLE
-        
-        print(f"   - Total count: {self.bottle_count}")
-        print(f"   - Total points: {self.total_points}")
+        print(f"   - Total count: {bottle_count}")
+        print(f"   - Total points: {total_points}")
         
         timestamp = datetime.now().strftime("%H:%M:%S")
-        print(f"🍼 [{timestamp}] Bottles detected: {count}, Total: {self.bottle_count}, Points: {self.total_points}")
+        print(f"🍼 [{timestamp}] Bottles detected: {count}, Total: {bottle_count}, Points: {total_points}")
         
-        # นับการทำงานของ Servo
         if ServoConfig.AUTO_SERVO_SWEEP:
-            self.servo_actions += 1
-            print(f"🧹 Servo sweep #{self.servo_actions} initiated")
+            print(f"🧹 Servo sweep #{servo_actions} initiated")
         
         print(f"\n💾 Preparing to save data to Firebase...")
         
         # ส่งไป Firebase
         data = {
-            "bottle_count": self.bottle_count,
-            "total_points": self.total_points,
+            "bottle_count": bottle_count,
+            "total_points": total_points,
             "last_detection": count,
-            "servo_actions": self.servo_actions,
+            "servo_actions": servo_actions,
             "servo_position": self.arduino.servo_position,
             "auto_sweep_enabled": ServoConfig.AUTO_SERVO_SWEEP,
             "device": "yolo_v11_servo_python",
@@ -332,7 +485,7 @@ class YOLOv11ServoDetectionSystem:
             "model_path": ServoConfig.MODEL_PATH
         }
         
-        success = self.firebase.send_data(data)
+        success = self.firebase.send_data(data, station_id=self.station_id)
         
         if success:
             print(f"✅ Data saved successfully!")
@@ -349,13 +502,16 @@ class YOLOv11ServoDetectionSystem:
         """รีเซ็ตตัวนับ"""
         print(f"\n🔄 Resetting all counters...")
         
-        old_count = self.bottle_count
-        old_points = self.total_points
-        old_actions = self.servo_actions
-        
-        self.bottle_count = 0
-        self.total_points = 0
-        self.servo_actions = 0
+        with self.state_lock:
+            old_count = self.bottle_count
+            old_points = self.total_points
+            old_actions = self.servo_actions
+            
+            if self.ledger is not None:
+                self.ledger.reset()
+            self.bottle_count = 0
+            self.total_points = 0
+            self.servo_actions = 0
         
         print(f"   - Bottle count: {old_count} → 0")
         print(f"   - Total points: {old_points} → 0")
@@ -380,7 +536,7 @@ class YOLOv11ServoDetectionSystem:
             "previous_actions": old_actions
         }
         
-        success = self.firebase.send_data(data)
+        success = self.firebase.send_data(data, station_id=self.station_id)
         
         if success:
             print(f"✅ Reset data saved successfully!")
@@ -389,13 +545,15 @@ class YOLOv11ServoDetectionSystem:
         
         print("🔄 Counter and servo reset completed!")
     
+    def _on_adaptive_change(self, change):
+        """บันทึกการปรับ imgsz / frame-skip (เรียกจาก inference thread)"""
+        print(f"📈 Adaptive: imgsz {change['img_size_from']}->{change['img_size']}, "
+              f"skip {change['skip_from']}->{change['skip']} "
+              f"({change['reason']}, {change['fps']:.1f}/{change['target_fps']:.0f} FPS, "
+              f"p50={change['latency_ms']:.0f}ms)")
+    
     def draw_info(self, frame, detected, confidence=0.0):
         """วาดข้อมูลบนเฟรม"""
-        # พื้นหลังสำหรับข้อความ
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (500, 180), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-        
         # ข้อความสถานะ
         texts = [
             f"YOLOv11 P2P Detection + Servo Control",
@@ -408,18 +566,153 @@ class YOLOv11ServoDetectionSystem:
             f"Auto Sweep: {'ON' if ServoConfig.AUTO_SERVO_SWEEP else 'OFF'}"
         ]
         
-        for i, text in enumerate(texts):
-            y = 25 + (i * 20)
-            color = (0, 255, 0) if i == 0 else (255, 255, 255)
-            if i == 6:  # Servo position
-                color = (0, 255, 255)  # เหลือง
-            cv2.putText(frame, text, (15, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
+        colors = [(0, 255, 0)] + [(255, 255, 255)] * (len(texts) - 1)
+        colors[6] = (0, 255, 255)  # Servo position - เหลือง
         
-        return frame
+        # พื้นหลังโปร่งแสง + ข้อความ เฉพาะในกล่อง (ไม่ copy ทั้งเฟรม)
+        return self.overlay.render(frame, texts, colors)
+    
+    def _infer_frame(self, frame):
+        """Inference stage: รัน YOLOv11 กับเฟรมเดียว (ทำงานใน inference thread)"""
+        img_size = self.controller.img_size if self.controller is not None else ServoConfig.IMG_SIZE
+        source, imgsz = frame, img_size
+        if self.roi is not None:
+            # ภาพเล็กลงและขนาดเป็นพหุคูณของ stride อยู่แล้ว -> ไม่ต้อง resize/letterbox
+            source = self.roi.crop(frame)
+            width, height = self.roi.input_size(frame.shape, img_size)
+            imgsz = [height, width]
+        
+        if self.gate is not None and not self.gate.should_infer(source):
+            return {
+                "result": None,
+                "skipped": True,
+                "detected": False,
+                "bottle_count": 0,
+                "new_bottles": 0,
+                "tracks": [],
+                "max_confidence": 0.0
+            }
+        
+        predict_start = time.perf_counter()
+        r = self.model.predict(
+            source=source,
+            device=ServoConfig.DEVICE,
+            conf=ServoConfig.CONF_THRESHOLD,
+            imgsz=imgsz,
+            verbose=False
+        )[0]
+        
+        if self.controller is not None:
+            backlog = self.pipeline.frame_queue.qsize() if self.pipeline is not None else 0
+            if self.controller.record(time.perf_counter() - predict_start, backlog):
+                self.controller.apply_to_gate(self.gate)
+        
+        # ตรวจสอบว่ามี plastic bottle ปรากฏ
+        boxes = np.zeros((0, 4), dtype=np.float32)
+        confidences = np.zeros((0,), dtype=np.float32)
+        
+        if r.boxes is not None and len(r.boxes):
+            classes = r.boxes.cls.cpu().numpy()
+            scores = r.boxes.conf.cpu().numpy()
+            mask = (classes == ServoConfig.TARGET_CLASS_ID) & (scores >= ServoConfig.CONF_THRESHOLD)
+            boxes = r.boxes.xyxy.cpu().numpy()[mask]
+            confidences = scores[mask]
+        
+        if self.roi is not None:
+            boxes = self.roi.to_frame(boxes, frame.shape)
+        if self.calibrator is not None:
+            self.calibrator.add(boxes, frame.shape)
+        
+        if self.gate is not None:
+            self.gate.notify_detections(len(confidences))
+        
+        new_bottles = 0
+        tracks = []
+        if self.tracker is not None:
+            new_bottles = len(self.tracker.update(boxes, confidences, frame.shape))
+            tracks = self.tracker.snapshot()
+            if new_bottles:
+                with self.state_lock:
+                    self.pending_bottles += new_bottles
+        
+        return {
+            "result": r,
+            "skipped": False,
+            "detected": len(confidences) > 0,
+            "bottle_count": len(confidences),
+            "new_bottles": new_bottles,
+            "tracks": tracks,
+            "max_confidence": float(confidences.max()) if len(confidences) else 0.0
+        }
+    
+    def _handle_output(self, packet):
+        """Output stage: ส่งสัญญาณ Arduino และบันทึก Firebase (ทำงานใน output thread)"""
+        result = packet.result
+        if result["skipped"]:
+            return  # ฉากนิ่ง ไม่มีอะไรเปลี่ยน
+        
+        # ส่งสัญญาณไป Arduino
+        self.arduino.send_signal(result["detected"])
+        
+        # จัดการการตรวจจับ
+        if self.tracker is not None:
+            with self.state_lock:
+                new_bottles = self.pending_bottles
+                self.pending_bottles = 0
+            if new_bottles:
+                self.on_bottle_detected(new_bottles)
+        elif result["detected"]:
+            self.on_bottle_detected(result["bottle_count"])
     
     def run(self):
         """เริ่มการทำงานหลัก"""
         print("🚀 Starting YOLOv11 Servo Detection System...")
+        if ServoConfig.HEADLESS:
+            print("🖥️ Headless mode: no display (Ctrl+C to quit)")
+            print("="*70)
+        
+        try:
+            self.start_pipeline()
+            if ServoConfig.HEADLESS:
+                self.run_headless()
+            else:
+                self.run_display()
+        
+        except KeyboardInterrupt:
+            print("\n🛑 System interrupted by user")
+        
+        except Exception as e:
+            print(f"❌ System error: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        finally:
+            self.cleanup()
+    
+    def start_pipeline(self):
+        """capture / inference / output ทำงานคนละ thread - main thread แสดงผลและรับคีย์บอร์ดเท่านั้น"""
+        self.pipeline = FramePipeline(
+            source=ServoConfig.CAM_ID,
+            infer_fn=self._infer_frame,
+            output_fn=self._handle_output,
+            frame_queue_size=ServoConfig.FRAME_QUEUE_SIZE,
+            output_queue_size=ServoConfig.OUTPUT_QUEUE_SIZE
+        )
+        self.pipeline.start()
+    
+    def run_headless(self):
+        """ไม่มีหน้าต่าง: ไม่วาดกล่อง/ข้อมูล ไม่ imshow/waitKey - แค่รับ packet ทิ้งและพิมพ์สถานะเป็นระยะ"""
+        last_status = time.time()
+        while self.pipeline.running:
+            self.pipeline.get_display_packet(timeout=0.1)
+            
+            interval = ServoConfig.HEADLESS_STATUS_INTERVAL
+            if interval and time.time() - last_status >= interval:
+                last_status = time.time()
+                self.show_status()
+    
+    def run_display(self):
+        """แสดงผลเฟรมพร้อมกล่อง/ข้อมูล และรับคีย์บอร์ด"""
         print("Controls:")
         print("  'ESC' - Quit")
         print("  'r' - Reset counter and servo")
@@ -430,82 +723,58 @@ class YOLOv11ServoDetectionSystem:
         print("  'h' - Move servo to rest position")
         print("="*70)
         
-        try:
-            # ใช้โหมด stream ของ YOLOv11
-            for r in self.model.predict(
-                source=ServoConfig.CAM_ID, 
-                stream=True, 
-                device=ServoConfig.DEVICE,
-                conf=ServoConfig.CONF_THRESHOLD, 
-                imgsz=ServoConfig.IMG_SIZE, 
-                verbose=False
-            ):
-                frame = r.plot()  # วาดกล่องลงเฟรมแล้ว
-                
-                # ตรวจสอบว่ามี plastic bottle ปรากฏ
-                detected = False
-                max_confidence = 0.0
-                bottle_count_in_frame = 0
-                
-                if r.boxes is not None:
-                    for box in r.boxes:
-                        cls_id = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        
-                        if cls_id == ServoConfig.TARGET_CLASS_ID and conf >= ServoConfig.CONF_THRESHOLD:
-                            detected = True
-                            bottle_count_in_frame += 1
-                            max_confidence = max(max_confidence, conf)
-                
-                # ส่งสัญญาณไป Arduino
-                self.arduino.send_signal(detected)
+        while self.pipeline.running:
+            packet = self.pipeline.get_display_packet(timeout=0.1)
+            
+            if packet is not None:
+                display_start = time.perf_counter()
+                result = packet.result
                 
-                # จัดการการตรวจจับ
-                if detected:
-                    self.on_bottle_detected(bottle_count_in_frame)
+                if result["skipped"]:
+                    frame = packet.frame
+                elif self.roi is not None:
+                    # วาดกล่องบนภาพที่ครอปแล้ววางกลับลงเฟรมเต็ม
+                    frame = packet.frame
+                    x1, y1, x2, y2 = self.roi.resolve(frame.shape)
+                    frame[y1:y2, x1:x2] = result["result"].plot()
+                    self.roi.draw(frame)
+                else:
+                    frame = result["result"].plot()  # วาดกล่องลงเฟรมแล้ว
+                if self.tracker is not None:
+                    frame = draw_tracks(frame, self.tracker, result["tracks"])
                 
                 # วาดข้อมูลบนเฟรม
-                frame = self.draw_info(frame, detected, max_confidence)
+                frame = self.draw_info(frame, result["detected"], result["max_confidence"])
                 
                 # แสดงผลภาพ
                 cv2.imshow(ServoConfig.WINDOW_NAME, frame)
-                
-                # จัดการคีย์บอร์ด
-                key = cv2.waitKey(1) & 0xFF
-                if key == 27:  # ESC เพื่อออก
-                    break
-                elif key == ord('r'):
-                    self.reset_counter()
-                elif key == ord('s'):
-                    self.show_status()
-                elif key == ord('t'):
-                    self.arduino.test_servo()
-                elif key == ord('w'):
-                    self.arduino.perform_bottle_sweep()
-                elif key == ord('h'):
-                    self.arduino.move_servo_to_rest()
-                elif key >= ord('1') and key <= ord('9'):
-                    # Preset positions
-                    angle = (key - ord('1')) * 20  # 0, 20, 40, ..., 160
-                    self.arduino.move_servo_to_angle(angle)
-        
-        except KeyboardInterrupt:
-            print("\n🛑 System interrupted by user")
-        
-        except Exception as e:
-            print(f"❌ System error: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        finally:
-            self.cleanup()
+                self.pipeline.record_stage("display", time.perf_counter() - display_start)
+            
+            # จัดการคีย์บอร์ด
+            key = cv2.waitKey(1) & 0xFF
+            if key == 27:  # ESC เพื่อออก
+                break
+            elif key == ord('r'):
+                self.reset_counter()
+            elif key == ord('s'):
+                self.show_status()
+            elif key == ord('t'):
+                self.arduino.test_servo()
+            elif key == ord('w'):
+                self.arduino.perform_bottle_sweep()
+            elif key == ord('h'):
+                self.arduino.move_servo_to_rest()
+            elif key >= ord('1') and key <= ord('9'):
+                # Preset positions
+                angle = (key - ord('1')) * 20  # 0, 20, 40, ..., 160
+                self.arduino.move_servo_to_angle(angle)
     
     def show_status(self):
         """แสดงสถานะระบบ"""
         print("\n" + "="*70)
         print("📊 YOLOv11 SERVO SYSTEM STATUS")
         print("="*70)
-        print(f"🤖 Model: {ServoConfig.MODEL_PATH}")
+        print(f"🤖 Model: {getattr(self, 'model_info', {}).get('path', ServoConfig.MODEL_PATH)}")
         print(f"🎯 Target Class ID: {ServoConfig.TARGET_CLASS_ID}")
         print(f"📊 Confidence Threshold: {ServoConfig.CONF_THRESHOLD}")
         print(f"🍼 Total Bottles: {self.bottle_count}")
@@ -513,21 +782,60 @@ class YOLOv11ServoDetectionSystem:
         print(f"🧹 Servo Actions: {self.servo_actions}")
         print(f"🔧 Servo Position: {self.arduino.servo_position}°")
         print(f"🔄 Auto Sweep: {'Enabled' if ServoConfig.AUTO_SERVO_SWEEP else 'Disabled'}")
+        if self.tracker is not None:
+            print(f"🧭 Tracking: {ServoConfig.COUNT_MODE} mode, {len(self.tracker.tracks)} active track(s), "
+                  f"{self.tracker.total_counted} counted")
         print(f"🔌 Arduino: {'Connected' if self.arduino.connected else 'Disconnected'}")
+        if self.arduino.scheduler is not None:
+            serial_stats = self.arduino.scheduler.get_stats()
+            print(f"📨 Serial queue: {serial_stats['pending']} pending, {serial_stats['written']} written, "
+                  f"{serial_stats['coalesced']} coalesced, {serial_stats['expired']} expired")
         print(f"🔥 Firebase: Ready")
+        if self.ledger is not None:
+            ledger = self.ledger.get_stats()
+            print(f"📒 Ledger: seq {ledger['seq']}, synced {ledger['synced_seq']}, "
+                  f"snapshot {ledger['snapshot_seq']} (station '{ledger['station']}')")
         print(f"📹 Camera ID: {ServoConfig.CAM_ID}")
         print(f"💻 Device: {ServoConfig.DEVICE}")
+        if self.gate is not None:
+            gate = self.gate.get_stats()
+            print(f"💤 Motion gate: {gate['inferred']}/{gate['frames']} frames inferred "
+                  f"({gate['inference_ratio'] * 100:.0f}%), skip={gate['current_skip']}")
+        if self.controller is not None:
+            adaptive = self.controller.get_stats()
+            print(f"📈 Adaptive: imgsz={adaptive['img_size']}, skip={adaptive['skip_frames']}, "
+                  f"{adaptive['achievable_fps']:.1f}/{adaptive['target_fps']:.0f} FPS, "
+                  f"{adaptive['changes']} change(s)")
+        if self.pipeline is not None:
+            self.pipeline.print_stats()
         print("="*70 + "\n")
     
     def cleanup(self):
         """ทำความสะอาดเมื่อปิดระบบ"""
         print("🧹 Cleaning up...")
         
-        cv2.destroyAllWindows()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        
+        if not ServoConfig.HEADLESS:
+            cv2.destroyAllWindows()
+        
+        if getattr(self, 'calibrator', None) is not None:
+            self.calibrator.save()
+            print(f"🎯 Suggested ROI ({len(self.calibrator)} boxes): {self.calibrator.suggest()}")
         
         if hasattr(self, 'arduino'):
             self.arduino.close()
         
+        if getattr(self, 'ledger_syncer', None) is not None:
+            self.ledger_syncer.close()
+        
+        if hasattr(self, 'firebase'):
+            self.firebase.close()
+        
+        if getattr(self, 'ledger', None) is not None:
+            self.ledger.close()
+        
         print("✅ Cleanup completed")
 
 def main():
@@ -557,7 +865,7 @@ def main():
             "bottle_count": 0
         }
         
-        firebase_success = system.firebase.send_data(test_data, "system_test")
+        firebase_success = system.firebase.send_data(test_data, "system_test", blocking=True)
         
         if firebase_success:
             print("✅ Firebase connection successful!")
@@ -11,6 +11,7 @@
   Communication:
   - Serial: 9600 baud
   - Commands: "90" = bottle detected, "0" = no bottle
+  - Binary frames (SOF 0xA5 + seq + opcode + CRC16) เมื่อ SERIAL_PROTOCOL = "binary"
   
   Author: P2P Team
   Version: 3.0 (YOLOv11 Edition)
@@ -110,26 +111,183 @@ void loop() {
 
 // ========================================
 // Serial Communication Functions
+// Binary Serial Protocol (ดู 02_AI_Detection/serial_protocol.py)
+// SOF(0xA5) | SEQ | OPCODE | LEN | PAYLOAD | CRC16 (CCITT-FALSE, big-endian)
+// ไบต์แรกของบรรทัดเป็น 0xA5 = frame, อย่างอื่น = คำสั่ง text เดิม
 // ========================================
+const uint8_t FRAME_SOF = 0xA5;
+const uint8_t FRAME_MAX_PAYLOAD = 32;
+const uint8_t ACK_FLAG = 0x80;
+const uint8_t OP_SIGNAL = 0x01;   // u8 detected
+const uint8_t OP_SERVO = 0x02;    // u8 angle
+const uint8_t OP_SWEEP = 0x03;
+const uint8_t OP_COUNT = 0x04;    // u16 count (little-endian)
+const uint8_t OP_RESET = 0x05;
+const uint8_t OP_STATUS = 0x06;
+const uint8_t OP_BOTTLE = 0x07;
+const uint8_t OP_TEST = 0x08;
+const uint8_t OP_PING = 0x09;
+const uint8_t OP_NACK = 0xFF;
+const uint8_t NACK_BAD_CRC = 1;
+const uint8_t NACK_UNKNOWN_OPCODE = 2;
+const uint8_t NACK_BAD_PAYLOAD = 3;
+
+enum FrameState { WAIT_SOF, READ_SEQ, READ_OPCODE, READ_LEN, READ_PAYLOAD, READ_CRC_HI, READ_CRC_LO };
+FrameState frameState = WAIT_SOF;
+uint8_t frameSeq = 0;
+uint8_t frameOpcode = 0;
+uint8_t frameLen = 0;
+uint8_t frameIndex = 0;
+uint8_t framePayload[FRAME_MAX_PAYLOAD];
+uint16_t frameCrc = 0xFFFF;
+uint16_t frameReceivedCrc = 0;
+
+char textBuffer[40];        // คำสั่ง text (แทน String ที่ต่อทีละตัวอักษร)
+uint8_t textLength = 0;
+
+uint16_t crc16Update(uint16_t crc, uint8_t data) {
+  crc ^= (uint16_t)data << 8;
+  for (uint8_t i = 0; i < 8; i++) {
+    crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+  }
+  return crc;
+}
+
+void sendFrame(uint8_t seq, uint8_t opcode, const uint8_t* payload, uint8_t len) {
+  uint8_t header[3] = {seq, opcode, len};
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 0; i < 3; i++) crc = crc16Update(crc, header[i]);
+  for (uint8_t i = 0; i < len; i++) crc = crc16Update(crc, payload[i]);
+  
+  Serial.write(FRAME_SOF);
+  Serial.write(header, 3);
+  if (len > 0) Serial.write(payload, len);
+  Serial.write((uint8_t)(crc >> 8));
+  Serial.write((uint8_t)(crc & 0xFF));
+}
+
+void sendAckU8(uint8_t seq, uint8_t opcode, uint8_t value) {
+  sendFrame(seq, opcode | ACK_FLAG, &value, 1);
+}
+
+void sendAckU16(uint8_t seq, uint8_t opcode, uint16_t value) {
+  uint8_t payload[2] = {(uint8_t)(value & 0xFF), (uint8_t)(value >> 8)};
+  sendFrame(seq, opcode | ACK_FLAG, payload, 2);
+}
+
+void sendStatusAck(uint8_t seq) {
+  uint8_t payload[4] = {
+    (uint8_t)(bottle_count & 0xFF), (uint8_t)(bottle_count >> 8),
+    (uint8_t)(total_points & 0xFF), (uint8_t)(total_points >> 8)
+  };
+  sendFrame(seq, OP_STATUS | ACK_FLAG, payload, 4);
+}
+
+void sendNack(uint8_t seq, uint8_t error) {
+  sendFrame(seq, OP_NACK, &error, 1);
+}
+
+void readFrameByte(uint8_t c) {
+  switch (frameState) {
+    case WAIT_SOF:
+      frameCrc = 0xFFFF;
+      frameState = READ_SEQ;
+      break;
+    case READ_SEQ:
+      frameSeq = c;
+      frameCrc = crc16Update(frameCrc, c);
+      frameState = READ_OPCODE;
+      break;
+    case READ_OPCODE:
+      frameOpcode = c;
+      frameCrc = crc16Update(frameCrc, c);
+      frameState = READ_LEN;
+      break;
+    case READ_LEN:
+      if (c > FRAME_MAX_PAYLOAD) {
+        frameState = WAIT_SOF;  // header เสีย รอ SOF ถัดไป
+        break;
+      }
+      frameLen = c;
+      frameIndex = 0;
+      frameCrc = crc16Update(frameCrc, c);
+      frameState = (c > 0) ? READ_PAYLOAD : READ_CRC_HI;
+      break;
+    case READ_PAYLOAD:
+      framePayload[frameIndex++] = c;
+      frameCrc = crc16Update(frameCrc, c);
+      if (frameIndex >= frameLen) frameState = READ_CRC_HI;
+      break;
+    case READ_CRC_HI:
+      frameReceivedCrc = (uint16_t)c << 8;
+      frameState = READ_CRC_LO;
+      break;
+    case READ_CRC_LO:
+      frameReceivedCrc |= c;
+      frameState = WAIT_SOF;
+      if (frameReceivedCrc == frameCrc) {
+        processFrame(frameSeq, frameOpcode, framePayload, frameLen);
+      } else {
+        sendNack(frameSeq, NACK_BAD_CRC);
+      }
+      break;
+  }
+}
+
 void checkSerialCommands() {
-  if (Serial.available() > 0) {
-    String command = Serial.readStringUntil('\n');
-    command.trim();
-    
-    if (command == "90") {
-      handleBottleDetected();
-    } else if (command == "0") {
-      handleNoBottle();
-    } else if (command == "reset") {
-      resetCounter();
-    } else if (command == "status") {
-      printDetailedStatus();
-    } else {
-      Serial.println("❓ Unknown command: " + command);
+  // อ่านทุกไบต์ที่รออยู่ในรอบเดียว (ไม่ใช่ทีละตัวต่อ loop)
+  while (Serial.available() > 0) {
+    uint8_t c = Serial.read();
+    if (frameState != WAIT_SOF || (c == FRAME_SOF && textLength == 0)) {
+      readFrameByte(c);
+    } else if (c == '\n') {
+      textBuffer[textLength] = '\0';
+      textLength = 0;
+      String command = String(textBuffer);
+      command.trim();
+      processCommand(command);
+    } else if (textLength < sizeof(textBuffer) - 1) {
+      textBuffer[textLength++] = (char)c;
     }
   }
 }
 
+void processFrame(uint8_t seq, uint8_t opcode, const uint8_t* payload, uint8_t len) {
+  switch (opcode) {
+    case OP_SIGNAL:
+      if (len != 1) { sendNack(seq, NACK_BAD_PAYLOAD); return; }
+      if (payload[0]) handleBottleDetected(); else handleNoBottle();
+      sendAckU16(seq, opcode, bottle_count);
+      break;
+    case OP_RESET:
+      resetCounter();
+      sendAckU16(seq, opcode, bottle_count);
+      break;
+    case OP_STATUS:
+      sendStatusAck(seq);
+      break;
+    case OP_PING:
+      sendFrame(seq, opcode | ACK_FLAG, payload, len);
+      break;
+    default:
+      sendNack(seq, NACK_UNKNOWN_OPCODE);
+  }
+}
+
+void processCommand(String command) {
+  if (command == "90") {
+    handleBottleDetected();
+  } else if (command == "0") {
+    handleNoBottle();
+  } else if (command == "reset") {
+    resetCounter();
+  } else if (command == "status") {
+    printDetailedStatus();
+  } else {
+    Serial.println("❓ Unknown command: " + command);
+  }
+}
+
 void handleBottleDetected() {
   unsigned long current_time = millis();
   
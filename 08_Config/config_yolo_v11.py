@@ -32,6 +32,11 @@ class YOLOv11Config:
     ARDUINO_BAUD_RATE = 9600
     ARDUINO_TIMEOUT = 1
     SEND_DELAY = 1.0  # เวลาระหว่างส่งสัญญาณไป Arduino (วินาที)
+    SERIAL_PROTOCOL = "text"  # "text" (คำสั่ง ASCII เดิม) หรือ "binary" (frame + CRC, ต้องใช้ sketch รุ่นใหม่)
+    
+    # Device discovery (device_discovery.py) - หากล้อง/Arduino พร้อมกัน แล้วจำผลตาม USB ID
+    DEVICE_CACHE_FILE = "config_local.json"
+    DISCOVERY_DEADLINE = 3.0  # เวลาสูงสุดของการหาอุปกรณ์ตอนเปิดเครื่อง (วินาที)
     
     # ========================================
     # YOLOv11 Model Settings
@@ -55,6 +60,14 @@ class YOLOv11Config:
     # 0.70 = แม่นยำปานกลาง, ตรวจจับได้มากขึ้น
     # 0.50 = แม่นยำน้อย, ตรวจจับได้เยอะ
     
+    INFERENCE_BACKEND = "ultralytics"  # backend ที่ใช้ inference (ดู 02_AI_Detection/inference_backends.py)
+    # "ultralytics" = .pt ผ่าน ultralytics.YOLO
+    # "onnxruntime" = .onnx บน CPU (ใส่ MODEL_PATH เป็นไฟล์ .onnx)
+    # "tflite"      = .tflite
+    # "opencv_dnn"  = YOLOv3 .weights ผ่าน cv2.dnn
+    
+    ONNX_NUM_THREADS = 0  # จำนวน thread ของ onnxruntime/tflite (0 = อัตโนมัติ)
+    
     # ========================================
     # Camera Settings
     # ========================================
@@ -92,6 +105,8 @@ class YOLOv11Config:
     WINDOW_NAME = "YOLOv11 P2P Detection (ESC to quit)"
     WINDOW_WIDTH = 1280  # ความกว้างหน้าต่าง (0 = auto)
     WINDOW_HEIGHT = 720  # ความสูงหน้าต่าง (0 = auto)
+    HEADLESS = os.environ.get("P2P_HEADLESS", "0") == "1"  # ไม่วาด/ไม่เปิดหน้าต่าง (รันบนเครื่องไม่มีจอ)
+    HEADLESS_STATUS_INTERVAL = 30.0  # โหมด headless: พิมพ์สถานะทุกกี่วินาที (0 = ไม่พิมพ์)
     
     # UI Colors (BGR format)
     UI_COLOR_PRIMARY = (0, 255, 0)    # เขียว
@@ -119,11 +134,52 @@ class YOLOv11Config:
     
     # Frame processing
     SKIP_FRAMES = 0  # ข้ามเฟรมเพื่อเพิ่มความเร็ว (0 = ไม่ข้าม)
+    
+    # Motion gate: รัน YOLO เฉพาะเมื่อภาพเปลี่ยน (02_AI_Detection/motion_gate.py)
+    # SKIP_FRAMES ด้านบนคืออัตราข้ามเฟรมตอนฉากยุ่ง
+    MOTION_GATE = True
+    MOTION_MAX_SKIP = 5         # ข้ามเฟรมสูงสุดตอนมีการเคลื่อนไหวเล็กน้อย
+    MOTION_MIN_CHANGED = 0.004  # สัดส่วน pixel ที่เปลี่ยนจึงถือว่ามีการเคลื่อนไหว
+    MOTION_HOLD_SECONDS = 1.5   # ตื่นต่ออีกกี่วินาทีหลังการเคลื่อนไหวครั้งสุดท้าย
+    MOTION_IDLE_REFRESH = 5.0   # ตอนฉากนิ่ง ตรวจซ้ำทุกกี่วินาที
+    
+    # Adaptive controller: ปรับ IMG_SIZE / SKIP_FRAMES ระหว่างรันตาม FPS ที่วัดได้ (02_AI_Detection/adaptive_controller.py)
+    ADAPTIVE_ENABLED = False
+    ADAPTIVE_TARGET_FPS = 15                          # FPS เป้าหมาย
+    ADAPTIVE_IMG_SIZES = (320, 384, 416, 480, 544, 640)  # ขั้นของ imgsz (ไม่เกิน IMG_SIZE)
+    ADAPTIVE_MAX_SKIP = 3                             # ข้ามเฟรมได้สูงสุด
+    ADAPTIVE_BACKLOG_LIMIT = 0                        # frame queue ค้างถึงค่านี้ = ลดขั้น (0 = ไม่ใช้)
+    ADAPTIVE_METRICS_FILE = "adaptive_metrics.jsonl"  # บันทึกทุกการเปลี่ยนแปลง
     MAX_FPS = 30     # FPS สูงสุด (0 = ไม่จำกัด)
     
     # Memory management
     CLEAR_CACHE_INTERVAL = 100  # ล้าง cache ทุกกี่เฟรม
     
+    # ========================================
+    # API Detection Service Settings (main.py)
+    # ========================================
+    
+    API_MAX_BATCH_SIZE = 8        # จำนวนภาพสูงสุดต่อ batch
+    API_MAX_BATCH_WAIT_MS = 10    # เวลารอรวม batch นับจาก request แรก (ms)
+    API_MAX_QUEUE_SIZE = 64       # request ที่รอได้สูงสุด (เกินจะตอบ 503)
+    API_MIN_CONFIDENCE = 0.25     # confidence ขั้นต่ำของ model (request กรองสูงกว่านี้ได้)
+    
+    # Result cache: ภาพนิ่งที่อัปโหลดซ้ำ (dHash ใกล้กัน) ตอบจาก cache โดยไม่รัน inference
+    API_RESULT_CACHE = True           # เปิดใช้ result cache
+    API_RESULT_CACHE_SIZE = 256       # จำนวนภาพที่จำได้สูงสุด (LRU)
+    API_RESULT_CACHE_TTL = 30.0       # อายุของผลใน cache (วินาที)
+    API_RESULT_CACHE_MAX_DISTANCE = 6 # Hamming distance สูงสุดที่ยังถือว่าเป็นภาพเดียวกัน (0 = ต้องตรงกันทุก bit)
+    API_RESULT_CACHE_HASH_SIZE = 16   # dHash ขนาด 16x16 = 256 bit
+    
+    # WebSocket stream (/v1/detect/stream): ประมวลผลเฉพาะเฟรมล่าสุดของแต่ละ connection
+    API_STREAM_MAX_FRAME_BYTES = 2_000_000  # ขนาด JPEG สูงสุดต่อเฟรม
+    API_STREAM_COUNT_MODE = "line"          # โหมดนับของ tracker ต่อ connection ("line", "roi" หรือ "track")
+    
+    # Dynamic batching (15_Performance/dynamic_batcher.py): ขนาด batch ตาม latency SLO แทน max_wait คงที่
+    API_DYNAMIC_BATCHING = False            # ใช้ DynamicBatcher ตัวเดียวกับงาน offline (get_shared_batcher) แทน micro-batch loop เดิม
+    API_LATENCY_SLO_MS = 100.0              # SLO ของ lane "live" (request / stream จาก kiosk)
+    API_BACKGROUND_LATENCY_SLO_MS = 2000.0  # SLO ของ lane "background" (งาน offline / re-scoring)
+    
     # ========================================
     # Logging Settings
     # ========================================
@@ -161,38 +217,41 @@ class YOLOv11Config:
     # Auto-detection Settings
     # ========================================
     
+    @classmethod
+    def discover_devices(cls, refresh=False, camera=True, arduino=True):
+        """หากล้องและ Arduino พร้อมกัน (ใช้ผลที่จำไว้ใน DEVICE_CACHE_FILE ก่อน)"""
+        from device_discovery import DeviceDiscovery
+        discovery = DeviceDiscovery(cache_file=cls.DEVICE_CACHE_FILE, deadline=cls.DISCOVERY_DEADLINE,
+                                    baud_rate=cls.ARDUINO_BAUD_RATE)
+        return discovery.discover(refresh=refresh, camera=camera, arduino=arduino)
+    
+    @classmethod
+    def _camera_from(cls, devices):
+        camera = devices.get("camera", {})
+        if camera.get("index") is None:
+            print("❌ No working camera found")
+            return 0
+        print(f"📹 Found working camera at index {camera['index']} ({camera['source']})")
+        return camera["index"]
+    
+    @classmethod
+    def _arduino_port_from(cls, devices):
+        arduino = devices.get("arduino", {})
+        if not arduino.get("port"):
+            print("❌ No COM ports found")
+            return "COM1"
+        print(f"🔌 Found Arduino at {arduino['port']} ({arduino['source']})")
+        return arduino["port"]
+    
     @classmethod
     def auto_detect_camera(cls):
-        """หา camera ID ที่ใช้งานได้อัตโนมัติ"""
-        import cv2
-        for i in range(5):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                ret, _ = cap.read()
-                cap.release()
-                if ret:
-                    print(f"📹 Found working camera at index {i}")
-                    return i
-        print("❌ No working camera found")
-        return 0
+        """หา camera ID ที่ใช้งานได้อัตโนมัติ (เปิดทุก index พร้อมกัน)"""
+        return cls._camera_from(cls.discover_devices(arduino=False))
     
     @classmethod
     def auto_detect_arduino_port(cls):
-        """หา Arduino COM port อัตโนมัติ (Windows)"""
-        import serial.tools.list_ports
-        
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            if 'Arduino' in port.description or 'CH340' in port.description:
-                print(f"🔌 Found Arduino at {port.device}")
-                return port.device
-        
-        if ports:
-            print(f"🔌 Using first available port: {ports[0].device}")
-            return ports[0].device
-        
-        print("❌ No COM ports found")
-        return "COM1"
+        """หา Arduino COM port อัตโนมัติ (ตรวจทุก port พร้อมกัน)"""
+        return cls._arduino_port_from(cls.discover_devices(camera=False))
     
     @classmethod
     def detect_gpu_support(cls):
@@ -221,15 +280,18 @@ class YOLOv11Config:
         """สร้าง config ที่เหมาะสมอัตโนมัติ"""
         config = cls()
         
-        # Auto-detect settings
-        config.CAM_ID = cls.auto_detect_camera()
-        config.ARDUINO_PORT = cls.auto_detect_arduino_port()
+        # Auto-detect settings (กล้องและ Arduino หาพร้อมกันภายใน DISCOVERY_DEADLINE)
+        devices = cls.discover_devices()
+        config.CAM_ID = cls._camera_from(devices)
+        config.ARDUINO_PORT = cls._arduino_port_from(devices)
         config.DEVICE = cls.detect_gpu_support()
         
         # Adjust settings based on device
         if config.DEVICE == "cpu":
-            config.IMG_SIZE = 416  # ลดขนาดสำหรับ CPU
+            config.IMG_SIZE = 416  # ค่าเริ่มต้นสำหรับ CPU
             config.SKIP_FRAMES = 1  # ข้ามเฟรมเพื่อเพิ่มความเร็ว
+            # CPU แต่ละเครื่องเร็วไม่เท่ากัน: เริ่มที่ 416 แล้วให้ปรับเองตาม FPS จริง
+            config.ADAPTIVE_ENABLED = True
         
         return config
 
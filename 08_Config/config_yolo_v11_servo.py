@@ -9,11 +9,12 @@ Version: 3.1 (Servo Edition)
 
 import os
 import json
-import serial.tools.list_ports
 import cv2
 import platform
 from typing import Dict, List, Optional, Tuple
 
+from device_discovery import DeviceDiscovery
+
 class YOLOv11ServoConfig:
     """การตั้งค่าหลักสำหรับระบบ YOLOv11 Servo Detection"""
     
@@ -24,6 +25,7 @@ class YOLOv11ServoConfig:
     ARDUINO_BAUD_RATE = 9600
     ARDUINO_TIMEOUT = 1
     SEND_DELAY = 1.0  # เวลาระหว่างส่งค่าไป Arduino (วินาที)
+    SERIAL_PROTOCOL = "text"  # "text" (คำสั่ง ASCII เดิม) หรือ "binary" (frame + CRC, ต้องใช้ sketch รุ่นใหม่)
     
     # Servo Motor Settings
     SERVO_REST_POSITION = 90      # ตำแหน่งพัก (องศา)
@@ -33,6 +35,10 @@ class YOLOv11ServoConfig:
     AUTO_SERVO_SWEEP = True       # เปิดใช้การปัดขวดอัตโนมัติ
     SERVO_TEST_ANGLES = [0, 45, 90, 135, 180]  # มุมสำหรับทดสอบ
     
+    # Device discovery (device_discovery.py) - หากล้อง/Arduino พร้อมกัน แล้วจำผลตาม USB ID
+    DEVICE_CACHE_FILE = "config_local.json"
+    DISCOVERY_DEADLINE = 3.0      # เวลาสูงสุดของการหาอุปกรณ์ตอนเปิดเครื่อง (วินาที)
+    
     # ========================================
     # YOLOv11 Settings
     # ========================================
@@ -41,6 +47,13 @@ class YOLOv11ServoConfig:
     CONF_THRESHOLD = 0.80         # Confidence ขั้นต่ำ
     IOU_THRESHOLD = 0.45          # IoU threshold สำหรับ NMS
     MAX_DETECTIONS = 300          # จำนวนการตรวจจับสูงสุด
+    INFERENCE_BACKEND = "ultralytics"  # ultralytics / onnxruntime / tflite / opencv_dnn
+    ONNX_NUM_THREADS = 0          # จำนวน thread ของ onnxruntime/tflite (0 = อัตโนมัติ)
+    MODEL_EXPORT_FORMAT = ""      # export .pt ครั้งเดียวแล้วใช้ซ้ำ: "" (ไม่ export) / "onnx" / "openvino"
+    MODEL_EXPORT_INT8 = False     # quantize เป็น INT8 ตอน export
+    MODEL_EXPORT_DATA = None      # dataset yaml สำหรับ calibrate INT8 ของ OpenVINO
+    MODEL_CACHE_DIR = "model_cache"  # เก็บ model ที่ export แล้ว (key = hash ของ weights + IMG_SIZE + DEVICE)
+    MODEL_WARMUP_RUNS = 3         # รัน predict กับเฟรมว่างก่อนเปิดกล้อง (0 = ไม่ warmup)
     
     # ========================================
     # Camera Settings
@@ -54,6 +67,21 @@ class YOLOv11ServoConfig:
     CAM_WIDTH = 1280
     CAM_HEIGHT = 720
     
+    # ROI - ครอปเฉพาะช่องใส่ขวดก่อน inference (02_AI_Detection/roi.py)
+    ROI_ENABLED = False
+    ROI = (0.25, 0.0, 0.75, 1.0)  # (x1, y1, x2, y2) สัดส่วนของเฟรม
+    ROI_ALIGN = 32                # ขยาย ROI ให้เป็นพหุคูณของ stride -> ไม่ต้อง letterbox
+    ROI_CALIBRATE = False         # เก็บ boxes จากเฟรมเต็มไว้แนะนำ ROI (python roi.py)
+    ROI_CALIBRATION_FILE = "roi_calibration.npy"
+    
+    # Adaptive controller - ปรับ IMG_SIZE / การข้ามเฟรมระหว่างรันให้ได้ FPS เป้าหมาย (02_AI_Detection/adaptive_controller.py)
+    ADAPTIVE_ENABLED = False
+    ADAPTIVE_TARGET_FPS = 15      # FPS เป้าหมาย (เฟรมกล้องที่รองรับได้ต่อวินาที)
+    ADAPTIVE_IMG_SIZES = (320, 384, 416, 480, 544, 640)  # ขั้นของ imgsz (ไม่เกิน IMG_SIZE)
+    ADAPTIVE_MAX_SKIP = 3         # ข้ามเฟรมได้สูงสุดเมื่อ imgsz ต่ำสุดแล้วยังไม่ทัน
+    ADAPTIVE_BACKLOG_LIMIT = 0    # frame queue ค้างถึงค่านี้ตลอด window = ลดขั้น (0 = ไม่ใช้)
+    ADAPTIVE_METRICS_FILE = "adaptive_metrics.jsonl"
+    
     # ========================================
     # Firebase Settings
     # ========================================
@@ -66,13 +94,30 @@ class YOLOv11ServoConfig:
     SERVO_DATA_PATH = "servo_data"
     SYSTEM_STATUS_PATH = "system_status"
     
+    # Count Ledger - event log ของการนับใน SQLite + sync แบบ idempotent (02_AI_Detection/count_ledger.py)
+    LEDGER_ENABLED = True         # ยอดไม่หายเมื่อปิดโปรแกรม/crash
+    LEDGER_PATH = "count_ledger.db"
+    LEDGER_STATION_ID = ""        # "" = ชื่อเครื่อง (แต่ละ station ต้องไม่ซ้ำกัน)
+    LEDGER_SNAPSHOT_EVERY = 100   # เขียน snapshot ยอดรวมทุกกี่ event
+    LEDGER_SYNC_INTERVAL = 2.0    # ส่ง event ที่ค้างไป Firebase ทุกกี่วินาที
+    
     # ========================================
     # Performance Settings
     # ========================================
-    DETECTION_COOLDOWN = 2.0      # เวลารอระหว่างการนับขวด (วินาที)
+    DETECTION_COOLDOWN = 2.0      # เวลารอระหว่างการนับขวด (วินาที) - ใช้เมื่อปิด tracking
     POINTS_PER_BOTTLE = 10        # คะแนนต่อขวด
     MAX_BOTTLE_COUNT = 9999       # จำนวนขวดสูงสุด
     
+    # Tracking Settings (02_AI_Detection/bottle_tracker.py)
+    USE_TRACKING = True           # นับขวดแต่ละใบครั้งเดียวแทนการใช้ cooldown
+    COUNT_MODE = "line"           # "line", "roi" หรือ "track"
+    COUNT_LINE = ((0.5, 0.0), (0.5, 1.0))  # เส้นนับ (สัดส่วนของเฟรม)
+    COUNT_ROI = (0.25, 0.25, 0.75, 0.75)   # พื้นที่นับสำหรับ COUNT_MODE = "roi"
+    COUNT_DIRECTION = None        # ทิศที่นับ เช่น (1, 0) = ซ้ายไปขวา, None = ทั้งสองทิศ
+    TRACK_IOU_THRESHOLD = 0.3
+    TRACK_MAX_MISSED = 10         # เฟรมที่หายไปได้ก่อนลบ track
+    TRACK_MIN_HITS = 2            # เฟรมที่ต้องเห็นก่อนนับ
+    
     # Threading Settings
     USE_THREADING = True          # ใช้ threading สำหรับ Firebase
     THREAD_TIMEOUT = 5.0          # Timeout สำหรับ threads
@@ -83,6 +128,8 @@ class YOLOv11ServoConfig:
     WINDOW_NAME = "YOLOv11 P2P Detection with Servo Control (ESC to quit)"
     WINDOW_WIDTH = 1280
     WINDOW_HEIGHT = 720
+    HEADLESS = os.environ.get("P2P_HEADLESS", "0") == "1"  # ไม่วาด/ไม่เปิดหน้าต่าง (รันบนเครื่องไม่มีจอ)
+    HEADLESS_STATUS_INTERVAL = 30.0  # โหมด headless: พิมพ์สถานะทุกกี่วินาที (0 = ไม่พิมพ์)
     
     # Colors (BGR format)
     COLOR_GREEN = (0, 255, 0)
@@ -121,43 +168,27 @@ class YOLOv11ServoConfig:
     MONITOR_INTERVAL = 30.0       # ช่วงเวลาการติดตาม (วินาที)
     
     @classmethod
-    def auto_detect_camera(cls) -> int:
-        """ตรวจหา Camera ID ที่ใช้งานได้"""
-        print("🔍 Auto-detecting camera...")
-        
-        for cam_id in range(5):  # ทดสอบ camera 0-4
-            try:
-                cap = cv2.VideoCapture(cam_id)
-                if cap.isOpened():
-                    ret, frame = cap.read()
-                    if ret and frame is not None:
-                        print(f"✅ Camera found at ID: {cam_id}")
-                        cap.release()
-                        return cam_id
-                cap.release()
-            except Exception as e:
-                continue
-        
-        print("❌ No camera detected, using default ID: 0")
-        return 0
+    def discover_devices(cls, refresh: bool = False, camera: bool = True, arduino: bool = True) -> Dict:
+        """หากล้องและ Arduino พร้อมกัน (ใช้ผลที่จำไว้ใน DEVICE_CACHE_FILE ก่อน)"""
+        discovery = DeviceDiscovery(cache_file=cls.DEVICE_CACHE_FILE, deadline=cls.DISCOVERY_DEADLINE,
+                                    baud_rate=cls.ARDUINO_BAUD_RATE)
+        return discovery.discover(refresh=refresh, camera=camera, arduino=arduino)
     
     @classmethod
-    def auto_detect_arduino_port(cls) -> str:
-        """ตรวจหา Arduino port อัตโนมัติ"""
-        print("🔍 Auto-detecting Arduino port...")
-        
-        ports = serial.tools.list_ports.comports()
-        arduino_ports = []
-        
-        for port in ports:
-            # ค้นหา Arduino ตาม description
-            if any(keyword in port.description.lower() for keyword in 
-                   ['arduino', 'ch340', 'cp210', 'ftdi', 'usb serial']):
-                arduino_ports.append(port.device)
-                print(f"✅ Potential Arduino port: {port.device} - {port.description}")
-        
-        if arduino_ports:
-            return arduino_ports[0]  # ใช้พอร์ตแรกที่เจอ
+    def _camera_from(cls, devices: Dict) -> int:
+        camera = devices.get("camera", {})
+        if camera.get("index") is None:
+            print("❌ No camera detected, using default ID: 0")
+            return 0
+        print(f"✅ Camera found at ID: {camera['index']} ({camera['source']})")
+        return camera["index"]
+    
+    @classmethod
+    def _arduino_port_from(cls, devices: Dict) -> str:
+        arduino = devices.get("arduino", {})
+        if arduino.get("port"):
+            print(f"✅ Arduino port: {arduino['port']} ({arduino['source']})")
+            return arduino["port"]
         
         # ถ้าไม่เจอ ใช้ default ตาม OS
         if platform.system() == "Windows":
@@ -168,6 +199,18 @@ class YOLOv11ServoConfig:
         print(f"❌ No Arduino detected, using default: {default_port}")
         return default_port
     
+    @classmethod
+    def auto_detect_camera(cls) -> int:
+        """ตรวจหา Camera ID ที่ใช้งานได้ (เปิดกล้อง 0-4 พร้อมกัน)"""
+        print("🔍 Auto-detecting camera...")
+        return cls._camera_from(cls.discover_devices(arduino=False))
+    
+    @classmethod
+    def auto_detect_arduino_port(cls) -> str:
+        """ตรวจหา Arduino port อัตโนมัติ (ตรวจทุก port พร้อมกัน)"""
+        print("🔍 Auto-detecting Arduino port...")
+        return cls._arduino_port_from(cls.discover_devices(camera=False))
+    
     @classmethod
     def detect_gpu_support(cls) -> str:
         """ตรวจสอบการรองรับ GPU"""
@@ -188,9 +231,11 @@ class YOLOv11ServoConfig:
         """สร้าง config ที่เหมาะสมกับระบบ"""
         config = cls()
         
-        # Auto-detect settings
-        config.CAM_ID = cls.auto_detect_camera()
-        config.ARDUINO_PORT = cls.auto_detect_arduino_port()
+        # Auto-detect settings (กล้องและ Arduino หาพร้อมกันภายใน DISCOVERY_DEADLINE)
+        print("🔍 Auto-detecting camera and Arduino...")
+        devices = cls.discover_devices()
+        config.CAM_ID = cls._camera_from(devices)
+        config.ARDUINO_PORT = cls._arduino_port_from(devices)
         config.DEVICE = cls.detect_gpu_support()
         
         # Optimize based on device
@@ -202,6 +247,8 @@ class YOLOv11ServoConfig:
             config.IMG_SIZE = 416  # เล็กลงสำหรับ CPU
             config.FPS_TARGET = 15
             config.ENABLE_HALF_PRECISION = False
+            config.ADAPTIVE_ENABLED = True  # ปรับต่อระหว่างรันตาม FPS จริงของเครื่อง
+            config.ADAPTIVE_TARGET_FPS = config.FPS_TARGET
         
         return config
     
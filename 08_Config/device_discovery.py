@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Device Discovery
+หากล้องและ Arduino แบบขนานภายในเวลาที่กำหนด แล้วจำผลไว้ใน config_local.json
+- เปิดกล้องทุก index พร้อมกัน (แทนการเปิดทีละตัวแล้วรอ timeout ของแต่ละตัว)
+- ตรวจ serial port ทุกตัวที่น่าจะเป็น Arduino พร้อมกัน โดยเปิดแบบไม่ดึง DTR
+  (บอร์ดไม่ reset จึงไม่ต้องรอ 2 วินาที)
+- จำอุปกรณ์ตาม USB VID:PID:serial - เปิดเครื่องครั้งถัดไปตรวจเฉพาะตัวที่จำไว้
+  และค้นหาใหม่เมื่อตัวที่จำไว้ใช้ไม่ได้เท่านั้น (port เปลี่ยนชื่อก็ยังหาเจอจาก USB ID)
+
+การใช้งาน:
+    python device_discovery.py            # ใช้ cache
+    python device_discovery.py --refresh  # ค้นหาใหม่ทั้งหมด
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+CACHE_FILE = "config_local.json"
+CACHE_KEY = "devices"
+
+# คำใน description และ USB vendor ID ของบอร์ด Arduino / ชิป USB-serial ที่ใช้บ่อย
+ARDUINO_KEYWORDS = ("arduino", "ch340", "cp210", "ftdi", "usb serial")
+ARDUINO_VIDS = (0x2341, 0x2A03, 0x1A86, 0x10C4, 0x0403)
+
+
+# ========================================
+# USB identity
+# ========================================
+
+def port_usb_id(port) -> Optional[str]:
+    """USB ID ของ serial port เช่น "2341:0043:75833353035351F0" (None ถ้าไม่ใช่ USB)"""
+    if getattr(port, "vid", None) is None:
+        return None
+    usb_id = f"{port.vid:04X}:{port.pid:04X}"
+    if getattr(port, "serial_number", None):
+        usb_id += f":{port.serial_number}"
+    return usb_id
+
+
+def camera_usb_id(index: int) -> Optional[str]:
+    """USB VID:PID ของกล้อง (Linux อ่านจาก sysfs, ระบบอื่นคืน None)"""
+    device = f"/sys/class/video4linux/video{index}/device"
+    for parent in (device, os.path.join(device, "..")):
+        try:
+            with open(os.path.join(parent, "idVendor")) as f:
+                vid = f.read().strip()
+            with open(os.path.join(parent, "idProduct")) as f:
+                pid = f.read().strip()
+        except OSError:
+            continue
+        usb_id = f"{vid}:{pid}".upper()
+        serial_file = os.path.join(parent, "serial")
+        if os.path.exists(serial_file):
+            with open(serial_file) as f:
+                usb_id += f":{f.read().strip()}"
+        return usb_id
+    return None
+
+
+def is_arduino_candidate(port) -> bool:
+    description = (getattr(port, "description", "") or "").lower()
+    return getattr(port, "vid", None) in ARDUINO_VIDS or any(word in description for word in ARDUINO_KEYWORDS)
+
+
+def list_serial_ports() -> List:
+    import serial.tools.list_ports
+    return list(serial.tools.list_ports.comports())
+
+
+# ========================================
+# Probes (แต่ละตัวทำงานใน thread ของตัวเอง)
+# ========================================
+
+def open_camera(index: int, timeout_ms: int = 2000):
+    """เปิดกล้องพร้อม open timeout (backend ที่รองรับ)"""
+    import cv2
+    if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+        return cv2.VideoCapture(index, cv2.CAP_ANY, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms])
+    return cv2.VideoCapture(index)
+
+
+def probe_camera(index: int, opener: Callable = open_camera) -> bool:
+    """เปิดกล้องแล้วอ่านได้ 1 เฟรม = ใช้งานได้"""
+    cap = opener(index)
+    try:
+        if not cap.isOpened():
+            return False
+        ret, frame = cap.read()
+        return bool(ret) and frame is not None
+    except Exception:
+        return False
+    finally:
+        cap.release()
+
+
+def probe_serial_port(device: str, baud_rate: int = 9600) -> bool:
+    """เปิด port โดยไม่ดึง DTR (Arduino ไม่ reset) - เปิดได้ = ไม่มีโปรแกรมอื่นจับอยู่"""
+    import serial
+    port = serial.Serial()
+    port.port = device
+    port.baudrate = baud_rate
+    port.dtr = False
+    try:
+        port.open()
+        return True
+    except Exception:
+        return False
+    finally:
+        if port.is_open:
+            port.close()
+
+
+def _first_in_order(executor, candidates: List, probe: Callable, deadline: float):
+    """
+    รัน probe ทุกตัวพร้อมกัน คืนตัวแรกตามลำดับของ candidates ที่ผ่าน
+    (คืนทันทีเมื่อตัวที่มาก่อนทุกตัวตอบแล้ว ไม่ต้องรอตัวที่ช้า) หรือ None เมื่อหมดเวลา
+    """
+    futures = {executor.submit(probe, candidate): i for i, candidate in enumerate(candidates)}
+    try:
+        return _wait_first_in_order(futures, candidates, deadline)
+    finally:
+        # probe ที่ยังไม่เริ่มไม่ต้องรัน (cancel_futures ของ shutdown() ไม่มีใน Python 3.8)
+        for future in futures:
+            future.cancel()
+
+
+def _wait_first_in_order(futures: Dict, candidates: List, deadline: float):
+    results = [None] * len(candidates)
+    pending = set(futures)
+    end = time.monotonic() + deadline
+
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break  # หมดเวลา
+        for future in done:
+            results[futures[future]] = bool(future.exception() is None and future.result())
+        for i, ok in enumerate(results):
+            if ok is None:
+                break  # ตัวที่มาก่อนยังไม่ตอบ
+            if ok:
+                return candidates[i]
+    for i, ok in enumerate(results):
+        if ok:
+            return candidates[i]
+    return None
+
+
+# ========================================
+# Cache
+# ========================================
+
+def load_device_cache(cache_file: str = CACHE_FILE) -> Dict:
+    """อ่านส่วน "devices" ของ config_local.json"""
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f).get(CACHE_KEY, {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Cannot read device cache {cache_file}: {e}")
+        return {}
+
+
+def save_device_cache(devices: Dict, cache_file: str = CACHE_FILE) -> bool:
+    """เขียนส่วน "devices" โดยคงค่าอื่นใน config_local.json ไว้"""
+    data = {}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    data[CACHE_KEY] = devices
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return True
+    except OSError as e:
+        print(f"⚠️ Cannot write device cache {cache_file}: {e}")
+        return False
+
+
+# ========================================
+# Discovery
+# ========================================
+
+class DeviceDiscovery:
+    """หากล้อง/Arduino แบบขนาน ใช้ผลที่จำไว้ก่อน แล้วค้นหาใหม่เฉพาะอุปกรณ์ที่ใช้ไม่ได้"""
+
+    def __init__(self, cache_file: str = CACHE_FILE, camera_indices: Iterable[int] = range(5),
+                 deadline: float = 3.0, baud_rate: int = 9600, camera_prober: Callable = probe_camera,
+                 serial_prober: Callable = probe_serial_port, port_lister: Callable = list_serial_ports,
+                 camera_id_reader: Callable = camera_usb_id):
+        self.cache_file = cache_file
+        self.camera_indices = list(camera_indices)
+        self.deadline = deadline
+        self.baud_rate = baud_rate
+        self.camera_prober = camera_prober
+        self.serial_prober = serial_prober
+        self.port_lister = port_lister
+        self.camera_id_reader = camera_id_reader
+
+    # ---------- camera ----------
+
+    def _camera_candidates(self, cached: Dict) -> List[int]:
+        """index ที่จำไว้ (หรือ index ปัจจุบันของ USB ID ที่จำไว้) มาก่อน"""
+        preferred = []
+        usb_id = cached.get("usb_id")
+        if usb_id:
+            preferred += [i for i in self.camera_indices if self.camera_id_reader(i) == usb_id]
+        if cached.get("index") is not None:
+            preferred.append(cached["index"])
+        return list(dict.fromkeys(preferred))
+
+    def find_camera(self, executor, cached: Dict, deadline: float) -> Dict:
+        start = time.monotonic()
+        for index in self._camera_candidates(cached):
+            if self.camera_prober(index):
+                return {**cached, "index": index, "source": "cache"}
+        remaining = max(0.0, deadline - (time.monotonic() - start))
+        index = _first_in_order(executor, self.camera_indices, self.camera_prober, remaining)
+        if index is None:
+            return {"index": None, "source": "none"}
+        return {"index": index, "usb_id": self.camera_id_reader(index), "source": "probe"}
+
+    # ---------- arduino ----------
+
+    def find_arduino(self, executor, cached: Dict, deadline: float) -> Dict:
+        start = time.monotonic()
+        ports = self.port_lister()
+        probe = lambda port: self.serial_prober(port.device, self.baud_rate)
+
+        usb_id = cached.get("usb_id")
+        preferred = [port for port in ports if usb_id and port_usb_id(port) == usb_id]
+        preferred += [port for port in ports if port.device == cached.get("port") and port not in preferred]
+        for port in preferred:
+            if probe(port):
+                return {"port": port.device, "usb_id": port_usb_id(port), "source": "cache"}
+
+        # ไม่มี port ไหนดูเหมือน Arduino -> ลองทุก port (เหมือน auto_detect เดิมที่ใช้ port แรก)
+        candidates = [port for port in ports if is_arduino_candidate(port)] or ports
+        remaining = max(0.0, deadline - (time.monotonic() - start))
+        port = _first_in_order(executor, candidates, probe, remaining) if candidates else None
+        if port is None:
+            return {"port": None, "source": "none"}
+        return {"port": port.device, "usb_id": port_usb_id(port), "description": port.description,
+                "source": "probe"}
+
+    # ---------- both ----------
+
+    def discover(self, refresh: bool = False, camera: bool = True, arduino: bool = True) -> Dict:
+        """
+        หาอุปกรณ์ทั้งหมดพร้อมกันภายใน deadline แล้วบันทึก cache ถ้าผลเปลี่ยน
+        คืน {"camera": {...}, "arduino": {...}, "seconds": ...}
+        """
+        start = time.monotonic()
+        cache = {} if refresh else load_device_cache(self.cache_file)
+        workers = len(self.camera_indices) + 8
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="discovery")
+        jobs = {}
+        try:
+            if camera:
+                jobs["camera"] = executor.submit(self.find_camera, executor, cache.get("camera", {}), self.deadline)
+            if arduino:
+                jobs["arduino"] = executor.submit(self.find_arduino, executor, cache.get("arduino", {}), self.deadline)
+            result = {}
+            for name, job in jobs.items():
+                try:
+                    result[name] = job.result(timeout=max(0.0, self.deadline - (time.monotonic() - start)) + 0.5)
+                except Exception as e:
+                    print(f"⚠️ {name} discovery failed: {e}")
+                    result[name] = {"source": "none"}
+        finally:
+            # probe ที่ค้าง (เช่น driver กล้องไม่ตอบ) ไม่ต้องรอ - งานที่ยังไม่เริ่มถูก cancel ไปแล้ว
+            for job in jobs.values():
+                job.cancel()
+            executor.shutdown(wait=False)
+
+        updated = dict(cache)
+        for name, found in result.items():
+            if found.get("source") == "probe":
+                entry = {key: value for key, value in found.items() if key != "source"}
+                updated[name] = {**entry, "verified": datetime.now().isoformat(timespec="seconds")}
+        if updated != cache:
+            save_device_cache(updated, self.cache_file)
+
+        result["seconds"] = time.monotonic() - start
+        return result
+
+
+def discover_devices(cache_file: str = CACHE_FILE, refresh: bool = False, **kwargs) -> Dict:
+    """ทางลัดสำหรับ config: หาอุปกรณ์ด้วย DeviceDiscovery แล้วพิมพ์ผล"""
+    result = DeviceDiscovery(cache_file=cache_file, **kwargs).discover(refresh=refresh)
+    camera, arduino = result.get("camera", {}), result.get("arduino", {})
+    if camera.get("index") is not None:
+        print(f"📹 Camera at index {camera['index']} ({camera['source']})")
+    else:
+        print("❌ No working camera found")
+    if arduino.get("port"):
+        print(f"🔌 Arduino at {arduino['port']} ({arduino['source']})")
+    else:
+        print("❌ No Arduino port found")
+    print(f"⏱️ Device discovery: {result['seconds']:.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover camera and Arduino in parallel")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--refresh", action="store_true", help="ไม่ใช้ผลที่จำไว้")
+    parser.add_argument("--deadline", type=float, default=3.0, help="เวลาสูงสุดของการค้นหา (วินาที)")
+    args = parser.parse_args()
+    discover_devices(args.cache, refresh=args.refresh, deadline=args.deadline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+Replay Benchmark
+วัดประสิทธิภาพ detection loop ด้วยวิดีโอ/โฟลเดอร์ภาพที่อัดไว้ (ไม่ต้องมีกล้องหรือ Arduino)
+- ป้อนเฟรมผ่าน code path เดิมของ YOLOv11DetectionSystem (v11) และ BottleDetectionSystem (bridge)
+  โดยแทน cv2.VideoCapture ด้วย ReplaySource
+- Arduino จำลองผ่าน pty (serial_protocol.LoopbackDevice) นับคำสั่งที่ส่งมา
+- Firebase REST API จำลองด้วย HTTP server ในเครื่อง นับจำนวน request
+- รายงาน FPS, latency แต่ละ stage (p50/p95/p99), ความแม่นยำการนับเทียบ ground truth
+  และจำนวน network call ต่อขวด แล้วบันทึกเป็น JSON เพื่อเทียบกับ baseline
+
+speed=1.0 (ค่าเริ่มต้น) เล่นตาม FPS ของวิดีโอและข้ามเฟรมที่ประมวลผลไม่ทันเหมือนกล้องจริง
+(cooldown / SEND_DELAY ขึ้นกับเวลาจริง จึงนับได้ตรงกับหน้างาน) ส่วน speed=0 ป้อนทุกเฟรมเร็วที่สุด
+
+การใช้งาน:
+    python replay_benchmark.py --system v11 --source clips/line1.mp4 --truth 12 --output results/line1.json
+    python replay_benchmark.py --system bridge --source frames/ --speed 0 --baseline results/base.json
+
+ground truth: --truth N หรือไฟล์ JSON {"bottles": N} ข้างวิดีโอ (clip.mp4 -> clip.json)
+หรือ truth.json ในโฟลเดอร์ภาพ
+
+Author: P2P Team
+Version: 1.0
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cv2
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from frame_pipeline import StageStats
+from serial_protocol import LoopbackDevice
+
+SYSTEMS = {
+    "v11": "yolo_v11_arduino_firebase",
+    "bridge": "yolo_arduino_firebase_bridge",
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STATS_WINDOW = 100000  # เก็บทุก sample ของการรัน เพื่อให้ percentile ครอบคลุมทั้งคลิป
+
+
+# ----------------------------------------
+# Frame source
+# ----------------------------------------
+
+class ReplaySource:
+    """
+    ใช้แทน cv2.VideoCapture: อ่านเฟรมจากไฟล์วิดีโอหรือโฟลเดอร์ภาพ (เรียงตามชื่อไฟล์)
+    speed > 0 จะปล่อยเฟรมตามเวลาของวิดีโอและข้ามเฟรมที่เลยเวลาไปแล้ว (เหมือนกล้องจริง)
+    """
+
+    def __init__(self, path, fps=None, speed=0.0, max_frames=None, video_capture=None):
+        self.path = str(path)
+        self.speed = speed
+        self.max_frames = max_frames
+        self.images = None
+        self.cap = None
+
+        if os.path.isdir(self.path):
+            self.images = sorted(
+                os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.fps = fps or 30.0
+            self.total_frames = len(self.images)
+        else:
+            self.cap = (video_capture or cv2.VideoCapture)(self.path)
+            self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self.position = 0       # index ของเฟรมถัดไปในไฟล์
+        self.frames_read = 0    # เฟรมที่ส่งให้ detection loop
+        self.dropped = 0        # เฟรมที่ข้ามเพราะ loop ช้ากว่าวิดีโอ
+        self.loop_stats = StageStats("loop", window=STATS_WINDOW)
+        self._start = None
+        self._last_read = None
+
+    def isOpened(self):
+        if self.images is not None:
+            return bool(self.images)
+        return self.cap.isOpened()
+
+    def _next_raw(self):
+        if self.images is not None:
+            if self.position >= len(self.images):
+                return None
+            frame = cv2.imread(self.images[self.position])
+        else:
+            ret, frame = self.cap.read()
+            if not ret:
+                return None
+        self.position += 1
+        return frame
+
+    def _skip_raw(self):
+        if self.images is not None:
+            if self.position >= len(self.images):
+                return False
+        elif not self.cap.grab():
+            return False
+        self.position += 1
+        self.dropped += 1
+        return True
+
+    def read(self):
+        now = time.perf_counter()
+        if self._last_read is not None:
+            self.loop_stats.record(now - self._last_read)  # เวลาต่อรอบของ detection loop
+        if self.max_frames and self.frames_read >= self.max_frames:
+            return False, None
+
+        if self.speed > 0:
+            if self._start is None:
+                self._start = now
+            rate = self.fps * self.speed
+            due = int((now - self._start) * rate)
+            while self.position < due:
+                if not self._skip_raw():
+                    return False, None
+            wait = self._start + self.position / rate - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+        frame = self._next_raw()
+        if frame is None:
+            return False, None
+        self.frames_read += 1
+        self._last_read = time.perf_counter()
+        return True, frame
+
+    def set(self, prop, value):
+        return False  # ขนาดเฟรมกำหนดโดยไฟล์ที่อัดไว้
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.total_frames
+        return self.cap.get(prop) if self.cap is not None else 0.0
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+# ----------------------------------------
+# Simulated Arduino / Firebase
+# ----------------------------------------
+
+class ReplayArduino(LoopbackDevice):
+    """Arduino จำลองบน pty ที่นับคำสั่งที่ได้รับ (reply=False ไม่ตอบกลับ สำหรับ loop ที่ไม่อ่าน serial)"""
+
+    def __init__(self, protocol="text", reply=True):
+        import tty
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        super().__init__(self.master, protocol=protocol)
+        self.port = os.ttyname(self.slave)
+        self.reply = reply
+        self.commands = Counter()
+
+    def _reply_binary(self, frame):
+        self.commands[f"0x{frame.opcode:02X}"] += 1
+        reply = super()._reply_binary(frame)
+        return reply if self.reply else b""
+
+    def _reply_text(self, line):
+        self.commands[line.split(":")[0]] += 1
+        reply = super()._reply_text(line)
+        return reply if self.reply else b""
+
+    def close(self):
+        self.stop()
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.record(self.command, self.path, len(body))
+        reply = body if self.command in ("PUT", "PATCH", "POST") and body else b"null"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    do_GET = do_PUT = do_PATCH = do_POST = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FirebaseStub(ThreadingHTTPServer):
+    """HTTP server ในเครื่องที่ตอบเหมือน Firebase REST API และนับทุก request"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _StubHandler)
+        self.requests = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, name="firebase-stub", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def record(self, method, path, size):
+        with self._lock:
+            self.requests.append({"method": method, "path": path, "bytes": size, "time": time.time()})
+
+    def summary(self):
+        with self._lock:
+            requests = list(self.requests)
+        return {
+            "requests": len(requests),
+            "by_method": dict(Counter(request["method"] for request in requests)),
+            "bytes": sum(request["bytes"] for request in requests),
+        }
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+# ----------------------------------------
+# Stage timing
+# ----------------------------------------
+
+def instrument(obj, method_name, stats):
+    """ห่อ method ของ instance ให้บันทึกเวลาลง StageStats (predict แบบ stream จับเวลาทีละผลลัพธ์)"""
+    original = getattr(obj, method_name)
+
+    def timed_stream(generator):
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            stats.record(time.perf_counter() - start)
+            yield item
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = original(*args, **kwargs)
+        except Exception:
+            stats.record_error()
+            raise
+        if kwargs.get("stream"):
+            return timed_stream(result)
+        stats.record(time.perf_counter() - start)
+        return result
+
+    setattr(obj, method_name, wrapper)
+    return stats
+
+
+def instrument_system(kind, system):
+    """ติดตั้งตัวจับเวลาให้ stage หลักของแต่ละระบบ - คืน dict ของ StageStats"""
+    stages = {}
+
+    def add(name, obj, method_name):
+        if obj is None:
+            return
+        if name not in stages:
+            stages[name] = StageStats(name, window=STATS_WINDOW)
+        instrument(obj, method_name, stages[name])
+
+    if kind == "v11":
+        add("inference", system.model, "predict")
+        add("post", system, "handle_result")
+        add("draw", system, "draw_info")
+        for channel in system.channels:
+            add("gate", channel.gate, "should_infer")
+            add("serial", channel.arduino, "send_signal")
+            add("count", channel, "on_bottle_detected")
+    else:
+        add("inference", system.yolo, "detect")
+        add("tracking", system.tracker, "update")
+        add("count", system, "on_bottle_detected")
+        add("serial", system.arduino, "read_response")
+        add("draw", system, "draw_info")
+    return stages
+
+
+# ----------------------------------------
+# Results
+# ----------------------------------------
+
+def load_ground_truth(source, truth=None):
+    """จำนวนขวดที่ถูกต้องของคลิป: ค่าที่ส่งมา > clip.json ข้างวิดีโอ > truth.json ในโฟลเดอร์"""
+    if truth is not None:
+        return int(truth)
+    source = Path(source)
+    sidecar = source / "truth.json" if source.is_dir() else source.with_suffix(".json")
+    if not sidecar.exists():
+        return None
+    with open(sidecar, "r", encoding="utf-8") as f:
+        return int(json.load(f)["bottles"])
+
+
+def counting_accuracy(counted, truth):
+    """1 - |นับได้ - จริง| / จริง (ไม่ต่ำกว่า 0) หรือ None ถ้าไม่มี ground truth"""
+    if truth is None:
+        return None
+    return max(0.0, 1.0 - abs(counted - truth) / max(truth, 1))
+
+
+def per_bottle(value, bottles):
+    return value / bottles if bottles else None
+
+
+def summarize(kind, source, stages, wall_seconds, frames, counted, truth, network, serial_commands,
+              replay=None, settings=None):
+    """รวมผลการรันเป็น dict (รูปแบบเดียวกับไฟล์ JSON ที่บันทึก)"""
+    return {
+        "system": kind,
+        "source": str(source),
+        "timestamp": datetime.now().isoformat(),
+        "settings": settings or {},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "frames": frames,
+        "frames_dropped": replay.dropped if replay is not None else 0,
+        "wall_seconds": round(wall_seconds, 3),
+        "fps": frames / wall_seconds if wall_seconds > 0 else 0.0,
+        "stages": {name: stats.snapshot() for name, stats in stages.items()},
+        "counting": {
+            "counted": counted,
+            "ground_truth": truth,
+            "error": counted - truth if truth is not None else None,
+            "accuracy": counting_accuracy(counted, truth),
+        },
+        "network": {**network, "per_bottle": per_bottle(network.get("requests", 0), counted)},
+        "serial": {
+            "commands": sum(serial_commands.values()),
+            "by_command": dict(serial_commands),
+            "per_bottle": per_bottle(sum(serial_commands.values()), counted),
+        },
+    }
+
+
+def compare_results(current, baseline, tolerance=0.10, min_latency_ms=1.0):
+    """
+    เทียบผลกับ baseline - คืน list ของ regression (ว่าง = ผ่าน)
+    FPS ลด / latency p95 เพิ่ม / network call ต่อขวดเพิ่ม เกิน tolerance หรือความแม่นยำการนับลดลง
+    (latency ต้องเพิ่มเกิน min_latency_ms ด้วย เพื่อไม่ให้ stage ที่เร็วมากแจ้งเตือนเพราะ noise)
+    """
+    regressions = []
+
+    if current["fps"] < baseline["fps"] * (1.0 - tolerance):
+        regressions.append(f"fps {current['fps']:.1f} < baseline {baseline['fps']:.1f}")
+
+    accuracy, base_accuracy = current["counting"]["accuracy"], baseline["counting"]["accuracy"]
+    if accuracy is not None and base_accuracy is not None and accuracy < base_accuracy:
+        regressions.append(f"counting accuracy {accuracy:.3f} < baseline {base_accuracy:.3f}")
+
+    calls, base_calls = current["network"]["per_bottle"], baseline["network"]["per_bottle"]
+    if calls is not None and base_calls is not None and calls > base_calls * (1.0 + tolerance):
+        regressions.append(f"network calls/bottle {calls:.2f} > baseline {base_calls:.2f}")
+
+    for name, stage in current["stages"].items():
+        base_stage = baseline["stages"].get(name)
+        if not base_stage or not stage["count"] or not base_stage["count"]:
+            continue
+        limit = max(base_stage["p95_ms"] * (1.0 + tolerance), base_stage["p95_ms"] + min_latency_ms)
+        if stage["p95_ms"] > limit:
+            regressions.append(f"{name} p95 {stage['p95_ms']:.2f}ms > baseline {base_stage['p95_ms']:.2f}ms")
+    return regressions
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def print_results(results):
+    print("=" * 60)
+    print(f"📊 REPLAY BENCHMARK - {results['system']} ({results['source']})")
+    print("=" * 60)
+    print(f"🎞️ Frames: {results['frames']} ({results['frames_dropped']} dropped) "
+          f"in {results['wall_seconds']:.1f}s -> {results['fps']:.1f} FPS")
+    for name, stage in results["stages"].items():
+        print(f"   ⏱️ {name:<10} n={stage['count']:<6} p50 {stage['p50_ms']:7.2f} ms  "
+              f"p95 {stage['p95_ms']:7.2f} ms  p99 {stage['p99_ms']:7.2f} ms")
+    counting = results["counting"]
+    accuracy = f"{counting['accuracy'] * 100:.1f}%" if counting["accuracy"] is not None else "n/a"
+    print(f"🍼 Counted: {counting['counted']} / truth {counting['ground_truth']} (accuracy {accuracy})")
+    network, serial_stats = results["network"], results["serial"]
+    print(f"🔥 Network calls: {network['requests']} ({network['per_bottle'] or 0:.2f} per bottle)")
+    print(f"📡 Serial commands: {serial_stats['commands']} ({serial_stats['per_bottle'] or 0:.2f} per bottle)")
+
+
+# ----------------------------------------
+# Runner
+# ----------------------------------------
+
+def load_system_module(kind, arduino_port, firebase_url):
+    """
+    import สคริปต์ของระบบโดยชี้ Arduino / Firebase ไปที่ตัวจำลอง
+    (ค่า default ของ ArduinoManager / FirebaseManager ถูกอ่านจาก Config ตอน import จึงต้องตั้ง env ก่อน)
+    """
+    os.environ["P2P_ARDUINO_PORT"] = arduino_port
+    os.environ["P2P_FIREBASE_URL"] = firebase_url
+    os.environ["P2P_HEADLESS"] = "1"
+    name = SYSTEMS[kind]
+    if name in sys.modules:
+        return importlib.reload(sys.modules[name])
+    return importlib.import_module(name)
+
+
+def run_replay(kind, source, truth=None, speed=1.0, fps=None, max_frames=None, protocol="text",
+               model_path=None, spool_dir=None, quiet=False):
+    """รันระบบกับคลิปที่อัดไว้หนึ่งครั้ง แล้วคืนผลแบบ summarize()"""
+    from firebase_writer import close_shared_writers
+
+    truth = load_ground_truth(source, truth)
+    arduino = ReplayArduino(protocol, reply=(kind == "bridge")).start()  # v11 ไม่อ่าน serial กลับ
+    stub = FirebaseStub().start()
+    replay = ReplaySource(source, fps=fps, speed=speed, max_frames=max_frames)
+    original_capture = cv2.VideoCapture
+    output = io.StringIO() if quiet else sys.stdout
+
+    try:
+        module = load_system_module(kind, arduino.port, stub.url)
+        config = module.Config
+        config.HEADLESS = True
+        config.SERIAL_PROTOCOL = protocol
+        config.FIREBASE_SPOOL_FILE = os.path.join(spool_dir or ".", f"replay_spool_{kind}.jsonl")
+        if kind == "v11":
+            config.CAM_ID = str(source)
+            config.CAMERA_SOURCES = []
+            config.HEADLESS_STATUS_INTERVAL = 0
+            if model_path:
+                config.MODEL_PATH = model_path
+        else:
+            config.CAMERA_INDEX = str(source)
+
+        cv2.VideoCapture = lambda *args, **kwargs: replay
+        with contextlib.redirect_stdout(output):
+            system = module.BottleDetectionSystem() if kind == "bridge" else module.YOLOv11DetectionSystem()
+            stages = instrument_system(kind, system)
+            start = time.perf_counter()
+            system.run()  # จบเมื่อเฟรมหมด แล้ว cleanup() flush Firebase ให้
+            wall_seconds = time.perf_counter() - start
+            close_shared_writers()
+    except BaseException:
+        if quiet:
+            sys.stdout.write(output.getvalue())  # แสดง log ของระบบเมื่อรันไม่สำเร็จ (เช่น sys.exit ตอนโหลด model)
+        raise
+    finally:
+        cv2.VideoCapture = original_capture
+        replay.release()
+        arduino.close()
+        stub.close()
+
+    if kind == "v11":
+        counted = sum(channel.bottle_count for channel in system.channels)
+    else:
+        counted = system.bottle_count
+
+    # ไม่มี motion gate: Ultralytics อ่านไฟล์เอง (stream) จึงนับเฟรมจากจำนวนผลลัพธ์แทน
+    frames = replay.frames_read or stages["inference"].count
+    stages = {"loop": replay.loop_stats, **stages} if replay.frames_read else stages
+    settings = {"speed": speed, "fps": replay.fps, "max_frames": max_frames, "protocol": protocol,
+                "model": getattr(config, "MODEL_PATH", None) if kind == "v11" else getattr(config, "YOLO_WEIGHTS", None)}
+    return summarize(kind, source, stages, wall_seconds, frames, counted, truth,
+                     stub.summary(), arduino.commands, replay=replay, settings=settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded video through the detection loops")
+    parser.add_argument("--system", choices=sorted(SYSTEMS), default="v11")
+    parser.add_argument("--source", required=True, help="ไฟล์วิดีโอ หรือโฟลเดอร์ภาพ")
+    parser.add_argument("--truth", type=int, default=None, help="จำนวนขวดจริงในคลิป")
+    parser.add_argument("--speed", type=float, default=1.0, help="1.0 = เวลาจริง, 0 = เร็วที่สุด (ไม่ข้ามเฟรม)")
+    parser.add_argument("--fps", type=float, default=None, help="FPS ของโฟลเดอร์ภาพ (ค่าเริ่มต้น 30)")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--protocol", choices=("text", "binary"), default="text")
+    parser.add_argument("--model", default=None, help="MODEL_PATH ของ v11")
+    parser.add_argument("--output", default=None, help="บันทึกผลเป็น JSON")
+    parser.add_argument("--baseline", default=None, help="JSON ของรอบก่อนหน้าเพื่อตรวจ regression")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--quiet", action="store_true", help="ซ่อน log ของระบบระหว่างรัน")
+    args = parser.parse_args()
+
+    results = run_replay(args.system, args.source, truth=args.truth, speed=args.speed, fps=args.fps,
+                         max_frames=args.max_frames, protocol=args.protocol, model_path=args.model,
+                         spool_dir=os.path.dirname(os.path.abspath(args.output)) if args.output else None,
+                         quiet=args.quiet)
+    print_results(results)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"💾 Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Regressions vs baseline:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print("✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
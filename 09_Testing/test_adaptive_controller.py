@@ -0,0 +1,125 @@
+# ========================================
+# Unit Tests for Adaptive Controller
+# ========================================
+
+import pytest
+import json
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from adaptive_controller import AdaptiveController, create_adaptive_controller_from_config
+from motion_gate import MotionGate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_controller(clock, **kwargs):
+    options = dict(target_fps=10, img_sizes=(320, 416, 640), initial_img_size=640,
+                   max_skip=2, window=5, cooldown_seconds=1.0, clock=clock)
+    options.update(kwargs)
+    return AdaptiveController(**options)
+
+
+def feed(controller, clock, latency_ms, backlog=0, samples=5):
+    """ส่ง latency ครบ window หลังพ้น cooldown - คืนการเปลี่ยนแปลงล่าสุด"""
+    clock.now += 2.0
+    change = None
+    for _ in range(samples):
+        change = controller.record(latency_ms / 1000.0, backlog) or change
+    return change
+
+
+class TestAdaptiveController:
+    """ทดสอบการปรับ imgsz / frame-skip ตาม FPS"""
+
+    def test_slow_cpu_steps_size_down_then_skips(self, clock):
+        controller = make_controller(clock)
+        assert feed(controller, clock, 200)["img_size"] == 416
+        assert feed(controller, clock, 200)["img_size"] == 320
+        change = feed(controller, clock, 200)
+        assert change["img_size"] == 320 and change["skip"] == 1
+        assert feed(controller, clock, 200) is None  # skip 1 -> 2 x 5 FPS = ได้เป้าพอดี
+        feed(controller, clock, 400)
+        assert controller.skip_frames == 2
+        assert feed(controller, clock, 400) is None  # ถึงขอบเขตแล้ว
+
+    def test_fast_cpu_removes_skip_then_grows_size(self, clock):
+        controller = make_controller(clock, initial_img_size=320, initial_skip=1)
+        change = feed(controller, clock, 20)
+        assert change["skip"] == 0 and change["reason"] == "headroom"
+        assert feed(controller, clock, 20)["img_size"] == 416
+
+    def test_no_step_up_without_enough_headroom(self, clock):
+        """416 -> 640 ใช้เวลา ~2.4 เท่า: 80ms จะกลายเป็น ~190ms ซึ่งไม่ทัน 10 FPS"""
+        controller = make_controller(clock, initial_img_size=416)
+        assert feed(controller, clock, 80) is None
+        assert controller.img_size == 416
+
+    def test_on_target_is_stable(self, clock):
+        controller = make_controller(clock)
+        for _ in range(5):
+            assert feed(controller, clock, 100) is None
+
+    def test_waits_for_window_and_cooldown(self, clock):
+        controller = make_controller(clock)
+        assert feed(controller, clock, 500, samples=4) is None
+        assert controller.record(0.5) is not None
+        assert controller.record(0.5) is None  # window ถูกล้างหลังเปลี่ยน
+
+    def test_backlog_steps_down(self, clock):
+        controller = make_controller(clock, backlog_threshold=2)
+        change = feed(controller, clock, 100, backlog=2)
+        assert change["reason"] == "backlog" and change["img_size"] == 416
+
+    def test_changes_logged_as_metrics(self, clock, tmp_path):
+        events = []
+        metrics = tmp_path / "adaptive.jsonl"
+        controller = make_controller(clock, on_change=events.append, metrics_file=str(metrics))
+        feed(controller, clock, 200)
+        feed(controller, clock, 200)
+        lines = [json.loads(line) for line in metrics.read_text().splitlines()]
+        assert [line["img_size"] for line in lines] == [416, 320]
+        assert events == controller.history == lines
+
+    def test_apply_to_gate(self, clock):
+        gate = MotionGate(skip_frames=0, max_skip=1, min_changed_fraction=0.0)
+        controller = make_controller(clock, initial_img_size=320, max_skip=3)
+        for _ in range(3):
+            feed(controller, clock, 400)
+            controller.apply_to_gate(gate)
+        assert gate.skip_frames == 3 and gate.max_skip == 3
+        feed(controller, clock, 20)
+        controller.apply_to_gate(gate)
+        assert gate.skip_frames == 2 and gate.max_skip == 2
+
+
+class TestConfigFactory:
+    def test_disabled_by_default(self):
+        class Config:
+            IMG_SIZE = 640
+        assert create_adaptive_controller_from_config(Config) is None
+
+    def test_sizes_bounded_by_img_size(self):
+        class Config:
+            ADAPTIVE_ENABLED = True
+            IMG_SIZE = 416
+            SKIP_FRAMES = 1
+            FPS_TARGET = 12
+        controller = create_adaptive_controller_from_config(Config)
+        assert controller.img_sizes == [320, 384, 416]
+        assert controller.img_size == 416 and controller.skip_frames == 1
+        assert controller.target_fps == 12
@@ -0,0 +1,98 @@
+# ========================================
+# Unit Tests for Batch Preprocessor
+# ========================================
+
+import pytest
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "15_Performance"))
+
+from batch_preprocess import BatchPreprocessor
+
+
+def random_frames(count, shape=(120, 160, 3), seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, shape, dtype=np.uint8) for _ in range(count)]
+
+
+def reference(image, size):
+    resized = cv2.resize(image, size, interpolation=cv2.INTER_LINEAR)
+    return (resized[..., ::-1].astype(np.float32) / 255.0).transpose(2, 0, 1)
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+class TestBatchPreprocessor:
+    """ทดสอบการเตรียม batch NCHW"""
+
+    def test_matches_reference_pipeline(self, pool):
+        frames = random_frames(5)
+        batch = BatchPreprocessor(executor=pool).preprocess(frames, (64, 48))
+        assert batch.shape == (5, 3, 48, 64) and batch.dtype == np.float32
+        for i, frame in enumerate(frames):
+            np.testing.assert_allclose(batch[i], reference(frame, (64, 48)), atol=1e-6)
+
+    def test_buffer_is_reused(self):
+        preprocessor = BatchPreprocessor()
+        first = preprocessor.preprocess(random_frames(4), (32, 32))
+        second = preprocessor.preprocess(random_frames(3, seed=1), (32, 32))
+        assert np.shares_memory(first, second)
+        assert preprocessor.get_stats()["allocations"] == 1
+
+        preprocessor.preprocess(random_frames(8), (32, 32))  # batch ใหญ่ขึ้น -> จองใหม่ครั้งเดียว
+        preprocessor.preprocess(random_frames(6), (32, 32))
+        assert preprocessor.get_stats()["allocations"] == 2
+
+    def test_threads_get_separate_buffers(self):
+        preprocessor = BatchPreprocessor()
+        results = {}
+
+        def run(name, seed):
+            results[name] = preprocessor.preprocess(random_frames(2, seed=seed), (32, 32))
+
+        threads = [threading.Thread(target=run, args=(name, seed)) for name, seed in (("a", 1), ("b", 2))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not np.shares_memory(results["a"], results["b"])
+
+    def test_mean_std_and_channel_order(self):
+        image = np.zeros((4, 4, 3), dtype=np.uint8)
+        image[..., 0] = 255  # B
+        preprocessor = BatchPreprocessor(mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5))
+        batch = preprocessor.preprocess([image], (4, 4))
+        assert np.allclose(batch[0, 2], 1.0) and np.allclose(batch[0, 0], -1.0)
+
+        kept = BatchPreprocessor(swap_rb=False).preprocess([image], (4, 4))
+        assert np.allclose(kept[0, 0], 1.0)
+
+    def test_groups_mixed_sizes(self, pool):
+        frames = random_frames(2) + random_frames(2, shape=(60, 80, 3), seed=3)
+        groups = BatchPreprocessor(executor=pool).preprocess_groups(frames, [(32, 32), None, (32, 32), None])
+        shapes = {tuple(indices): tensor.shape for indices, tensor in groups}
+        assert shapes == {(0, 2): (2, 3, 32, 32), (1,): (1, 3, 120, 160), (3,): (1, 3, 60, 80)}
+
+    def test_groups_without_reuse_keep_results(self):
+        preprocessor = BatchPreprocessor()
+        [(_, first)] = preprocessor.preprocess_groups(random_frames(2), [(32, 32)] * 2, reuse=False)
+        kept = first.copy()
+        preprocessor.preprocess_groups(random_frames(2, seed=5), [(32, 32)] * 2, reuse=False)
+        assert np.array_equal(first, kept)
+
+    def test_grayscale_and_bgra_inputs(self):
+        gray = np.full((10, 10), 128, dtype=np.uint8)
+        bgra = np.full((10, 10, 4), 128, dtype=np.uint8)
+        batch = BatchPreprocessor().preprocess([gray, bgra], (10, 10))
+        assert np.allclose(batch, 128 / 255.0)
@@ -0,0 +1,124 @@
+# ========================================
+# Unit Tests for Firebase Batch Writer
+# ========================================
+
+import pytest
+import json
+import sys
+import requests
+from unittest.mock import Mock
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from firebase_writer import FirebaseBatchWriter
+
+
+class FakeSession:
+    """requests.Session ปลอมที่บันทึกทุก PATCH"""
+
+    def __init__(self):
+        self.patches = []
+        self.offline = False
+
+    def patch(self, url, json=None, timeout=None):
+        if self.offline:
+            raise requests.exceptions.ConnectionError("network down")
+        self.patches.append((url, json))
+        return Mock(status_code=200, text="{}")
+
+    def close(self):
+        pass
+
+
+class TestBatchWriter:
+    """Test cases สำหรับ FirebaseBatchWriter"""
+
+    @pytest.fixture
+    def session(self):
+        return FakeSession()
+
+    @pytest.fixture
+    def writer(self, session, tmp_path):
+        writer = FirebaseBatchWriter(
+            "https://example-rtdb.test/",
+            spool_path=str(tmp_path / "spool.jsonl"),
+            flush_interval=60,
+            retry_interval=60,
+            session=session
+        )
+        yield writer
+        writer.close()
+
+    def test_coalesces_same_path(self, writer, session):
+        """ทดสอบว่าอัปเดต path เดิมซ้ำๆ ถูกรวมเหลือค่าล่าสุด"""
+        for count in range(1, 6):
+            writer.submit("bottle_data/user", {"bottle_count": count})
+
+        assert writer.flush() is True
+        assert len(session.patches) == 1
+        url, body = session.patches[0]
+        assert url == "https://example-rtdb.test/.json"
+        assert body == {"bottle_data/user": {"bottle_count": 5}}
+        assert writer.get_stats()["coalesced"] == 4
+
+    def test_multiple_paths_in_one_patch(self, writer, session):
+        """ทดสอบว่าหลาย path ถูกรวมเป็น PATCH เดียว"""
+        writer.submit("bottle_data/user", {"bottle_count": 3})
+        writer.submit("/servo_data/user/", {"servo_angle": 45})
+        writer.submit("live_count/user", 3)
+
+        writer.flush()
+
+        assert len(session.patches) == 1
+        assert session.patches[0][1] == {
+            "bottle_data/user": {"bottle_count": 3},
+            "servo_data/user": {"servo_angle": 45},
+            "live_count/user": 3,
+        }
+
+    def test_spools_offline_and_replays(self, writer, session, tmp_path):
+        """ทดสอบการเก็บลง spool ตอน offline และส่งซ้ำเมื่อกลับมาออนไลน์"""
+        session.offline = True
+        writer.submit("bottle_data/user", {"bottle_count": 1})
+        assert writer.flush() is False
+
+        writer.submit("bottle_data/user", {"bottle_count": 2})
+        writer.submit("live_count/user", 2)
+        assert writer.flush() is False
+
+        spool_lines = (tmp_path / "spool.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(spool_lines) == 2
+        assert json.loads(spool_lines[0])["updates"] == {"bottle_data/user": {"bottle_count": 1}}
+        assert writer.online is False
+
+        session.offline = False
+        writer.submit("bottle_data/user", {"bottle_count": 3})
+        assert writer.flush() is True
+
+        assert len(session.patches) == 1
+        assert session.patches[0][1] == {
+            "bottle_data/user": {"bottle_count": 3},
+            "live_count/user": 2,
+        }
+        assert not (tmp_path / "spool.jsonl").exists()
+        assert writer.online is True
+
+    def test_send_now_reports_failure(self, writer, session):
+        """ทดสอบ send_now แบบ blocking เมื่อเชื่อมต่อไม่ได้"""
+        session.offline = True
+        assert writer.send_now("system_test/user", {"test": True}) is False
+
+        session.offline = False
+        assert writer.send_now("system_test/user", {"test": True}) is True
+        assert session.patches[-1][1] == {"system_test/user": {"test": True}}
+
+    def test_send_updates_is_single_patch(self, writer, session):
+        """ทดสอบว่า send_updates ส่งหลาย path ใน PATCH เดียวและคืนผลทันที"""
+        assert writer.send_updates({"/a/1": 1, "b/2": 2}) is True
+        assert session.patches == [("https://example-rtdb.test/.json", {"a/1": 1, "b/2": 2})]
+
+        session.offline = True
+        assert writer.send_updates({"a/3": 3}) is False
+        assert writer.pending_count() == 0  # ไม่เข้า spool - ผู้เรียกจัดการ retry เอง
@@ -0,0 +1,112 @@
+# ========================================
+# Unit Tests for Bottle Tracker
+# ========================================
+
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from bottle_tracker import BottleTracker, iou_matrix, xywh_to_xyxy
+
+FRAME_SHAPE = (480, 640, 3)
+
+
+def box_at(cx, cy, size=40):
+    half = size / 2
+    return [cx - half, cy - half, cx + half, cy + half]
+
+
+def run_belt(tracker, positions_per_frame):
+    """ป้อน detection ทีละเฟรม - คืนจำนวนที่นับได้ทั้งหมด"""
+    total = 0
+    for positions in positions_per_frame:
+        boxes = [box_at(x, y) for x, y in positions]
+        total += len(tracker.update(boxes, [0.9] * len(boxes), FRAME_SHAPE))
+    return total
+
+
+class TestIoUMatrix:
+    """Test cases สำหรับ iou_matrix"""
+
+    def test_values(self):
+        """ทดสอบค่า IoU ของกล่องที่ซ้อน/ไม่ซ้อนกัน"""
+        a = [[0, 0, 10, 10]]
+        b = [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]]
+
+        result = iou_matrix(a, b)
+
+        assert result.shape == (1, 3)
+        assert result[0].tolist() == pytest.approx([1.0, 1 / 3, 0.0])
+
+    def test_xywh_conversion(self):
+        """ทดสอบการแปลง [x, y, w, h] เป็น xyxy"""
+        assert xywh_to_xyxy([[10, 20, 30, 40]]).tolist() == [[10, 20, 40, 60]]
+
+
+class TestBottleTracker:
+    """Test cases สำหรับ BottleTracker"""
+
+    def test_counts_each_bottle_once_on_line(self):
+        """ทดสอบว่าขวดที่ค้างอยู่หลายเฟรมถูกนับครั้งเดียวเมื่อข้ามเส้น"""
+        tracker = BottleTracker(count_mode="line")
+        frames = [[(x, 240)] for x in range(200, 460, 20)]
+
+        assert run_belt(tracker, frames) == 1
+        assert tracker.total_counted == 1
+
+    def test_two_bottles_in_same_frame(self):
+        """ทดสอบขวดสองใบพร้อมกัน (cooldown เดิมจะนับขาด/เกิน)"""
+        tracker = BottleTracker(count_mode="line")
+        frames = [[(x, 120), (x - 60, 360)] for x in range(220, 500, 20)]
+
+        assert run_belt(tracker, frames) == 2
+        assert len({t.track_id for t in tracker.tracks}) == 2
+
+    def test_fast_belt_uses_centroid_matching(self):
+        """ทดสอบสายพานเร็วจน box ไม่ซ้อนกันระหว่างเฟรม"""
+        tracker = BottleTracker(count_mode="line")
+        frames = [[(x, 240)] for x in range(180, 520, 45)]
+
+        assert run_belt(tracker, frames) == 1
+        assert len(tracker.tracks) == 1
+
+    def test_direction_filter(self):
+        """ทดสอบการนับเฉพาะทิศที่กำหนด"""
+        left_to_right = [[(x, 240)] for x in range(200, 460, 20)]
+
+        tracker = BottleTracker(count_mode="line", direction=(-1, 0))
+        assert run_belt(tracker, left_to_right) == 0
+
+        tracker = BottleTracker(count_mode="line", direction=(1, 0))
+        assert run_belt(tracker, left_to_right) == 1
+
+    def test_crossing_before_confirmation_is_counted(self):
+        """ทดสอบว่าขวดที่ข้ามเส้นก่อนครบ min_hits ยังถูกนับเมื่อ track ยืนยันแล้ว"""
+        tracker = BottleTracker(count_mode="line", min_hits=3)
+        frames = [[(x, 240)] for x in (280, 355, 380, 400)]  # ข้ามเส้นกลาง (x=320) ที่เฟรมที่ 2
+
+        assert run_belt(tracker, frames) == 1
+        assert tracker.total_counted == 1
+
+    def test_roi_mode(self):
+        """ทดสอบการนับเมื่อเข้าพื้นที่นับ"""
+        tracker = BottleTracker(count_mode="roi", count_roi=(0.5, 0.0, 1.0, 1.0))
+        frames = [[(x, 240)] for x in range(100, 600, 25)]
+
+        assert run_belt(tracker, frames) == 1
+
+    def test_short_occlusion_keeps_track(self):
+        """ทดสอบว่าขวดที่หายไปไม่กี่เฟรมไม่ถูกนับซ้ำ"""
+        tracker = BottleTracker(count_mode="track", max_missed=5)
+        frames = [[(200, 240)]] * 3 + [[]] * 3 + [[(200, 240)]] * 3
+
+        assert run_belt(tracker, frames) == 1
+
+    def test_invalid_mode(self):
+        """ทดสอบ count_mode ที่ไม่รองรับ"""
+        with pytest.raises(ValueError):
+            BottleTracker(count_mode="cooldown")
@@ -0,0 +1,185 @@
+# ========================================
+# Unit Tests for Byte-Budget LRU Cache
+# ========================================
+
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "15_Performance"))
+
+from byte_lru import ByteLRU, FileHashCache, SingleFlight, estimate_nbytes, file_digest
+
+MB = 1024 * 1024
+
+
+def weights(mb):
+    return np.zeros(mb * MB, dtype=np.uint8)
+
+
+class FakeModule:
+    """เลียนแบบ torch.nn.Module: parameters() / buffers() คืน tensor ที่มี numel / element_size"""
+
+    class Tensor:
+        def __init__(self, numel, element_size=4):
+            self._numel = numel
+            self._element_size = element_size
+
+        def numel(self):
+            return self._numel
+
+        def element_size(self):
+            return self._element_size
+
+    def __init__(self):
+        self.weight = self.Tensor(1000)
+        self.running_mean = self.Tensor(10)
+
+    def parameters(self):
+        return [self.weight]
+
+    def buffers(self):
+        return [self.running_mean]
+
+
+class TestEstimateNbytes:
+    """ทดสอบการประมาณขนาดของ entry"""
+
+    def test_arrays_and_modules(self):
+        assert estimate_nbytes(np.zeros((10, 10), dtype=np.float32)) == 400
+        assert estimate_nbytes(FakeModule()) == 4040
+
+    def test_nested_objects_count_arrays_once(self):
+        array = weights(1)
+
+        class Wrapper:
+            def __init__(self):
+                self.net = {"a": array, "b": array}
+
+        assert MB <= estimate_nbytes(Wrapper()) < MB + 4096
+
+
+class TestByteLRU:
+    """ทดสอบ LRU ที่จำกัดด้วย byte"""
+
+    def test_evicts_by_bytes_in_lru_order(self):
+        cache = ByteLRU(max_bytes=3 * MB)
+        cache.put("a", weights(1))
+        cache.put("b", weights(1))
+        cache.get("a")                   # a ใช้ล่าสุด -> b เก่าสุด
+        cache.put("c", weights(2))
+        assert cache.keys() == ["a", "c"]
+        stats = cache.get_stats()
+        assert stats["bytes"] == 3 * MB and stats["evictions"] == 1 and stats["evicted_bytes"] == MB
+
+    def test_entry_cap_and_replacement(self):
+        cache = ByteLRU(max_bytes=100 * MB, max_entries=2)
+        cache.put("a", weights(1))
+        cache.put("a", weights(2))       # แทนที่ ไม่นับซ้ำ
+        assert cache.current_bytes == 2 * MB
+        cache.put("b", weights(1))
+        cache.put("c", weights(1))
+        assert cache.keys() == ["b", "c"]
+
+    def test_oversized_entry_is_rejected(self):
+        cache = ByteLRU(max_bytes=MB)
+        cache.put("small", np.zeros(10, dtype=np.uint8))
+        assert cache.put("big", weights(2)) is False
+        assert "big" not in cache and "small" in cache
+        assert cache.get_stats()["rejected"] == 1
+
+    def test_hit_miss_counters(self):
+        cache = ByteLRU(max_bytes=MB)
+        cache.put("a", 1, nbytes=10)
+        cache.get("a")
+        cache.get("missing")
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+
+class TestSingleFlight:
+    """ทดสอบการโหลดแบบ single-flight"""
+
+    def test_concurrent_misses_load_once(self):
+        cache = ByteLRU(max_bytes=10 * MB)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return weights(1)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("m", loader))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert cache.get_stats()["loads"] == 1 and cache.get_stats()["shared_loads"] == 7
+
+    def test_error_reaches_every_waiter(self):
+        flight = SingleFlight()
+        errors = []
+
+        def fail():
+            time.sleep(0.05)
+            raise RuntimeError("load failed")
+
+        def call():
+            try:
+                flight.do("m", fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 4 and flight.calls == 1
+
+    def test_failed_load_can_be_retried(self):
+        cache = ByteLRU(max_bytes=MB)
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_load("m", fail)
+        assert cache.get_or_load("m", lambda: "ok") == "ok"
+        assert cache.get_stats()["load_errors"] == 1
+
+
+class TestFileHashCache:
+    """ทดสอบ hash ของไฟล์ที่คำนวณใหม่เมื่อไฟล์เปลี่ยน"""
+
+    def test_digest_streams_in_chunks(self, tmp_path):
+        path = tmp_path / "image.jpg"
+        path.write_bytes(b"x" * 1000)
+        assert file_digest(str(path), chunk_size=64) == file_digest(str(path))
+
+    def test_unchanged_file_is_not_rehashed(self, tmp_path):
+        path = tmp_path / "image.jpg"
+        path.write_bytes(b"first")
+        hashes = FileHashCache()
+        first = hashes.get(str(path))
+        assert hashes.get(str(path)) == first
+        assert hashes.computed == 1 and hashes.hits == 1
+
+    def test_modified_file_is_rehashed(self, tmp_path):
+        path = tmp_path / "image.jpg"
+        path.write_bytes(b"first")
+        hashes = FileHashCache()
+        first = hashes.get(str(path))
+        path.write_bytes(b"second version")
+        second = hashes.get(str(path))
+        assert second[0] != first[0] and second[2] == len(b"second version")
+        assert hashes.computed == 2
@@ -0,0 +1,155 @@
+# ========================================
+# Unit Tests for Count Ledger
+# ========================================
+
+import pytest
+import sqlite3
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from count_ledger import CountLedger, LedgerSyncer, create_ledger_from_config, event_key
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "ledger.db")
+
+
+class FakeBackend:
+    """เก็บ multi-path update แบบเดียวกับ Firebase (path เดิมถูกเขียนทับ)"""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+        self.online = True
+
+    def send_updates(self, updates):
+        self.calls += 1
+        if not self.online:
+            return False
+        self.data.update(updates)
+        return True
+
+
+class TestLedgerCounting:
+    """ทดสอบการบันทึก event และยอดรวม"""
+
+    def test_append_returns_running_totals(self, db_path):
+        ledger = CountLedger(db_path, station_id="st1")
+        ledger.append(bottle_count=1, total_points=10, servo_actions=1)
+        totals = ledger.append(bottle_count=2, total_points=20)
+        assert totals == {"bottle_count": 3, "total_points": 30, "servo_actions": 1, "seq": 2}
+        ledger.close()
+
+    def test_reset_is_an_event(self, db_path):
+        ledger = CountLedger(db_path, station_id="st1")
+        ledger.append(bottle_count=4, total_points=40, servo_actions=4)
+        totals = ledger.reset()
+        assert totals == {"bottle_count": 0, "total_points": 0, "servo_actions": 0, "seq": 2}
+        assert ledger.events_after(0)[-1]["kind"] == "reset"
+        assert ledger.totals_at(1)["bottle_count"] == 4
+        ledger.close()
+
+    def test_recovery_without_close(self, db_path):
+        """process ตาย (ไม่ได้ close) - เปิดใหม่ต้องได้ยอดเดิมจาก snapshot + log tail"""
+        ledger = CountLedger(db_path, station_id="st1", snapshot_every=3)
+        for _ in range(7):
+            ledger.append(bottle_count=1, total_points=10)
+
+        recovered = CountLedger(db_path, station_id="st1", snapshot_every=3)
+        assert recovered.totals() == {"bottle_count": 7, "total_points": 70, "servo_actions": 0, "seq": 7}
+        assert recovered.stats["recovered_events"] == 1  # snapshot ที่ seq 6 + event ที่ 7
+        assert recovered.append(bottle_count=1)["seq"] == 8
+
+    def test_stations_are_independent(self, db_path):
+        first = CountLedger(db_path, station_id="st1")
+        second = CountLedger(db_path, station_id="st2")
+        first.append(bottle_count=2)
+        second.append(bottle_count=5)
+        assert first.totals()["bottle_count"] == 2
+        assert second.totals() == {"bottle_count": 5, "total_points": 0, "servo_actions": 0, "seq": 1}
+
+    def test_uses_wal_journal(self, db_path):
+        CountLedger(db_path, station_id="st1").close()
+        mode = sqlite3.connect(db_path).execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+
+class TestLedgerSync:
+    """ทดสอบการ sync delta แบบ idempotent"""
+
+    def test_sync_updates_paths(self, db_path):
+        ledger = CountLedger(db_path, station_id="st1")
+        ledger.append(bottle_count=1, total_points=10, servo_actions=1)
+        ledger.append(bottle_count=1, total_points=10, servo_actions=1)
+        updates, last_seq = ledger.sync_updates("user", limit=1)
+        assert last_seq == 1
+        assert set(updates) == {f"count_events/user/st1/{event_key(1)}", "count_totals/user/st1"}
+        assert updates["count_totals/user/st1"]["bottle_count"] == 1  # ยอด ณ event ที่ส่ง ไม่ใช่ยอดล่าสุด
+        assert event_key(42) == "e0000000042"
+
+    def test_resend_is_idempotent(self, db_path):
+        """ส่ง batch เดิมซ้ำ (เช่น ack หาย) ต้องไม่ทำให้ยอดใน backend เพิ่ม"""
+        ledger = CountLedger(db_path, station_id="st1")
+        backend = FakeBackend()
+        for _ in range(3):
+            ledger.append(bottle_count=1, total_points=10)
+        updates, _ = ledger.sync_updates("user")
+        backend.send_updates(updates)
+        snapshot = dict(backend.data)
+        backend.send_updates(updates)
+        assert backend.data == snapshot
+        assert backend.data["count_totals/user/st1"]["bottle_count"] == 3
+
+    def test_syncer_retries_after_offline(self, db_path):
+        ledger = CountLedger(db_path, station_id="st1")
+        backend = FakeBackend()
+        syncer = LedgerSyncer(ledger, backend, "user", interval=60, batch_size=2)
+        try:
+            backend.online = False
+            for _ in range(5):
+                ledger.append(bottle_count=1, total_points=10)
+            assert syncer.sync_once() == 0
+            assert ledger.pending_count() == 5
+
+            backend.online = True
+            assert syncer.sync_once() == 5
+            assert ledger.synced_seq == 5 and ledger.pending_count() == 0
+        finally:
+            syncer.close()
+        assert len([path for path in backend.data if path.startswith("count_events/")]) == 5
+        assert backend.data["count_totals/user/st1"]["total_points"] == 50
+
+    def test_compact_keeps_unsynced_events(self, db_path):
+        ledger = CountLedger(db_path, station_id="st1")
+        for _ in range(4):
+            ledger.append(bottle_count=1)
+        ledger.mark_synced(3)
+        assert ledger.compact() == 3
+        assert [event["seq"] for event in ledger.events_after(0)] == [4]
+
+        ledger.close()
+        reopened = CountLedger(db_path, station_id="st1")
+        assert reopened.totals()["bottle_count"] == 4
+
+
+class TestLedgerConfig:
+    def test_disabled_by_default(self):
+        class Config:
+            pass
+
+        assert create_ledger_from_config(Config) is None
+
+    def test_from_config(self, db_path):
+        class Config:
+            LEDGER_ENABLED = True
+            LEDGER_PATH = db_path
+            LEDGER_STATION_ID = "line2"
+            LEDGER_SNAPSHOT_EVERY = 10
+
+        ledger = create_ledger_from_config(Config)
+        assert ledger.station_id == "line2" and ledger.snapshot_every == 10
+        ledger.close()
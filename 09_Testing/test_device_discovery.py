@@ -0,0 +1,134 @@
+# ========================================
+# Unit Tests for Device Discovery
+# ========================================
+
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "08_Config"))
+
+from device_discovery import DeviceDiscovery, _first_in_order, load_device_cache, port_usb_id, save_device_cache
+
+
+def make_port(device, vid=None, pid=None, serial_number=None, description="n/a"):
+    return SimpleNamespace(device=device, vid=vid, pid=pid, serial_number=serial_number, description=description)
+
+
+class FakeProbes:
+    """probe ปลอม: กำหนดได้ว่าอุปกรณ์ไหนใช้งานได้และใช้เวลาเท่าไร"""
+
+    def __init__(self, working_indices=(), working_ports=(), delay=0.0, ports=()):
+        self.working_indices = set(working_indices)
+        self.working_ports = set(working_ports)
+        self.delay = delay
+        self.ports = list(ports)
+        self.video_calls = []
+        self.serial_calls = []
+
+    def video(self, index):
+        self.video_calls.append(index)
+        time.sleep(self.delay)
+        return index in self.working_indices
+
+    def serial(self, device, baud_rate):
+        self.serial_calls.append(device)
+        time.sleep(self.delay)
+        return device in self.working_ports
+
+    def discovery(self, cache_file, **kwargs):
+        return DeviceDiscovery(cache_file=str(cache_file), camera_prober=self.video, serial_prober=self.serial,
+                               port_lister=lambda: self.ports, camera_id_reader=lambda index: None, **kwargs)
+
+
+UNO = make_port("/dev/ttyACM0", 0x2341, 0x0043, "A1B2", "Arduino Uno")
+OTHER = make_port("/dev/ttyS0", description="Serial port")
+
+
+class TestDiscovery:
+    """ทดสอบการหาอุปกรณ์แบบขนาน"""
+
+    def test_probes_run_concurrently(self, tmp_path):
+        """5 index ที่ใช้ 0.3s ต่อตัว ต้องเสร็จเร็วกว่าการเปิดทีละตัว (1.5s)"""
+        probes = FakeProbes(working_indices={3}, delay=0.3, ports=[UNO], working_ports={UNO.device})
+        start = time.monotonic()
+        result = probes.discovery(tmp_path / "local.json").discover()
+        elapsed = time.monotonic() - start
+        assert result["camera"]["index"] == 3
+        assert result["arduino"]["port"] == "/dev/ttyACM0"
+        assert elapsed < 1.0
+
+    def test_lowest_working_index_wins(self, tmp_path):
+        probes = FakeProbes(working_indices={1, 2})
+        assert probes.discovery(tmp_path / "local.json").discover(arduino=False)["camera"]["index"] == 1
+
+    def test_deadline_bounds_total_time(self, tmp_path):
+        probes = FakeProbes(working_indices={0}, delay=2.0)
+        start = time.monotonic()
+        result = probes.discovery(tmp_path / "local.json", deadline=0.2).discover(arduino=False)
+        assert result["camera"]["index"] is None
+        assert time.monotonic() - start < 1.5
+
+    def test_unstarted_probes_are_cancelled(self):
+        """ได้ผลแล้ว probe ที่ยังไม่เริ่มต้องถูก cancel (ไม่ต้องพึ่ง shutdown(cancel_futures=True) ของ 3.9)"""
+        calls = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            found = _first_in_order(executor, [0, 1, 2, 3], lambda i: calls.append(i) or time.sleep(0.05) or True,
+                                    deadline=1.0)
+        assert found == 0
+        assert calls[:1] == [0] and len(calls) <= 2
+
+    def test_prefers_known_boards(self, tmp_path):
+        probes = FakeProbes(ports=[OTHER, UNO], working_ports={OTHER.device, UNO.device})
+        result = probes.discovery(tmp_path / "local.json").discover(camera=False)
+        assert result["arduino"]["port"] == UNO.device
+        assert result["arduino"]["usb_id"] == "2341:0043:A1B2"
+
+
+class TestDiscoveryCache:
+    """ทดสอบการจำผลใน config_local.json"""
+
+    def test_cached_devices_skip_full_probe(self, tmp_path):
+        cache = tmp_path / "local.json"
+        FakeProbes(working_indices={2}, ports=[UNO], working_ports={UNO.device}).discovery(cache).discover()
+
+        probes = FakeProbes(working_indices={2}, ports=[OTHER, UNO], working_ports={UNO.device, OTHER.device})
+        result = probes.discovery(cache).discover()
+        assert result["camera"] == {**load_device_cache(str(cache))["camera"], "source": "cache"}
+        assert probes.video_calls == [2]
+        assert probes.serial_calls == [UNO.device]
+
+    def test_usb_id_follows_renamed_port(self, tmp_path):
+        """port เปลี่ยนชื่อ (ACM0 -> ACM1) ต้องหาเจอจาก USB ID โดยไม่ probe ตัวอื่น"""
+        cache = tmp_path / "local.json"
+        FakeProbes(ports=[UNO], working_ports={UNO.device}).discovery(cache).discover(camera=False)
+
+        moved = make_port("/dev/ttyACM1", 0x2341, 0x0043, "A1B2", "Arduino Uno")
+        probes = FakeProbes(ports=[OTHER, moved], working_ports={moved.device})
+        result = probes.discovery(cache).discover(camera=False)
+        assert result["arduino"]["port"] == "/dev/ttyACM1" and result["arduino"]["source"] == "cache"
+        assert probes.serial_calls == ["/dev/ttyACM1"]
+
+    def test_failed_cached_device_is_reprobed(self, tmp_path):
+        cache = tmp_path / "local.json"
+        FakeProbes(working_indices={0}).discovery(cache).discover(arduino=False)
+
+        probes = FakeProbes(working_indices={4})
+        result = probes.discovery(cache).discover(arduino=False)
+        assert result["camera"]["index"] == 4 and result["camera"]["source"] == "probe"
+        assert load_device_cache(str(cache))["camera"]["index"] == 4
+
+    def test_cache_keeps_other_settings(self, tmp_path):
+        cache = tmp_path / "local.json"
+        cache.write_text(json.dumps({"cam_id": 1, "user_id": "kiosk"}))
+        save_device_cache({"camera": {"index": 1}}, str(cache))
+        data = json.loads(cache.read_text())
+        assert data["user_id"] == "kiosk" and data["devices"] == {"camera": {"index": 1}}
+
+    def test_port_usb_id(self):
+        assert port_usb_id(UNO) == "2341:0043:A1B2"
+        assert port_usb_id(OTHER) is None
@@ -0,0 +1,185 @@
+# ========================================
+# Unit Tests for Dynamic Batcher
+# ========================================
+
+import pytest
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "15_Performance"))
+
+import dynamic_batcher
+from dynamic_batcher import (
+    BatchCostModel, BatcherClosedError, BatcherQueueFullError, DynamicBatcher, close_shared_batcher,
+    create_batcher_from_config, get_shared_batcher
+)
+
+
+class Recorder:
+    """process_batch ปลอม: ใช้เวลา overhead + per_item * n และจำ batch ที่ได้รับ"""
+
+    def __init__(self, overhead=0.0, per_item=0.0, fail=False):
+        self.overhead = overhead
+        self.per_item = per_item
+        self.fail = fail
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, payloads):
+        self.gate.wait()
+        self.batches.append(list(payloads))
+        if self.fail:
+            raise RuntimeError("model error")
+        time.sleep(self.overhead + self.per_item * len(payloads))
+        return [payload * 10 for payload in payloads]
+
+
+@pytest.fixture
+def closing():
+    batchers = []
+    yield batchers.append
+    for batcher in batchers:
+        batcher.close(drain=False)
+
+
+class TestDynamicBatcher:
+    """ทดสอบการจัด batch แบบ event-driven"""
+
+    def test_futures_receive_their_own_results(self, closing):
+        batcher = DynamicBatcher(Recorder(), max_batch_size=4, latency_slo_ms=50)
+        closing(batcher)
+        futures = [batcher.submit(i) for i in range(10)]
+        assert [future.result(timeout=2) for future in futures] == [i * 10 for i in range(10)]
+
+    def test_concurrent_work_is_batched_within_slo(self, closing):
+        recorder = Recorder(overhead=0.005, per_item=0.001)
+        batcher = DynamicBatcher(recorder, max_batch_size=8, latency_slo_ms=100)
+        closing(batcher)
+        futures = [batcher.submit(i) for i in range(8)]
+        for future in futures:
+            future.result(timeout=2)
+        assert len(recorder.batches) <= 2
+        assert batcher.get_stats()["lanes"]["live"]["slo_violations"] == 0
+
+    def test_live_lane_goes_first(self, closing):
+        recorder = Recorder()
+        recorder.gate.clear()
+        batcher = DynamicBatcher(recorder, max_batch_size=2, dynamic=False)
+        closing(batcher)
+        blocker = batcher.submit(0)            # ค้างอยู่ใน process_batch จนกว่าจะเปิด gate
+        time.sleep(0.05)
+        background = [batcher.submit(i, lane="background") for i in (1, 2)]
+        live = [batcher.submit(i, lane="live") for i in (3, 4)]
+        recorder.gate.set()
+        for future in [blocker] + background + live:
+            future.result(timeout=2)
+        assert recorder.batches[1] == [3, 4]
+
+    def test_overdue_background_is_not_starved(self, closing):
+        recorder = Recorder()
+        batcher = DynamicBatcher(recorder, max_batch_size=2, lanes={"live": 1000, "background": 1})
+        closing(batcher)
+        with batcher._cond:                    # ใส่ลง queue พร้อมกันก่อน worker ตื่น
+            background = batcher.submit(1, lane="background")
+            live = [batcher.submit(i) for i in (2, 3)]
+            time.sleep(0.01)                   # background เลย SLO แล้ว
+        assert background.result(timeout=2) == 10
+        assert [future.result(timeout=2) for future in live] == [20, 30]
+        assert 1 in recorder.batches[0]
+
+    def test_static_mode_waits_for_full_batch_or_timeout(self, closing):
+        recorder = Recorder()
+        batcher = DynamicBatcher(recorder, max_batch_size=3, max_wait_ms=100, dynamic=False)
+        closing(batcher)
+        start = time.perf_counter()
+        futures = [batcher.submit(i) for i in range(2)]
+        for future in futures:
+            future.result(timeout=2)
+        assert time.perf_counter() - start >= 0.09
+        assert recorder.batches == [[0, 1]]
+
+    def test_errors_and_queue_limits(self, closing):
+        batcher = DynamicBatcher(Recorder(fail=True), latency_slo_ms=10, max_queue_size=1)
+        closing(batcher)
+        with pytest.raises(RuntimeError):
+            batcher.submit(1).result(timeout=2)
+        with pytest.raises(ValueError):
+            batcher.submit(1, lane="vip")
+
+        with batcher._cond:
+            batcher.submit(1)
+            with pytest.raises(BatcherQueueFullError):
+                batcher.submit(2)
+
+    def test_close_drains_then_rejects(self):
+        batcher = DynamicBatcher(Recorder(), latency_slo_ms=1000)
+        futures = [batcher.submit(i) for i in range(3)]
+        batcher.close()
+        assert [future.result(timeout=0) for future in futures] == [0, 10, 20]
+        with pytest.raises(BatcherClosedError):
+            batcher.submit(4)
+
+    def test_submit_async(self, closing):
+        batcher = DynamicBatcher(Recorder(), latency_slo_ms=20)
+        closing(batcher)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit_async(i) for i in range(3)))
+
+        assert asyncio.run(run()) == [0, 10, 20]
+
+
+class TestSharedBatcher:
+    """ทดสอบ batcher ตัวเดียวที่หลายงานใช้ร่วมกัน (handler ต่องาน)"""
+
+    def test_handlers_are_split_per_batch(self, closing):
+        doubles, negates = Recorder(), []
+        batcher = DynamicBatcher(max_batch_size=8, dynamic=False, max_wait_ms=50)
+        closing(batcher)
+        with batcher._cond:
+            a = batcher.submit(1, handler=doubles)
+            b = batcher.submit(2, lane="background", handler=lambda xs: negates.append(xs) or [-x for x in xs])
+        assert (a.result(timeout=2), b.result(timeout=2)) == (10, -2)
+        assert doubles.batches == [[1]] and negates == [[2]]
+        assert batcher.get_stats()["batches"] == 1
+        with pytest.raises(ValueError):
+            batcher.submit(3)                  # ไม่มี process_batch และไม่ส่ง handler
+
+    def test_get_shared_batcher_is_process_wide(self):
+        config = SimpleNamespace(dynamic_batching=True, max_batch_size=4, batch_timeout_seconds=0.5,
+                                 batch_latency_slo_ms=50.0, background_latency_slo_ms=500.0)
+        try:
+            shared = get_shared_batcher(config)
+            assert get_shared_batcher(max_batch_size=99) is shared   # ผู้เรียกคนแรกกำหนดค่า
+            assert shared.max_batch_size == 4
+            assert shared.submit(3, handler=Recorder()).result(timeout=2) == 30
+        finally:
+            close_shared_batcher()
+        assert dynamic_batcher._shared_batcher is None and shared.closed
+        replacement = get_shared_batcher()
+        assert replacement is not shared
+        close_shared_batcher()
+
+
+class TestCostModel:
+    def test_fits_overhead_and_per_item(self):
+        model = BatchCostModel(alpha=0.5)
+        for n in (1, 4, 8, 2, 6) * 4:
+            model.update(n, 0.010 + 0.002 * n)
+        assert model.per_item == pytest.approx(0.002, rel=0.05)
+        assert model.overhead == pytest.approx(0.010, rel=0.05)
+        assert model.max_items_within(0.030, 16) == 10
+
+    def test_from_config(self, closing):
+        config = SimpleNamespace(dynamic_batching=False, max_batch_size=4, batch_timeout_seconds=0.2,
+                                 batch_latency_slo_ms=50.0, background_latency_slo_ms=800.0)
+        batcher = create_batcher_from_config(Recorder(), config)
+        closing(batcher)
+        assert batcher.dynamic is False and batcher.max_batch_size == 4
+        assert batcher.lanes == {"live": 0.05, "background": 0.8}
@@ -0,0 +1,145 @@
+# ========================================
+# Unit Tests for Frame Pipeline
+# ========================================
+
+import pytest
+import numpy as np
+import sys
+import time
+from unittest.mock import patch
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from frame_pipeline import DropOldestQueue, StageStats, FramePipeline, LatestFrameReader
+
+
+class FakeCapture:
+    """VideoCapture ปลอมที่คืนเฟรมสุ่มตามจังหวะที่กำหนด"""
+
+    def __init__(self, source, interval=0.002):
+        self.source = source
+        self.interval = interval
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        time.sleep(self.interval)
+        return True, np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+
+class TestDropOldestQueue:
+    """Test cases สำหรับ DropOldestQueue"""
+
+    def test_drops_oldest_when_full(self):
+        """ทดสอบว่า queue เต็มแล้วทิ้ง item เก่าสุด"""
+        q = DropOldestQueue(maxsize=2)
+        for i in range(5):
+            q.put(i)
+
+        assert q.dropped == 3
+        assert q.get(timeout=0.1) == 3
+        assert q.get(timeout=0.1) == 4
+
+
+class TestStageStats:
+    """Test cases สำหรับ StageStats"""
+
+    def test_snapshot_values(self):
+        """ทดสอบการคำนวณค่าสถิติ"""
+        stats = StageStats("inference")
+        for ms in range(1, 101):
+            stats.record(ms / 1000.0)
+
+        snapshot = stats.snapshot()
+        assert snapshot["count"] == 100
+        assert snapshot["max_ms"] == pytest.approx(100.0)
+        assert snapshot["avg_ms"] == pytest.approx(50.5)
+        assert snapshot["p50_ms"] == pytest.approx(50.0)
+        assert snapshot["p95_ms"] == pytest.approx(95.0)
+
+
+class TestFramePipeline:
+    """Test cases สำหรับ FramePipeline"""
+
+    def test_slow_output_does_not_stall_inference(self):
+        """ทดสอบว่า output stage ที่ช้า (เช่น Firebase timeout) ไม่ถ่วง inference"""
+        outputs = []
+
+        def slow_output(packet):
+            time.sleep(0.2)
+            outputs.append(packet.frame_id)
+
+        with patch("frame_pipeline.cv2.VideoCapture", FakeCapture):
+            pipeline = FramePipeline(
+                source=0,
+                infer_fn=lambda frame: {"mean": float(frame.mean())},
+                output_fn=slow_output,
+                frame_queue_size=2,
+                output_queue_size=2
+            )
+            pipeline.start()
+            time.sleep(0.5)
+            stats = pipeline.get_stats()
+            pipeline.stop()
+
+        assert stats["stages"]["inference"]["count"] > 20
+        assert stats["stages"]["output"]["count"] <= 3
+        assert stats["queues"]["output"]["dropped"] > 0
+        assert 1 <= len(outputs) <= 3
+
+    def test_display_packet_carries_result(self):
+        """ทดสอบว่า main thread ได้รับผล inference สำหรับแสดงผล"""
+        with patch("frame_pipeline.cv2.VideoCapture", FakeCapture):
+            pipeline = FramePipeline(source=0, infer_fn=lambda frame: {"detected": True})
+            pipeline.start()
+            packet = None
+            for _ in range(50):
+                packet = pipeline.get_display_packet(timeout=0.05)
+                if packet is not None:
+                    break
+            pipeline.stop()
+
+        assert packet is not None
+        assert packet.result == {"detected": True}
+        assert packet.frame.shape == (48, 64, 3)
+
+    def test_unopened_source_raises(self):
+        """ทดสอบกรณีเปิดกล้องไม่ได้"""
+        class ClosedCapture(FakeCapture):
+            def isOpened(self):
+                return False
+
+        with patch("frame_pipeline.cv2.VideoCapture", ClosedCapture):
+            pipeline = FramePipeline(source=3, infer_fn=lambda frame: None)
+            with pytest.raises(RuntimeError):
+                pipeline.start()
+
+
+class TestLatestFrameReader:
+    """Test cases สำหรับ LatestFrameReader (multi-camera station)"""
+
+    def test_readers_keep_only_latest_frame(self):
+        """ทดสอบว่าแต่ละ source อ่านแยกกันและเก็บเฉพาะเฟรมล่าสุด"""
+        with patch("frame_pipeline.cv2.VideoCapture", FakeCapture):
+            readers = [LatestFrameReader(source, name=f"cam{source}") for source in (0, 1)]
+            for reader in readers:
+                reader.start()
+            time.sleep(0.1)
+            packets = [reader.read_latest(timeout=0.5) for reader in readers]
+            for reader in readers:
+                reader.stop()
+
+        assert all(packet is not None for packet in packets)
+        assert all(reader.frames_read > 5 for reader in readers)
+        assert all(reader.dropped > 0 for reader in readers)
+        assert not any(reader.alive for reader in readers)
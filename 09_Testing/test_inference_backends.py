@@ -0,0 +1,133 @@
+# ========================================
+# Unit Tests for Inference Backends
+# ========================================
+
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from inference_backends import (
+    BACKENDS,
+    DetectionBackend,
+    Detections,
+    available_backends,
+    benchmark_backends,
+    create_backend,
+    create_backend_from_config,
+    decode_ultralytics_output,
+    letterbox,
+    register_backend,
+)
+
+
+@register_backend("fake")
+class FakeBackend(DetectionBackend):
+    """Backend ปลอมที่คืน box เต็มเฟรมหนึ่งกล่องต่อภาพ"""
+
+    def load(self):
+        self.batches = []
+
+    def _predict_batch(self, frames):
+        self.batches.append(len(frames))
+        return [
+            Detections([[0, 0, f.shape[1], f.shape[0]]], [0.9], [0])
+            for f in frames
+        ]
+
+
+class TestRegistry:
+    """Test cases สำหรับ registry และ factory"""
+
+    def test_builtin_backends_registered(self):
+        """ทดสอบว่า backend มาตรฐานลงทะเบียนครบ"""
+        for name in ("opencv_dnn", "ultralytics", "onnxruntime", "tflite"):
+            assert name in available_backends()
+
+    def test_unknown_backend_raises(self):
+        """ทดสอบชื่อ backend ที่ไม่มี"""
+        with pytest.raises(ValueError):
+            create_backend("does_not_exist", model_path="x")
+
+    def test_create_from_config(self):
+        """ทดสอบการอ่านค่าจาก config class"""
+        class Config:
+            INFERENCE_BACKEND = "onnxruntime"
+            MODEL_PATH = "best.onnx"
+            CONF_THRESHOLD = 0.8
+            IMG_SIZE = 416
+            TARGET_CLASS_ID = 0
+            ONNX_NUM_THREADS = 2
+
+        backend = create_backend_from_config(Config)
+
+        assert backend.name == "onnxruntime"
+        assert backend.num_threads == 2
+        assert backend.conf_threshold == 0.8
+        assert backend.img_size == 416
+        assert backend.classes == [0]
+
+    def test_predict_loads_lazily_and_batches(self):
+        """ทดสอบว่า predict โหลด model ครั้งแรกและส่งทั้ง batch"""
+        backend = BACKENDS["fake"](model_path="fake.pt", img_size=32)
+        frames = [np.zeros((48, 64, 3), dtype=np.uint8)] * 3
+
+        results = backend.predict(frames)
+
+        assert backend.loaded is True
+        assert backend.batches == [3]
+        assert results[0].boxes.tolist() == [[0, 0, 64, 48]]
+        assert backend.predict([]) == []
+
+    def test_benchmark_reports_each_backend(self):
+        """ทดสอบ benchmark_backends"""
+        backend = create_backend("fake", model_path="fake.pt", img_size=32)
+        frames = [np.zeros((48, 64, 3), dtype=np.uint8)]
+
+        results = benchmark_backends([backend], frames, runs=3, batch_size=2)
+
+        assert set(results["fake"]) == {"mean_ms", "p95_ms", "fps", "detections"}
+        assert results["fake"]["detections"] == 6
+
+
+class TestUltralyticsDecoding:
+    """Test cases สำหรับการแปลง output ของ ONNX/TFLite"""
+
+    def test_letterbox_keeps_aspect_ratio(self):
+        """ทดสอบ letterbox ของภาพแนวนอน"""
+        image, scale, pad = letterbox(np.zeros((480, 640, 3), dtype=np.uint8), 320)
+
+        assert image.shape == (320, 320, 3)
+        assert scale == pytest.approx(0.5)
+        assert pad == (0, 40)
+
+    def test_decode_maps_back_to_frame(self):
+        """ทดสอบการแปลงพิกัดกลับเป็นเฟรมจริงและ NMS"""
+        # 3 anchors, 2 classes: (4 + 2, A)
+        output = np.zeros((6, 3), dtype=np.float32)
+        output[:4, 0] = [160, 160, 40, 40]   # class 0, 0.9
+        output[:4, 1] = [162, 160, 40, 40]   # ซ้อนกับตัวแรก -> ถูกตัดด้วย NMS
+        output[:4, 2] = [80, 100, 20, 20]    # class 1, 0.7
+        output[4, :] = [0.9, 0.8, 0.1]
+        output[5, :] = [0.0, 0.0, 0.7]
+
+        detections = decode_ultralytics_output(output, 0.5, (0, 40), (480, 640, 3), 0.5, 0.45)
+
+        assert len(detections) == 2
+        assert detections.class_ids.tolist() == [0, 1]
+        assert detections.boxes[0].tolist() == pytest.approx([280, 200, 360, 280])
+        assert detections.to_list(["bottle", "cup"])[1]["class"] == "cup"
+
+    def test_decode_filters_classes(self):
+        """ทดสอบการกรองเฉพาะ class ที่ต้องการ"""
+        output = np.zeros((3, 6), dtype=np.float32)
+        output[:, :4] = [100, 100, 10, 10]
+        output[:, 4] = [0.9, 0.0, 0.2]
+        output[:, 5] = [0.0, 0.8, 0.1]
+
+        detections = decode_ultralytics_output(output.T, 1.0, (0, 0), (640, 640, 3), 0.5, 0.45, classes=[1])
+
+        assert detections.class_ids.tolist() == [1]
@@ -0,0 +1,92 @@
+# ========================================
+# Unit Tests for Model Cache
+# ========================================
+
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "15_Performance"))
+
+from model_cache import ModelCache
+
+
+class TinyModel:
+    """model ปลอมที่มี state_dict() เหมือน torch nn.Module"""
+
+    def __init__(self, weights=None):
+        self.weights = weights or {"fc.weight": np.ones((4, 4), dtype=np.float32), "fc.bias": np.zeros(4, dtype=np.float32)}
+
+    def state_dict(self):
+        return self.weights
+
+
+class CountingLoader:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return TinyModel()
+
+
+def make_config(storage):
+    return SimpleNamespace(model_cache_enabled=True, model_cache_size=5, model_cache_size_mb=64,
+                           model_cache_ttl_hours=1, model_cache_storage=storage)
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return ModelCache(make_config("disk"), cache_dir=str(tmp_path / "tensors"))
+
+
+class TestModelCache:
+    """ทดสอบว่า get_model คืน model object จากทุก tier"""
+
+    def test_disk_get_model_twice_returns_same_type(self, disk_cache):
+        loader = CountingLoader()
+        first = disk_cache.get_model("yolo", loader=loader, builder=TinyModel)
+        second = disk_cache.get_model("yolo", loader=loader, builder=TinyModel)
+        assert isinstance(first, TinyModel) and second is first
+        assert loader.calls == 1
+
+    def test_disk_tier_rebuilds_model_with_builder(self, disk_cache, tmp_path):
+        disk_cache.get_model("yolo", loader=CountingLoader(), builder=TinyModel)
+
+        # process ใหม่ (memory tier ว่าง) -> สร้างกลับจาก weights บน disk ไม่ต้องเรียก loader
+        restarted = ModelCache(make_config("disk"), cache_dir=str(tmp_path / "tensors"))
+        loader = CountingLoader()
+        model = restarted.get_model("yolo", loader=loader, builder=TinyModel)
+        assert isinstance(model, TinyModel) and loader.calls == 0
+        np.testing.assert_array_equal(model.weights["fc.weight"], np.ones((4, 4)))
+        assert restarted.get_stats()["storage_hits"] == 1
+
+    def test_disk_without_builder_falls_back_to_loader(self, disk_cache, tmp_path):
+        disk_cache.get_model("yolo", loader=CountingLoader())
+        restarted = ModelCache(make_config("disk"), cache_dir=str(tmp_path / "tensors"))
+        loader = CountingLoader()
+        assert isinstance(restarted.get_model("yolo", loader=loader), TinyModel)
+        assert loader.calls == 1
+        assert set(restarted.get_weights("yolo")) == {"fc.weight", "fc.bias"}
+
+    def test_concurrent_misses_load_once(self):
+        cache = ModelCache(make_config("memory"))
+        loader = CountingLoader(delay=0.05)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_model("yolo", loader=loader)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert loader.calls == 1 and len({id(model) for model in results}) == 1
+        stats = cache.get_stats()
+        assert stats["shared_loads"] + stats["hits"] == 3
@@ -0,0 +1,126 @@
+# ========================================
+# Unit Tests for Model Export Cache
+# ========================================
+
+import pytest
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from model_export_cache import ModelExportCache, export_model_from_config, warmup_model
+
+
+class CountingExporter:
+    """exporter แทน Ultralytics: เขียนไฟล์ข้าง weights แล้วนับจำนวนครั้งที่ export"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, weights_path, fmt, img_size, device, **kwargs):
+        self.calls.append((fmt, img_size, device, kwargs))
+        exported = str(Path(weights_path).with_suffix(".onnx"))
+        Path(exported).write_bytes(b"onnx-model")
+        return exported
+
+
+@pytest.fixture
+def weights(tmp_path):
+    path = tmp_path / "best.pt"
+    path.write_bytes(b"weights-v1")
+    return str(path)
+
+
+@pytest.fixture
+def exporter():
+    return CountingExporter()
+
+
+@pytest.fixture
+def cache(tmp_path, exporter):
+    return ModelExportCache(str(tmp_path / "model_cache"), exporter=exporter)
+
+
+class TestModelExportCache:
+    """ทดสอบการ export ครั้งเดียวและการใช้ไฟล์ใน cache"""
+
+    def test_second_start_uses_cache(self, cache, exporter, weights):
+        path, hit = cache.get_or_export(weights, "onnx", 640, "cpu")
+        assert not hit and os.path.exists(path)
+        assert not os.path.exists(str(Path(weights).with_suffix(".onnx")))  # ย้ายเข้า cache แล้ว
+
+        again, hit = cache.get_or_export(weights, "onnx", 640, "cpu")
+        assert hit and again == path
+        assert len(exporter.calls) == 1
+
+    def test_key_depends_on_weights_size_and_device(self, cache, weights):
+        base = cache.cache_key(weights, "onnx", 640, "cpu")
+        assert cache.cache_key(weights, "onnx", 416, "cpu") != base
+        assert cache.cache_key(weights, "onnx", 640, "cuda") != base
+        assert cache.cache_key(weights, "onnx", 640, "cpu", int8=True) != base
+
+        Path(weights).write_bytes(b"weights-v2")  # retrain -> export ใหม่
+        assert cache.cache_key(weights, "onnx", 640, "cpu") != base
+
+    def test_retrained_weights_exported_again(self, cache, exporter, weights):
+        cache.get_or_export(weights, "onnx", 640, "cpu")
+        Path(weights).write_bytes(b"weights-v2")
+        _, hit = cache.get_or_export(weights, "onnx", 640, "cpu")
+        assert not hit and len(exporter.calls) == 2
+        assert len(cache.entries()) == 2
+
+    def test_int8_passed_to_exporter(self, cache, exporter, weights):
+        cache.get_or_export(weights, "openvino", 640, "cpu", int8=True, data="bottles.yaml")
+        assert exporter.calls[0][3]["int8"] is True
+        assert exporter.calls[0][3]["data"] == "bottles.yaml"
+
+    def test_unknown_format(self, cache, weights):
+        with pytest.raises(ValueError):
+            cache.get_or_export(weights, "coreml", 640, "cpu")
+
+    def test_clear(self, cache, weights):
+        cache.get_or_export(weights, "onnx", 640, "cpu")
+        cache.clear()
+        assert cache.entries() == []
+
+
+class TestExportFromConfig:
+    """ทดสอบการเลือก option ของ export จาก config"""
+
+    def make_config(self, weights, **overrides):
+        values = dict(MODEL_PATH=weights, MODEL_EXPORT_FORMAT="onnx", IMG_SIZE=640, DEVICE="cpu",
+                      ROI_ENABLED=False, ADAPTIVE_ENABLED=False)
+        values.update(overrides)
+        return SimpleNamespace(**values)
+
+    def test_adaptive_imgsz_exports_dynamic_shape(self, cache, exporter, weights):
+        """controller เปลี่ยน imgsz ระหว่างรัน -> model ที่ export ต้องรับ input ได้หลายขนาด"""
+        path, fmt, _ = export_model_from_config(self.make_config(weights, ADAPTIVE_ENABLED=True), cache)
+        assert fmt == "onnx" and path.endswith(".onnx")
+        assert exporter.calls[0][3]["dynamic"] is True
+
+    def test_fixed_imgsz_exports_static_shape(self, cache, exporter, weights):
+        export_model_from_config(self.make_config(weights), cache)
+        assert exporter.calls[0][3]["dynamic"] is False
+
+    def test_pt_format_skips_export(self, cache, exporter, weights):
+        assert export_model_from_config(self.make_config(weights, MODEL_EXPORT_FORMAT=""), cache) == (weights, "pt", False)
+        assert exporter.calls == []
+
+
+class TestWarmup:
+    """ทดสอบ warmup ด้วยเฟรมว่าง"""
+
+    def test_runs_dummy_frames(self):
+        calls = []
+
+        class RecordingModel:
+            def predict(self, source, **kwargs):
+                calls.append((source.shape, kwargs["imgsz"]))
+
+        timings = warmup_model(RecordingModel(), img_size=416, runs=3)
+        assert len(timings) == 3
+        assert calls == [((416, 416, 3), 416)] * 3
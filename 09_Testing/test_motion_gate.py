@@ -0,0 +1,136 @@
+# ========================================
+# Unit Tests for Motion Gate
+# ========================================
+
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+import motion_gate
+from motion_gate import MotionGate, create_motion_gate_from_config
+
+
+class FakeClock:
+    """แทน time.monotonic เพื่อให้ทดสอบ hold / idle refresh ได้แน่นอน"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(motion_gate.time, "monotonic", fake)
+    return fake
+
+
+def static_frame():
+    return np.full((240, 320, 3), 80, dtype=np.uint8)
+
+
+def frame_with_box(x):
+    frame = static_frame()
+    frame[80:160, x:x + 60] = 255
+    return frame
+
+
+class TestMotionGate:
+    """ทดสอบการตัดสินใจรัน inference"""
+
+    def test_static_scene_skipped_until_refresh(self, clock):
+        """ฉากนิ่งรันเฉพาะเฟรมแรกและรอบ idle refresh"""
+        gate = MotionGate(hold_seconds=1.0, idle_refresh=5.0)
+        decisions = []
+        for _ in range(100):
+            decisions.append(gate.should_infer(static_frame()))
+            clock.now += 0.033
+        # เฟรมแรก + ตื่นต่อช่วง hold + refresh ทุก 5 วินาที
+        assert decisions[0] is True
+        assert sum(decisions) < 15
+        assert gate.get_stats()["skipped"] > 85
+
+    def test_motion_wakes_gate(self, clock):
+        """มีวัตถุเคลื่อนที่ -> รัน inference ตามอัตรา skip"""
+        gate = MotionGate(skip_frames=0, max_skip=0, hold_seconds=1.0, idle_refresh=60.0)
+        for _ in range(60):
+            gate.should_infer(static_frame())
+            clock.now += 0.033
+        assert not gate.awake
+
+        decisions = []
+        for x in range(0, 200, 10):
+            decisions.append(gate.should_infer(frame_with_box(x)))
+            clock.now += 0.033
+        assert gate.awake
+        assert all(decisions)
+
+    def test_busy_scene_uses_skip_frames(self, clock):
+        """ฉากยุ่งใช้ SKIP_FRAMES ส่วนฉากเคลื่อนไหวน้อยข้ามได้ถึง max_skip"""
+        gate = MotionGate(skip_frames=1, max_skip=4)
+        assert gate.current_skip == 4
+        gate.activity = 1.0
+        assert gate.current_skip == 1
+
+        decisions = []
+        for x in range(0, 240, 10):
+            decisions.append(gate.should_infer(frame_with_box(x)))
+            clock.now += 0.033
+        # รันประมาณทุกเฟรมเว้นเฟรม
+        assert 8 <= sum(decisions) <= 14
+
+    def test_detections_keep_gate_awake(self, clock):
+        """ยังเจอขวดอยู่ -> ตื่นต่อแม้ภาพจะนิ่ง"""
+        gate = MotionGate(hold_seconds=1.0, idle_refresh=60.0)
+        gate.should_infer(static_frame())
+        clock.now += 2.0
+        assert not gate.awake
+        gate.notify_detections(2)
+        assert gate.awake
+        gate.notify_detections(0)
+        clock.now += 1.5
+        assert not gate.awake
+
+    def test_skip_floor_keeps_configured_base(self):
+        """set_skip_floor เพิ่มการข้ามได้ และ floor 0 คืนค่าที่ตั้งไว้ตอนสร้าง"""
+        gate = MotionGate(skip_frames=1, max_skip=4)
+        gate.set_skip_floor(6)
+        assert (gate.skip_frames, gate.max_skip) == (6, 6)
+        gate.set_skip_floor(2)
+        assert (gate.skip_frames, gate.max_skip) == (2, 4)
+        gate.set_skip_floor(0)
+        assert (gate.skip_frames, gate.max_skip) == (1, 4)
+
+
+class TestMotionGateConfig:
+    """ทดสอบการสร้าง gate จาก config"""
+
+    def test_disabled_returns_none(self):
+        class Config:
+            MOTION_GATE = False
+            SKIP_FRAMES = 0
+        assert create_motion_gate_from_config(Config) is None
+
+    def test_fixed_skip_fallback(self, clock):
+        """ปิด motion gate แต่ตั้ง SKIP_FRAMES -> ข้ามเฟรมคงที่"""
+        class Config:
+            MOTION_GATE = False
+            SKIP_FRAMES = 2
+        gate = create_motion_gate_from_config(Config)
+        decisions = [gate.should_infer(static_frame()) for _ in range(9)]
+        assert decisions == [True, False, False] * 3
+
+    def test_reads_motion_keys(self):
+        class Config:
+            MOTION_GATE = True
+            SKIP_FRAMES = 1
+            MOTION_MAX_SKIP = 6
+            MOTION_IDLE_REFRESH = 3.0
+        gate = create_motion_gate_from_config(Config)
+        assert (gate.skip_frames, gate.max_skip, gate.idle_refresh) == (1, 6, 3.0)
@@ -0,0 +1,60 @@
+# ========================================
+# Unit Tests for Overlay Renderer
+# ========================================
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from overlay_renderer import InfoOverlay, benchmark_overlay, draw_info_legacy
+
+
+def make_frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+
+TEXTS = ["YOLOv11 P2P Detection System", "Total Bottles: 3", "Total Points: 30"]
+
+
+class TestInfoOverlay:
+    """ทดสอบกล่องข้อมูลแบบ cache"""
+
+    def test_redraw_only_when_text_changes(self):
+        overlay = InfoOverlay()
+        for _ in range(5):
+            overlay.render(make_frame(), TEXTS)
+        assert overlay.redraws == 1 and overlay.renders == 5
+
+        overlay.render(make_frame(), TEXTS[:1] + ["Total Bottles: 4", "Total Points: 40"])
+        assert overlay.redraws == 2
+
+    def test_matches_legacy_drawing(self):
+        """ผลลัพธ์ต่างจากวิธีเดิมแค่ขอบ antialias ของตัวอักษร"""
+        frame = make_frame()
+        legacy = draw_info_legacy(frame.copy(), TEXTS)
+        cached = InfoOverlay().render(frame.copy(), TEXTS)
+        diff = np.abs(legacy.astype(int) - cached.astype(int)).max(axis=2)
+        assert (diff > 1).mean() < 0.01
+
+    def test_only_box_region_modified(self):
+        frame = make_frame()
+        original = frame.copy()
+        result = InfoOverlay(rect=(10, 10, 450, 140)).render(frame, TEXTS)
+        assert result is frame  # วาดลงเฟรมเดิม ไม่ copy
+        assert np.array_equal(frame[141:], original[141:])
+        assert np.array_equal(frame[:, 451:], original[:, 451:])
+        assert not np.array_equal(frame[10:141, 10:451], original[10:141, 10:451])
+
+    def test_box_clipped_to_small_frame(self):
+        frame = np.zeros((60, 80, 3), dtype=np.uint8)
+        InfoOverlay().render(frame, TEXTS)
+        assert frame.shape == (60, 80, 3)
+
+    def test_benchmark_keys(self):
+        result = benchmark_overlay(frames=20, count_every=10)
+        assert {"no_overlay_fps", "legacy_fps", "cached_fps"} <= set(result)
+        assert result["frames"] == 20 and result["redraws"] <= 20
@@ -0,0 +1,162 @@
+# ========================================
+# Unit Tests for Replay Benchmark Harness
+# ========================================
+
+import pytest
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import requests
+import serial
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent))
+
+from replay_benchmark import (
+    FirebaseStub, ReplayArduino, ReplaySource,
+    compare_results, counting_accuracy, instrument, load_ground_truth, summarize
+)
+from frame_pipeline import StageStats
+from serial_protocol import create_codec
+
+
+def write_frames(folder, count=6, size=(64, 48)):
+    """สร้างโฟลเดอร์ภาพ frame_000.png ... ที่ค่าสีบอกลำดับเฟรม"""
+    folder.mkdir(exist_ok=True)
+    for i in range(count):
+        frame = np.full((size[1], size[0], 3), i * 10, dtype=np.uint8)
+        cv2.imwrite(str(folder / f"frame_{i:03d}.png"), frame)
+    return folder
+
+
+class TestReplaySource:
+    """ทดสอบการอ่านเฟรมจากโฟลเดอร์ภาพแทนกล้อง"""
+
+    def test_reads_all_frames_in_order(self, tmp_path):
+        source = ReplaySource(write_frames(tmp_path / "clip"))
+        assert source.isOpened()
+        values = []
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            values.append(int(frame[0, 0, 0]))
+        assert values == [0, 10, 20, 30, 40, 50]
+        assert source.frames_read == 6 and source.dropped == 0
+        assert source.loop_stats.count == 6
+
+    def test_max_frames_and_properties(self, tmp_path):
+        source = ReplaySource(write_frames(tmp_path / "clip"), fps=12, max_frames=2)
+        assert source.get(cv2.CAP_PROP_FPS) == 12
+        assert source.get(cv2.CAP_PROP_FRAME_COUNT) == 6
+        assert source.set(cv2.CAP_PROP_FRAME_WIDTH, 1280) is False
+        assert source.read()[0] and source.read()[0]
+        assert source.read() == (False, None)
+
+    def test_realtime_drops_late_frames(self, tmp_path):
+        """speed > 0: loop ที่ช้ากว่าวิดีโอต้องข้ามเฟรมเหมือนกล้องจริง"""
+        source = ReplaySource(write_frames(tmp_path / "clip", count=20), fps=100, speed=1.0)
+        source.read()
+        time.sleep(0.05)  # ช้าไป ~5 เฟรม
+        ret, frame = source.read()
+        assert ret and source.dropped >= 3
+        assert int(frame[0, 0, 0]) == source.dropped * 10 + 10
+
+
+class TestStub:
+    """ทดสอบ HTTP stub และ serial จำลอง"""
+
+    def test_stub_counts_requests(self):
+        stub = FirebaseStub().start()
+        try:
+            with requests.Session() as session:
+                response = session.patch(f"{stub.url}/.json", json={"a/b": {"bottle_count": 1}}, timeout=5)
+                assert response.status_code == 200
+                assert response.json() == {"a/b": {"bottle_count": 1}}
+                assert session.get(f"{stub.url}/bottle_data.json", timeout=5).json() is None
+        finally:
+            stub.close()
+        summary = stub.summary()
+        assert summary["requests"] == 2
+        assert summary["by_method"] == {"PATCH": 1, "GET": 1}
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="pty not available")
+    def test_pty_device_counts_commands(self):
+        device = ReplayArduino("text", reply=True).start()
+        port = serial.Serial(device.port, timeout=1.0)
+        codec = create_codec("text")
+        try:
+            for command in ("BOTTLE_DETECTED", "COUNT:1", "COUNT:2"):
+                port.write(codec.encode_command(command))
+            replies = []
+            deadline = time.time() + 2.0
+            while len(replies) < 3 and time.time() < deadline:
+                replies.extend(codec.feed(port.read(max(1, port.in_waiting))))
+        finally:
+            port.close()
+            device.close()
+        assert device.commands == {"BOTTLE_DETECTED": 1, "COUNT": 2}
+        assert replies[-1] == "✅ COUNT:2"
+
+
+class TestResults:
+    """ทดสอบการสรุปผลและการเทียบกับ baseline"""
+
+    def make_result(self, fps=20.0, counted=10, truth=10, requests_made=12, inference_ms=30.0):
+        stats = StageStats("inference")
+        for _ in range(5):
+            stats.record(inference_ms / 1000)
+        return summarize("v11", "clip.mp4", {"inference": stats}, wall_seconds=10.0, frames=int(fps * 10),
+                         counted=counted, truth=truth, network={"requests": requests_made},
+                         serial_commands={"90": 3})
+
+    def test_summary_fields(self):
+        result = self.make_result(counted=8, truth=10)
+        assert result["fps"] == pytest.approx(20.0)
+        assert result["counting"] == {"counted": 8, "ground_truth": 10, "error": -2, "accuracy": 0.8}
+        assert result["network"]["per_bottle"] == pytest.approx(1.5)
+        assert result["stages"]["inference"]["p95_ms"] == pytest.approx(30.0)
+        json.dumps(result)  # ต้องบันทึกเป็น JSON ได้
+
+    def test_counting_accuracy(self):
+        assert counting_accuracy(10, 10) == 1.0
+        assert counting_accuracy(13, 10) == pytest.approx(0.7)
+        assert counting_accuracy(5, 0) == 0.0
+        assert counting_accuracy(3, None) is None
+
+    def test_ground_truth_sidecar(self, tmp_path):
+        clip = tmp_path / "line1.mp4"
+        (tmp_path / "line1.json").write_text(json.dumps({"bottles": 7}))
+        folder = write_frames(tmp_path / "frames", count=1)
+        (folder / "truth.json").write_text(json.dumps({"bottles": 3}))
+        assert load_ground_truth(clip) == 7
+        assert load_ground_truth(folder) == 3
+        assert load_ground_truth(clip, truth=9) == 9
+        assert load_ground_truth(tmp_path / "other.mp4") is None
+
+    def test_compare_with_baseline(self):
+        baseline = self.make_result()
+        assert compare_results(self.make_result(fps=19.0), baseline) == []
+        regressions = compare_results(
+            self.make_result(fps=15.0, counted=9, requests_made=20, inference_ms=45.0), baseline)
+        assert len(regressions) == 4
+        assert regressions[0].startswith("fps")
+
+    def test_instrument_stream_results(self):
+        """predict(stream=True) ต้องจับเวลาทีละผลลัพธ์ ไม่ใช่ตอนสร้าง generator"""
+        class Model:
+            def predict(self, source=None, stream=False):
+                if stream:
+                    return (i for i in range(3))
+                return [source]
+
+        model, stats = Model(), StageStats("inference")
+        instrument(model, "predict", stats)
+        assert model.predict(source=1) == [1]
+        assert list(model.predict(stream=True)) == [0, 1, 2]
+        assert stats.count == 4
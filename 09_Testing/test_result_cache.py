@@ -0,0 +1,116 @@
+# ========================================
+# Unit Tests for Detection Result Cache
+# ========================================
+
+import cv2
+import numpy as np
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+import result_cache
+from result_cache import DetectionResultCache, create_result_cache_from_config, dhash, hamming
+
+
+def scene(x=100):
+    frame = np.full((240, 320, 3), 60, dtype=np.uint8)
+    cv2.rectangle(frame, (x, 60), (x + 50, 200), (230, 230, 230), -1)
+    cv2.circle(frame, (260, 60), 25, (0, 0, 200), -1)
+    return frame
+
+
+def reencode(frame, quality=70):
+    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+DETECTIONS = [{"class": "bottle", "confidence": 0.9, "bbox": [100, 60, 150, 200], "center": [125, 130]}]
+
+
+class TestPerceptualHash:
+    """ทดสอบ dHash"""
+
+    def test_reencoded_image_is_close(self):
+        original = scene()
+        assert hamming(dhash(original), dhash(reencode(original))) <= 6
+
+    def test_different_scene_is_far(self):
+        assert hamming(dhash(scene(40)), dhash(scene(200))) > 20
+
+    def test_hash_bits(self):
+        assert dhash(scene(), hash_size=8).bit_length() <= 64
+
+
+class TestResultCache:
+    """ทดสอบ LRU + TTL + Hamming tolerance"""
+
+    def test_hit_on_near_duplicate(self):
+        cache = DetectionResultCache(max_distance=6)
+        original = scene()
+        cache.put(cache.image_hash(original), original.shape, "yolo", 0.5, DETECTIONS)
+
+        retry = reencode(original)
+        assert cache.get(cache.image_hash(retry), retry.shape, "yolo", 0.5) == DETECTIONS
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["hit_rate"] == 1.0
+
+    def test_key_includes_model_threshold_and_size(self):
+        cache = DetectionResultCache()
+        frame = scene()
+        image_hash = cache.image_hash(frame)
+        cache.put(image_hash, frame.shape, "yolo", 0.5, DETECTIONS)
+        assert cache.get(image_hash, frame.shape, "yolo", 0.7) is None
+        assert cache.get(image_hash, frame.shape, "custom", 0.5) is None
+        assert cache.get(image_hash, (480, 640, 3), "yolo", 0.5) is None
+        assert cache.get_stats()["misses"] == 3
+
+    def test_exact_match_only(self):
+        cache = DetectionResultCache(max_distance=0)
+        cache.put(0b1010, (10, 10), "yolo", 0.5, DETECTIONS)
+        assert cache.get(0b1011, (10, 10), "yolo", 0.5) is None
+        assert cache.get(0b1010, (10, 10), "yolo", 0.5) == DETECTIONS
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+        cache = DetectionResultCache(ttl=5.0)
+        cache.put(1, (10, 10), "yolo", 0.5, DETECTIONS)
+        now[0] += 6.0
+        assert cache.get(1, (10, 10), "yolo", 0.5) is None
+        assert cache.get_stats()["expired"] == 1 and cache.get_stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        cache = DetectionResultCache(max_entries=2, max_distance=0)
+        cache.put(1, (10, 10), "yolo", 0.5, [])
+        cache.put(2, (10, 10), "yolo", 0.5, [])
+        cache.get(1, (10, 10), "yolo", 0.5)  # 1 ถูกใช้ล่าสุด -> 2 ถูก evict
+        cache.put(3, (10, 10), "yolo", 0.5, [])
+        assert cache.get(2, (10, 10), "yolo", 0.5) is None
+        assert cache.get(1, (10, 10), "yolo", 0.5) == []
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_returned_detections_are_copies(self):
+        cache = DetectionResultCache()
+        cache.put(1, (10, 10), "yolo", 0.5, DETECTIONS)
+        first = cache.get(1, (10, 10), "yolo", 0.5)
+        first[0]["confidence"] = 0.1
+        assert cache.get(1, (10, 10), "yolo", 0.5)[0]["confidence"] == 0.9
+
+
+class TestResultCacheConfig:
+    def test_disabled_by_default(self):
+        class Config:
+            pass
+
+        assert create_result_cache_from_config(Config) is None
+
+    def test_from_config(self):
+        class Config:
+            API_RESULT_CACHE = True
+            API_RESULT_CACHE_SIZE = 16
+            API_RESULT_CACHE_MAX_DISTANCE = 0
+
+        cache = create_result_cache_from_config(Config)
+        assert cache.max_entries == 16 and cache.max_distance == 0
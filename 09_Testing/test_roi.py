@@ -0,0 +1,98 @@
+# ========================================
+# Unit Tests for ROI Cropping
+# ========================================
+
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from roi import RegionOfInterest, RoiCalibrator, suggest_roi, create_roi_from_config
+
+FRAME_SHAPE = (480, 640, 3)
+
+
+class TestRegionOfInterest:
+    """ทดสอบการครอปและแปลงพิกัด"""
+
+    def test_resolve_aligned_to_stride(self):
+        """ขนาด ROI เป็นพหุคูณของ 32 และอยู่ในเฟรม"""
+        roi = RegionOfInterest((0.3, 0.1, 0.62, 0.83))
+        x1, y1, x2, y2 = roi.resolve(FRAME_SHAPE)
+        assert (x2 - x1) % 32 == 0 and (y2 - y1) % 32 == 0
+        assert x1 <= int(0.3 * 640) and x2 >= int(0.62 * 640)
+        assert 0 <= y1 and y2 <= 480
+
+    def test_resolve_at_frame_edge(self):
+        """ROI ชิดขอบเฟรมต้องเลื่อนเข้ามาแทนการล้นออกนอกเฟรม"""
+        roi = RegionOfInterest((0.9, 0.0, 1.0, 1.0))
+        x1, y1, x2, y2 = roi.resolve(FRAME_SHAPE)
+        assert x2 == 640 and (x2 - x1) % 32 == 0
+        assert (y1, y2) == (0, 480)
+
+    def test_crop_is_view(self):
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        roi = RegionOfInterest((0.25, 0.0, 0.75, 1.0))
+        crop = roi.crop(frame)
+        assert crop.shape == (480, 320, 3)
+        assert np.shares_memory(crop, frame)
+
+    def test_input_size_without_resize(self):
+        """ROI เล็กกว่า max_side -> ส่งขนาดเดิม (ไม่ resize / letterbox)"""
+        roi = RegionOfInterest((0.25, 0.0, 0.75, 1.0))
+        assert roi.input_size(FRAME_SHAPE, 640) == (320, 480)
+        width, height = roi.input_size(FRAME_SHAPE, 416)
+        assert height <= 416 and width % 32 == 0 and height % 32 == 0
+
+    def test_boxes_mapped_back(self):
+        """box ที่เจอในภาพครอปต้องตรงกับตำแหน่งในเฟรมเต็ม"""
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        frame[200:260, 300:340] = 255
+        roi = RegionOfInterest((0.25, 0.0, 0.75, 1.0))
+        crop = roi.crop(frame)
+        ys, xs = np.nonzero(crop[:, :, 0])
+        box = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float32)
+        assert roi.to_frame(box, FRAME_SHAPE).tolist() == [[300, 200, 340, 260]]
+
+        xywh = np.array([[xs.min(), ys.min(), 40, 60]], dtype=np.int32)
+        assert roi.to_frame_xywh(xywh, FRAME_SHAPE).tolist() == [[300, 200, 40, 60]]
+
+    def test_invalid_roi_rejected(self):
+        with pytest.raises(ValueError):
+            RegionOfInterest((0.8, 0.0, 0.2, 1.0))
+
+
+class TestRoiCalibration:
+    """ทดสอบการแนะนำ ROI จาก boxes ในอดีต"""
+
+    def test_suggest_covers_detections(self):
+        rng = np.random.default_rng(0)
+        x1 = rng.uniform(250, 330, 500)
+        y1 = rng.uniform(50, 350, 500)
+        boxes = np.stack([x1, y1, x1 + 40, y1 + 80], axis=1)
+        roi = suggest_roi(boxes, FRAME_SHAPE, margin=0.1, coverage=1.0)
+        assert roi[0] <= 250 / 640 and roi[2] >= 370 / 640
+        assert roi[1] <= 50 / 480 and roi[3] >= 430 / 480
+        assert roi[2] - roi[0] < 0.5
+
+    def test_calibrator_persists(self, tmp_path):
+        path = str(tmp_path / "roi_calibration.npy")
+        calibrator = RoiCalibrator(path)
+        assert calibrator.suggest() is None
+        calibrator.add([[320, 0, 480, 240]], FRAME_SHAPE)
+        calibrator.save()
+
+        reloaded = RoiCalibrator(path)
+        assert len(reloaded) == 1
+        assert reloaded.suggest(margin=0.0) == (0.5, 0.0, 0.75, 0.5)
+
+    def test_config_factory(self):
+        class Config:
+            ROI_ENABLED = False
+            ROI = (0.2, 0.0, 0.8, 1.0)
+        assert create_roi_from_config(Config) is None
+        Config.ROI_ENABLED = True
+        assert create_roi_from_config(Config).roi == (0.2, 0.0, 0.8, 1.0)
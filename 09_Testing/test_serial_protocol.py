@@ -0,0 +1,162 @@
+# ========================================
+# Unit Tests for Serial Protocol
+# ========================================
+
+import pytest
+import os
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from serial_protocol import (
+    ACK_FLAG, OP_COUNT, OP_NACK, OP_SERVO, OP_SIGNAL, OP_STATUS,
+    BinaryCodec, Frame, FrameDecoder, TextCodec,
+    crc16_ccitt, create_codec, encode_frame, measure_round_trip, parse_text_command
+)
+from serial_scheduler import SerialCommandScheduler, PRIORITY_HIGH
+
+
+class TestFraming:
+    """ทดสอบ frame / CRC / decoder"""
+
+    def test_crc_reference_value(self):
+        """CRC-16/CCITT-FALSE ของ "123456789" ต้องเป็น 0x29B1"""
+        assert crc16_ccitt(b"123456789") == 0x29B1
+
+    def test_round_trip(self):
+        data = encode_frame(7, OP_SERVO, bytes([135]))
+        assert len(data) == 7
+        frames = FrameDecoder().feed(data)
+        assert frames == [Frame(7, OP_SERVO, bytes([135]))]
+        assert frames[0].values == (135,)
+
+    def test_split_stream(self):
+        """frame ที่มาเป็นชิ้นๆ ต้องประกอบกลับได้"""
+        data = encode_frame(1, OP_COUNT, struct.pack("<H", 1234)) + encode_frame(2, OP_SIGNAL, b"\x01")
+        decoder = FrameDecoder()
+        frames = []
+        for byte in data:
+            frames.extend(decoder.feed(bytes([byte])))
+        assert [frame.seq for frame in frames] == [1, 2]
+        assert frames[0].values == (1234,)
+
+    def test_corrupted_frame_rejected(self):
+        """byte เสียต้องถูกทิ้งและ decoder หา frame ถัดไปได้"""
+        bad = bytearray(encode_frame(1, OP_SERVO, bytes([45])))
+        bad[4] ^= 0xFF
+        good = encode_frame(2, OP_SERVO, bytes([90]))
+        decoder = FrameDecoder()
+        frames = decoder.feed(bytes(bad) + good)
+        assert [frame.seq for frame in frames] == [2]
+        assert decoder.stats["crc_errors"] == 1
+
+    def test_debug_text_between_frames(self):
+        """ข้อความ debug ของ sketch ที่ปนมาต้องไม่ทำให้ frame หาย"""
+        noise = "🔧 Servo moved to: 45°\r\n".encode()
+        ack = encode_frame(3, OP_SERVO | ACK_FLAG, bytes([45]))
+        frames = FrameDecoder().feed(noise + ack + noise)
+        assert len(frames) == 1
+        assert frames[0].is_ack and frames[0].command == OP_SERVO
+
+    def test_status_ack_and_nack(self):
+        status = Frame(4, OP_STATUS | ACK_FLAG, struct.pack("<HH", 12, 120))
+        assert status.values == (12, 120)
+        nack = Frame(5, OP_NACK, b"\x01")
+        assert nack.is_nack and not nack.is_ack and nack.values == (1,)
+
+
+class TestCodecs:
+    """ทดสอบ codec text / binary"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("90", (OP_SIGNAL, 1)),
+        ("0", (OP_SIGNAL, 0)),
+        ("SERVO:135", (OP_SERVO, 135)),
+        ("COUNT:42", (OP_COUNT, 42)),
+        ("reset", (5, None)),
+    ])
+    def test_parse_text_command(self, text, expected):
+        assert parse_text_command(text) == expected
+
+    def test_binary_smaller_than_text(self):
+        """คำสั่ง servo / count แบบ binary สั้นกว่าแบบ text"""
+        text, binary = TextCodec(), BinaryCodec()
+        for command in ("SERVO:135", "COUNT:1234"):
+            assert len(binary.encode_command(command)) < len(text.encode_command(command))
+
+    def test_sequence_numbers_wrap(self):
+        codec = BinaryCodec()
+        seqs = [codec.feed(codec.encode_command("90"))[0].seq for _ in range(300)]
+        assert seqs[0] == 1 and seqs[254] == 255 and seqs[255] == 0
+
+    def test_text_codec_lines(self):
+        codec = TextCodec()
+        assert codec.encode_command("SERVO:45") == b"SERVO:45\n"
+        assert codec.feed(b"STATUS:1") == []
+        assert codec.feed(b",10\r\nok\n") == ["STATUS:1,10", "ok"]
+
+    def test_unknown_protocol(self):
+        with pytest.raises(ValueError):
+            create_codec("morse")
+
+
+class FakeStreamPort:
+    """serial port ปลอมที่ตอบ ACK ทันทีสำหรับทุก frame ที่เขียน (read รอได้ไม่เกิน timeout เหมือน pyserial)"""
+
+    def __init__(self, timeout=0.05):
+        self.decoder = FrameDecoder()
+        self.pending = bytearray()
+        self.timeout = timeout
+        self._cond = threading.Condition()
+
+    @property
+    def in_waiting(self):
+        with self._cond:
+            return len(self.pending)
+
+    def write(self, data):
+        with self._cond:
+            for frame in self.decoder.feed(data):
+                self.pending.extend(encode_frame(frame.seq, frame.opcode | ACK_FLAG, frame.payload))
+            self._cond.notify_all()
+
+    def read(self, size=1):
+        with self._cond:
+            self._cond.wait_for(lambda: self.pending, timeout=self.timeout)
+            data = bytes(self.pending[:size])
+            del self.pending[:size]
+            return data
+
+
+class TestBinaryScheduler:
+    """ทดสอบการใช้ codec กับ SerialCommandScheduler"""
+
+    def test_acks_delivered_as_frames(self):
+        codec = BinaryCodec()
+        replies = []
+        scheduler = SerialCommandScheduler(FakeStreamPort(), on_line=replies.append, codec=codec)
+        try:
+            scheduler.submit(codec.encode_command("SERVO:45"), PRIORITY_HIGH)
+            assert scheduler.flush(timeout=2.0)
+            deadline = time.time() + 2.0
+            while not replies and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.close(timeout=2.0)
+        assert replies and replies[0].is_ack and replies[0].values == (45,)
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="pty not available")
+class TestPtyLoopback:
+    """วัด round-trip ผ่าน pty จริง"""
+
+    @pytest.mark.parametrize("protocol", ["text", "binary"])
+    def test_round_trip(self, protocol):
+        results = measure_round_trip(protocol, commands=("90", "SERVO:45"), runs=5)
+        assert set(results) == {"90", "SERVO:45"}
+        assert all(result["p50_ms"] > 0 for result in results.values())
@@ -0,0 +1,130 @@
+# ========================================
+# Unit Tests for Serial Command Scheduler
+# ========================================
+
+import pytest
+import queue
+import sys
+import time
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from serial_scheduler import (
+    SerialCommandScheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+)
+
+
+class FakePort:
+    """แทน serial.Serial: บันทึกสิ่งที่เขียน และ readline แบบมี timeout"""
+
+    def __init__(self):
+        self.written = []
+        self.replies = queue.Queue()
+
+    def write(self, data):
+        self.written.append(data)
+        return len(data)
+
+    def readline(self):
+        try:
+            return self.replies.get(timeout=0.05)
+        except queue.Empty:
+            return b""
+
+
+@pytest.fixture
+def port():
+    return FakePort()
+
+
+@pytest.fixture
+def scheduler(port):
+    scheduler = SerialCommandScheduler(port, name="test-serial")
+    yield scheduler
+    scheduler.close(timeout=2.0)
+
+
+def hold_writer(scheduler, seconds=0.3):
+    """ส่งคำสั่งที่มี dwell เพื่อให้คำสั่งถัดไปค้างอยู่ในคิว"""
+    scheduler.submit(b"HOLD\n", PRIORITY_HIGH, dwell=seconds)
+    time.sleep(0.05)
+
+
+class TestSerialCommandScheduler:
+    """ทดสอบลำดับ / coalescing / deadline ของคิวคำสั่ง"""
+
+    def test_priority_order(self, scheduler, port):
+        hold_writer(scheduler)
+        scheduler.submit(b"0\n", PRIORITY_LOW)
+        scheduler.submit(b"90\n", PRIORITY_NORMAL)
+        scheduler.submit(b"SWEEP\n", PRIORITY_HIGH)
+        assert scheduler.flush(timeout=2.0)
+        assert port.written == [b"HOLD\n", b"SWEEP\n", b"90\n", b"0\n"]
+
+    def test_servo_moves_coalesced(self, scheduler, port):
+        """มุม servo ที่ยังไม่ได้ส่งถูกแทนที่ด้วยมุมล่าสุด"""
+        hold_writer(scheduler)
+        for angle in (10, 20, 30):
+            scheduler.submit(f"SERVO:{angle}\n".encode(), PRIORITY_HIGH, coalesce_key="servo")
+        assert scheduler.flush(timeout=2.0)
+        assert port.written == [b"HOLD\n", b"SERVO:30\n"]
+        assert scheduler.get_stats()["coalesced"] == 2
+
+    def test_coalesced_command_keeps_queue_position(self, scheduler, port):
+        hold_writer(scheduler)
+        scheduler.submit(b"0\n", PRIORITY_NORMAL, coalesce_key="signal")
+        scheduler.submit(b"status\n", PRIORITY_NORMAL)
+        scheduler.submit(b"90\n", PRIORITY_NORMAL, coalesce_key="signal")
+        assert scheduler.flush(timeout=2.0)
+        assert port.written == [b"HOLD\n", b"90\n", b"status\n"]
+
+    def test_expired_commands_dropped(self, scheduler, port):
+        hold_writer(scheduler)
+        scheduler.submit(b"0\n", PRIORITY_LOW, deadline=0.05)
+        assert scheduler.flush(timeout=2.0)
+        assert port.written == [b"HOLD\n"]
+        assert scheduler.get_stats()["expired"] == 1
+
+    def test_submit_never_waits_for_dwell(self, scheduler, port):
+        """ผู้เรียก (detection thread) ไม่ต้องรอ servo หมุน"""
+        start = time.perf_counter()
+        for angle in (0, 45, 90, 135, 180):
+            scheduler.submit(f"SERVO:{angle}\n".encode(), PRIORITY_HIGH, dwell=0.1)
+        assert time.perf_counter() - start < 0.05
+        assert scheduler.flush(timeout=2.0)
+        assert len(port.written) == 5
+
+    def test_queue_full(self, port):
+        scheduler = SerialCommandScheduler(port, max_queue_size=2)
+        try:
+            hold_writer(scheduler)
+            assert scheduler.submit(b"a\n")
+            assert scheduler.submit(b"b\n")
+            assert not scheduler.submit(b"c\n")
+            assert scheduler.get_stats()["dropped"] == 1
+        finally:
+            scheduler.close(timeout=2.0)
+
+    def test_replies_read_in_background(self, port):
+        lines = []
+        scheduler = SerialCommandScheduler(port, on_line=lines.append)
+        try:
+            port.replies.put("🔧 Servo moved to: 45°\r\n".encode())
+            port.replies.put(b"\r\n")
+            deadline = time.time() + 2.0
+            while not lines and time.time() < deadline:
+                time.sleep(0.01)
+            assert lines == ["🔧 Servo moved to: 45°"]
+            assert list(scheduler.responses) == lines
+        finally:
+            scheduler.close(timeout=2.0)
+
+    def test_close_sends_pending(self, port):
+        scheduler = SerialCommandScheduler(port)
+        hold_writer(scheduler, seconds=0.1)
+        scheduler.submit(b"SERVO:90\n", PRIORITY_HIGH)
+        scheduler.close(timeout=2.0)
+        assert port.written[-1] == b"SERVO:90\n"
+        assert not scheduler.submit(b"0\n")
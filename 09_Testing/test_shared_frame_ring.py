@@ -0,0 +1,112 @@
+# ========================================
+# Unit Tests for Shared-Memory Frame Ring
+# ========================================
+
+import pytest
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "15_Performance"))
+
+from shared_frame_ring import (
+    FrameRef, SharedFrameRing, attach_worker_rings, preprocess_ring_frame
+)
+
+SHAPE = (48, 64, 3)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(slots=3, shape=SHAPE)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def make_frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def write_frames(ring, values, ref_queue):
+    """capture process จำลอง: เขียนเฟรมลง ring แล้วส่งแค่ FrameRef"""
+    for value in values:
+        ref_queue.put(ring.write(make_frame(value)))
+
+
+class TestSharedFrameRing:
+    """ทดสอบการเขียน / อ่าน / reference count ของ slot"""
+
+    def test_write_and_zero_copy_view(self, ring):
+        ref = ring.write(make_frame(7))
+        view = ring.view(ref)
+        assert view.shape == SHAPE and int(view[0, 0, 0]) == 7
+        assert np.shares_memory(view, ring._views[ref.slot])
+        assert not view.flags.writeable
+
+    def test_slots_recycled_after_release(self, ring):
+        refs = [ring.write(make_frame(i)) for i in range(3)]
+        assert ring.free_slots() == 0
+        assert ring.write(make_frame(9)) is None
+        assert ring.get_stats()["dropped"] == 1
+
+        assert ring.release(refs[1])
+        ref = ring.write(make_frame(9))
+        assert ref.slot == refs[1].slot and ref.seq > refs[1].seq
+
+    def test_stale_ref_rejected(self, ring):
+        ref = ring.write(make_frame(1))
+        ring.release(ref)
+        with pytest.raises(KeyError):
+            ring.view(ref)
+        assert not ring.release(ref)
+
+    def test_multiple_readers(self, ring):
+        ref = ring.write(make_frame(3), readers=2)
+        assert not ring.release(ref)
+        ring.retain(ref)
+        assert not ring.release(ref)
+        assert ring.release(ref)
+        assert ring.free_slots() == 3
+
+    def test_reserve_publish(self, ring):
+        ref, view = ring.reserve()
+        view[:] = 5
+        with pytest.raises(KeyError):
+            ring.view(ref)  # ยังเขียนไม่เสร็จ
+        ring.publish(ref)
+        assert int(ring.view(ref).max()) == 5
+
+    def test_shape_mismatch(self, ring):
+        with pytest.raises(ValueError):
+            ring.write(np.zeros((10, 10, 3), dtype=np.uint8))
+
+
+class TestCrossProcess:
+    """ทดสอบการส่งเฟรมข้าม process"""
+
+    def test_writer_process(self, ring):
+        ref_queue = multiprocessing.Queue()
+        writer = multiprocessing.Process(target=write_frames, args=(ring, [11, 22], ref_queue))
+        writer.start()
+        refs = [FrameRef(*ref_queue.get(timeout=10)) for _ in range(2)]
+        writer.join(timeout=10)
+        assert [int(ring.view(ref)[0, 0, 0]) for ref in refs] == [11, 22]
+
+    def test_preprocess_in_process_pool(self, ring):
+        out_ring = SharedFrameRing(slots=2, shape=(16, 32, 3), dtype=np.float32)
+        try:
+            with ProcessPoolExecutor(max_workers=1, initializer=attach_worker_rings,
+                                     initargs=(ring, out_ring)) as pool:
+                ref = ring.write(make_frame(255))
+                out_ref = pool.submit(preprocess_ring_frame, ref, (32, 16)).result(timeout=30)
+            assert ring.free_slots() == 3  # worker release เฟรม input แล้ว
+            result = out_ring.view(out_ref)
+            assert result.shape == (16, 32, 3) and np.allclose(result, 1.0)
+        finally:
+            out_ring.close()
+            out_ring.unlink()
@@ -0,0 +1,116 @@
+# ========================================
+# Unit Tests for Tensor Store
+# ========================================
+
+import pytest
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "15_Performance"))
+
+import tensor_store
+from tensor_store import TensorStore, build_manifest, decode_blobs, encode_blobs, tensor_content_hash, to_tensors
+
+
+def sample_weights():
+    return {
+        "conv.weight": np.arange(2 * 3 * 3 * 3, dtype=np.float32).reshape(2, 3, 3, 3),
+        "conv.bias": np.array([0.5, -0.5], dtype=np.float32),
+        "bn.num_batches": np.array(7, dtype=np.int64),
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TensorStore(str(tmp_path / "tensors"), ttl_seconds=3600)
+
+
+class TestTensorStore:
+    """ทดสอบการเก็บ weights เป็น .npy + manifest"""
+
+    def test_roundtrip_is_memory_mapped_and_read_only(self, store):
+        store.save("model:yolo:latest", sample_weights())
+        loaded = store.load("model:yolo:latest")
+        assert set(loaded) == set(sample_weights())
+        for name, array in sample_weights().items():
+            np.testing.assert_array_equal(loaded[name], array)
+        assert isinstance(loaded["conv.weight"], np.memmap)
+        with pytest.raises(ValueError):
+            loaded["conv.bias"][0] = 1.0
+
+    def test_manifest_has_hash_and_ttl(self, store):
+        manifest = store.save("model:yolo:v2", sample_weights(), metadata={"imgsz": 640})
+        on_disk = store.manifest("model:yolo:v2")
+        assert on_disk["content_hash"] == tensor_content_hash(sample_weights())
+        assert on_disk["ttl_seconds"] == 3600 and on_disk["metadata"] == {"imgsz": 640}
+        assert on_disk["tensors"]["conv.weight"]["shape"] == [2, 3, 3, 3]
+        assert manifest["dir"] == on_disk["dir"]
+
+    def test_expired_entry_is_removed(self, store, monkeypatch):
+        store.save("model:old", sample_weights())
+        created = store.manifest("model:old")["created"]
+        monkeypatch.setattr(tensor_store.time, "time", lambda: created + 7200)
+        assert store.load("model:old") is None
+        assert store.manifest("model:old") is None
+
+    def test_new_version_replaces_old_files(self, store, tmp_path):
+        store.save("model:yolo", sample_weights())
+        old_dir = tmp_path / "tensors" / store.manifest("model:yolo")["dir"]
+        updated = sample_weights()
+        updated["conv.bias"] = np.array([1.0, 2.0], dtype=np.float32)
+        store.save("model:yolo", updated)
+        assert not old_dir.exists()
+        np.testing.assert_array_equal(store.load("model:yolo")["conv.bias"], [1.0, 2.0])
+
+    def test_verify_detects_corruption(self, store, tmp_path):
+        store.save("model:yolo", sample_weights())
+        manifest = store.manifest("model:yolo")
+        path = tmp_path / "tensors" / manifest["dir"] / manifest["tensors"]["conv.bias"]["file"]
+        array = np.load(path)
+        array[0] = 99.0
+        np.save(path, array)
+        assert store.load("model:yolo") is not None
+        assert store.load("model:yolo", verify=True) is None
+
+    def test_object_arrays_are_refused(self, store):
+        with pytest.raises(ValueError):
+            store.save("model:bad", {"names": np.array([{"a": 1}], dtype=object)})
+
+    def test_clear(self, store, tmp_path):
+        store.save("model:a", sample_weights())
+        store.save("model:b", sample_weights())
+        store.clear()
+        assert list((tmp_path / "tensors").iterdir()) == []
+
+
+class TestTensorConversion:
+    """ทดสอบการแปลง model เป็น tensors และการเข้ารหัสสำหรับ Redis"""
+
+    def test_state_dict_and_keras_weights(self):
+        class TorchLike:
+            def state_dict(self):
+                return {"w": np.ones((2, 2), dtype=np.float16)}
+
+        class KerasLike:
+            def get_weights(self):
+                return [np.zeros(3), np.ones(1)]
+
+        assert to_tensors(TorchLike())["w"].dtype == np.float16
+        assert list(to_tensors(KerasLike())) == ["weight_0000", "weight_0001"]
+        with pytest.raises(TypeError):
+            to_tensors(object())
+
+    def test_blob_roundtrip_and_hash_check(self):
+        weights = sample_weights()
+        manifest = json.loads(json.dumps(build_manifest("model:x", weights, 60)))
+        blobs = encode_blobs(weights)
+        decoded = decode_blobs(manifest, blobs)
+        np.testing.assert_array_equal(decoded["conv.weight"], weights["conv.weight"])
+
+        blobs["t:conv.bias"] = np.array([9.0, 9.0], dtype=np.float32).tobytes()
+        with pytest.raises(ValueError):
+            decode_blobs(manifest, blobs)
@@ -0,0 +1,74 @@
+# ========================================
+# Unit Tests for YOLO Post-processing
+# ========================================
+
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# เพิ่ม path สำหรับ import modules
+sys.path.append(str(Path(__file__).parent.parent / "02_AI_Detection"))
+
+from yolo_postprocess import (
+    decode_yolo_outputs,
+    decode_yolo_outputs_loop,
+    detect_class_boxes,
+    make_synthetic_outputs,
+)
+
+BOTTLE_CLASS_ID = 39
+
+
+class TestDecodeYoloOutputs:
+    """Test cases สำหรับการ decode แบบ vectorized"""
+
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_matches_reference_loop(self, seed):
+        """ทดสอบว่าผลลัพธ์ตรงกับ loop เดิมทุก box"""
+        outputs = make_synthetic_outputs(class_id=BOTTLE_CLASS_ID, positives=20, seed=seed)
+
+        boxes, confidences = decode_yolo_outputs(outputs, 640, 480, BOTTLE_CLASS_ID, 0.5)
+        ref_boxes, ref_confidences = decode_yolo_outputs_loop(outputs, 640, 480, BOTTLE_CLASS_ID, 0.5)
+
+        assert boxes.tolist() == ref_boxes
+        assert confidences.tolist() == pytest.approx(ref_confidences)
+
+    def test_requires_target_class_to_be_argmax(self):
+        """ทดสอบว่าแถวที่ class อื่นมีคะแนนสูงกว่าถูกตัดทิ้ง"""
+        output = np.zeros((2, 85), dtype=np.float32)
+        output[:, :4] = [0.5, 0.5, 0.2, 0.4]
+        output[0, 5 + BOTTLE_CLASS_ID] = 0.8
+        output[1, 5 + BOTTLE_CLASS_ID] = 0.8
+        output[1, 5 + 0] = 0.9  # person ชนะ
+
+        boxes, confidences = decode_yolo_outputs([output], 100, 100, BOTTLE_CLASS_ID, 0.5)
+
+        assert boxes.tolist() == [[40, 30, 20, 40]]
+        assert confidences.tolist() == pytest.approx([0.8])
+
+    def test_empty_outputs(self):
+        """ทดสอบกรณีไม่มี box ผ่านเกณฑ์"""
+        outputs = [np.zeros((10, 85), dtype=np.float32)]
+
+        boxes, confidences = detect_class_boxes(outputs, 640, 480, BOTTLE_CLASS_ID, 0.5, 0.4)
+
+        assert boxes.shape == (0, 4)
+        assert confidences.shape == (0,)
+
+
+class TestDetectClassBoxes:
+    """Test cases สำหรับ decode + NMS"""
+
+    def test_nms_merges_overlapping_boxes(self):
+        """ทดสอบว่า box ที่ซ้อนกันเหลือตัวที่มั่นใจที่สุด"""
+        output = np.zeros((3, 85), dtype=np.float32)
+        output[0, :4] = [0.30, 0.30, 0.2, 0.2]
+        output[1, :4] = [0.31, 0.30, 0.2, 0.2]
+        output[2, :4] = [0.80, 0.80, 0.1, 0.1]
+        output[:, 5 + BOTTLE_CLASS_ID] = [0.7, 0.9, 0.6]
+
+        boxes, confidences = detect_class_boxes([output], 200, 200, BOTTLE_CLASS_ID, 0.5, 0.4)
+
+        assert len(boxes) == 2
+        assert sorted(confidences.tolist()) == pytest.approx([0.6, 0.9])
@@ -0,0 +1,313 @@
+"""
+Byte-Budget LRU Cache
+LRU แบบ O(1) (OrderedDict) ที่จำกัดด้วยจำนวน byte แทนจำนวน entry
+- ประมาณขนาดของแต่ละ entry จาก tensor / array ที่อยู่ข้างใน (parameters ของ model, numpy arrays)
+- thread-safe และนับ hit / miss / eviction
+- โหลดแบบ single-flight: miss พร้อมกันหลาย thread ของ key เดียวกันจะโหลดแค่ครั้งเดียว
+- evict โดยไม่เรียก gc.collect() (object ถูกคืนเมื่อไม่มีใครอ้างถึงแล้ว)
+- FileHashCache: hash เนื้อไฟล์แบบอ่านทีละ chunk และคำนวณใหม่เฉพาะเมื่อ (mtime, size) เปลี่ยน
+
+ใช้เป็น memory tier ของ ModelCache (model_cache.py) และ image cache ของ ImageProcessor ใน performance_optimizer.py
+"""
+
+import hashlib
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MAX_DEPTH = 4
+
+
+def estimate_nbytes(obj: Any, _seen: Optional[set] = None, _depth: int = 0) -> int:
+    """
+    ประมาณจำนวน byte ที่ object ใช้ โดยนับเฉพาะข้อมูลก้อนใหญ่
+
+    - numpy array / bytes                 : ขนาด buffer
+    - torch tensor                        : numel * element_size
+    - torch nn.Module                     : parameters + buffers
+    - Keras / TF model (มี .weights)       : ผลรวมของ weights
+    - dict / list / tuple / object ทั่วไป   : รวมของที่อยู่ข้างใน (ลึกไม่เกิน 4 ชั้น)
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, (str, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+
+    # torch.Tensor (duck typing - ไม่ต้อง import torch)
+    if hasattr(obj, "element_size") and hasattr(obj, "numel"):
+        try:
+            return int(obj.numel()) * int(obj.element_size())
+        except Exception:
+            pass
+
+    # torch.nn.Module
+    if callable(getattr(obj, "parameters", None)) and callable(getattr(obj, "buffers", None)):
+        try:
+            return sum(estimate_nbytes(t, _seen, _depth + 1) for t in obj.parameters()) + \
+                sum(estimate_nbytes(t, _seen, _depth + 1) for t in obj.buffers())
+        except Exception:
+            pass
+
+    # Keras / TensorFlow model
+    weights = getattr(obj, "weights", None)
+    if isinstance(weights, (list, tuple)) and weights:
+        try:
+            return sum(int(np.prod(w.shape)) * np.dtype(getattr(w.dtype, "as_numpy_dtype", w.dtype)).itemsize
+                       for w in weights)
+        except Exception:
+            pass
+
+    if _depth >= _MAX_DEPTH:
+        return sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v, _seen, _depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v, _seen, _depth + 1) for v in obj)
+    if hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + estimate_nbytes(vars(obj), _seen, _depth + 1)
+    return sys.getsizeof(obj)
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """รวมการเรียก fn ที่ซ้อนกันของ key เดียวกันให้เหลือครั้งเดียว (thread ที่มาทีหลังรอผลเดียวกัน)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+        return flight.value
+
+
+class ByteLRU:
+    """LRU cache ที่จำกัดขนาดรวมเป็น byte (และจำนวน entry ถ้ากำหนด)"""
+
+    def __init__(self, max_bytes: int, max_entries: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = estimate_nbytes):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.RLock()
+        self._flights = SingleFlight()
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejected = 0
+        self.load_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any, nbytes: Optional[int] = None) -> bool:
+        """เก็บ value - คืน False ถ้าใหญ่เกิน budget ทั้งก้อน (ไม่ถูกเก็บ)"""
+        nbytes = self.sizeof(value) if nbytes is None else nbytes
+        if nbytes > self.max_bytes:
+            with self._lock:
+                self.rejected += 1
+                self._remove(key)
+            logger.warning(f"Cache entry {key} ({nbytes / 1024 ** 2:.1f}MB) exceeds cache budget - not cached")
+            return False
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            self.current_bytes += nbytes
+            self._evict_to_budget()
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries[key]
+            self._remove(key)
+            return value
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], nbytes: Optional[int] = None) -> Any:
+        """คืนค่าใน cache หรือเรียก loader() ครั้งเดียวต่อ key แม้จะ miss พร้อมกันหลาย thread"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        def load():
+            # thread ก่อนหน้าอาจโหลดเสร็จระหว่างที่เรารอ lock
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key]
+            try:
+                value = loader()
+            except Exception:
+                with self._lock:
+                    self.load_errors += 1
+                raise
+            if value is not None:
+                self.put(key, value, nbytes)
+            return value
+
+        return self._flights.do(key, load)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Hashable):
+        if key in self._entries:
+            del self._entries[key]
+            self.current_bytes -= self._sizes.pop(key)
+
+    def _evict_to_budget(self):
+        while self._entries and (
+            self.current_bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            nbytes = self._sizes.pop(key)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+            self.evicted_bytes += nbytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "rejected": self.rejected,
+                "loads": self._flights.calls,
+                "shared_loads": self._flights.shared,
+                "load_errors": self.load_errors,
+            }
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """hash ของเนื้อไฟล์ (BLAKE2b 128 bit) โดยอ่านทีละ chunk ไม่โหลดทั้งไฟล์เข้า memory"""
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+class FileHashCache:
+    """จำ hash ของไฟล์ตาม path - คำนวณใหม่เมื่อ mtime หรือขนาดไฟล์เปลี่ยน"""
+
+    def __init__(self, max_entries: int = 1000, chunk_size: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.chunk_size = chunk_size
+        self._entries: "OrderedDict[str, Tuple[str, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.computed = 0
+
+    def get(self, path: str) -> Tuple[str, int, int]:
+        """คืน (digest, mtime_ns, size) ของไฟล์ (OSError ถ้าอ่านไฟล์ไม่ได้)"""
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[1:] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        entry = (file_digest(path, self.chunk_size), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            self.computed += 1
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,372 @@
+"""
+Dynamic Batcher
+ตัวจัด batch แบบ event-driven ที่ใช้ร่วมกันระหว่าง API (YOLODetectionService) และงาน offline (ImageProcessor)
+- get_shared_batcher() คืน batcher ตัวเดียวของทั้ง process: เฟรม live จาก API และงาน background ของ ImageProcessor
+  อยู่ใน worker เดียวกัน lane "live" จึงแซงงาน background ได้จริง (แต่ละงานส่ง handler ของตัวเองมากับ submit)
+- submit() คืน concurrent.futures.Future (หรือ submit_async() สำหรับ asyncio) แทนการใช้ callback
+- worker thread หลับบน Condition จนมีงานเข้าหรือถึง deadline (ไม่ poll queue ทุก 0.1 วินาที)
+- priority lanes: เช่น "live" (เฟรมจาก kiosk) มาก่อน "background" (re-scoring) แต่ละ lane มี latency SLO ของตัวเอง
+  lane ที่เลย SLO แล้วจะได้ที่ใน batch ถัดไปก่อน จึงไม่ถูกแย่งจนอดตาย
+- dynamic=True : ขนาด batch มาจาก cost model (เวลา = overhead + ต่อภาพ * n ที่วัดได้จริง) และ queue depth
+                 ให้ item ที่เก่าที่สุดเสร็จทัน SLO; รอรวม batch ได้จนกว่าจะเหลือเวลาพอดีกับเวลาประมวลผล
+  dynamic=False: batch ขนาดคงที่ max_batch_size หรือเมื่อครบ max_wait นับจาก item แรก (พฤติกรรมเดิม)
+
+สร้างจาก PerformanceConfig ด้วย create_batcher_from_config() (ใช้ dynamic_batching, max_batch_size,
+batch_timeout_seconds, batch_latency_slo_ms, background_latency_slo_ms)
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherClosedError(RuntimeError):
+    """batcher ถูกปิดแล้ว - ไม่รับงานใหม่"""
+
+
+class BatcherQueueFullError(RuntimeError):
+    """queue ของ lane เต็ม - ผู้เรียกควรลองใหม่ภายหลัง (API ตอบ 503)"""
+
+
+class _Item:
+    __slots__ = ("payload", "handler", "future", "lane", "enqueued_at", "deadline")
+
+    def __init__(self, payload, handler, future, lane, enqueued_at, deadline):
+        self.payload = payload
+        self.handler = handler
+        self.future = future
+        self.lane = lane
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline
+
+
+class BatchCostModel:
+    """
+    ประมาณเวลาประมวลผล batch: time(n) = overhead + per_item * n
+
+    fit แบบ least squares บนค่าเฉลี่ยถ่วงน้ำหนัก (EMA) ของ n, t, n*n, n*t จาก batch ที่วัดได้จริง
+    """
+
+    def __init__(self, alpha: float = 0.1, initial_per_item: float = 0.005, initial_overhead: float = 0.0):
+        self.alpha = alpha
+        self.per_item = initial_per_item
+        self.overhead = initial_overhead
+        self.samples = 0
+        self._n = self._t = self._nn = self._nt = 0.0
+
+    def update(self, n: int, seconds: float):
+        a = self.alpha if self.samples else 1.0
+        self._n += a * (n - self._n)
+        self._t += a * (seconds - self._t)
+        self._nn += a * (n * n - self._nn)
+        self._nt += a * (n * seconds - self._nt)
+        self.samples += 1
+
+        variance = self._nn - self._n * self._n
+        if variance > 1e-6:
+            slope = (self._nt - self._n * self._t) / variance
+            if slope > 0:
+                self.per_item = slope
+                self.overhead = max(0.0, self._t - slope * self._n)
+                return
+        # ยังไม่มีขนาด batch ที่หลากหลายพอ - ถือว่าไม่มี overhead
+        self.per_item = self._t / max(self._n, 1.0)
+        self.overhead = 0.0
+
+    def predict(self, n: int) -> float:
+        return self.overhead + self.per_item * n
+
+    def max_items_within(self, budget: float, limit: int) -> int:
+        """จำนวน item สูงสุดที่ประมวลผลเสร็จภายใน budget วินาที (อย่างน้อย 1)"""
+        if self.per_item <= 0:
+            return limit
+        return int(max(1, min(limit, (budget - self.overhead) / self.per_item + 1e-9)))
+
+
+class DynamicBatcher:
+    """
+    รวมงานเป็น batch แล้วเรียก process_batch(payloads) -> results ใน worker thread เดียว
+
+    submit(..., handler=fn) ใช้ fn แทน process_batch สำหรับงานนั้น - batch ที่มีหลาย handler
+    จะถูกแบ่งเรียกทีละ handler ตามลำดับ (process_batch เป็น None ได้ถ้าทุกงานส่ง handler มาเอง)
+    """
+
+    def __init__(self, process_batch: Optional[Callable[[List[Any]], Sequence[Any]]] = None, max_batch_size: int = 16,
+                 latency_slo_ms: float = 100.0, max_wait_ms: Optional[float] = None,
+                 lanes: Optional[Dict[str, float]] = None, dynamic: bool = True,
+                 max_queue_size: int = 1024, name: str = "dynamic-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = None if max_wait_ms is None else max_wait_ms / 1000.0
+        self.dynamic = dynamic
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        # lane -> SLO (วินาที) เรียงตามลำดับความสำคัญ
+        lanes = lanes or {"live": latency_slo_ms, "background": latency_slo_ms * 10}
+        self.lanes = {lane: slo_ms / 1000.0 for lane, slo_ms in lanes.items()}
+        self._queues: Dict[str, deque] = {lane: deque() for lane in self.lanes}
+
+        self.cost = BatchCostModel()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.batches = 0
+        self.failed_batches = 0
+        self.batch_sizes = Counter()
+        self.submitted = Counter()
+        self.completed = Counter()
+        self.rejected = Counter()
+        self.slo_violations = Counter()
+        self._latencies = {lane: deque(maxlen=1000) for lane in self.lanes}
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # ----------------------------------------
+    # Public API
+    # ----------------------------------------
+
+    def submit(self, payload: Any, lane: Optional[str] = None,
+               handler: Optional[Callable[[List[Any]], Sequence[Any]]] = None) -> Future:
+        """ใส่งานลง lane (ค่าเริ่มต้น = lane แรก) - คืน Future ของผลลัพธ์"""
+        lane = lane or next(iter(self.lanes))
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown lane '{lane}' (lanes: {list(self.lanes)})")
+        handler = handler or self.process_batch
+        if handler is None:
+            raise ValueError(f"{self.name} has no process_batch - pass handler=")
+
+        future = Future()
+        now = time.perf_counter()
+        with self._cond:
+            if self._closed:
+                raise BatcherClosedError(f"{self.name} is closed")
+            if len(self._queues[lane]) >= self.max_queue_size:
+                self.rejected[lane] += 1
+                raise BatcherQueueFullError(f"{self.name}: lane '{lane}' queue is full")
+            self._queues[lane].append(_Item(payload, handler, future, lane, now, now + self.lanes[lane]))
+            self.submitted[lane] += 1
+            self._cond.notify()
+        return future
+
+    def submit_async(self, payload: Any, lane: Optional[str] = None,
+                     handler: Optional[Callable[[List[Any]], Sequence[Any]]] = None) -> "asyncio.Future":
+        """เหมือน submit() แต่คืน awaitable สำหรับ event loop ปัจจุบัน"""
+        return asyncio.wrap_future(self.submit(payload, lane, handler))
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def queue_depth(self, lane: Optional[str] = None) -> int:
+        with self._cond:
+            if lane is not None:
+                return len(self._queues[lane])
+            return sum(len(queue) for queue in self._queues.values())
+
+    def close(self, drain: bool = True, timeout: float = 10.0):
+        """หยุดรับงาน - drain=True ประมวลผลงานที่ค้างให้เสร็จก่อน, False = ยกเลิกด้วย BatcherClosedError"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            if not drain:
+                for queue in self._queues.values():
+                    while queue:
+                        item = queue.popleft()
+                        if not item.future.done():
+                            item.future.set_exception(BatcherClosedError(f"{self.name} is closed"))
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+
+    # ----------------------------------------
+    # Scheduling
+    # ----------------------------------------
+
+    def _plan(self, now: float):
+        """คืน (จำนวน item ที่จะส่งตอนนี้, เวลาที่ควรรอก่อนคิดใหม่) - ต้องถือ _cond"""
+        depth = sum(len(queue) for queue in self._queues.values())
+        if depth == 0:
+            return 0, None
+        if self._closed:
+            return min(depth, self.max_batch_size), None
+
+        oldest = min(queue[0].enqueued_at for queue in self._queues.values() if queue)
+        waited_out = self.max_wait is not None and now - oldest >= self.max_wait
+
+        if not self.dynamic:
+            if depth >= self.max_batch_size or waited_out or self.max_wait is None:
+                return min(depth, self.max_batch_size), None
+            return 0, oldest + self.max_wait - now
+
+        # เวลาที่เหลือของ item ที่ใกล้ deadline ที่สุด
+        budget = min(queue[0].deadline for queue in self._queues.values() if queue) - now
+        if budget <= self.cost.predict(1):
+            # ไม่ทัน SLO อยู่แล้ว (งานล้น) - ส่ง batch ใหญ่สุดเพื่อให้ queue ลดเร็วที่สุด
+            return min(depth, self.max_batch_size), None
+        target = self.cost.max_items_within(budget, self.max_batch_size)
+        if depth >= target or waited_out:
+            return min(depth, target), None
+
+        # รอ item เพิ่มได้จนกว่าเวลาที่เหลือจะพอดีกับเวลาประมวลผล batch ที่ใหญ่ขึ้นอีกหนึ่ง
+        slack = budget - self.cost.predict(depth + 1)
+        if self.max_wait is not None:
+            slack = min(slack, oldest + self.max_wait - now)
+        if slack <= 0:
+            return depth, None
+        return 0, slack
+
+    def _take(self, count: int, now: float) -> List[_Item]:
+        """ดึง item ตามลำดับ lane - lane ที่เลย deadline แล้วได้ก่อน (ต้องถือ _cond)"""
+        order = sorted(
+            (lane for lane, queue in self._queues.items() if queue),
+            key=lambda lane: (self._queues[lane][0].deadline > now, list(self.lanes).index(lane))
+        )
+        batch = []
+        for lane in order:
+            queue = self._queues[lane]
+            while queue and len(batch) < count:
+                batch.append(queue.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.perf_counter()
+                    count, wait = self._plan(now)
+                    if count:
+                        batch = self._take(count, now)
+                        break
+                    if self._closed:
+                        return
+                    self._cond.wait(timeout=wait)
+
+            self._execute(batch)
+
+    def _execute(self, batch: List[_Item]):
+        # ข้ามงานที่ผู้เรียกยกเลิกไปแล้ว
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        groups: Dict[Callable, List[_Item]] = {}
+        for item in batch:
+            groups.setdefault(item.handler, []).append(item)
+
+        start = time.perf_counter()
+        done = []
+        for handler, items in groups.items():
+            try:
+                results = handler([item.payload for item in items])
+                if len(results) != len(items):
+                    raise RuntimeError(f"process_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+                for item in items:
+                    item.future.set_exception(e)
+                continue
+            done.extend(zip(items, results))
+        if not done:
+            return
+
+        finished = time.perf_counter()
+        self.cost.update(len(batch), finished - start)
+        self.batches += 1
+        self.batch_sizes[len(batch)] += 1
+        for item, result in done:
+            latency = finished - item.enqueued_at
+            self._latencies[item.lane].append(latency)
+            self.completed[item.lane] += 1
+            if finished > item.deadline:
+                self.slo_violations[item.lane] += 1
+            item.future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """สถิติ: histogram ขนาด batch, cost model, queue depth และ latency ต่อ lane"""
+        with self._cond:
+            lanes = {}
+            for lane, slo in self.lanes.items():
+                latencies = np.array(self._latencies[lane]) * 1000 if self._latencies[lane] else None
+                lanes[lane] = {
+                    "slo_ms": slo * 1000,
+                    "queue_depth": len(self._queues[lane]),
+                    "submitted": self.submitted[lane],
+                    "completed": self.completed[lane],
+                    "rejected": self.rejected[lane],
+                    "slo_violations": self.slo_violations[lane],
+                    "p50_ms": float(np.percentile(latencies, 50)) if latencies is not None else 0.0,
+                    "p95_ms": float(np.percentile(latencies, 95)) if latencies is not None else 0.0,
+                }
+            batched = sum(size * count for size, count in self.batch_sizes.items())
+            return {
+                "dynamic": self.dynamic,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "avg_batch_size": (batched / self.batches) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                "per_item_ms": self.cost.per_item * 1000,
+                "overhead_ms": self.cost.overhead * 1000,
+                "lanes": lanes,
+            }
+
+
+def create_batcher_from_config(process_batch: Optional[Callable[[List[Any]], Sequence[Any]]], config,
+                               name: str = "dynamic-batcher") -> DynamicBatcher:
+    """สร้าง DynamicBatcher จาก PerformanceConfig (หรือ config class ที่มี attribute ชื่อเดียวกัน)"""
+    slo_ms = getattr(config, "batch_latency_slo_ms", 100.0)
+    return DynamicBatcher(
+        process_batch,
+        max_batch_size=getattr(config, "max_batch_size", 16),
+        latency_slo_ms=slo_ms,
+        max_wait_ms=getattr(config, "batch_timeout_seconds", 0.5) * 1000,
+        lanes={"live": slo_ms, "background": getattr(config, "background_latency_slo_ms", slo_ms * 10)},
+        dynamic=getattr(config, "dynamic_batching", True),
+        name=name
+    )
+
+
+_shared_batcher: Optional[DynamicBatcher] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_batcher(config=None, **kwargs) -> DynamicBatcher:
+    """
+    คืน batcher ตัวเดียวที่ใช้ร่วมกันทั้ง process (สร้างใหม่ถ้ายังไม่มี - ผู้เรียกคนแรกเป็นผู้กำหนดค่า)
+
+    config: PerformanceConfig (ผ่าน create_batcher_from_config) หรือส่ง kwargs ของ DynamicBatcher ตรงๆ
+    ผู้ใช้ batcher นี้ต้องส่ง handler มากับ submit() เสมอ
+    """
+    global _shared_batcher
+    with _shared_lock:
+        if _shared_batcher is None or _shared_batcher.closed:
+            if config is not None:
+                _shared_batcher = create_batcher_from_config(None, config, name="shared-batcher")
+            else:
+                kwargs.setdefault("name", "shared-batcher")
+                _shared_batcher = DynamicBatcher(None, **kwargs)
+        return _shared_batcher
+
+
+def close_shared_batcher(drain: bool = True):
+    """ปิด batcher ที่ใช้ร่วมกัน (เรียกอัตโนมัติตอนจบโปรแกรม)"""
+    global _shared_batcher
+    with _shared_lock:
+        batcher, _shared_batcher = _shared_batcher, None
+    if batcher is not None:
+        batcher.close(drain=drain)
+
+
+atexit.register(close_shared_batcher)
@@ -0,0 +1,198 @@
+"""
+Model Cache
+cache ของ model แบบหลายชั้น: memory tier (ByteLRU) อยู่หน้าเสมอ + redis / disk tier ที่เก็บเฉพาะ weights
+- get_model() คืน model object ทุกครั้ง ไม่ว่าจะ hit ที่ชั้นไหน:
+  weights จาก redis / disk ถูกสร้างกลับเป็น model ด้วย builder(weights) ที่ผู้เรียกส่งมา แล้วเก็บไว้ใน memory tier
+- miss พร้อมกันหลาย thread ของ model เดียวกันโหลดแค่ครั้งเดียว (single-flight ของ ByteLRU)
+- get_weights() สำหรับผู้ที่ต้องการ weights ดิบ (dict ชื่อ -> numpy array แบบ read-only)
+
+ใช้เป็น ModelCache ของ performance_optimizer.py
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from byte_lru import ByteLRU
+from tensor_store import TensorStore, build_manifest, decode_blobs, encode_blobs, to_tensors
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """จัดการ cache สำหรับ models"""
+
+    def __init__(self, config, cache_dir: str = os.path.join("model_cache", "tensors")):
+        self.config = config
+        self.cache = ByteLRU(
+            max_bytes=config.model_cache_size_mb * 1024 * 1024,
+            max_entries=config.model_cache_size
+        )
+        self.redis_client = None
+        self.cache_dir = cache_dir
+        self.tensor_store = None
+        self.storage_hits = 0
+        self.storage_misses = 0
+
+        if config.model_cache_storage == "redis":
+            self.init_redis()
+        elif config.model_cache_storage == "disk":
+            self.tensor_store = TensorStore(self.cache_dir, ttl_seconds=config.model_cache_ttl_hours * 3600)
+
+    def init_redis(self):
+        """เริ่มต้น Redis connection"""
+        try:
+            import redis
+            self.redis_client = redis.Redis(host='localhost', port=6379, db=1)
+            self.redis_client.ping()
+            logger.info("Model cache Redis connection established")
+        except Exception as e:
+            logger.warning(f"Redis not available for model cache: {e}")
+            self.redis_client = None
+
+    def _generate_cache_key(self, model_name: str, model_version: str = "latest") -> str:
+        """สร้าง cache key"""
+        return f"model:{model_name}:{model_version}"
+
+    def get_model(self, model_name: str, model_version: str = "latest", loader: Optional[Callable[[], Any]] = None,
+                  builder: Optional[Callable[[Dict[str, np.ndarray]], Any]] = None):
+        """
+        ดึง model จาก cache - คืน model object เสมอ (None ถ้าไม่มีและไม่ได้ส่ง loader มา)
+
+        ลำดับ: memory tier -> weights ใน redis / disk + builder(weights) -> loader()
+        model ที่ได้จาก builder / loader ถูกเก็บใน memory tier และ loader() ถูกเขียนลง redis / disk ด้วย
+        ถ้าไม่ส่ง builder มา redis / disk tier จะถูกข้าม (weights สร้าง model เองไม่ได้ - ใช้ get_weights())
+        """
+        if not self.config.model_cache_enabled:
+            return loader() if loader else None
+
+        cache_key = self._generate_cache_key(model_name, model_version)
+        if loader is None and builder is None:
+            return self.cache.get(cache_key)
+
+        def load():
+            model = self._build_from_storage(cache_key, builder) if builder is not None else None
+            if model is None and loader is not None:
+                model = loader()
+                if model is not None:
+                    self._set_to_storage(cache_key, model)
+            return model
+
+        return self.cache.get_or_load(cache_key, load)
+
+    def get_weights(self, model_name: str, model_version: str = "latest") -> Optional[Dict[str, np.ndarray]]:
+        """weights (dict ชื่อ -> numpy array แบบ read-only) จาก redis / disk tier (None ถ้าไม่มี)"""
+        return self._get_weights(self._generate_cache_key(model_name, model_version))
+
+    def _build_from_storage(self, cache_key: str, builder: Callable[[Dict[str, np.ndarray]], Any]):
+        weights = self._get_weights(cache_key)
+        if weights is None:
+            self.storage_misses += 1
+            return None
+        self.storage_hits += 1
+        return builder(weights)
+
+    def _get_weights(self, cache_key: str) -> Optional[Dict[str, np.ndarray]]:
+        """ดึง weights จาก storage ที่ตั้งไว้ (None ถ้าไม่มี)"""
+        try:
+            if self.config.model_cache_storage == "redis":
+                return self._get_from_redis(cache_key)
+            elif self.config.model_cache_storage == "disk":
+                return self._get_from_disk(cache_key)
+        except Exception as e:
+            logger.error(f"Error getting model from cache: {e}")
+        return None
+
+    def set_model(self, model_name: str, model, model_version: str = "latest"):
+        """เก็บ model ใน memory tier (และ weights ใน redis / disk ถ้าตั้งไว้)"""
+        if not self.config.model_cache_enabled:
+            return
+
+        cache_key = self._generate_cache_key(model_name, model_version)
+        self.cache.put(cache_key, model)
+        self._set_to_storage(cache_key, model)
+
+    def _set_to_storage(self, cache_key: str, model):
+        try:
+            if self.config.model_cache_storage == "redis":
+                self._set_to_redis(cache_key, model)
+            elif self.config.model_cache_storage == "disk":
+                self._set_to_disk(cache_key, model)
+        except Exception as e:
+            logger.error(f"Error setting model to cache: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """สถิติของ memory tier (hit / miss / eviction / single-flight) และ hit ของ redis / disk tier"""
+        stats = self.cache.get_stats()
+        stats["storage"] = self.config.model_cache_storage
+        stats["storage_hits"] = self.storage_hits
+        stats["storage_misses"] = self.storage_misses
+        return stats
+
+    # redis / disk tier เก็บเฉพาะ weights (dict ชื่อ -> numpy array) ไม่ใช่ model object
+    # get_model() สร้าง model กลับด้วย builder เช่น
+    # lambda w: net.load_state_dict({k: torch.from_numpy(np.array(v)) for k, v in w.items()}) or net
+
+    def _get_from_redis(self, cache_key: str):
+        """ดึง weights จาก Redis (hash: manifest + raw bytes ต่อ tensor)"""
+        if not self.redis_client:
+            return None
+
+        try:
+            blobs = self.redis_client.hgetall(cache_key)
+            if blobs:
+                blobs = {field.decode() if isinstance(field, bytes) else field: value for field, value in blobs.items()}
+                manifest = json.loads(blobs.pop("manifest"))
+                return decode_blobs(manifest, blobs)
+        except Exception as e:
+            logger.error(f"Redis get error: {e}")
+        return None
+
+    def _set_to_redis(self, cache_key: str, model):
+        """เก็บ weights ใน Redis พร้อม manifest (content hash) และ TTL"""
+        if not self.redis_client:
+            return
+
+        try:
+            tensors = to_tensors(model)
+            ttl = self.config.model_cache_ttl_hours * 3600
+            manifest = build_manifest(cache_key, tensors, ttl)
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(cache_key)
+            pipe.hset(cache_key, mapping={"manifest": json.dumps(manifest), **encode_blobs(tensors)})
+            pipe.expire(cache_key, ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis set error: {e}")
+
+    def _get_from_disk(self, cache_key: str):
+        """ดึง weights จาก disk แบบ memory-mapped (หมดอายุตาม TTL ใน manifest)"""
+        return self.tensor_store.load(cache_key) if self.tensor_store else None
+
+    def _set_to_disk(self, cache_key: str, model):
+        """เก็บ weights เป็น .npy ต่อ tensor + manifest"""
+        if not self.tensor_store:
+            return
+
+        try:
+            self.tensor_store.save(cache_key, to_tensors(model))
+        except Exception as e:
+            logger.error(f"Disk cache write error: {e}")
+
+    def clear_cache(self):
+        """ล้าง cache ทั้งหมด"""
+        self.cache.clear()
+
+        if self.redis_client:
+            try:
+                keys = self.redis_client.keys("model:*")
+                if keys:
+                    self.redis_client.delete(*keys)
+            except Exception as e:
+                logger.error(f"Redis cache clear error: {e}")
+
+        if self.tensor_store:
+            self.tensor_store.clear()
@@ -3,12 +3,11 @@ Advanced Performance Optimizer for Object Detection System
 รองรับ Model caching, Image preprocessing optimization, Batch processing, GPU acceleration
 """
 
-import os
 import time
 import psutil
 import threading
 import multiprocessing
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait as wait_futures
 import asyncio
 import aiofiles
 import numpy as np
@@ -16,15 +15,13 @@ import cv2
 import torch
 import tensorflow as tf
 from PIL import Image, ImageOps
-import pickle
-import redis
 import sqlite3
 import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
-from functools import lru_cache, wraps
+from functools import wraps
 import hashlib
 import gc
 import tracemalloc
@@ -32,9 +29,14 @@ from memory_profiler import profile
 import cProfile
 import pstats
 from contextlib import contextmanager
-import queue
 import weakref
 
+from shared_frame_ring import SharedFrameRing, FrameRef, attach_worker_rings, preprocess_ring_frame
+from byte_lru import ByteLRU, FileHashCache
+from batch_preprocess import BatchPreprocessor
+from dynamic_batcher import DynamicBatcher, get_shared_batcher
+from model_cache import ModelCache
+
 # ตั้งค่า logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,6 +47,7 @@ class PerformanceConfig:
     # Model Caching
     model_cache_enabled: bool = True
     model_cache_size: int = 5  # จำนวน models ที่เก็บใน cache
+    model_cache_size_mb: int = 2048  # ขนาดรวมของ models ใน memory cache (ประมาณจาก parameters/arrays)
     model_cache_ttl_hours: int = 24
     model_cache_storage: str = "memory"  # memory, redis, disk
     
@@ -65,7 +68,9 @@ class PerformanceConfig:
     batch_processing_enabled: bool = True
     max_batch_size: int = 16
     batch_timeout_seconds: float = 0.5
-    dynamic_batching: bool = True
+    dynamic_batching: bool = True  # False = batch ขนาดคงที่ / รอครบ batch_timeout_seconds
+    batch_latency_slo_ms: float = 100.0  # SLO ของ lane "live" (เฟรมจาก kiosk / API)
+    background_latency_slo_ms: float = 2000.0  # SLO ของ lane "background" (งาน offline / re-scoring)
     
     # Memory Management
     memory_monitoring_enabled: bool = True
@@ -110,304 +115,148 @@ class PerformanceMetrics:
     active_connections: int
     queue_size: int
 
-class ModelCache:
-    """จัดการ cache สำหรับ models"""
+class ImageProcessor:
+    """ประมวลผลภาพอย่างมีประสิทธิภาพ"""
     
     def __init__(self, config: PerformanceConfig):
         self.config = config
-        self.cache = {}
-        self.access_times = {}
-        self.redis_client = None
-        self.cache_dir = "model_cache"
-        
-        if config.model_cache_storage == "redis":
-            self.init_redis()
-        elif config.model_cache_storage == "disk":
-            os.makedirs(self.cache_dir, exist_ok=True)
-    
-    def init_redis(self):
-        """เริ่มต้น Redis connection"""
-        try:
-            self.redis_client = redis.Redis(host='localhost', port=6379, db=1)
-            self.redis_client.ping()
-            logger.info("Model cache Redis connection established")
-        except Exception as e:
-            logger.warning(f"Redis not available for model cache: {e}")
-            self.redis_client = None
-    
-    def _generate_cache_key(self, model_name: str, model_version: str = "latest") -> str:
-        """สร้าง cache key"""
-        return f"model:{model_name}:{model_version}"
-    
-    def get_model(self, model_name: str, model_version: str = "latest"):
-        """ดึง model จาก cache"""
-        if not self.config.model_cache_enabled:
-            return None
-        
-        cache_key = self._generate_cache_key(model_name, model_version)
-        
-        try:
-            if self.config.model_cache_storage == "memory":
-                return self._get_from_memory(cache_key)
-            elif self.config.model_cache_storage == "redis":
-                return self._get_from_redis(cache_key)
-            elif self.config.model_cache_storage == "disk":
-                return self._get_from_disk(cache_key)
-        except Exception as e:
-            logger.error(f"Error getting model from cache: {e}")
-            return None
-    
-    def set_model(self, model_name: str, model, model_version: str = "latest"):
-        """เก็บ model ใน cache"""
-        if not self.config.model_cache_enabled:
-            return
-        
-        cache_key = self._generate_cache_key(model_name, model_version)
-        
-        try:
-            if self.config.model_cache_storage == "memory":
-                self._set_to_memory(cache_key, model)
-            elif self.config.model_cache_storage == "redis":
-                self._set_to_redis(cache_key, model)
-            elif self.config.model_cache_storage == "disk":
-                self._set_to_disk(cache_key, model)
-        except Exception as e:
-            logger.error(f"Error setting model to cache: {e}")
-    
-    def _get_from_memory(self, cache_key: str):
-        """ดึงจาก memory cache"""
-        if cache_key in self.cache:
-            self.access_times[cache_key] = time.time()
-            return self.cache[cache_key]
-        return None
-    
-    def _set_to_memory(self, cache_key: str, model):
-        """เก็บใน memory cache"""
-        # ตรวจสอบขนาด cache
-        if len(self.cache) >= self.config.model_cache_size:
-            self._evict_lru()
+        self.thread_pool = ThreadPoolExecutor(max_workers=config.image_preprocessing_workers)
+        self.batch_preprocessor = BatchPreprocessor(executor=self.thread_pool)
+        self.process_pool = ProcessPoolExecutor(max_workers=config.process_pool_size)
+        self.image_cache = ByteLRU(max_bytes=config.image_cache_size_mb * 1024 * 1024, sizeof=lambda image: image.nbytes)
+        self.file_hashes = FileHashCache()
+        self.batcher: Optional[DynamicBatcher] = None
+        self._pending = set()  # Future ของงานที่ส่งเข้า batcher แล้วยังไม่เสร็จ
+        self._pending_lock = threading.Lock()
+        self.frame_ring: Optional[SharedFrameRing] = None
+        self.output_ring: Optional[SharedFrameRing] = None
         
-        self.cache[cache_key] = model
-        self.access_times[cache_key] = time.time()
+        if config.batch_processing_enabled:
+            self.start_batch_processor()
     
-    def _evict_lru(self):
-        """ลบ model ที่ใช้นานที่สุด"""
-        if not self.access_times:
+    def start_batch_processor(self):
+        """
+        เริ่มต้น batch processor: ใช้ DynamicBatcher ตัวเดียวกับ detection service ของ API (get_shared_batcher)
+        worker หลับจนมีงานเข้า (ไม่ poll queue) และเฟรม live จาก kiosk แซงงานของ ImageProcessor ได้
+        """
+        if self.batcher is None:
+            self.batcher = get_shared_batcher(self.config)
+    
+    def stop_batch_processor(self, drain: bool = True, timeout: float = 10.0):
+        """
+        หยุดส่งงานเข้า batcher - drain=True รองานของ ImageProcessor ที่ค้างให้เสร็จ, False = ยกเลิกงานที่ยังไม่เริ่ม
+        (batcher ใช้ร่วมกับ API จึงไม่ถูกปิดที่นี่ - ปิดด้วย close_shared_batcher() ตอนจบโปรแกรม)
+        """
+        if self.batcher is None:
             return
+        self.batcher = None
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            if not drain:
+                future.cancel()
+        wait_futures(pending, timeout=timeout)
+    
+    def submit(self, item: Dict, lane: str = "background") -> Future:
+        """
+        ส่งงานเข้า batch: item = {'operation': 'resize' | 'normalize' | 'augment', 'image', ...}
         
-        lru_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-        del self.cache[lru_key]
-        del self.access_times[lru_key]
+        คืน Future ของผลลัพธ์ (ภาพที่ประมวลผลแล้ว) - ค่าเริ่มต้นเป็น lane "background" (งาน offline ที่รอได้)
+        ส่ง lane="live" เฉพาะงานที่ผู้ใช้รอผลอยู่
+        """
+        if self.batcher is None:
+            raise RuntimeError("Batch processor is not running - call start_batch_processor() first")
+        future = self.batcher.submit(item, lane, handler=self._process_batch)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard_pending)
+        return future
+    
+    def _discard_pending(self, future: Future):
+        with self._pending_lock:
+            self._pending.discard(future)
+    
+    def _process_batch(self, batch: List[Dict]) -> List[Any]:
+        """ประมวลผล batch ของภาพ - คืนผลลัพธ์ตามลำดับเดิมของ item (error ส่งต่อไปที่ Future ของทุก item)"""
+        results: List[Any] = [None] * len(batch)
         
-        # บังคับ garbage collection
-        gc.collect()
-    
-    def _get_from_redis(self, cache_key: str):
-        """ดึงจาก Redis cache"""
-        if not self.redis_client:
-            return None
+        # จัดกลุ่มตามประเภทการประมวลผล
+        groups: Dict[str, List[int]] = {'resize': [], 'normalize': [], 'augment': []}
+        for index, item in enumerate(batch):
+            operation = item.get('operation')
+            if operation not in groups:
+                raise ValueError(f"Unknown batch operation: {operation}")
+            groups[operation].append(index)
         
-        try:
-            data = self.redis_client.get(cache_key)
-            if data:
-                return pickle.loads(data)
-        except Exception as e:
-            logger.error(f"Redis get error: {e}")
-        return None
-    
-    def _set_to_redis(self, cache_key: str, model):
-        """เก็บใน Redis cache"""
-        if not self.redis_client:
-            return
+        # ประมวลผลแต่ละกลุ่ม
+        handlers = {'resize': self._batch_resize, 'normalize': self._batch_normalize, 'augment': self._batch_augment}
+        for operation, indices in groups.items():
+            if indices:
+                outputs = handlers[operation]([batch[i] for i in indices])
+                for index, output in zip(indices, outputs):
+                    results[index] = output
         
-        try:
-            data = pickle.dumps(model)
-            ttl = self.config.model_cache_ttl_hours * 3600
-            self.redis_client.setex(cache_key, ttl, data)
-        except Exception as e:
-            logger.error(f"Redis set error: {e}")
-    
-    def _get_from_disk(self, cache_key: str):
-        """ดึงจาก disk cache"""
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.pkl")
+        return results
+    
+    @staticmethod
+    def _resize_one(image, target_size: Tuple[int, int]):
+        if isinstance(image, np.ndarray):
+            return cv2.resize(image, target_size, interpolation=cv2.INTER_LINEAR)
+        # PIL Image
+        return image.resize(target_size, Image.LANCZOS)
+    
+    def _batch_resize(self, batch: List[Dict]) -> List[Any]:
+        """Batch resize images (กระจายไปที่ thread pool - cv2.resize ปล่อย GIL)"""
+        resized = list(self.thread_pool.map(
+            lambda item: self._resize_one(item['image'], item['target_size']), batch
+        ))
         
-        if os.path.exists(cache_file):
-            # ตรวจสอบอายุไฟล์
-            file_age = time.time() - os.path.getmtime(cache_file)
-            if file_age < self.config.model_cache_ttl_hours * 3600:
-                try:
-                    with open(cache_file, 'rb') as f:
-                        return pickle.load(f)
-                except Exception as e:
-                    logger.error(f"Disk cache read error: {e}")
-        return None
-    
-    def _set_to_disk(self, cache_key: str, model):
-        """เก็บใน disk cache"""
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.pkl")
+        for item, image in zip(batch, resized):
+            if item.get('callback'):
+                item['callback'](image)
         
-        try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(model, f)
-        except Exception as e:
-            logger.error(f"Disk cache write error: {e}")
+        return resized
     
-    def clear_cache(self):
-        """ล้าง cache ทั้งหมด"""
-        self.cache.clear()
-        self.access_times.clear()
+    def _batch_normalize(self, batch: List[Dict]) -> List[np.ndarray]:
+        """
+        Batch normalize images เป็น CHW float32 (RGB, 0-1)
         
-        if self.redis_client:
-            try:
-                keys = self.redis_client.keys("model:*")
-                if keys:
-                    self.redis_client.delete(*keys)
-            except Exception as e:
-                logger.error(f"Redis cache clear error: {e}")
+        จัดกลุ่มตาม target_size ของ item (ไม่มี = ขนาดเดิมของภาพ) แล้วเตรียมทั้งกลุ่มลง tensor NCHW ก้อนเดียว
+        ผลลัพธ์ของแต่ละ item เป็น view ของ tensor ของกลุ่ม (tensor ใหม่ต่อ batch เพราะ Future ถือผลไว้หลัง batch จบ)
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(batch)
+        images = [item['image'] for item in batch]
+        target_sizes = [item.get('target_size') for item in batch]
         
-        if os.path.exists(self.cache_dir):
-            for file in os.listdir(self.cache_dir):
-                if file.endswith('.pkl'):
-                    os.remove(os.path.join(self.cache_dir, file))
-
-class ImageProcessor:
-    """ประมวลผลภาพอย่างมีประสิทธิภาพ"""
-    
-    def __init__(self, config: PerformanceConfig):
-        self.config = config
-        self.thread_pool = ThreadPoolExecutor(max_workers=config.image_preprocessing_workers)
-        self.process_pool = ProcessPoolExecutor(max_workers=config.process_pool_size)
-        self.image_cache = {}
-        self.batch_queue = queue.Queue()
-        self.batch_processor_running = False
+        for indices, tensor in self.batch_preprocessor.preprocess_groups(images, target_sizes, reuse=False):
+            for position, index in enumerate(indices):
+                results[index] = tensor[position]
+                callback = batch[index].get('callback')
+                if callback:
+                    callback(tensor[position])
         
-        if config.batch_processing_enabled:
-            self.start_batch_processor()
-    
-    def start_batch_processor(self):
-        """เริ่มต้น batch processor"""
-        if not self.batch_processor_running:
-            self.batch_processor_running = True
-            threading.Thread(target=self._batch_processor_worker, daemon=True).start()
+        return results
     
-    def _batch_processor_worker(self):
-        """Worker สำหรับ batch processing"""
-        batch = []
-        last_process_time = time.time()
+    def preprocess_batch(self, images: List[np.ndarray], target_size: Tuple[int, int]) -> np.ndarray:
+        """
+        เตรียมภาพ BGR เป็น tensor NCHW float32 (RGB, 0-1) สำหรับส่งเข้า backend โดยตรง
         
-        while self.batch_processor_running:
-            try:
-                # รอรับ item ใหม่
-                try:
-                    item = self.batch_queue.get(timeout=0.1)
-                    batch.append(item)
-                except queue.Empty:
-                    pass
-                
-                current_time = time.time()
-                
-                # ประมวลผล batch เมื่อ:
-                # 1. batch เต็ม
-                # 2. timeout
-                # 3. มี item ใน batch และเวลาผ่านไป
-                should_process = (
-                    len(batch) >= self.config.max_batch_size or
-                    (batch and current_time - last_process_time >= self.config.batch_timeout_seconds)
-                )
-                
-                if should_process and batch:
-                    self._process_batch(batch)
-                    batch = []
-                    last_process_time = current_time
-                
-            except Exception as e:
-                logger.error(f"Batch processor error: {e}")
-                batch = []
-    
-    def _process_batch(self, batch: List[Dict]):
-        """ประมวลผล batch ของภาพ"""
-        try:
-            # จัดกลุ่มตามประเภทการประมวลผล
-            resize_batch = []
-            normalize_batch = []
-            augment_batch = []
-            
-            for item in batch:
-                operation = item.get('operation')
-                if operation == 'resize':
-                    resize_batch.append(item)
-                elif operation == 'normalize':
-                    normalize_batch.append(item)
-                elif operation == 'augment':
-                    augment_batch.append(item)
-            
-            # ประมวลผลแต่ละกลุ่ม
-            if resize_batch:
-                self._batch_resize(resize_batch)
-            if normalize_batch:
-                self._batch_normalize(normalize_batch)
-            if augment_batch:
-                self._batch_augment(augment_batch)
-                
-        except Exception as e:
-            logger.error(f"Batch processing error: {e}")
-    
-    def _batch_resize(self, batch: List[Dict]):
-        """Batch resize images"""
-        try:
-            for item in batch:
-                image = item['image']
-                target_size = item['target_size']
-                callback = item['callback']
-                
-                # ใช้ OpenCV สำหรับ batch resize
-                if isinstance(image, np.ndarray):
-                    resized = cv2.resize(image, target_size, interpolation=cv2.INTER_LINEAR)
-                else:
-                    # PIL Image
-                    resized = image.resize(target_size, Image.LANCZOS)
-                
-                # เรียก callback
-                if callback:
-                    callback(resized)
-                    
-        except Exception as e:
-            logger.error(f"Batch resize error: {e}")
-    
-    def _batch_normalize(self, batch: List[Dict]):
-        """Batch normalize images"""
-        try:
-            images = [item['image'] for item in batch]
-            callbacks = [item['callback'] for item in batch]
-            
-            # Batch normalization
-            if images and isinstance(images[0], np.ndarray):
-                # NumPy batch processing
-                batch_array = np.stack(images)
-                normalized_batch = (batch_array.astype(np.float32) / 255.0)
-                
-                for i, callback in enumerate(callbacks):
-                    if callback:
-                        callback(normalized_batch[i])
-                        
-        except Exception as e:
-            logger.error(f"Batch normalize error: {e}")
+        ผลลัพธ์เป็น buffer ที่ใช้ซ้ำของ thread ผู้เรียก - ใช้ได้จนถึงการเรียกครั้งถัดไปที่ target_size เดียวกัน
+        """
+        return self.batch_preprocessor.preprocess(images, target_size)
     
-    def _batch_augment(self, batch: List[Dict]):
+    def _batch_augment(self, batch: List[Dict]) -> List[np.ndarray]:
         """Batch augment images"""
-        try:
-            for item in batch:
-                image = item['image']
-                augmentations = item.get('augmentations', [])
-                callback = item['callback']
-                
-                augmented = self._apply_augmentations(image, augmentations)
-                
-                if callback:
-                    callback(augmented)
-                    
-        except Exception as e:
-            logger.error(f"Batch augment error: {e}")
+        results = []
+        for item in batch:
+            augmented = self._apply_augmentations(item['image'], item.get('augmentations', []))
+            results.append(augmented)
+            
+            callback = item.get('callback')
+            if callback:
+                callback(augmented)
+        
+        return results
     
     def _apply_augmentations(self, image: np.ndarray, augmentations: List[str]) -> np.ndarray:
         """ใช้ augmentations กับภาพ"""
@@ -427,24 +276,47 @@ class ImageProcessor:
         
         return result
     
-    @lru_cache(maxsize=1000)
+    def attach_frame_ring(self, frame_ring: SharedFrameRing, output_ring: Optional[SharedFrameRing] = None):
+        """ให้ process pool อ่านเฟรมจาก shared memory ring (ส่งแค่ FrameRef แทนการ pickle ภาพ)"""
+        self.process_pool.shutdown(wait=True)
+        self.frame_ring = frame_ring
+        self.output_ring = output_ring
+        # ring (และ lock ของมัน) ส่งให้ worker ได้ตอนสร้าง process เท่านั้น
+        self.process_pool = ProcessPoolExecutor(
+            max_workers=self.config.process_pool_size,
+            initializer=attach_worker_rings,
+            initargs=(frame_ring, output_ring)
+        )
+    
+    def preprocess_shared_frame(self, ref: FrameRef, target_size: Optional[Tuple[int, int]] = None,
+                                normalize: bool = True):
+        """
+        resize / normalize เฟรมใน ring บน process pool - คืน Future
+        ผลลัพธ์เป็น FrameRef ของ output ring (ถ้ามี) หรือ ndarray; เฟรม input ถูก release ให้อัตโนมัติ
+        """
+        if self.frame_ring is None:
+            raise RuntimeError("No frame ring attached - call attach_frame_ring() first")
+        return self.process_pool.submit(preprocess_ring_frame, ref, target_size, normalize)
+    
     def get_image_hash(self, image_path: str) -> str:
-        """สร้าง hash สำหรับภาพ"""
+        """สร้าง hash สำหรับภาพ (อ่านไฟล์ทีละ chunk และคำนวณใหม่เมื่อ mtime/size ของไฟล์เปลี่ยน)"""
         try:
-            with open(image_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
-        except Exception:
+            return self.file_hashes.get(image_path)[0]
+        except OSError:
             return hashlib.md5(image_path.encode()).hexdigest()
     
     async def preprocess_image_async(self, image_path: str, target_size: Tuple[int, int], 
                                    normalize: bool = True) -> np.ndarray:
         """ประมวลผลภาพแบบ async"""
         try:
-            # ตรวจสอบ cache
-            cache_key = f"{self.get_image_hash(image_path)}_{target_size}_{normalize}"
-            
-            if self.config.image_cache_enabled and cache_key in self.image_cache:
-                return self.image_cache[cache_key]
+            # ตรวจสอบ cache (key = content hash + (mtime, size) ของไฟล์ + การประมวลผล)
+            cache_key = None
+            if self.config.image_cache_enabled:
+                digest, mtime_ns, size = self.file_hashes.get(image_path)
+                cache_key = (digest, mtime_ns, size, tuple(target_size) if target_size else None, normalize)
+                cached = self.image_cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
             # อ่านภาพ
             async with aiofiles.open(image_path, 'rb') as f:
@@ -493,24 +365,15 @@ class ImageProcessor:
             logger.error(f"Sync image processing error: {e}")
             raise
     
-    def _manage_image_cache(self, cache_key: str, image: np.ndarray):
-        """จัดการ image cache"""
+    def _manage_image_cache(self, cache_key: Tuple, image: np.ndarray):
+        """
+        จัดการ image cache (LRU นับขนาดแบบสะสม ไม่ต้องรวม nbytes ใหม่ทุกครั้ง)
+        
+        ภาพใน cache เป็น read-only เพราะถูกแชร์ให้ผู้เรียกหลายคน - ถ้าจะแก้ต้อง copy ก่อน
+        """
         try:
-            # ตรวจสอบขนาด cache
-            current_size_mb = sum(
-                img.nbytes / (1024 * 1024) 
-                for img in self.image_cache.values()
-            )
-            
-            # ลบ cache เก่าถ้าเกินขนาดที่กำหนด
-            while current_size_mb > self.config.image_cache_size_mb and self.image_cache:
-                oldest_key = next(iter(self.image_cache))
-                oldest_image = self.image_cache.pop(oldest_key)
-                current_size_mb -= oldest_image.nbytes / (1024 * 1024)
-            
-            # เพิ่ม image ใหม่
-            self.image_cache[cache_key] = image
-            
+            image.setflags(write=False)
+            self.image_cache.put(cache_key, image)
         except Exception as e:
             logger.error(f"Image cache management error: {e}")
 
@@ -866,7 +729,7 @@ class PerformanceOptimizer:
                 cache_hit_rate=cache_hit_rate,
                 error_rate=0,  # จะอัปเดตจากการติดตาม error
                 active_connections=0,  # จะอัปเดตจาก web server
-                queue_size=self.image_processor.batch_queue.qsize()
+                queue_size=self.image_processor.batcher.queue_depth() if self.image_processor.batcher else 0
             )
             
         except Exception as e:
@@ -985,10 +848,16 @@ class PerformanceOptimizer:
             # ข้อมูล cache
             cache_stats = {
                 "model_cache_size": len(self.model_cache.cache),
+                "model_cache": self.model_cache.get_stats(),
                 "image_cache_size": len(self.image_processor.image_cache),
+                "image_cache": self.image_processor.image_cache.get_stats(),
                 "result_cache_size": len(self.result_cache)
             }
             
+            # ข้อมูล batch processor
+            batcher = self.image_processor.batcher
+            batch_stats = batcher.get_stats() if batcher else None
+            
             # ข้อมูล GPU
             gpu_info = self.gpu_manager.get_gpu_memory_info()
             
@@ -1006,6 +875,7 @@ class PerformanceOptimizer:
                     "gpu_info": gpu_info
                 },
                 "cache_stats": cache_stats,
+                "batch_stats": batch_stats,
                 "configuration": {
                     "gpu_enabled": self.config.gpu_enabled,
                     "batch_processing": self.config.batch_processing_enabled,
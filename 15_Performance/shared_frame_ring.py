@@ -0,0 +1,333 @@
+"""
+Shared-Memory Frame Ring Buffer
+ส่งเฟรมระหว่าง process ผ่าน multiprocessing.shared_memory แทนการ pickle ภาพ
+- เฟรมขนาดคงที่ (เช่น 480x640x3 uint8) เก็บใน slot ของ shared memory ก้อนเดียว
+- capture process เขียนลง slot ว่าง แล้วส่งแค่ FrameRef (slot, seq) ผ่าน queue
+- inference / preprocessing process อ่านเป็น numpy view (zero-copy)
+- slot มี reference count: ผู้อ่านคนสุดท้าย release แล้ว slot จะถูกนำกลับมาใช้ใหม่
+
+ใช้กับ ImageProcessor.attach_frame_ring() ใน performance_optimizer.py
+benchmark (pickle vs shared memory): python shared_frame_ring.py
+"""
+
+import logging
+import multiprocessing
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FrameRef = namedtuple("FrameRef", ["slot", "seq"])
+
+# refcount ของ slot
+SLOT_FREE = 0
+SLOT_WRITING = -1
+
+# แถวแรกของ control block: ตัวนับของทั้ง ring
+_HEADER_NEXT_SEQ, _HEADER_CURSOR, _HEADER_WRITES, _HEADER_DROPPED = range(4)
+_CONTROL_COLUMNS = 4
+_ALIGN = 64
+
+
+class SharedFrameRing:
+    """Ring buffer ของเฟรมขนาดคงที่ใน shared memory (ส่งต่อให้ process ลูกได้ตอนสร้าง process)"""
+
+    def __init__(self, slots: int, shape: Tuple[int, ...], dtype=np.uint8,
+                 name: Optional[str] = None, create: bool = True, lock=None):
+        if slots < 1:
+            raise ValueError("slots must be >= 1")
+
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.lock = lock if lock is not None else multiprocessing.Lock()
+
+        control_nbytes = (slots + 1) * _CONTROL_COLUMNS * 8
+        self._frames_offset = -(-control_nbytes // _ALIGN) * _ALIGN
+        self._slot_stride = -(-self.frame_nbytes // _ALIGN) * _ALIGN
+        size = self._frames_offset + self._slot_stride * slots
+
+        self._owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+
+        # แถว 0 = header, แถว 1.. = [refcount, seq, write_time_ns, 0] ของแต่ละ slot
+        self._control = np.ndarray((slots + 1, _CONTROL_COLUMNS), dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self._control[:] = 0
+            self._control[0, _HEADER_NEXT_SEQ] = 1
+
+        self._views = [
+            np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf,
+                       offset=self._frames_offset + i * self._slot_stride)
+            for i in range(slots)
+        ]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # ----------------------------------------
+    # ส่งต่อให้ process ลูก (เช่น initargs ของ ProcessPoolExecutor)
+    # ----------------------------------------
+
+    def __getstate__(self):
+        return {"name": self.name, "slots": self.slots, "shape": self.shape,
+                "dtype": self.dtype.str, "lock": self.lock}
+
+    def __setstate__(self, state):
+        self.__init__(state["slots"], state["shape"], np.dtype(state["dtype"]),
+                      name=state["name"], create=False, lock=state["lock"])
+
+    # ----------------------------------------
+    # ฝั่งเขียน (capture)
+    # ----------------------------------------
+
+    def reserve(self) -> Optional[Tuple[FrameRef, np.ndarray]]:
+        """จอง slot ว่างสำหรับเขียน - คืน (ref, view ที่เขียนได้) หรือ None ถ้าทุก slot ยังถูกใช้อยู่"""
+        with self.lock:
+            header = self._control[0]
+            for step in range(self.slots):
+                slot = (int(header[_HEADER_CURSOR]) + step) % self.slots
+                row = self._control[slot + 1]
+                if row[0] != SLOT_FREE:
+                    continue
+                seq = int(header[_HEADER_NEXT_SEQ])
+                header[_HEADER_NEXT_SEQ] = seq + 1
+                header[_HEADER_CURSOR] = (slot + 1) % self.slots
+                row[0] = SLOT_WRITING
+                row[1] = seq
+                return FrameRef(slot, seq), self._views[slot]
+            header[_HEADER_DROPPED] += 1
+        return None
+
+    def publish(self, ref: FrameRef, readers: int = 1):
+        """เขียนเสร็จแล้ว: เปิดให้ผู้อ่าน readers คน (0 = คืน slot ทันที)"""
+        with self.lock:
+            row = self._control[ref.slot + 1]
+            if row[1] != ref.seq or row[0] != SLOT_WRITING:
+                raise ValueError(f"Slot {ref.slot} is not reserved for seq {ref.seq}")
+            row[0] = max(0, readers)
+            row[2] = time.time_ns()
+            self._control[0, _HEADER_WRITES] += 1
+
+    def write(self, frame: np.ndarray, readers: int = 1) -> Optional[FrameRef]:
+        """copy เฟรมลง slot ว่างแล้ว publish - คืน None (นับเป็น dropped) ถ้าไม่มี slot ว่าง"""
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match ring shape {self.shape}")
+        reserved = self.reserve()
+        if reserved is None:
+            return None
+        ref, view = reserved
+        np.copyto(view, frame, casting="unsafe")
+        self.publish(ref, readers)
+        return ref
+
+    # ----------------------------------------
+    # ฝั่งอ่าน (inference / preprocessing)
+    # ----------------------------------------
+
+    def view(self, ref: FrameRef) -> np.ndarray:
+        """numpy view ของเฟรม (ไม่ copy, อ่านอย่างเดียว) - ใช้ได้จนกว่าจะ release"""
+        with self.lock:
+            row = self._control[ref.slot + 1]
+            if row[1] != ref.seq or row[0] <= 0:
+                raise KeyError(f"Frame {ref} is no longer in the ring")
+        view = self._views[ref.slot].view()
+        view.flags.writeable = False
+        return view
+
+    def retain(self, ref: FrameRef, count: int = 1):
+        """เพิ่มผู้อ่านของเฟรม (เช่น ส่งต่อให้อีก process)"""
+        with self.lock:
+            row = self._control[ref.slot + 1]
+            if row[1] != ref.seq or row[0] <= 0:
+                raise KeyError(f"Frame {ref} is no longer in the ring")
+            row[0] += count
+
+    def release(self, ref: FrameRef) -> bool:
+        """ผู้อ่านใช้เฟรมเสร็จ - คืน True เมื่อ slot ว่างและนำกลับมาใช้ใหม่ได้"""
+        with self.lock:
+            row = self._control[ref.slot + 1]
+            if row[1] != ref.seq or row[0] <= 0:
+                return False
+            row[0] -= 1
+            return row[0] == SLOT_FREE
+
+    def frame_time(self, ref: FrameRef) -> float:
+        """เวลาที่ publish เฟรม (epoch seconds)"""
+        return int(self._control[ref.slot + 1, 2]) / 1e9
+
+    # ----------------------------------------
+    # สถานะ / ปิด
+    # ----------------------------------------
+
+    def free_slots(self) -> int:
+        with self.lock:
+            return int(np.count_nonzero(self._control[1:, 0] == SLOT_FREE))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            header = self._control[0]
+            refcounts = self._control[1:, 0]
+            return {
+                "slots": self.slots,
+                "free": int(np.count_nonzero(refcounts == SLOT_FREE)),
+                "writing": int(np.count_nonzero(refcounts == SLOT_WRITING)),
+                "in_use": int(np.count_nonzero(refcounts > 0)),
+                "writes": int(header[_HEADER_WRITES]),
+                "dropped": int(header[_HEADER_DROPPED]),
+            }
+
+    def close(self):
+        """ปล่อย view และ mapping ของ process นี้ (ผู้สร้างต้องเรียก unlink ด้วย)"""
+        self._views = []
+        self._control = None
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning(f"Frame ring {self.name}: views still in use, mapping kept open")
+
+    def unlink(self):
+        """ลบ shared memory ออกจากระบบ (เรียกจากผู้สร้างเท่านั้น)"""
+        if self._owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.unlink()
+
+# === Worker Functions (รันใน process ลูก) ===
+
+_worker_rings: Dict[str, Optional[SharedFrameRing]] = {"input": None, "output": None}
+
+
+def attach_worker_rings(input_ring: SharedFrameRing, output_ring: Optional[SharedFrameRing] = None):
+    """initializer ของ ProcessPoolExecutor: attach ring ครั้งเดียวต่อ worker"""
+    _worker_rings["input"] = input_ring
+    _worker_rings["output"] = output_ring
+
+
+def preprocess_ring_frame(ref: FrameRef, target_size: Optional[Tuple[int, int]] = None,
+                          normalize: bool = True):
+    """
+    resize / normalize เฟรมจาก input ring แล้ว release เฟรมนั้น
+    ถ้ามี output ring จะเขียนผลลงนั้นและคืน FrameRef (ไม่ pickle ผลลัพธ์) ไม่งั้นคืน ndarray
+    """
+    input_ring, output_ring = _worker_rings["input"], _worker_rings["output"]
+    if input_ring is None:
+        raise RuntimeError("Worker has no frame ring - use attach_worker_rings as initializer")
+
+    try:
+        image = input_ring.view(ref)
+        if target_size:
+            image = cv2.resize(image, target_size, interpolation=cv2.INTER_LINEAR)
+
+        if output_ring is None:
+            return image.astype(np.float32) / 255.0 if normalize else np.array(image)
+
+        reserved = output_ring.reserve()
+        if reserved is None:
+            return None
+        out_ref, out = reserved
+        if normalize:
+            np.multiply(image, np.float32(1.0 / 255.0), out=out, casting="unsafe")
+        else:
+            np.copyto(out, image, casting="unsafe")
+        output_ring.publish(out_ref)
+        return out_ref
+    finally:
+        input_ring.release(ref)
+
+
+def capture_to_ring(source, ring: SharedFrameRing, ref_queue, stop_event, readers: int = 1):
+    """
+    เป้าหมายของ capture process: อ่านกล้องลง slot ของ ring โดยตรง แล้วส่ง FrameRef ลง queue
+    ถ้าไม่มี slot ว่าง (ผู้อ่านช้า) จะทิ้งเฟรมนั้นแทนการรอ
+    """
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        logger.error(f"Cannot open camera source: {source}")
+        return
+
+    try:
+        while not stop_event.is_set():
+            reserved = ring.reserve()
+            if reserved is None:
+                cap.grab()
+                continue
+            ref, view = reserved
+            ret, frame = cap.read(image=view)
+            if not ret:
+                ring.publish(ref, readers=0)
+                break
+            if frame is not view:
+                np.copyto(view, frame.reshape(ring.shape), casting="unsafe")
+            ring.publish(ref, readers)
+            ref_queue.put(ref)
+    finally:
+        cap.release()
+
+# === Benchmark ===
+
+def _preprocess_pickled(frame: np.ndarray, target_size: Tuple[int, int]) -> np.ndarray:
+    return cv2.resize(frame, target_size, interpolation=cv2.INTER_LINEAR).astype(np.float32) / 255.0
+
+
+def benchmark_transport(frames: int = 200, shape: Tuple[int, int, int] = (480, 640, 3),
+                        target_size: Tuple[int, int] = (416, 416), workers: int = 2,
+                        slots: int = 8) -> Dict[str, float]:
+    """
+    เปรียบเทียบ FPS ของ preprocessing ใน ProcessPoolExecutor:
+    ส่งภาพแบบ pickle เทียบกับส่ง FrameRef ของ shared memory ring (ผลลัพธ์ลง output ring)
+    """
+    rng = np.random.default_rng(0)
+    source = rng.integers(0, 255, shape, dtype=np.uint8)
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_preprocess_pickled, [source] * workers, [target_size] * workers))  # warm up
+        start = time.perf_counter()
+        pending = [pool.submit(_preprocess_pickled, source, target_size) for _ in range(frames)]
+        for future in pending:
+            future.result()
+        results["pickle_fps"] = frames / (time.perf_counter() - start)
+
+    out_shape = (target_size[1], target_size[0], shape[2])
+    with SharedFrameRing(slots, shape) as ring, SharedFrameRing(slots, out_shape, np.float32) as out_ring:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_worker_rings,
+                                 initargs=(ring, out_ring)) as pool:
+            start = time.perf_counter()
+            in_flight = []
+            done = 0
+            while done < frames:
+                ref = ring.write(source) if done + len(in_flight) < frames else None
+                if ref is not None:
+                    in_flight.append(pool.submit(preprocess_ring_frame, ref, target_size))
+                if ref is None or len(in_flight) >= slots:
+                    out_ref = in_flight.pop(0).result()
+                    if out_ref is not None:
+                        out_ring.view(out_ref)  # ผู้ใช้ผลลัพธ์อ่านแบบ zero-copy
+                        out_ring.release(out_ref)
+                    done += 1
+            results["shared_memory_fps"] = frames / (time.perf_counter() - start)
+            results["dropped"] = ring.get_stats()["dropped"]
+
+    results["frames"] = frames
+    return results
+
+
+if __name__ == "__main__":
+    print("⏱️ Benchmarking frame transport to ProcessPoolExecutor (640x480 -> 416x416)...")
+    result = benchmark_transport()
+    print(f"📦 Pickled frames : {result['pickle_fps']:8.0f} FPS")
+    print(f"🚀 Shared memory  : {result['shared_memory_fps']:8.0f} FPS")
@@ -0,0 +1,209 @@
+"""
+Tensor Store
+เก็บ weights ของ model เป็นไฟล์ .npy แยกต่อ tensor แทนการ pickle ทั้ง object
+- โหลดด้วย np.load(mmap_mode="r"): ไม่ต้อง copy ทั้งไฟล์เข้า memory และ
+  uvicorn worker หลาย process ที่เปิดไฟล์เดียวกันใช้ page cache ก้อนเดียวกัน
+- manifest (JSON) เก็บ shape / dtype ของแต่ละ tensor, content hash (SHA-256) และ TTL
+- เขียนแบบ atomic: tensor ลง directory ตาม content hash แล้วค่อย os.replace manifest
+- ไม่มี pickle (allow_pickle=False) จึงโหลดไฟล์จาก cache ได้อย่างปลอดภัย
+
+ใช้เป็น disk / redis tier ของ ModelCache (model_cache.py)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def to_tensors(model: Any) -> Dict[str, np.ndarray]:
+    """
+    แปลง model เป็น dict ของ numpy arrays (ชื่อ -> tensor)
+
+    รองรับ dict ของ arrays/tensors, torch nn.Module (state_dict) และ Keras model (get_weights)
+    """
+    if isinstance(model, dict):
+        state = model
+    elif callable(getattr(model, "state_dict", None)):
+        state = model.state_dict()
+    elif callable(getattr(model, "get_weights", None)):
+        state = {f"weight_{i:04d}": w for i, w in enumerate(model.get_weights())}
+    else:
+        raise TypeError(f"Cannot extract tensors from {type(model).__name__}")
+
+    tensors = {}
+    for name, value in state.items():
+        if hasattr(value, "detach"):  # torch.Tensor
+            value = value.detach().cpu()
+            try:
+                value = value.numpy()
+            except TypeError:
+                value = value.float().numpy()  # bfloat16 ไม่มีใน numpy
+        tensors[str(name)] = np.ascontiguousarray(value)
+    return tensors
+
+
+def tensor_content_hash(tensors: Dict[str, np.ndarray]) -> str:
+    """SHA-256 ของชื่อ + dtype + shape + ข้อมูลของทุก tensor (เรียงตามชื่อ)"""
+    digest = hashlib.sha256()
+    for name in sorted(tensors):
+        array = np.ascontiguousarray(tensors[name])
+        digest.update(f"{name}|{array.dtype.str}|{array.shape}\n".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def build_manifest(key: str, tensors: Dict[str, np.ndarray], ttl_seconds: float,
+                   metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "version": MANIFEST_VERSION,
+        "key": key,
+        "created": time.time(),
+        "ttl_seconds": ttl_seconds,
+        "content_hash": tensor_content_hash(tensors),
+        "total_bytes": sum(int(array.nbytes) for array in tensors.values()),
+        "metadata": metadata or {},
+        "tensors": {
+            name: {"file": f"{i:05d}.npy", "dtype": array.dtype.str, "shape": list(array.shape)}
+            for i, (name, array) in enumerate(tensors.items())
+        },
+    }
+
+
+def is_expired(manifest: Dict[str, Any], now: Optional[float] = None) -> bool:
+    ttl = manifest.get("ttl_seconds")
+    return bool(ttl) and (now or time.time()) - manifest["created"] >= ttl
+
+
+def encode_blobs(tensors: Dict[str, np.ndarray]) -> Dict[str, bytes]:
+    """raw bytes ของแต่ละ tensor (ใช้กับ Redis hash: field t:<ชื่อ>)"""
+    return {f"t:{name}": np.ascontiguousarray(array).tobytes() for name, array in tensors.items()}
+
+
+def decode_blobs(manifest: Dict[str, Any], blobs: Dict[str, bytes], verify: bool = True) -> Dict[str, np.ndarray]:
+    """สร้าง tensors กลับจาก raw bytes ตาม manifest (read-only, ไม่ copy)"""
+    tensors = {}
+    for name, info in manifest["tensors"].items():
+        array = np.frombuffer(blobs[f"t:{name}"], dtype=np.dtype(info["dtype"]))
+        tensors[name] = array.reshape(info["shape"])
+    if verify and tensor_content_hash(tensors) != manifest["content_hash"]:
+        raise ValueError(f"Content hash mismatch for {manifest.get('key')}")
+    return tensors
+
+
+class TensorStore:
+    """เก็บ/โหลดชุด tensor บน disk ตาม key (หนึ่ง key = หนึ่ง model version)"""
+
+    def __init__(self, root: str = "model_cache", ttl_seconds: float = 24 * 3600):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def _safe(self, key: str) -> str:
+        return re.sub(r"[^A-Za-z0-9._-]", "_", key)
+
+    def _manifest_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{self._safe(key)}.json")
+
+    def _key_dir(self, key: str) -> str:
+        return os.path.join(self.root, self._safe(key))
+
+    def manifest(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, tensors: Dict[str, np.ndarray],
+             metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """เขียน tensors + manifest (tensor ชุดเดิมที่ hash ตรงกันจะไม่ถูกเขียนซ้ำ)"""
+        tensors = {name: np.ascontiguousarray(array) for name, array in tensors.items()}
+        manifest = build_manifest(key, tensors, self.ttl_seconds, metadata)
+        content_dir = os.path.join(self._key_dir(key), manifest["content_hash"][:16])
+
+        if not os.path.isdir(content_dir):
+            os.makedirs(self._key_dir(key), exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=".staging-", dir=self._key_dir(key))
+            try:
+                for name, info in manifest["tensors"].items():
+                    np.save(os.path.join(staging, info["file"]), tensors[name], allow_pickle=False)
+                os.replace(staging, content_dir)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.isdir(content_dir):  # worker อื่นเขียนชุดเดียวกันเสร็จก่อนก็ใช้ได้
+                    raise
+
+        manifest["dir"] = os.path.relpath(content_dir, self.root)
+        fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=self.root)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._manifest_path(key))
+
+        self._remove_stale_versions(key, keep=content_dir)
+        return manifest
+
+    def load(self, key: str, verify: bool = False) -> Optional[Dict[str, np.ndarray]]:
+        """
+        โหลด tensors แบบ memory-mapped (read-only) - คืน None ถ้าไม่มี, หมดอายุ หรือไฟล์ไม่ครบ
+
+        verify=True จะอ่านทุก byte เพื่อตรวจ content hash (เสียประโยชน์ของ lazy mmap)
+        """
+        loaded = self.load_with_manifest(key, verify)
+        return loaded[0] if loaded else None
+
+    def load_with_manifest(self, key: str, verify: bool = False) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+        manifest = self.manifest(key)
+        if manifest is None:
+            return None
+        if is_expired(manifest):
+            self.delete(key)
+            return None
+
+        content_dir = os.path.join(self.root, manifest["dir"])
+        tensors = {}
+        try:
+            for name, info in manifest["tensors"].items():
+                array = np.load(os.path.join(content_dir, info["file"]), mmap_mode="r", allow_pickle=False)
+                if array.dtype.str != info["dtype"] or list(array.shape) != info["shape"]:
+                    raise ValueError(f"tensor {name} does not match manifest")
+                tensors[name] = array
+        except (OSError, ValueError) as e:
+            logger.error(f"Tensor store entry {key} is unreadable: {e}")
+            return None
+
+        if verify and tensor_content_hash(tensors) != manifest["content_hash"]:
+            logger.error(f"Tensor store entry {key} failed content hash check")
+            return None
+        return tensors, manifest
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._manifest_path(key))
+        except OSError:
+            pass
+        shutil.rmtree(self._key_dir(key), ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                self.delete(name[:-len(".json")])
+
+    def _remove_stale_versions(self, key: str, keep: str):
+        """ลบ tensor ชุดเก่าของ key นี้ (process ที่ mmap ไว้แล้วยังอ่านได้จนกว่าจะปิด บน POSIX)"""
+        key_dir = self._key_dir(key)
+        for name in os.listdir(key_dir):
+            path = os.path.join(key_dir, name)
+            if path != keep and not name.startswith(".staging-"):
+                shutil.rmtree(path, ignore_errors=True)
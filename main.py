@@ -22,9 +22,10 @@ sys.path.insert(0, str(project_root / "03_Hardware"))
 sys.path.insert(0, str(project_root / "04_Web_Dashboard"))
 sys.path.insert(0, str(project_root / "05_Firebase_Config"))
 sys.path.insert(0, str(project_root / "08_Config"))
+sys.path.insert(0, str(project_root / "15_Performance"))
 
 # FastAPI imports
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse, HTMLResponse
@@ -40,6 +41,14 @@ import numpy as np
 from datetime import datetime
 import json
 
+# Detection service
+from config_yolo_v11 import YOLOv11Config
+from detection_service import YOLODetectionService, ServiceOverloadedError
+from dynamic_batcher import get_shared_batcher
+from inference_backends import create_backend_from_config
+from result_cache import create_result_cache_from_config
+from stream_session import create_stream_session
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -64,6 +73,7 @@ class DetectionResult(BaseModel):
     image_size: Dict[str, int]
     model_used: str
     timestamp: str
+    cached: bool = False
 
 class HealthResponse(BaseModel):
     """Health check response"""
@@ -76,6 +86,55 @@ class HealthResponse(BaseModel):
 detection_service = None
 arduino_service = None
 firebase_service = None
+result_cache = create_result_cache_from_config(YOLOv11Config)
+stream_sessions = set()
+
+def get_detection_batcher(max_batch_size, max_queue_size):
+    """Process-wide DynamicBatcher shared with offline jobs (None = built-in micro-batch loop)
+
+    API requests use the "live" lane; ImageProcessor jobs in the same process submit to "background",
+    so kiosk frames are batched ahead of re-scoring work.
+    """
+    dynamic = os.getenv("DETECTION_DYNAMIC_BATCHING", str(YOLOv11Config.API_DYNAMIC_BATCHING)).lower() in ("1", "true", "yes")
+    if not dynamic:
+        return None
+
+    slo_ms = float(os.getenv("DETECTION_LATENCY_SLO_MS", YOLOv11Config.API_LATENCY_SLO_MS))
+    return get_shared_batcher(
+        max_batch_size=max_batch_size,
+        lanes={"live": slo_ms, "background": YOLOv11Config.API_BACKGROUND_LATENCY_SLO_MS},
+        max_queue_size=max_queue_size
+    )
+
+async def start_detection_service():
+    """Create the micro-batching detection service from config (None if the model cannot load)"""
+    backend_name = os.getenv("DETECTION_BACKEND", YOLOv11Config.INFERENCE_BACKEND)
+    model_path = os.getenv("DETECTION_MODEL_PATH", YOLOv11Config.MODEL_PATH)
+
+    try:
+        # The API reports every class; per-request thresholds filter above API_MIN_CONFIDENCE
+        backend = create_backend_from_config(
+            YOLOv11Config,
+            name=backend_name,
+            model_path=model_path,
+            classes=None,
+            conf_threshold=YOLOv11Config.API_MIN_CONFIDENCE
+        )
+        max_batch_size = int(os.getenv("DETECTION_MAX_BATCH", YOLOv11Config.API_MAX_BATCH_SIZE))
+        max_wait_ms = float(os.getenv("DETECTION_MAX_WAIT_MS", YOLOv11Config.API_MAX_BATCH_WAIT_MS))
+        max_queue_size = int(os.getenv("DETECTION_QUEUE_SIZE", YOLOv11Config.API_MAX_QUEUE_SIZE))
+        service = YOLODetectionService(
+            backend,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_queue_size=max_queue_size,
+            batcher=get_detection_batcher(max_batch_size, max_queue_size)
+        )
+        await service.start()
+        return service
+    except Exception as e:
+        logger.warning(f"⚠️ AI Detection Service unavailable ({backend_name}, {model_path}): {e}")
+        return None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -88,7 +147,7 @@ async def lifespan(app: FastAPI):
     try:
         # Initialize AI Detection Service
         logger.info("📸 Initializing AI Detection Service...")
-        # detection_service = YOLODetectionService()
+        detection_service = await start_detection_service()
         
         # Initialize Arduino Service
         logger.info("🔌 Initializing Arduino Service...")
@@ -108,6 +167,8 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("🛑 Shutting down services...")
+    if detection_service:
+        await detection_service.stop()
     if arduino_service:
         await arduino_service.close()
     if firebase_service:
@@ -178,6 +239,12 @@ async def root():
             <div class="endpoint">
                 <span class="method">POST</span> /v1/detect/image - Object Detection from Image
             </div>
+            <div class="endpoint">
+                <span class="method">GET</span> /v1/detect/stats - Detection Batching Statistics
+            </div>
+            <div class="endpoint">
+                <span class="method">WS</span> /v1/detect/stream - Streaming Detection (JPEG frames in, detections + counts out)
+            </div>
             <div class="endpoint">
                 <span class="method">GET</span> /v1/models - List Available Models
             </div>
@@ -240,27 +307,40 @@ async def detect_objects_in_image(
         
         height, width = cv_image.shape[:2]
         
-        # Mock detection results (replace with actual detection service)
-        mock_detections = [
-            {
-                "class": "person",
-                "confidence": 0.85,
-                "bbox": [100, 100, 200, 300],
-                "center": [150, 200]
-            },
-            {
-                "class": "car", 
-                "confidence": 0.72,
-                "bbox": [300, 150, 500, 350],
-                "center": [400, 250]
-            }
-        ]
+        if not detection_service:
+            raise HTTPException(status_code=503, detail="AI detection service not available")
+        
+        # Retried / duplicate stills are answered from the result cache without inference
+        image_hash = None
+        if result_cache:
+            image_hash = result_cache.image_hash(cv_image)
+            cached = result_cache.get(image_hash, cv_image.shape, detection_service.backend.name, confidence_threshold)
+            if cached is not None:
+                return DetectionResult(
+                    detections=cached,
+                    processing_time=(datetime.now() - start_time).total_seconds(),
+                    image_size={"width": width, "height": height},
+                    model_used=detection_service.backend.name,
+                    timestamp=datetime.now().isoformat(),
+                    cached=True
+                )
+        
+        try:
+            result = await detection_service.detect(cv_image)
+        except ServiceOverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
         
         # Filter by confidence threshold
-        filtered_detections = [
-            det for det in mock_detections 
-            if det["confidence"] >= confidence_threshold
-        ]
+        filtered_detections = []
+        for det in result.to_list(detection_service.backend.class_names):
+            if det["confidence"] < confidence_threshold:
+                continue
+            x1, y1, x2, y2 = det["bbox"]
+            det["center"] = [(x1 + x2) // 2, (y1 + y2) // 2]
+            filtered_detections.append(det)
+        
+        if result_cache:
+            result_cache.put(image_hash, cv_image.shape, detection_service.backend.name, confidence_threshold, filtered_detections)
         
         processing_time = (datetime.now() - start_time).total_seconds()
         
@@ -268,14 +348,74 @@ async def detect_objects_in_image(
             detections=filtered_detections,
             processing_time=processing_time,
             image_size={"width": width, "height": height},
-            model_used=model_name,
+            model_used=detection_service.backend.name,
             timestamp=datetime.now().isoformat()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Detection error: {e}")
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
+@app.get("/v1/detect/stats")
+async def detection_stats():
+    """Micro-batching statistics: queue depth, batch-size histogram, latency and result-cache hit rate"""
+    if not detection_service:
+        raise HTTPException(status_code=503, detail="AI detection service not available")
+    
+    stats = detection_service.get_stats()
+    stats["result_cache"] = result_cache.get_stats() if result_cache else None
+    stats["streams"] = [session.get_stats() for session in stream_sessions]
+    return stats
+
+@app.websocket("/v1/detect/stream")
+async def detect_objects_in_stream(
+    websocket: WebSocket,
+    confidence_threshold: float = 0.5,
+    count_mode: Optional[str] = None
+):
+    """
+    Stream JPEG frames (binary messages) and receive detections as they complete
+    
+    - Only the newest pending frame is processed; stale frames are dropped
+    - Each connection keeps its own bottle tracker, so counts are computed server-side
+    - Send the text message "reset" to clear the connection's counter
+    """
+    await websocket.accept()
+    
+    if not detection_service:
+        await websocket.close(code=1013, reason="AI detection service not available")
+        return
+    
+    try:
+        session = create_stream_session(
+            YOLOv11Config,
+            detection_service.detect,
+            class_names=detection_service.backend.class_names,
+            confidence_threshold=confidence_threshold,
+            count_mode=count_mode
+        )
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    
+    async def receive():
+        try:
+            message = await websocket.receive()
+        except WebSocketDisconnect:
+            return None
+        if message["type"] == "websocket.disconnect":
+            return None
+        return message.get("bytes") if message.get("bytes") is not None else message.get("text")
+    
+    stream_sessions.add(session)
+    try:
+        await session.run(receive, websocket.send_json)
+    finally:
+        stream_sessions.discard(session)
+        logger.info(f"📡 Stream closed: {session.get_stats()}")
+
 @app.get("/v1/models")
 async def list_models():
     """List available detection models"""
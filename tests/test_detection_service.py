@@ -0,0 +1,321 @@
+"""Tests for the micro-batching detection service."""
+
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+import main
+from detection_service import YOLODetectionService, ServiceOverloadedError
+from dynamic_batcher import DynamicBatcher
+from config_yolo_v11 import YOLOv11Config
+from inference_backends import DetectionBackend, Detections
+from result_cache import create_result_cache_from_config
+
+
+class FakeBackend(DetectionBackend):
+    """Backend that records batch sizes and returns one box per frame."""
+
+    name = "fake"
+
+    def __init__(self, delay=0.0, fail=False):
+        super().__init__("fake.pt", img_size=32, class_names=["bottle"])
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.threads = set()
+
+    def load(self):
+        pass
+
+    def _predict_batch(self, frames):
+        self.threads.add(threading.current_thread().name)
+        self.batches.append(len(frames))
+        if self.fail:
+            raise RuntimeError("model error")
+        time.sleep(self.delay)
+        return [
+            Detections([[0, 0, f.shape[1], f.shape[0]]], [float(f[0, 0, 0]) / 100], [0])
+            for f in frames
+        ]
+
+
+def make_frame(value, size=(40, 60)):
+    return np.full((size[0], size[1], 3), value, dtype=np.uint8)
+
+
+class TestDetectionService:
+    """Test cases for YOLODetectionService."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_batched(self):
+        """Concurrent requests share one batch and each gets its own result."""
+        backend = FakeBackend()
+        service = YOLODetectionService(backend, max_batch_size=8, max_wait_ms=50)
+        await service.start(warmup=False)
+
+        results = await asyncio.gather(*(service.detect(make_frame(v)) for v in range(10, 16)))
+        await service.stop()
+
+        assert backend.batches == [6]
+        assert [round(float(r.scores[0]), 2) for r in results] == [0.1, 0.11, 0.12, 0.13, 0.14, 0.15]
+        assert all(name.startswith("detection-worker") for name in backend.threads)
+
+        stats = service.get_stats()
+        assert stats["batch_size_histogram"] == {"6": 1}
+        assert stats["requests"] == 6
+        assert stats["max_queue_depth"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_batch_size_is_capped(self):
+        """Bursts larger than max_batch_size are split into several batches."""
+        backend = FakeBackend()
+        service = YOLODetectionService(backend, max_batch_size=4, max_wait_ms=20)
+        await service.start(warmup=False)
+
+        await asyncio.gather(*(service.detect(make_frame(1)) for _ in range(10)))
+        await service.stop()
+
+        assert max(backend.batches) <= 4
+        assert sum(backend.batches) == 10
+
+    @pytest.mark.asyncio
+    async def test_single_request_waits_at_most_deadline(self):
+        """A lone request is dispatched once the max-wait deadline expires."""
+        service = YOLODetectionService(FakeBackend(), max_batch_size=8, max_wait_ms=30)
+        await service.start(warmup=False)
+
+        start = time.perf_counter()
+        await service.detect(make_frame(5))
+        elapsed = time.perf_counter() - start
+        await service.stop()
+
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_full_queue_is_rejected(self):
+        """Requests beyond max_queue_size fail fast with ServiceOverloadedError."""
+        service = YOLODetectionService(FakeBackend(delay=0.2), max_batch_size=1, max_wait_ms=0, max_queue_size=2)
+        await service.start(warmup=False)
+
+        results = await asyncio.gather(
+            *(service.detect(make_frame(1)) for _ in range(6)), return_exceptions=True
+        )
+        await service.stop()
+
+        assert any(isinstance(r, ServiceOverloadedError) for r in results)
+        assert service.get_stats()["rejected"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_backend_error_propagates(self):
+        """Inference errors are returned to every request of the batch."""
+        service = YOLODetectionService(FakeBackend(fail=True), max_wait_ms=10)
+        await service.start(warmup=False)
+
+        with pytest.raises(RuntimeError):
+            await service.detect(make_frame(1))
+        await service.stop()
+
+        assert service.get_stats()["failed_batches"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("delay, max_wait_ms", [(0.0, 1000), (0.3, 0)])
+    async def test_stop_fails_in_flight_requests(self, delay, max_wait_ms):
+        """Requests already collected into a batch (waiting or running) fail on stop instead of hanging."""
+        service = YOLODetectionService(FakeBackend(delay=delay), max_batch_size=8, max_wait_ms=max_wait_ms)
+        await service.start(warmup=False)
+
+        request = asyncio.ensure_future(service.detect(make_frame(1)))
+        await asyncio.sleep(0.05)
+        assert service._queue.empty()
+        await service.stop()
+
+        with pytest.raises(ServiceOverloadedError):
+            await asyncio.wait_for(request, timeout=1.0)
+
+    @pytest.mark.asyncio
+    async def test_shared_batcher_gives_live_frames_priority(self):
+        """With a shared DynamicBatcher, API frames (live lane) are batched ahead of queued background work."""
+        backend = FakeBackend()
+        batcher = DynamicBatcher(max_batch_size=2, dynamic=False)
+        service = YOLODetectionService(backend, batcher=batcher)
+        await service.start(warmup=False)
+
+        gate = threading.Event()
+        order = []
+
+        def offline_job(payloads):
+            gate.wait(2.0)
+            order.extend((payload, len(backend.batches)) for payload in payloads)
+            return payloads
+
+        blocker = batcher.submit("blocker", "background", handler=offline_job)
+        await asyncio.sleep(0.05)
+        background = [batcher.submit(f"rescore-{i}", "background", handler=offline_job) for i in range(2)]
+        live = [asyncio.ensure_future(service.detect(make_frame(v))) for v in (10, 11)]
+        await asyncio.sleep(0.05)
+        gate.set()
+
+        results = await asyncio.gather(*live)
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in [blocker] + background))
+        stats = service.get_stats()
+        await service.stop()
+
+        assert service._task is None
+        assert backend.batches == [2]
+        # the live batch ran before any queued background work (and after the one already running)
+        assert order == [("blocker", 0), ("rescore-0", 1), ("rescore-1", 1)]
+        assert [round(float(r.scores[0]), 2) for r in results] == [0.1, 0.11]
+        assert stats["dynamic_batcher"]["lanes"]["live"]["completed"] == 2
+        assert not batcher.closed  # shared batcher outlives the service
+        with pytest.raises(ServiceOverloadedError):
+            await service.detect(make_frame(1))
+        batcher.close()
+
+
+class TestDetectEndpoint:
+    """Test the /v1/detect/image endpoint against a fake backend."""
+
+    def test_detect_image_uses_service(self, client: TestClient):
+        """Uploaded images are detected by the service and filtered by confidence."""
+        ok, encoded = cv2.imencode(".png", make_frame(90))
+        assert ok
+
+        async def run():
+            service = YOLODetectionService(FakeBackend(), max_wait_ms=1)
+            await service.start(warmup=False)
+            return service
+
+        service = client.portal.call(run)
+        with patch.object(main, "detection_service", service):
+            response = client.post(
+                "/v1/detect/image",
+                files={"image": ("test.png", encoded.tobytes(), "image/png")},
+                data={"confidence_threshold": "0.5"}
+            )
+            stats = client.get("/v1/detect/stats").json()
+        client.portal.call(service.stop)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["model_used"] == "fake"
+        assert data["detections"][0]["class"] == "bottle"
+        assert data["detections"][0]["center"] == [30, 20]
+        assert stats["batch_size_histogram"] == {"1": 1}
+
+    def test_result_cache_ignores_model_name_label(self, client: TestClient):
+        """The same still sent with a different model_name label is served from the cache."""
+        ok, encoded = cv2.imencode(".png", make_frame(70))
+        backend = FakeBackend()
+
+        async def run():
+            service = YOLODetectionService(backend, max_wait_ms=1)
+            await service.start(warmup=False)
+            return service
+
+        service = client.portal.call(run)
+        with patch.object(main, "detection_service", service), \
+                patch.object(main, "result_cache", create_result_cache_from_config(YOLOv11Config)):
+            responses = [
+                client.post(
+                    "/v1/detect/image",
+                    files={"image": ("test.png", encoded.tobytes(), "image/png")},
+                    data={"confidence_threshold": "0.5", "model_name": label}
+                ).json()
+                for label in ("yolo", "yolov11")
+            ]
+        client.portal.call(service.stop)
+
+        assert [response["cached"] for response in responses] == [False, True]
+        assert backend.batches == [1]
+
+    def test_detect_image_without_service(self, client: TestClient):
+        """The endpoint returns 503 when no model could be loaded."""
+        ok, encoded = cv2.imencode(".png", make_frame(90))
+
+        with patch.object(main, "detection_service", None):
+            response = client.post(
+                "/v1/detect/image",
+                files={"image": ("test.png", encoded.tobytes(), "image/png")}
+            )
+
+        assert response.status_code == 503
+
+
+class MovingBackend(FakeBackend):
+    """Backend whose single box sits at x = pixel value, so frames can move a bottle."""
+
+    def _predict_batch(self, frames):
+        time.sleep(self.delay)
+        return [
+            Detections([[int(f[0, 0, 0]), 10, int(f[0, 0, 0]) + 20, 50]], [0.9], [0])
+            for f in frames
+        ]
+
+
+class TestStreamEndpoint:
+    """Test the /v1/detect/stream WebSocket endpoint against a fake backend."""
+
+    def start_service(self, client, backend):
+        async def run():
+            service = YOLODetectionService(backend, max_wait_ms=1)
+            await service.start(warmup=False)
+            return service
+
+        return client.portal.call(run)
+
+    def test_stream_counts_bottles_server_side(self, client: TestClient):
+        """A box crossing the middle line is counted once by the connection's tracker."""
+        service = self.start_service(client, MovingBackend())
+        frames = [cv2.imencode(".png", make_frame(x, size=(60, 200)))[1].tobytes() for x in (20, 35, 50, 65, 80, 95, 110)]
+
+        with patch.object(main, "detection_service", service):
+            with client.websocket_connect("/v1/detect/stream?count_mode=line") as websocket:
+                replies = []
+                for data in frames:
+                    websocket.send_bytes(data)
+                    replies.append(websocket.receive_json())
+                websocket.send_text("reset")
+                websocket.send_bytes(frames[0])
+                after_reset = websocket.receive_json()
+        client.portal.call(service.stop)
+
+        assert [reply["frame"] for reply in replies] == [1, 2, 3, 4, 5, 6, 7]
+        assert replies[-1]["total_counted"] == 1
+        assert sum(len(reply["counted"]) for reply in replies) == 1
+        assert replies[0]["detections"][0]["class"] == "bottle"
+        assert after_reset["total_counted"] == 0
+
+    def test_stream_drops_stale_frames(self, client: TestClient):
+        """Frames that arrive while inference is busy are replaced by the newest one."""
+        service = self.start_service(client, MovingBackend(delay=0.1))
+        data = cv2.imencode(".png", make_frame(20))[1].tobytes()
+
+        with patch.object(main, "detection_service", service):
+            with client.websocket_connect("/v1/detect/stream") as websocket:
+                for _ in range(8):
+                    websocket.send_bytes(data)
+                replies = [websocket.receive_json()]
+                while replies[-1]["frame"] != 8:
+                    replies.append(websocket.receive_json())
+                stats = client.get("/v1/detect/stats").json()
+        client.portal.call(service.stop)
+
+        assert len(replies) < 8
+        assert replies[-1]["dropped"] == 8 - len(replies)
+        assert stats["streams"][0]["received"] == 8
+
+    def test_stream_rejects_unknown_count_mode(self, client: TestClient):
+        service = self.start_service(client, FakeBackend())
+
+        with patch.object(main, "detection_service", service):
+            with client.websocket_connect("/v1/detect/stream?count_mode=zigzag") as websocket:
+                message = websocket.receive()
+        client.portal.call(service.stop)
+
+        assert message["type"] == "websocket.close" and message["code"] == 1008